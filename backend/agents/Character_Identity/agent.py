@@ -22,8 +22,19 @@ from dotenv import load_dotenv
 
 from agent_types import AgentLevel
 from .schemas import EntryAgentOutput, FinalCharacterProfile
-from .storage import CharacterStorage
-from .orchestrator import CharacterOrchestrator
+from .async_storage import get_shared_storage
+from .orchestrator import AGENT_FUNCTIONS, APPROVAL_POLICIES, CharacterOrchestrator, record_agent_usage
+from .dependencies import AGENT_CHECKPOINTS, compute_input_hash, downstream_agents
+from .budget import (
+    BudgetExceededError,
+    apply_budget_mode,
+    compute_budget_status,
+    make_budget,
+    should_skip_agent
+)
+from providers.clients import is_offline_mode
+from providers.response_cache import fresh_responses
+from providers.usage import add_usage, empty_usage
 
 
 class CharacterIdentityAgent:
@@ -47,13 +58,16 @@ class CharacterIdentityAgent:
 
         # Load additional API keys from environment
         load_dotenv()
-        self.gemini_api_key = os.getenv("GEMINI_API_KEY")
+        self.gemini_api_key = os.getenv("GEMINI_API_KEY") or ("fake" if is_offline_mode() else None)
 
+        # Only image generation needs Gemini; text agents run without it
         if not self.gemini_api_key:
-            raise ValueError("GEMINI_API_KEY not found in environment")
+            print("Warning: GEMINI_API_KEY not found in environment. Image generation is disabled.")
 
-        # Initialize storage
-        self.storage = CharacterStorage()
+        # Initialize storage (sync API for CLI use, async facade for handlers and sessions)
+        # Shared process-wide with the Scene Creator tools (one write buffer and read cache)
+        self.async_storage = get_shared_storage()
+        self.storage = self.async_storage.sync
 
         # Track active character sessions
         self.active_sessions: Dict[str, CharacterOrchestrator] = {}
@@ -61,7 +75,11 @@ class CharacterIdentityAgent:
     def start_character_development(
         self,
         entry_output: EntryAgentOutput,
-        mode: str = "balanced"
+        mode: str = "balanced",
+        project_id: Optional[str] = None,
+        approval_policy: str = "manual",
+        approval_timeout_seconds: Optional[float] = None,
+        budget: Optional[Dict] = None
     ) -> str:
         """
         Start character development from Entry Agent output
@@ -69,12 +87,26 @@ class CharacterIdentityAgent:
         Args:
             entry_output: Output from Entry Agent (Level 1)
             mode: Development mode (fast/balanced/deep)
+            project_id: Optional project the character belongs to
+            approval_policy: manual, auto, auto_unless_parse_fallback or auto_after_timeout
+            approval_timeout_seconds: Wait before auto-approving under auto_after_timeout
+            budget: Optional spend limits from make_budget() (environment defaults otherwise)
 
         Returns:
             character_id: UUID of created character session
         """
+        if approval_policy not in APPROVAL_POLICIES:
+            raise ValueError(f"Unknown approval policy: {approval_policy}. Valid policies: {APPROVAL_POLICIES}")
+
         # Create character in storage
-        character_id = self.storage.create_character(entry_output, mode)
+        character_id = self.storage.create_character(
+            entry_output,
+            mode,
+            project_id=project_id,
+            approval_policy=approval_policy,
+            approval_timeout_seconds=approval_timeout_seconds,
+            budget=budget or make_budget()
+        )
         return character_id
 
     async def run_character_development(
@@ -98,7 +130,8 @@ class CharacterIdentityAgent:
             anthropic_api_key=self.anthropic_api_key,
             gemini_api_key=self.gemini_api_key,
             storage=self.storage,
-            websocket_callback=websocket_callback
+            websocket_callback=websocket_callback,
+            async_storage=self.async_storage
         )
 
         # Store active session
@@ -152,6 +185,42 @@ class CharacterIdentityAgent:
         """
         return self.storage.load_checkpoint(character_id, checkpoint_number)
 
+    def list_checkpoints(self, character_id: str):
+        """
+        List checkpoint summaries (number, agent, status, size) from the index
+
+        Args:
+            character_id: Character UUID
+
+        Returns:
+            List of checkpoint summaries ordered by checkpoint number
+        """
+        self.storage.load_metadata(character_id)  # Raises FileNotFoundError for unknown characters
+        return self.storage.list_checkpoints(character_id)
+
+    def list_checkpoint_versions(self, character_id: str, checkpoint_number: int):
+        """
+        List the saved versions of a checkpoint
+
+        Args:
+            character_id: Character UUID
+            checkpoint_number: Checkpoint number (1-8)
+
+        Returns:
+            Version summaries (version, timestamp, agent, status, kind, size), oldest first
+        """
+        self.storage.load_metadata(character_id)  # Raises FileNotFoundError for unknown characters
+        return self.storage.list_checkpoint_versions(character_id, checkpoint_number)
+
+    def get_checkpoint_version(self, character_id: str, checkpoint_number: int, version: int):
+        """
+        Get a checkpoint as it was at a given version
+
+        Returns:
+            Checkpoint data or None if the version does not exist
+        """
+        return self.storage.load_checkpoint_version(character_id, checkpoint_number, version)
+
     def approve_checkpoint(self, character_id: str, checkpoint_number: int):
         """
         Approve a checkpoint and allow continuation
@@ -160,100 +229,413 @@ class CharacterIdentityAgent:
             character_id: Character UUID
             checkpoint_number: Checkpoint number to approve
         """
-        metadata = self.storage.load_metadata(character_id)
-        metadata["completed_checkpoints"] = checkpoint_number
-        self.storage.save_metadata(character_id, metadata)
+        checkpoint = self.storage.load_checkpoint(character_id, checkpoint_number)
+        if checkpoint and checkpoint["status"] == "awaiting_approval":
+            checkpoint["status"] = "approved"
+            checkpoint["metadata"]["approved_by"] = "user"
+            self.storage.save_checkpoint(character_id, checkpoint)
+
+        def mark_completed(metadata):
+            metadata["completed_checkpoints"] = checkpoint_number
+
+        self.storage.update_metadata(character_id, mark_completed)
+
+    async def _budget_status(self, character_id: str):
+        """compute_budget_status() off the event loop"""
+        return await self.async_storage.run(compute_budget_status, self.storage, character_id)
+
+    async def _record_usage(self, character_id: str, agent_name: str, wave: int, run_info) -> None:
+        """Add an agent run to the usage ledger (atomic metadata update)"""
+        await self.async_storage.update_metadata(
+            character_id,
+            lambda metadata: record_agent_usage(metadata, agent_name, wave, run_info)
+        )
+
+    async def _invoke_agent(self, agent_name: str, kb):
+        """
+        Run a single sub-agent against the given KB
+
+        Args:
+            agent_name: Name of agent to run
+            kb: Character knowledge base
+
+        Returns:
+            Tuple of (structured_output, narrative, run_info)
+        """
+        if agent_name not in AGENT_FUNCTIONS:
+            raise ValueError(f"Unknown agent name: {agent_name}. Valid agents: {list(AGENT_FUNCTIONS.keys())}")
+
+        agent_func = AGENT_FUNCTIONS[agent_name]
+
+        if agent_name == "image_generation":
+            # Image generation requires additional parameters
+            return await agent_func(kb, self.gemini_api_key, self.async_storage)
+
+        # Text-based agents use Anthropic API
+        return await agent_func(kb, self.anthropic_api_key)
+
+    async def _commit_agent_output(
+        self,
+        character_id: str,
+        kb,
+        agent_name: str,
+        output: Dict,
+        narrative: str,
+        input_hash: str,
+        mode: Optional[str] = None
+    ) -> int:
+        """
+        Store a (re)generated agent output in the KB and its checkpoint
+
+        Args:
+            mode: Mode the output was produced in, if the budget downgraded it
+
+        Returns:
+            Checkpoint number that was updated
+        """
+        kb[agent_name] = output
+        wave = kb["agent_statuses"].get(agent_name, {}).get("wave", 0)
+        kb["agent_statuses"][agent_name] = {"status": "completed", "wave": wave, "input_hash": input_hash}
+        if mode and mode != kb["mode"]:
+            kb["agent_statuses"][agent_name]["mode"] = mode
+        await self.async_storage.save_character_kb(kb)
+
+        # Load and update the checkpoint (may not exist yet if the wave is still running)
+        checkpoint_num = AGENT_CHECKPOINTS[agent_name]
+        checkpoint = await self.async_storage.load_checkpoint(character_id, checkpoint_num)
+        if checkpoint:
+            checkpoint["output"]["structured"] = output
+            checkpoint["output"]["narrative"] = narrative
+            checkpoint["status"] = "awaiting_approval"
+            await self.async_storage.save_checkpoint(character_id, checkpoint)
+
+        return checkpoint_num
 
     async def regenerate_agent(
         self,
         character_id: str,
         agent_name: str,
-        feedback: str
+        feedback: str,
+        cascade: bool = True
     ):
         """
         Regenerate a specific agent with user feedback
 
+        Downstream agents built on the old output are marked stale and, when
+        cascade is enabled, re-run only if the KB fields they consume changed.
+        Every run is checked against the budget: near exhaustion agents run in
+        fast mode, optional agents stay stale, and once exhausted the cascade
+        stops (the remaining dependents stay stale).
+
+        While a development session is active the regeneration happens in that
+        session's KB, so later waves and the final profile build on the new
+        output. It is refused while the session's agents are running.
+
         Args:
             character_id: Character UUID
             agent_name: Name of agent to regenerate (e.g., "personality", "backstory_motivation")
             feedback: User feedback for regeneration
-        """
-        from .subagents import (
-            personality_agent,
-            backstory_motivation_agent,
-            voice_dialogue_agent,
-            physical_description_agent,
-            story_arc_agent,
-            relationships_agent,
-            image_generation_agent
-        )
+            cascade: Re-run stale downstream agents whose inputs changed
 
-        # Load KB and metadata
-        kb = self.storage.load_character_kb(character_id)
-        metadata = self.storage.load_metadata(character_id)
+        Returns:
+            Dict describing the regenerated checkpoint and every recomputed dependent
+
+        Raises:
+            BudgetExceededError: If the budget is already exhausted
+        """
+        if agent_name not in AGENT_CHECKPOINTS:
+            raise ValueError(f"Unknown agent name: {agent_name}. Valid agents: {list(AGENT_CHECKPOINTS.keys())}")
+
+        orchestrator = self.active_sessions.get(character_id)
+        if orchestrator:
+            running = [
+                name for name, status in orchestrator.kb["agent_statuses"].items()
+                if status.get("status") == "in_progress"
+            ]
+            if running:
+                raise ValueError(f"Cannot regenerate while agents are running ({', '.join(running)})")
+            # The session's in-memory KB is saved again by later waves: update it, not a copy
+            kb = orchestrator.kb
+        else:
+            kb = await self.async_storage.load_character_kb(character_id)
 
         # Add feedback to KB so it's available to the agent
         feedback_key = f"{agent_name}_feedback"
         kb[feedback_key] = feedback
-        self.storage.save_character_kb(kb)
-
-        # Map agent name to agent function
-        agent_mapping = {
-            "personality": personality_agent,
-            "backstory_motivation": backstory_motivation_agent,
-            "voice_dialogue": voice_dialogue_agent,
-            "physical_description": physical_description_agent,
-            "story_arc": story_arc_agent,
-            "relationships": relationships_agent,
-            "image_generation": image_generation_agent,
+        await self.async_storage.save_character_kb(kb)
+
+        budget = await self._budget_status(character_id)
+        if budget["level"] == "exhausted":
+            raise BudgetExceededError(budget)
+
+        # Re-run the agent with feedback in KB (a fresh sample, never a cached response)
+        run_kb = self._budgeted_kb(kb, budget)
+        input_hash = compute_input_hash(run_kb, agent_name)
+        with fresh_responses():
+            output, narrative, run_info = await self._invoke_agent(agent_name, run_kb)
+        checkpoint_num = await self._commit_agent_output(
+            character_id, kb, agent_name, output, narrative, input_hash, run_kb["mode"]
+        )
+        await self._record_usage(character_id, agent_name, kb["agent_statuses"][agent_name]["wave"], run_info)
+
+        # Mark dependents that already produced output as stale
+        dependents = [
+            name for name in downstream_agents(agent_name)
+            if kb.get(name) is not None
+        ]
+        for name in dependents:
+            kb["agent_statuses"][name]["status"] = "stale"
+        await self.async_storage.save_character_kb(kb)
+
+        recomputed = []
+        unchanged = []
+        if cascade:
+            # Dependents are in execution order, so upstream changes land first
+            for name in dependents:
+                budget = await self._budget_status(character_id)
+                if budget["level"] == "exhausted":
+                    break
+
+                # Stored hashes were computed from the budgeted KB the agent ran against
+                run_kb = self._budgeted_kb(kb, budget)
+                dep_hash = compute_input_hash(run_kb, name)
+                if dep_hash == kb["agent_statuses"][name].get("input_hash"):
+                    kb["agent_statuses"][name]["status"] = "completed"
+                    await self.async_storage.save_character_kb(kb)
+                    unchanged.append(name)
+                    continue
+
+                if should_skip_agent(name, budget):
+                    continue
+
+                dep_output, dep_narrative, dep_run = await self._invoke_agent(name, run_kb)
+                await self._commit_agent_output(character_id, kb, name, dep_output, dep_narrative, dep_hash, run_kb["mode"])
+                await self._record_usage(character_id, name, kb["agent_statuses"][name]["wave"], dep_run)
+                recomputed.append({"agent": name, "checkpoint": AGENT_CHECKPOINTS[name]})
+
+        # Update regeneration count
+        def count_regeneration(metadata):
+            metadata["regenerations"] = metadata.get("regenerations", 0) + 1
+
+        await self.async_storage.update_metadata(character_id, count_regeneration)
+
+        stale = [name for name in dependents if kb["agent_statuses"][name]["status"] == "stale"]
+
+        message = f"Agent '{agent_name}' regenerated with feedback. Review checkpoint #{checkpoint_num}."
+        if recomputed:
+            message += f" Recomputed dependents: {', '.join(r['agent'] for r in recomputed)}."
+
+        budget = await self._budget_status(character_id)
+        if stale and cascade and budget["level"] != "ok":
+            message += f" Budget {budget['level']}: {', '.join(stale)} left stale."
+
+        return {
+            "checkpoint": checkpoint_num,
+            "agent": agent_name,
+            "status": "regenerated",
+            "recomputed": recomputed,
+            "unchanged": unchanged,
+            "stale": stale,
+            "budget": budget,
+            "message": message
         }
 
-        if agent_name not in agent_mapping:
-            raise ValueError(f"Unknown agent name: {agent_name}. Valid agents: {list(agent_mapping.keys())}")
+    def _budgeted_kb(self, kb, budget):
+        """KB copy to run an agent against, downgraded to fast mode if the budget requires it"""
+        if budget["level"] == "ok":
+            return kb
+        run_kb = dict(kb)
+        apply_budget_mode(run_kb, budget)  # type: ignore
+        return run_kb
 
-        agent_func = agent_mapping[agent_name]
+    async def retry_checkpoint(self, character_id: str, checkpoint_number: int) -> Dict:
+        """
+        Re-run the agent behind a failed checkpoint
 
-        # Re-run the agent with feedback in KB
-        if agent_name == "image_generation":
-            # Image generation requires additional parameters
-            output, narrative = await agent_func(kb, self.gemini_api_key, self.storage)
+        Uses the active orchestrator session when there is one, so the wave
+        waiting on the failed checkpoint resumes after approval. Otherwise the
+        agent is re-run directly against the stored KB.
+
+        Args:
+            character_id: Character UUID
+            checkpoint_number: Number of the failed checkpoint
+
+        Returns:
+            Dict describing the retried checkpoint
+        """
+        agent_name = next(
+            (name for name, number in AGENT_CHECKPOINTS.items() if number == checkpoint_number),
+            None
+        )
+        if agent_name is None:
+            raise ValueError(f"Checkpoint {checkpoint_number} does not belong to a retryable agent")
+
+        orchestrator = self.active_sessions.get(character_id)
+        if orchestrator:
+            await orchestrator.retry_agent(agent_name)
         else:
-            # Text-based agents use Anthropic API
-            output, narrative = await agent_func(kb, self.anthropic_api_key)
+            kb = await self.async_storage.load_character_kb(character_id)
+            status = kb["agent_statuses"].get(agent_name, {})
+            if status.get("status") != "failed":
+                raise ValueError(f"Agent '{agent_name}' has not failed (status: {status.get('status', 'unknown')})")
 
-        # Update KB with new output
-        kb[agent_name] = output
-        self.storage.save_character_kb(kb)
-
-        # Find the checkpoint number for this agent
-        # Map agents to their checkpoint numbers
-        checkpoint_mapping = {
-            "personality": 1,
-            "backstory_motivation": 2,
-            "voice_dialogue": 3,
-            "physical_description": 4,
-            "story_arc": 5,
-            "relationships": 6,
-            "image_generation": 7,
+            budget = await self._budget_status(character_id)
+            if budget["level"] == "exhausted":
+                raise BudgetExceededError(budget)
+
+            run_kb = self._budgeted_kb(kb, budget)
+            input_hash = compute_input_hash(run_kb, agent_name)
+            output, narrative, run_info = await self._invoke_agent(agent_name, run_kb)
+            await self._commit_agent_output(character_id, kb, agent_name, output, narrative, input_hash, run_kb["mode"])
+
+            await self._record_usage(character_id, agent_name, status["wave"], run_info)
+
+        return {
+            "checkpoint": checkpoint_number,
+            "agent": agent_name,
+            "status": "awaiting_approval",
+            "message": f"Agent '{agent_name}' retried. Review checkpoint #{checkpoint_number}."
         }
-        checkpoint_num = checkpoint_mapping.get(agent_name, 1)
 
-        # Load and update the checkpoint
-        checkpoint = self.storage.load_checkpoint(character_id, checkpoint_num)
-        checkpoint["output"]["structured"] = output
-        checkpoint["output"]["narrative"] = narrative
-        checkpoint["status"] = "awaiting_approval"
-        self.storage.save_checkpoint(character_id, checkpoint)
+    async def rollback_checkpoint(self, character_id: str, checkpoint_number: int, version: int) -> Dict:
+        """
+        Restore a checkpoint's output from an earlier version
 
-        # Update regeneration count
-        metadata["regenerations"] = metadata.get("regenerations", 0) + 1
-        self.storage.save_metadata(character_id, metadata)
+        No model is called: the stored version becomes the agent's KB output
+        again and is saved as a new version awaiting approval (the versions
+        in between are kept). Downstream agents that already produced output
+        are marked stale, as after a regeneration.
+
+        Args:
+            character_id: Character UUID
+            checkpoint_number: Checkpoint to roll back
+            version: Version to restore
+
+        Returns:
+            Dict describing the restored checkpoint
+
+        Raises:
+            LookupError: If the version does not exist
+        """
+        if character_id in self.active_sessions:
+            raise ValueError("Cannot roll back while character development is running")
 
+        target = await self.async_storage.load_checkpoint_version(character_id, checkpoint_number, version)
+        if target is None:
+            raise LookupError(f"Checkpoint {checkpoint_number} has no version {version}")
+
+        current = await self.async_storage.load_checkpoint(character_id, checkpoint_number)
+        checkpoint = current or target
+        checkpoint["output"] = target["output"]
+        checkpoint["status"] = "awaiting_approval"
+        checkpoint["metadata"]["rollback_of_version"] = version
+
+        agent_name = target["agent"]
+        stale = []
+        if agent_name in AGENT_CHECKPOINTS:
+            kb = await self.async_storage.load_character_kb(character_id)
+            kb[agent_name] = target["output"]["structured"]
+            status = kb["agent_statuses"].get(agent_name, {})
+            kb["agent_statuses"][agent_name] = {**status, "status": "completed"}
+
+            stale = [name for name in downstream_agents(agent_name) if kb.get(name) is not None]
+            for name in stale:
+                kb["agent_statuses"][name]["status"] = "stale"
+            await self.async_storage.save_character_kb(kb)
+
+        await self.async_storage.save_checkpoint(character_id, checkpoint)
+
+        message = f"Checkpoint #{checkpoint_number} restored to version {version}."
+        if stale:
+            message += f" Marked stale: {', '.join(stale)}."
         return {
-            "checkpoint": checkpoint_num,
+            "checkpoint": checkpoint_number,
             "agent": agent_name,
-            "status": "regenerated",
-            "message": f"Agent '{agent_name}' regenerated with feedback. Review checkpoint #{checkpoint_num}."
+            "version": version,
+            "status": "awaiting_approval",
+            "stale": stale,
+            "message": message
+        }
+
+    def get_usage(self, character_id: str) -> Dict:
+        """
+        Get measured token usage and agent latency for a character
+
+        Args:
+            character_id: Character UUID
+
+        Returns:
+            Usage ledger (total, by_agent, by_wave) from character metadata
+        """
+        metadata = self.storage.load_metadata(character_id)
+        return metadata.get("usage", {
+            "total": empty_usage(),
+            "cost_usd": 0.0,
+            "agent_time_seconds": 0.0,
+            "api_calls": 0,
+            "by_agent": {},
+            "by_wave": {}
+        })
+
+    def get_budget(self, character_id: str) -> Dict:
+        """
+        Get spend against the character and project budgets
+
+        Args:
+            character_id: Character UUID
+
+        Returns:
+            BudgetStatus dict
+        """
+        return compute_budget_status(self.storage, character_id)
+
+    def update_budget(self, character_id: str, budget: Dict) -> Dict:
+        """
+        Replace a character's budget limits
+
+        Args:
+            character_id: Character UUID
+            budget: New limits from make_budget()
+
+        Returns:
+            Updated BudgetStatus dict
+        """
+        metadata = self.storage.update_metadata(character_id, lambda m: m.update(budget=budget))
+        return compute_budget_status(self.storage, character_id, metadata)
+
+    def get_project_usage(self, project_id: str) -> Dict:
+        """
+        Aggregate measured usage across every character in a project
+
+        Args:
+            project_id: Project identifier given at character creation
+
+        Returns:
+            Dict with project totals and per-character totals
+        """
+        total = empty_usage()
+        cost = 0.0
+        agent_time = 0.0
+        characters = {}
+
+        for character_id in self.storage.list_characters(project_id=project_id):
+            try:
+                metadata = self.storage.load_metadata(character_id)
+            except FileNotFoundError:
+                continue
+
+            ledger = metadata.get("usage", {})
+            add_usage(total, ledger.get("total"))
+            cost += ledger.get("cost_usd", 0.0)
+            agent_time += ledger.get("agent_time_seconds", 0.0)
+            characters[character_id] = ledger.get("total", empty_usage())
+
+        return {
+            "project_id": project_id,
+            "total": total,
+            "cost_usd": cost,
+            "agent_time_seconds": agent_time,
+            "characters": characters
         }
 
     def get_final_profile(self, character_id: str) -> Optional[FinalCharacterProfile]:
@@ -380,6 +762,14 @@ Type '/next' to proceed to Scene Creator, or continue refining this character.
                 agent = message.get("agent", "")
                 print(f"  ✓ {agent} complete")
 
+            elif msg_type == "checkpoint_failed":
+                checkpoint_num = message.get("checkpoint_number", 0)
+                print(f"\n✗ Checkpoint #{checkpoint_num} ({message.get('agent', '')}) failed: {message.get('error', '')}")
+                retry = input("Retry this agent? (y/n): ").strip().lower()
+                if retry != 'y':
+                    raise RuntimeError(f"Checkpoint #{checkpoint_num} failed and was not retried")
+                await self.retry_checkpoint(character_id, checkpoint_num)
+
             elif msg_type == "checkpoint_ready":
                 checkpoint_num = message.get("checkpoint_number", message.get("checkpoint", 0))
                 print(f"\n{'='*60}")
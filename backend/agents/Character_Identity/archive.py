@@ -0,0 +1,430 @@
+"""
+Single-file export/import of characters and projects
+
+An archive is a gzipped tar stream:
+
+    characters/<id>/input.json
+    characters/<id>/metadata.json
+    characters/<id>/knowledge_base.json
+    characters/<id>/final_profile.json        (if complete)
+    characters/<id>/checkpoints/<NN>.json     (refs resolved)
+    characters/<id>/history/<NN>.jsonl        (every retained version)
+    characters/<id>/images/<type>.png
+    manifest.json                             (last: character list, size + sha256 per file)
+
+Export is a generator of chunks, so the API can stream it while it is
+being built; memory use is bounded by the largest single file, not by the
+archive. Import reads the tar as a stream (ArchiveStreamReader lets the API
+feed request chunks to a worker thread), stages members on disk while
+hashing them, and only writes to storage once every hash matches the
+manifest. Image URLs are rewritten to the target storage's layout, so
+archives move freely between the JSON and SQLite backends.
+
+Usage (from backend/):
+    python -m agents.Character_Identity.archive export --character <id> -o character.tar.gz
+    python -m agents.Character_Identity.archive export --project <id> -o project.tar.gz
+    python -m agents.Character_Identity.archive import project.tar.gz [--overwrite]
+"""
+
+import argparse
+import hashlib
+import io
+import json
+import os
+import queue
+import re
+import tarfile
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, BinaryIO, Container, Dict, Iterator, List, Optional
+
+from .storage import create_storage
+
+
+ARCHIVE_FORMAT = "weave-character-archive"
+ARCHIVE_VERSION = 1
+ARCHIVE_MANIFEST = "manifest.json"
+
+CHARACTER_ID_PATTERN = re.compile(r"[A-Za-z0-9_-]+")
+MEMBER_PATTERN = re.compile(
+    r"characters/(?P<id>[A-Za-z0-9_-]+)/"
+    r"(?P<file>input\.json|metadata\.json|knowledge_base\.json|final_profile\.json"
+    r"|checkpoints/\d+\.json|history/\d+\.jsonl|images/[A-Za-z0-9_-]+\.png)"
+)
+
+# Files every archived character must contain
+REQUIRED_CHARACTER_FILES = ("input.json", "metadata.json", "knowledge_base.json")
+
+CHUNK_SIZE = 1024 * 1024
+
+# Seconds an import waits for the next upload chunk before giving up
+ARCHIVE_UPLOAD_IDLE_TIMEOUT = float(os.getenv("ARCHIVE_UPLOAD_IDLE_TIMEOUT", "60"))
+
+
+class ArchiveError(ValueError):
+    """Raised for malformed archives or failed integrity checks"""
+    pass
+
+
+def _encode(data: Any) -> bytes:
+    return json.dumps(data, separators=(",", ":")).encode("utf-8")
+
+
+# ============================================================================
+# EXPORT
+# ============================================================================
+
+class _ChunkSink:
+    """Write-only file object that collects what tarfile writes"""
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+class _HashingReader:
+    """Read-through file wrapper that hashes what is read"""
+
+    def __init__(self, fileobj: BinaryIO):
+        self._fileobj = fileobj
+        self.sha256 = hashlib.sha256()
+
+    def read(self, size: int = -1) -> bytes:
+        data = self._fileobj.read(size)
+        self.sha256.update(data)
+        return data
+
+
+def _character_members(storage, character_id: str) -> Iterator[tuple]:
+    """(archive path, bytes or file path) for everything stored about a character"""
+    prefix = f"characters/{character_id}"
+    yield f"{prefix}/input.json", _encode(storage.load_input(character_id))
+    yield f"{prefix}/metadata.json", _encode(storage.load_metadata(character_id))
+    yield f"{prefix}/knowledge_base.json", _encode(storage.load_character_kb(character_id))
+
+    final_profile = storage.load_final_profile(character_id)
+    if final_profile is not None:
+        yield f"{prefix}/final_profile.json", _encode(final_profile)
+
+    for number, checkpoint in sorted(storage.load_all_checkpoints(character_id).items()):
+        yield f"{prefix}/checkpoints/{number:02d}.json", _encode(checkpoint)
+        records = storage.load_checkpoint_history(character_id, number)
+        if records:
+            yield f"{prefix}/history/{number:02d}.jsonl", b"".join(_encode(record) + b"\n" for record in records)
+
+    images_dir = storage.get_image_path(character_id, "portrait").parent
+    if images_dir.exists():
+        for path in sorted(images_dir.glob("*.png")):
+            yield f"{prefix}/images/{path.name}", path
+
+
+def export_archive(storage, character_ids: List[str], project_id: Optional[str] = None) -> Iterator[bytes]:
+    """
+    Stream characters as a gzipped tar archive
+
+    Args:
+        storage: CharacterStorage or SQLiteCharacterStorage instance
+        character_ids: Characters to include
+        project_id: Recorded in the manifest for project exports
+
+    Yields:
+        Chunks of the archive
+    """
+    sink = _ChunkSink()
+    files: Dict[str, Dict[str, Any]] = {}
+    mtime = time.time()
+
+    with tarfile.open(fileobj=sink, mode="w|gz") as tar:  # type: ignore
+        for character_id in character_ids:
+            for name, content in _character_members(storage, character_id):
+                info = tarfile.TarInfo(name)
+                info.mtime = int(mtime)
+                if isinstance(content, bytes):
+                    info.size = len(content)
+                    tar.addfile(info, io.BytesIO(content))
+                    digest = hashlib.sha256(content).hexdigest()
+                else:
+                    info.size = content.stat().st_size
+                    with open(content, "rb") as f:
+                        reader = _HashingReader(f)
+                        tar.addfile(info, reader)  # type: ignore
+                    digest = reader.sha256.hexdigest()
+                files[name] = {"size": info.size, "sha256": digest}
+                yield sink.drain()
+
+        manifest = _encode({
+            "format": ARCHIVE_FORMAT,
+            "version": ARCHIVE_VERSION,
+            "created_at": datetime.utcnow().isoformat(),
+            "project_id": project_id,
+            "characters": character_ids,
+            "files": files,
+        })
+        info = tarfile.TarInfo(ARCHIVE_MANIFEST)
+        info.size = len(manifest)
+        info.mtime = int(mtime)
+        tar.addfile(info, io.BytesIO(manifest))
+
+    yield sink.drain()
+
+
+# ============================================================================
+# IMPORT
+# ============================================================================
+
+class ArchiveStreamReader(io.RawIOBase):
+    """
+    Blocking reader fed with chunks from another thread
+
+    The API handler calls feed() for every request chunk (and feed(b"") at
+    the end) while import_archive() reads on a worker thread. At most
+    max_chunks are queued, so a slow import applies backpressure instead of
+    buffering the upload. If the upload breaks off, the handler calls
+    fail(); a reader left without chunks for idle_timeout seconds gives up
+    on its own, so the worker thread is never blocked for good.
+    """
+
+    def __init__(self, max_chunks: int = 16, idle_timeout: float = ARCHIVE_UPLOAD_IDLE_TIMEOUT):
+        self._queue: "queue.Queue[bytes]" = queue.Queue(max_chunks)
+        self._buffer = b""
+        self._eof = False
+        self._failure: Optional[str] = None
+        self.idle_timeout = idle_timeout
+        self.abandoned = False  # Set when the reader stops early; feed() then drops chunks
+
+    def feed(self, chunk: bytes) -> None:
+        """Queue a chunk (b"" marks the end of the stream)"""
+        while not self.abandoned and self._failure is None:
+            try:
+                self._queue.put(chunk, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    def fail(self, reason: str) -> None:
+        """Mark the upload as broken off (the reader raises ArchiveError)"""
+        self._failure = reason
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        deadline = time.monotonic() + self.idle_timeout
+        while not self._buffer and not self._eof:
+            if self._failure is not None:
+                raise ArchiveError(self._failure)
+            try:
+                chunk = self._queue.get(timeout=0.1)
+            except queue.Empty:
+                if time.monotonic() > deadline:
+                    raise ArchiveError(f"Upload stalled: no data for {self.idle_timeout:g} seconds")
+                continue
+            if chunk:
+                self._buffer = chunk
+            else:
+                self._eof = True
+        size = min(len(buffer), len(self._buffer))
+        buffer[:size] = self._buffer[:size]
+        self._buffer = self._buffer[size:]
+        return size
+
+
+def _stage_members(fileobj: BinaryIO, staging: Path) -> Dict[str, Any]:
+    """
+    Extract the archive stream into staging, hashing every member
+
+    Returns:
+        The manifest, after verifying every member against it
+    """
+    hashes: Dict[str, Dict[str, Any]] = {}
+    manifest = None
+    try:
+        with tarfile.open(fileobj=fileobj, mode="r|*") as tar:
+            for member in tar:
+                if not member.isfile():
+                    raise ArchiveError(f"Unexpected archive entry {member.name}")
+                source = tar.extractfile(member)
+
+                if member.name == ARCHIVE_MANIFEST:
+                    manifest = json.loads(source.read())  # type: ignore
+                    continue
+                if not MEMBER_PATTERN.fullmatch(member.name):
+                    raise ArchiveError(f"Unexpected archive entry {member.name}")
+
+                target = staging / member.name
+                target.parent.mkdir(parents=True, exist_ok=True)
+                digest = hashlib.sha256()
+                with open(target, "wb") as out:
+                    while True:
+                        chunk = source.read(CHUNK_SIZE)  # type: ignore
+                        if not chunk:
+                            break
+                        digest.update(chunk)
+                        out.write(chunk)
+                hashes[member.name] = {"size": member.size, "sha256": digest.hexdigest()}
+    except (tarfile.TarError, EOFError, OSError, json.JSONDecodeError) as e:
+        raise ArchiveError(f"Unreadable archive: {e}")
+
+    if manifest is None or manifest.get("format") != ARCHIVE_FORMAT:
+        raise ArchiveError("Not a character archive (manifest missing)")
+    if manifest.get("version", 0) > ARCHIVE_VERSION:
+        raise ArchiveError(f"Archive version {manifest['version']} is newer than supported ({ARCHIVE_VERSION})")
+
+    expected = manifest.get("files", {})
+    missing = sorted(set(expected) - set(hashes))
+    unexpected = sorted(set(hashes) - set(expected))
+    corrupt = sorted(name for name in expected if name in hashes and hashes[name] != expected[name])
+    if missing or unexpected or corrupt:
+        first = (corrupt + missing + unexpected)[0]
+        raise ArchiveError(
+            f"Integrity check failed: {len(corrupt)} corrupt, {len(missing)} missing, "
+            f"{len(unexpected)} unlisted files (first: {first})"
+        )
+
+    # Character IDs become storage paths: each must be a plain ID with its files staged
+    character_ids = manifest.get("characters")
+    if not isinstance(character_ids, list) or not character_ids:
+        raise ArchiveError("Manifest lists no characters")
+    for character_id in character_ids:
+        if not isinstance(character_id, str) or not CHARACTER_ID_PATTERN.fullmatch(character_id):
+            raise ArchiveError(f"Invalid character ID in manifest: {character_id!r}")
+        missing = [name for name in REQUIRED_CHARACTER_FILES if f"characters/{character_id}/{name}" not in hashes]
+        if missing:
+            raise ArchiveError(f"Character {character_id} is missing {', '.join(missing)}")
+    unlisted = sorted({MEMBER_PATTERN.fullmatch(name).group("id") for name in hashes} - set(character_ids))  # type: ignore
+    if unlisted:
+        raise ArchiveError(f"Files for characters not in the manifest: {', '.join(unlisted)}")
+    return manifest
+
+
+def _import_character(storage, character_id: str, source: Path) -> None:
+    """Write one staged character into storage"""
+    images = sorted((source / "images").glob("*.png")) if (source / "images").exists() else []
+    url_prefix = None
+    for path in images:
+        url = storage.save_image(character_id, path.stem, path.read_bytes())
+        url_prefix = url.rsplit("/", 1)[0] + "/"
+
+    # Image URLs point at the exporting store's layout
+    url_pattern = re.compile(rf"/character_data/(?:[^/\"]+/)*?{re.escape(character_id)}/images/")
+
+    def load(relative: str) -> Any:
+        text = (source / relative).read_text(encoding="utf-8")
+        if url_prefix is not None:
+            text = url_pattern.sub(url_prefix, text)
+        return json.loads(text)
+
+    checkpoints = {
+        int(path.stem): load(f"checkpoints/{path.name}")
+        for path in sorted((source / "checkpoints").glob("*.json"))
+    } if (source / "checkpoints").exists() else {}
+
+    storage.import_character(
+        character_id,
+        load("input.json"),
+        load("metadata.json"),
+        load("knowledge_base.json"),
+        checkpoints=checkpoints,
+        final_profile=load("final_profile.json") if (source / "final_profile.json").exists() else None
+    )
+
+    if (source / "history").exists():
+        for path in sorted((source / "history").glob("*.jsonl")):
+            text = path.read_text(encoding="utf-8")
+            if url_prefix is not None:
+                text = url_pattern.sub(url_prefix, text)
+            records = [json.loads(line) for line in text.splitlines() if line.strip()]
+            storage.replace_checkpoint_history(character_id, int(path.stem), records)
+    storage.flush(character_id)
+
+
+def import_archive(
+    storage,
+    fileobj: BinaryIO,
+    overwrite: bool = False,
+    in_use: Container[str] = ()
+) -> Dict[str, Any]:
+    """
+    Import every character in an archive stream
+
+    Nothing is written to storage unless the whole archive passes the
+    integrity check and (without overwrite) none of its characters exist.
+
+    Args:
+        storage: CharacterStorage or SQLiteCharacterStorage instance
+        fileobj: Readable archive stream (file, ArchiveStreamReader, ...)
+        overwrite: Replace characters that already exist
+        in_use: Character IDs that must not be replaced (e.g. active sessions)
+
+    Returns:
+        Dict with the imported character IDs and the archive's project_id
+
+    Raises:
+        ArchiveError: If the archive is malformed or fails verification
+        FileExistsError: If a character exists and overwrite is False, or
+            an existing character is in use
+    """
+    with tempfile.TemporaryDirectory(prefix="character-import-") as tmp:
+        staging = Path(tmp)
+        try:
+            manifest = _stage_members(fileobj, staging)
+        finally:
+            if isinstance(fileobj, ArchiveStreamReader):
+                fileobj.abandoned = True
+
+        character_ids = manifest["characters"]
+        existing = [character_id for character_id in character_ids if storage.character_exists(character_id)]
+        if existing and not overwrite:
+            raise FileExistsError(f"Characters already exist: {', '.join(existing)}")
+        busy = [character_id for character_id in existing if character_id in in_use]
+        if busy:
+            raise FileExistsError(f"Characters have an active session: {', '.join(busy)}")
+
+        for character_id in character_ids:
+            if character_id in existing:
+                storage.delete_character(character_id)
+            _import_character(storage, character_id, staging / "characters" / character_id)
+
+    return {"characters": character_ids, "project_id": manifest.get("project_id")}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export or import characters as a single archive")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    export_parser = commands.add_parser("export", help="Write characters to an archive")
+    selection = export_parser.add_mutually_exclusive_group(required=True)
+    selection.add_argument("--character", action="append", help="Character ID (repeatable)")
+    selection.add_argument("--project", help="Export every character of a project")
+    export_parser.add_argument("-o", "--output", required=True, help="Archive path (.tar.gz)")
+
+    import_parser = commands.add_parser("import", help="Load characters from an archive")
+    import_parser.add_argument("archive", help="Archive path")
+    import_parser.add_argument("--overwrite", action="store_true", help="Replace existing characters")
+    args = parser.parse_args()
+
+    storage = create_storage()
+    if args.command == "export":
+        character_ids = args.character or storage.list_characters(project_id=args.project)
+        with open(args.output, "wb") as f:
+            for chunk in export_archive(storage, character_ids, project_id=args.project):
+                f.write(chunk)
+        print(f"✓ Exported {len(character_ids)} characters to {args.output}")
+    else:
+        with open(args.archive, "rb") as f:
+            result = import_archive(storage, f, overwrite=args.overwrite)
+        print(f"✓ Imported {len(result['characters'])} characters from {args.archive}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,186 @@
+"""
+Non-blocking storage API for Character Development System
+
+CharacterStorage and SQLiteCharacterStorage do synchronous file/database
+I/O. AsyncCharacterStorage wraps either backend and runs every call on a
+bounded thread pool, so KB writes, checkpoint saves and image saves never
+stall the event loop (and with it every WebSocket send and HTTP request in
+the process).
+
+The sync API stays the primary interface for CLI tools; async code
+(orchestrator, API handlers, image generation) goes through this facade.
+
+get_shared_storage() returns the process-wide instance. Every agent in the
+process (Character Development, Scene Creator tools) uses it, so they share
+one write-coalescing buffer and one read cache and never see stale data.
+"""
+
+import asyncio
+import functools
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+from .schemas import CharacterKnowledgeBase, Checkpoint, FinalCharacterProfile
+from .storage import _freeze, _thaw, create_storage
+
+
+# Worker threads for storage I/O (per storage instance)
+STORAGE_IO_THREADS = int(os.getenv("STORAGE_IO_THREADS", "4"))
+
+
+def _snapshot(data: Any) -> Any:
+    """
+    Copy caller-owned data before handing it to a worker thread
+
+    The orchestrator keeps mutating its KB on the event loop while the
+    write is in flight; the worker must serialize the state as it was
+    when the save was requested.
+    """
+    return _thaw(_freeze(data))
+
+
+class AsyncCharacterStorage:
+    """Async facade over a CharacterStorage backend"""
+
+    def __init__(self, storage, max_workers: int = STORAGE_IO_THREADS):
+        """
+        Args:
+            storage: CharacterStorage or SQLiteCharacterStorage instance
+            max_workers: Size of the I/O thread pool
+        """
+        self.sync = storage
+        self.max_workers = max(1, max_workers)
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="storage-io")
+
+    async def run(self, func: Callable, *args, **kwargs) -> Any:
+        """
+        Run any blocking storage-bound callable on the I/O pool
+
+        Args:
+            func: Sync callable (storage method, budget computation, agent accessor)
+            *args, **kwargs: Arguments for func
+
+        Returns:
+            func's return value
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, functools.partial(func, *args, **kwargs))
+
+    def shutdown(self) -> None:
+        """Stop the I/O pool after in-flight calls complete"""
+        self._executor.shutdown(wait=True)
+
+    # ========================================================================
+    # CHARACTER OPERATIONS
+    # ========================================================================
+
+    async def load_character_kb(self, character_id: str) -> CharacterKnowledgeBase:
+        return await self.run(self.sync.load_character_kb, character_id)
+
+    async def save_character_kb(self, kb: CharacterKnowledgeBase) -> None:
+        await self.run(self.sync.save_character_kb, _snapshot(kb))
+
+    async def load_metadata(self, character_id: str) -> Dict:
+        return await self.run(self.sync.load_metadata, character_id)
+
+    async def save_metadata(self, character_id: str, metadata: Dict) -> None:
+        await self.run(self.sync.save_metadata, character_id, _snapshot(metadata))
+
+    async def update_metadata(self, character_id: str, update: Callable[[Dict], Any]) -> Dict:
+        """Atomic read-modify-write of metadata (update runs on the I/O pool)"""
+        return await self.run(self.sync.update_metadata, character_id, update)
+
+    async def character_exists(self, character_id: str) -> bool:
+        return await self.run(self.sync.character_exists, character_id)
+
+    async def list_characters(self, project_id: Optional[str] = None, status: Optional[str] = None) -> List[str]:
+        return await self.run(self.sync.list_characters, project_id=project_id, status=status)
+
+    async def latest_character(self, project_id: Optional[str] = None, status: Optional[str] = None) -> Optional[str]:
+        return await self.run(self.sync.latest_character, project_id=project_id, status=status)
+
+    async def list_catalog(
+        self,
+        project_id: Optional[str] = None,
+        status: Optional[str] = None,
+        limit: Optional[int] = None
+    ) -> List[Dict]:
+        return await self.run(self.sync.list_catalog, project_id=project_id, status=status, limit=limit)
+
+    async def delete_character(self, character_id: str) -> int:
+        return await self.run(self.sync.delete_character, character_id)
+
+    # ========================================================================
+    # CHECKPOINT OPERATIONS
+    # ========================================================================
+
+    async def save_checkpoint(self, character_id: str, checkpoint: Checkpoint) -> None:
+        await self.run(self.sync.save_checkpoint, character_id, _snapshot(checkpoint))
+
+    async def save_checkpoint_with_metadata(
+        self,
+        character_id: str,
+        checkpoint: Checkpoint,
+        update: Callable[[Dict], Any]
+    ) -> Dict:
+        """Save a checkpoint and apply its metadata update (see the sync backends)"""
+        return await self.run(self.sync.save_checkpoint_with_metadata, character_id, _snapshot(checkpoint), update)
+
+    async def load_checkpoint(self, character_id: str, checkpoint_number: int) -> Optional[Checkpoint]:
+        return await self.run(self.sync.load_checkpoint, character_id, checkpoint_number)
+
+    async def load_all_checkpoints(self, character_id: str) -> Dict[int, Checkpoint]:
+        return await self.run(self.sync.load_all_checkpoints, character_id)
+
+    async def list_checkpoints(self, character_id: str) -> List[Dict]:
+        return await self.run(self.sync.list_checkpoints, character_id)
+
+    async def list_checkpoint_versions(self, character_id: str, checkpoint_number: int) -> List[Dict]:
+        return await self.run(self.sync.list_checkpoint_versions, character_id, checkpoint_number)
+
+    async def load_checkpoint_version(
+        self,
+        character_id: str,
+        checkpoint_number: int,
+        version: int
+    ) -> Optional[Checkpoint]:
+        return await self.run(self.sync.load_checkpoint_version, character_id, checkpoint_number, version)
+
+    async def compact_checkpoint_history(self, character_id: str, checkpoint_number: int, keep: int) -> int:
+        return await self.run(self.sync.compact_checkpoint_history, character_id, checkpoint_number, keep)
+
+    # ========================================================================
+    # IMAGE AND FINAL PROFILE OPERATIONS
+    # ========================================================================
+
+    async def save_image(self, character_id: str, image_type: str, image_data: bytes) -> str:
+        return await self.run(self.sync.save_image, character_id, image_type, image_data)
+
+    def get_image_path(self, character_id: str, image_type: str) -> Path:
+        # Pure path computation, no I/O
+        return self.sync.get_image_path(character_id, image_type)
+
+    async def save_final_profile(self, character_id: str, profile: FinalCharacterProfile) -> None:
+        await self.run(self.sync.save_final_profile, character_id, _snapshot(profile))
+
+    async def load_final_profile(self, character_id: str) -> Optional[FinalCharacterProfile]:
+        return await self.run(self.sync.load_final_profile, character_id)
+
+    async def flush(self, character_id: Optional[str] = None) -> None:
+        await self.run(self.sync.flush, character_id)
+
+
+_shared_storage: Optional[AsyncCharacterStorage] = None
+_shared_storage_lock = threading.Lock()
+
+
+def get_shared_storage() -> AsyncCharacterStorage:
+    """Process-wide storage (configured backend), created on first use"""
+    global _shared_storage
+    with _shared_storage_lock:
+        if _shared_storage is None:
+            _shared_storage = AsyncCharacterStorage(create_storage())
+        return _shared_storage
@@ -0,0 +1,176 @@
+"""
+Token and cost budgets for Character Development System
+
+Each character carries a budget in its metadata (per character, plus an
+optional ceiling shared by every character of its project). Spend is
+measured from the real usage ledger kept by record_agent_usage().
+
+As spend approaches a ceiling the orchestrator degrades gracefully:
+- downgrade: remaining agents run in "fast" mode
+- skip_optional: optional stages (image generation) are skipped
+- exhausted: no further agent runs are started
+"""
+
+import os
+from typing import Dict, Optional
+
+from .catalog import ledger_spend
+from .schemas import BudgetLimits, BudgetStatus, CharacterKnowledgeBase
+from .storage import CharacterStorage
+
+
+def _env_number(name: str, cast):
+    value = os.getenv(name)
+    return cast(value) if value else None
+
+
+# Defaults applied at character creation (unset = unlimited)
+DEFAULT_CHARACTER_TOKEN_BUDGET: Optional[int] = _env_number("CHARACTER_TOKEN_BUDGET", int)
+DEFAULT_CHARACTER_COST_BUDGET_USD: Optional[float] = _env_number("CHARACTER_COST_BUDGET_USD", float)
+DEFAULT_PROJECT_TOKEN_BUDGET: Optional[int] = _env_number("PROJECT_TOKEN_BUDGET", int)
+DEFAULT_PROJECT_COST_BUDGET_USD: Optional[float] = _env_number("PROJECT_COST_BUDGET_USD", float)
+
+# Fraction of the tightest budget at which each degradation kicks in
+BUDGET_DOWNGRADE_THRESHOLD = float(os.getenv("BUDGET_DOWNGRADE_THRESHOLD", "0.7"))
+BUDGET_SKIP_OPTIONAL_THRESHOLD = float(os.getenv("BUDGET_SKIP_OPTIONAL_THRESHOLD", "0.9"))
+
+# Agents that can be dropped without blocking the final profile
+OPTIONAL_AGENTS = {"image_generation"}
+
+
+class BudgetExceededError(RuntimeError):
+    """Raised when an agent run would start with the budget exhausted"""
+
+    def __init__(self, status: BudgetStatus):
+        self.status = status
+        super().__init__(
+            f"Budget exhausted for character {status['character_id']} "
+            f"({status['tokens_used']} tokens, ${status['cost_usd']:.4f} used)"
+        )
+
+
+def make_budget(
+    max_tokens: Optional[int] = None,
+    max_cost_usd: Optional[float] = None,
+    project_max_tokens: Optional[int] = None,
+    project_max_cost_usd: Optional[float] = None
+) -> Dict[str, BudgetLimits]:
+    """
+    Build the metadata["budget"] entry, falling back to environment defaults
+
+    Returns:
+        Dict with "character" and "project" BudgetLimits
+    """
+    return {
+        "character": {
+            "max_tokens": max_tokens if max_tokens is not None else DEFAULT_CHARACTER_TOKEN_BUDGET,
+            "max_cost_usd": max_cost_usd if max_cost_usd is not None else DEFAULT_CHARACTER_COST_BUDGET_USD,
+        },
+        "project": {
+            "max_tokens": project_max_tokens if project_max_tokens is not None else DEFAULT_PROJECT_TOKEN_BUDGET,
+            "max_cost_usd": project_max_cost_usd if project_max_cost_usd is not None else DEFAULT_PROJECT_COST_BUDGET_USD,
+        },
+    }
+
+
+def project_spend(storage: CharacterStorage, project_id: str, exclude_character_id: Optional[str] = None):
+    """
+    Sum measured spend over every character of a project
+
+    Read from the per-character spend kept in the storage index (updated on
+    every metadata write), so the cost does not grow with project size.
+
+    Args:
+        storage: Character storage
+        project_id: Project to sum
+        exclude_character_id: Character to leave out (added from fresh metadata by the caller)
+
+    Returns:
+        Tuple of (tokens, cost_usd)
+    """
+    return storage.project_spend(project_id, exclude_character_id)
+
+
+def _fraction(used: float, limit: Optional[float]) -> float:
+    if not limit:
+        return 0.0
+    return used / limit
+
+
+def compute_budget_status(
+    storage: CharacterStorage,
+    character_id: str,
+    metadata: Optional[Dict] = None
+) -> BudgetStatus:
+    """
+    Measure a character's spend against its character and project budgets
+
+    Args:
+        storage: Character storage
+        character_id: Character UUID
+        metadata: Already-loaded metadata (loaded from storage if omitted)
+
+    Returns:
+        BudgetStatus with the degradation level that applies now
+    """
+    if metadata is None:
+        metadata = storage.load_metadata(character_id)
+
+    budget = metadata.get("budget") or make_budget()
+    limits = budget["character"]
+    project_limits = budget["project"]
+    project_id = metadata.get("project_id")
+
+    tokens, cost = ledger_spend(metadata)
+    project_tokens, project_cost = 0, 0.0
+    if project_id and (project_limits["max_tokens"] or project_limits["max_cost_usd"]):
+        # Others from the index; this character from its metadata (may not be written yet)
+        other_tokens, other_cost = project_spend(storage, project_id, character_id)
+        project_tokens, project_cost = other_tokens + tokens, other_cost + cost
+
+    fraction = max(
+        _fraction(tokens, limits["max_tokens"]),
+        _fraction(cost, limits["max_cost_usd"]),
+        _fraction(project_tokens, project_limits["max_tokens"]),
+        _fraction(project_cost, project_limits["max_cost_usd"]),
+    )
+
+    if fraction >= 1.0:
+        level = "exhausted"
+    elif fraction >= BUDGET_SKIP_OPTIONAL_THRESHOLD:
+        level = "skip_optional"
+    elif fraction >= BUDGET_DOWNGRADE_THRESHOLD:
+        level = "downgrade"
+    else:
+        level = "ok"
+
+    return {
+        "character_id": character_id,
+        "tokens_used": tokens,
+        "cost_usd": round(cost, 6),
+        "limits": limits,
+        "project_id": project_id,
+        "project_tokens_used": project_tokens,
+        "project_cost_usd": round(project_cost, 6),
+        "project_limits": project_limits,
+        "fraction_used": round(fraction, 4),
+        "level": level,  # type: ignore
+    }
+
+
+def should_skip_agent(agent_name: str, status: BudgetStatus) -> bool:
+    """Check whether an optional agent should be dropped at this budget level"""
+    return agent_name in OPTIONAL_AGENTS and status["level"] in ("skip_optional", "exhausted")
+
+
+def apply_budget_mode(kb: CharacterKnowledgeBase, status: BudgetStatus) -> bool:
+    """
+    Switch a KB (snapshot) to fast mode when the budget calls for it
+
+    Returns:
+        True if the mode was downgraded
+    """
+    if status["level"] == "ok" or kb.get("mode") == "fast":
+        return False
+    kb["mode"] = "fast"
+    return True
@@ -0,0 +1,194 @@
+"""
+Character catalog for the JSON storage backend
+
+A small SQLite index (catalog.db in the storage directory) with one row per
+character: name, project, status, created/updated times, checkpoint
+progress and measured spend. CharacterStorage keeps it in sync whenever
+metadata is written, so listing, filtering, "latest character" and project
+spend queries are index lookups instead of directory scans that stat (or
+load) every character.
+
+The catalog is derived data: rebuild it from the character directories
+with CharacterStorage.rebuild_catalog() if it is lost.
+"""
+
+import sqlite3
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from providers.usage import total_tokens
+
+
+CATALOG_SCHEMA = """
+CREATE TABLE IF NOT EXISTS catalog (
+    character_id          TEXT PRIMARY KEY,
+    name                  TEXT,
+    project_id            TEXT,
+    status                TEXT,
+    created_at            TEXT,
+    updated_at            TEXT NOT NULL,
+    completed_checkpoints INTEGER NOT NULL DEFAULT 0,
+    total_checkpoints     INTEGER NOT NULL DEFAULT 0,
+    completed_at          TEXT,
+    tokens_used           INTEGER NOT NULL DEFAULT 0,
+    cost_usd              REAL NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_catalog_updated ON catalog(updated_at);
+CREATE INDEX IF NOT EXISTS idx_catalog_project ON catalog(project_id, updated_at);
+CREATE INDEX IF NOT EXISTS idx_catalog_status ON catalog(status, updated_at);
+"""
+
+CATALOG_COLUMNS = [
+    "character_id", "name", "project_id", "status", "created_at", "updated_at",
+    "completed_checkpoints", "total_checkpoints", "completed_at"
+]
+
+# Columns added after the first release (added to existing catalogs on open)
+CATALOG_SPEND_COLUMNS = {
+    "tokens_used": "INTEGER NOT NULL DEFAULT 0",
+    "cost_usd": "REAL NOT NULL DEFAULT 0",
+}
+
+
+def ledger_spend(metadata: Dict) -> Tuple[int, float]:
+    """Tokens and cost recorded in a character's usage ledger (metadata["usage"])"""
+    ledger = metadata.get("usage") or {}
+    return total_tokens(ledger.get("total")), ledger.get("cost_usd", 0.0)
+
+
+class CharacterCatalog:
+    """SQLite index of the characters in a JSON storage directory"""
+
+    def __init__(self, db_path: Path):
+        self.db_path = Path(db_path)
+        self._local = threading.local()
+        self._connect().executescript(CATALOG_SCHEMA)
+
+        # Catalogs from before spend tracking: add the columns; rows need a rebuild
+        existing = {row[1] for row in self._connect().execute("PRAGMA table_info(catalog)")}
+        missing = [column for column in CATALOG_SPEND_COLUMNS if column not in existing]
+        for column in missing:
+            self._connect().execute(f"ALTER TABLE catalog ADD COLUMN {column} {CATALOG_SPEND_COLUMNS[column]}")
+        self.needs_rebuild = bool(missing) and self.count() > 0
+
+    def _connect(self) -> sqlite3.Connection:
+        """Per-thread connection in autocommit mode"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(str(self.db_path), isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            # Derived data: losing the last commits on power failure only costs a rebuild
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def record(self, character_id: str, metadata: Dict, name: Optional[str] = None) -> None:
+        """
+        Insert or update a character's row from its metadata
+
+        Args:
+            character_id: Character UUID
+            metadata: Character metadata as just written
+            name: Character name (only known at creation; kept on later updates)
+        """
+        tokens_used, cost_usd = ledger_spend(metadata)
+        self._connect().execute(
+            """
+            INSERT INTO catalog (
+                character_id, name, project_id, status, created_at, updated_at,
+                completed_checkpoints, total_checkpoints, completed_at, tokens_used, cost_usd
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(character_id) DO UPDATE SET
+                name = COALESCE(excluded.name, catalog.name),
+                project_id = excluded.project_id,
+                status = excluded.status,
+                created_at = COALESCE(excluded.created_at, catalog.created_at),
+                updated_at = excluded.updated_at,
+                completed_checkpoints = excluded.completed_checkpoints,
+                total_checkpoints = excluded.total_checkpoints,
+                completed_at = excluded.completed_at,
+                tokens_used = excluded.tokens_used,
+                cost_usd = excluded.cost_usd
+            """,
+            (
+                character_id,
+                name,
+                metadata.get("project_id"),
+                metadata.get("status"),
+                metadata.get("created_at"),
+                datetime.utcnow().isoformat(),
+                metadata.get("completed_checkpoints", 0),
+                metadata.get("total_checkpoints", 0),
+                metadata.get("completed_at"),
+                tokens_used,
+                cost_usd,
+            )
+        )
+
+    def remove(self, character_id: str) -> None:
+        self._connect().execute("DELETE FROM catalog WHERE character_id = ?", (character_id,))
+
+    def clear(self) -> None:
+        self._connect().execute("DELETE FROM catalog")
+
+    def count(self) -> int:
+        return self._connect().execute("SELECT COUNT(*) FROM catalog").fetchone()[0]
+
+    def _where(self, project_id: Optional[str], status: Optional[str]):
+        clauses, params = [], []
+        if project_id is not None:
+            clauses.append("project_id = ?")
+            params.append(project_id)
+        if status is not None:
+            clauses.append("status = ?")
+            params.append(status)
+        return (" WHERE " + " AND ".join(clauses) if clauses else ""), params
+
+    def entries(
+        self,
+        project_id: Optional[str] = None,
+        status: Optional[str] = None,
+        limit: Optional[int] = None
+    ) -> List[Dict]:
+        """
+        Catalog rows, most recently updated first
+
+        Args:
+            project_id: Only characters of this project
+            status: Only characters with this status
+            limit: Maximum number of rows
+
+        Returns:
+            List of dicts with the CATALOG_COLUMNS fields
+        """
+        where, params = self._where(project_id, status)
+        sql = f"SELECT {', '.join(CATALOG_COLUMNS)} FROM catalog{where} ORDER BY updated_at DESC"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+        rows = self._connect().execute(sql, params).fetchall()
+        return [dict(zip(CATALOG_COLUMNS, row)) for row in rows]
+
+    def character_ids(self, project_id: Optional[str] = None, status: Optional[str] = None) -> List[str]:
+        """Character IDs matching the filters"""
+        where, params = self._where(project_id, status)
+        rows = self._connect().execute(f"SELECT character_id FROM catalog{where}", params).fetchall()
+        return [row[0] for row in rows]
+
+    def project_spend(self, project_id: str, exclude_character_id: Optional[str] = None) -> Tuple[int, float]:
+        """Summed (tokens, cost_usd) of a project's characters, optionally leaving one out"""
+        row = self._connect().execute(
+            """
+            SELECT COALESCE(SUM(tokens_used), 0), COALESCE(SUM(cost_usd), 0.0)
+            FROM catalog WHERE project_id = ? AND character_id IS NOT ?
+            """,
+            (project_id, exclude_character_id)
+        ).fetchone()
+        return row[0], row[1]
+
+    def latest(self, project_id: Optional[str] = None, status: Optional[str] = None) -> Optional[str]:
+        """Most recently updated character matching the filters"""
+        entries = self.entries(project_id=project_id, status=status, limit=1)
+        return entries[0]["character_id"] if entries else None
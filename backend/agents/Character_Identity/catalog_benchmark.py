@@ -0,0 +1,115 @@
+"""
+Benchmark character listing before and after sharding + catalog
+
+Usage (from backend/):
+    python -m agents.Character_Identity.catalog_benchmark --characters 100000
+
+Builds a synthetic flat store (metadata.json + input.json per character) in
+a temporary directory and times the old access patterns against it:
+directory scan for list, newest-mtime scan for "latest" (as Scene Creator
+did) and metadata reads for project/status filters. The store is then
+migrated with migrate_layout.shard_store() and the same queries are timed
+against the catalog.
+"""
+
+import argparse
+import random
+import tempfile
+import time
+import uuid
+from pathlib import Path
+from typing import Callable, Dict
+
+from .migrate_layout import shard_store
+from .storage import CharacterStorage, atomic_write_json, new_character_records, read_json_file
+
+
+def _timed(func: Callable, repeat: int = 3) -> float:
+    """Best wall time of several runs, in milliseconds"""
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - started)
+    return best * 1000
+
+
+def build_flat_store(base_path: Path, count: int, projects: int) -> None:
+    """Write count characters in the flat layout (as stores looked before sharding)"""
+    statuses = ["in_progress", "completed", "failed"]
+    for i in range(count):
+        character_id = str(uuid.uuid4())
+        input_data = {"characters": [{"name": f"Character {i}"}], "storyline": {}}
+        metadata, _ = new_character_records(
+            character_id,
+            input_data,  # type: ignore
+            project_id=f"project-{i % projects}"
+        )
+        metadata["status"] = random.choice(statuses)
+
+        char_dir = base_path / character_id
+        char_dir.mkdir()
+        atomic_write_json(char_dir / "input.json", input_data, "compact")
+        atomic_write_json(char_dir / "metadata.json", metadata, "compact")
+
+
+def _scan_filter(base_path: Path, project_id: str):
+    """Old project filter: read every character's metadata"""
+    return [
+        d.name for d in base_path.iterdir()
+        if d.is_dir() and read_json_file(d / "metadata.json").get("project_id") == project_id
+    ]
+
+
+def run_benchmark(count: int, projects: int) -> Dict[str, Dict[str, float]]:
+    """
+    Time list/latest/filter queries on a flat store and on the migrated store
+
+    Returns:
+        Dict of query → {"flat_scan_ms", "catalog_ms"}
+    """
+    results: Dict[str, Dict[str, float]] = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        base_path = Path(tmp) / "character_data"
+        base_path.mkdir()
+
+        started = time.perf_counter()
+        build_flat_store(base_path, count, projects)
+        print(f"Built {count} flat characters in {time.perf_counter() - started:.1f}s")
+
+        results["list"] = {"flat_scan_ms": _timed(lambda: [d.name for d in base_path.iterdir() if d.is_dir()])}
+        results["latest"] = {"flat_scan_ms": _timed(
+            lambda: max((d for d in base_path.iterdir() if d.is_dir()), key=lambda d: d.stat().st_mtime)
+        )}
+        results["filter_project"] = {"flat_scan_ms": _timed(lambda: _scan_filter(base_path, "project-0"), repeat=1)}
+
+        started = time.perf_counter()
+        shard_store(str(base_path))
+        print(f"Migrated to sharded layout in {time.perf_counter() - started:.1f}s")
+
+        storage = CharacterStorage(str(base_path), coalesce_seconds=0, cache_size=0)
+        results["list"]["catalog_ms"] = _timed(storage.list_characters)
+        results["latest"]["catalog_ms"] = _timed(storage.latest_character)
+        results["filter_project"]["catalog_ms"] = _timed(lambda: storage.list_characters(project_id="project-0"))
+        results["filter_status"] = {"catalog_ms": _timed(lambda: storage.list_characters(status="failed"))}
+        results["latest_completed"] = {"catalog_ms": _timed(lambda: storage.latest_character(status="completed"))}
+
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark character listing: flat scan vs sharded catalog")
+    parser.add_argument("--characters", type=int, default=100000, help="Number of synthetic characters")
+    parser.add_argument("--projects", type=int, default=100, help="Number of projects to spread them over")
+    args = parser.parse_args()
+
+    results = run_benchmark(args.characters, args.projects)
+    print(f"{'query':<18} {'flat scan (ms)':>15} {'catalog (ms)':>13}")
+    for query, timings in results.items():
+        flat = timings.get("flat_scan_ms")
+        flat_text = f"{flat:.1f}" if flat is not None else "-"
+        print(f"{query:<18} {flat_text:>15} {timings['catalog_ms']:>13.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+"""
+Agent dependency graph for Character Development System
+
+Records which knowledge base fields each sub-agent reads, so that a
+regenerated agent can invalidate exactly the downstream outputs built on it.
+"""
+
+import hashlib
+import json
+from typing import Any, Dict, List, Optional
+
+from .schemas import CharacterKnowledgeBase
+
+
+# Agents in execution order (wave 1 → wave 3)
+AGENT_ORDER: List[str] = [
+    "personality",
+    "backstory_motivation",
+    "voice_dialogue",
+    "physical_description",
+    "story_arc",
+    "relationships",
+    "image_generation",
+]
+
+# Checkpoint number produced by each agent
+AGENT_CHECKPOINTS: Dict[str, int] = {
+    "personality": 1,
+    "backstory_motivation": 2,
+    "voice_dialogue": 3,
+    "physical_description": 4,
+    "story_arc": 5,
+    "relationships": 6,
+    "image_generation": 7,
+}
+
+# Upstream agent outputs each agent consumes from the KB (mirrors the
+# kb.get(...) lookups in subagents/*.py)
+AGENT_DEPENDENCIES: Dict[str, List[str]] = {
+    "personality": [],
+    "backstory_motivation": ["personality"],
+    "voice_dialogue": ["personality", "backstory_motivation"],
+    "physical_description": ["personality", "backstory_motivation"],
+    "story_arc": ["personality", "backstory_motivation"],
+    "relationships": ["personality", "backstory_motivation", "story_arc"],
+    "image_generation": ["personality", "physical_description", "backstory_motivation", "story_arc"],
+}
+
+# Fields of each upstream output an agent reads (keys mirror AGENT_DEPENDENCIES).
+# The text agents' prompts include exactly these (subagents/context.py), and
+# input hashes cover only these, so a change to any other field or to a
+# narrative does not make a dependent stale.
+UPSTREAM_FIELDS: Dict[str, Dict[str, List[str]]] = {
+    "personality": {},
+    "backstory_motivation": {
+        "personality": ["core_traits", "fears", "secrets"],
+    },
+    "voice_dialogue": {
+        "personality": ["core_traits", "emotional_baseline", "fears"],
+        "backstory_motivation": ["goals"],
+    },
+    "physical_description": {
+        "personality": ["core_traits", "fears", "triggers"],
+        "backstory_motivation": ["timeline"],
+    },
+    "story_arc": {
+        "personality": ["core_traits", "emotional_baseline", "fears"],
+        "backstory_motivation": ["goals", "internal_conflicts"],
+    },
+    "relationships": {
+        "personality": ["core_traits", "fears", "triggers"],
+        "backstory_motivation": ["internal_conflicts", "timeline"],
+        "story_arc": ["arc_type", "role"],
+    },
+    "image_generation": {
+        "personality": ["core_traits", "emotional_baseline"],
+        "physical_description": ["body_language", "movement_style"],
+        "backstory_motivation": ["timeline"],
+        "story_arc": ["arc_type"],
+    },
+}
+
+
+def downstream_agents(agent_name: str) -> List[str]:
+    """
+    Get every agent that transitively depends on an agent's output
+
+    Args:
+        agent_name: Name of the changed agent
+
+    Returns:
+        Dependent agent names in execution order
+    """
+    affected = {agent_name}
+    for name in AGENT_ORDER:
+        if any(dep in affected for dep in AGENT_DEPENDENCIES[name]):
+            affected.add(name)
+
+    return [name for name in AGENT_ORDER if name in affected and name != agent_name]
+
+
+def consumed_upstream(kb: CharacterKnowledgeBase, agent_name: str) -> Dict[str, Optional[Dict[str, Any]]]:
+    """
+    Upstream output fields an agent reads, in execution order
+
+    Args:
+        kb: Character knowledge base
+        agent_name: Agent whose inputs should be selected
+
+    Returns:
+        Dict of upstream agent → its UPSTREAM_FIELDS for agent_name, or None
+        if that upstream has no output yet
+    """
+    dependencies = AGENT_DEPENDENCIES.get(agent_name, [])
+    fields = UPSTREAM_FIELDS.get(agent_name, {})
+    consumed: Dict[str, Optional[Dict[str, Any]]] = {}
+    for upstream in AGENT_ORDER:
+        if upstream not in dependencies:
+            continue
+        output = kb.get(upstream)
+        consumed[upstream] = (
+            {key: output[key] for key in fields.get(upstream, []) if key in output} if output else None
+        )
+    return consumed
+
+
+def compute_input_hash(kb: CharacterKnowledgeBase, agent_name: str) -> str:
+    """
+    Hash the KB content an agent consumes
+
+    Covers the character input, mode and the UPSTREAM_FIELDS of every
+    upstream output listed in AGENT_DEPENDENCIES (selected with
+    consumed_upstream(), as the prompts are). Two runs with the same hash
+    saw identical inputs.
+
+    Args:
+        kb: Character knowledge base
+        agent_name: Agent whose inputs should be hashed
+
+    Returns:
+        Hex SHA-256 digest
+    """
+    consumed = {
+        "input_data": kb["input_data"],
+        "mode": kb.get("mode", "balanced"),
+    }
+    consumed.update(consumed_upstream(kb, agent_name))
+
+    payload = json.dumps(consumed, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
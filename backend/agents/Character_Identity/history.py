@@ -0,0 +1,200 @@
+"""
+Append-only version history for checkpoints
+
+Every save of a checkpoint whose content changed appends an immutable
+version to that checkpoint's history stream. Versions are stored as
+structural diffs against the previous version, with a full snapshot every
+HISTORY_SNAPSHOT_INTERVAL versions so reconstructing any version applies
+a bounded number of diffs. The checkpoint's structured output is the
+agent's KB output, so the stream also versions the agent output.
+
+Diff operations are JSON-patch-like, with paths as lists of keys/indexes:
+    {"op": "add" | "replace", "path": [...], "value": ...}
+    {"op": "remove", "path": [...]}
+    {"op": "truncate", "path": [...], "length": n}
+
+Streams grow without bound until compact_records() drops old versions
+(see maintenance.py).
+"""
+
+import copy
+import json
+import os
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+
+# A full snapshot is stored every N versions (bounds reconstruction cost)
+HISTORY_SNAPSHOT_INTERVAL = int(os.getenv("HISTORY_SNAPSHOT_INTERVAL", "10"))
+
+
+def json_diff(old: Any, new: Any, path: Optional[List] = None) -> List[Dict]:
+    """
+    Structural diff turning old into new
+
+    Dicts are compared key by key and lists element by element (a longer
+    list appends, a shorter one truncates); anything else is replaced.
+
+    Returns:
+        List of diff operations (empty if equal)
+    """
+    path = path or []
+    if old == new:
+        return []
+
+    if isinstance(old, dict) and isinstance(new, dict):
+        ops: List[Dict] = []
+        for key in old:
+            if key not in new:
+                ops.append({"op": "remove", "path": path + [key]})
+        for key, value in new.items():
+            if key not in old:
+                ops.append({"op": "add", "path": path + [key], "value": value})
+            else:
+                ops.extend(json_diff(old[key], value, path + [key]))
+        return ops
+
+    if isinstance(old, list) and isinstance(new, list):
+        ops = []
+        for index in range(min(len(old), len(new))):
+            ops.extend(json_diff(old[index], new[index], path + [index]))
+        if len(new) < len(old):
+            ops.append({"op": "truncate", "path": path, "length": len(new)})
+        for index in range(len(old), len(new)):
+            ops.append({"op": "add", "path": path + [index], "value": new[index]})
+        return ops
+
+    return [{"op": "replace", "path": path, "value": new}]
+
+
+def apply_diff(doc: Any, ops: List[Dict]) -> Any:
+    """
+    Apply json_diff() operations to a copy of doc
+
+    Returns:
+        The patched document
+    """
+    doc = copy.deepcopy(doc)
+    for op in ops:
+        path = op["path"]
+        if op["op"] == "truncate":
+            target = doc
+            for key in path:
+                target = target[key]
+            del target[op["length"]:]
+            continue
+
+        if not path:
+            doc = copy.deepcopy(op["value"])
+            continue
+
+        parent = doc
+        for key in path[:-1]:
+            parent = parent[key]
+        key = path[-1]
+
+        if op["op"] == "remove":
+            del parent[key]
+        elif isinstance(parent, list) and key == len(parent):
+            parent.append(copy.deepcopy(op["value"]))
+        else:
+            parent[key] = copy.deepcopy(op["value"])
+    return doc
+
+
+def next_version(head: Optional[Tuple[int, Any]], doc: Dict) -> Optional[Dict]:
+    """
+    Build the history record for a new version of a checkpoint
+
+    Args:
+        head: (version, document) of the latest version, or None for a new stream
+        doc: The checkpoint as saved (refs resolved)
+
+    Returns:
+        Record to append, or None if the content is unchanged
+    """
+    version = head[0] + 1 if head else 1
+    record: Dict[str, Any] = {
+        "version": version,
+        "timestamp": datetime.utcnow().isoformat(),
+        "agent": doc.get("agent"),
+        "status": doc.get("status"),
+    }
+
+    if head is None or (version - 1) % HISTORY_SNAPSHOT_INTERVAL == 0:
+        if head is not None and head[1] == doc:
+            return None
+        record["snapshot"] = doc
+        return record
+
+    ops = json_diff(head[1], doc)
+    if not ops:
+        return None
+    record["diff"] = ops
+    return record
+
+
+def reconstruct(records: List[Dict], version: Optional[int] = None) -> Optional[Any]:
+    """
+    Rebuild a version from its stream
+
+    Args:
+        records: History records in version order
+        version: Version to rebuild (latest if None)
+
+    Returns:
+        The document at that version, or None if it does not exist
+    """
+    if not records:
+        return None
+    if version is None:
+        version = records[-1]["version"]
+    if not 1 <= version <= records[-1]["version"]:
+        return None
+
+    doc = None
+    for record in records:
+        if record["version"] > version:
+            break
+        if "snapshot" in record:
+            doc = record["snapshot"]
+        else:
+            doc = apply_diff(doc, record["diff"])
+    return copy.deepcopy(doc)
+
+
+def compact_records(records: List[Dict], keep: int) -> List[Dict]:
+    """
+    Drop all but the newest versions of a stream
+
+    The oldest kept version is rewritten as a snapshot; version numbers are
+    unchanged, so older versions simply stop existing.
+
+    Args:
+        records: History records in version order
+        keep: Number of versions to keep (at least 1)
+
+    Returns:
+        The compacted records (the input list if nothing was dropped)
+    """
+    keep = max(1, keep)
+    if len(records) <= keep:
+        return records
+
+    kept = records[-keep:]
+    first = {key: value for key, value in kept[0].items() if key not in ("snapshot", "diff")}
+    first["snapshot"] = reconstruct(records, kept[0]["version"])
+    return [first] + kept[1:]
+
+
+def version_summary(record: Dict) -> Dict:
+    """Version metadata without its content (for listings)"""
+    payload = record.get("snapshot", record.get("diff"))
+    return {
+        "version": record["version"],
+        "timestamp": record["timestamp"],
+        "agent": record["agent"],
+        "status": record["status"],
+        "kind": "snapshot" if "snapshot" in record else "diff",
+        "size": len(json.dumps(payload, separators=(",", ":"))),
+    }
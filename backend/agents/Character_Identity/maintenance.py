@@ -0,0 +1,396 @@
+"""
+Retention, garbage collection and compaction for stored data
+
+Nothing else in the system deletes anything. MaintenanceJob removes:
+
+- Characters whose status has a retention period (CHARACTER_RETENTION_DAYS,
+  e.g. "failed=14,budget_exhausted=30,in_progress=30") and that were not
+  updated within it. Statuses without a period (completed by default) are
+  kept forever, and characters with a running session are never touched.
+- Image files nothing refers to any more: not the KB, the final profile,
+  a checkpoint or any retained checkpoint version (e.g. after a
+  regeneration fell back to a placeholder entry).
+- entry_*.json / scene_*.json session files untouched for
+  SESSION_RETENTION_DAYS, unless the session is loaded in the server.
+- output/style_examples images older than STYLE_EXAMPLE_RETENTION_DAYS that
+  no remaining Entry session links to.
+- Checkpoint history beyond HISTORY_MAX_VERSIONS versions per checkpoint.
+
+A pass is a generator of small work items. run_slice() executes items until
+its time budget is used and resumes where it stopped on the next call, so
+run_maintenance_loop() interleaves short slices (MAINTENANCE_SLICE_MS) on
+the storage I/O pool with normal traffic instead of stalling it. After the
+first pass only characters updated since the previous pass are swept for
+images and history. Every pass logs the space it reclaimed.
+
+Usage (from backend/, one full pass):
+    python -m agents.Character_Identity.maintenance [--dry-run]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import re
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, Optional
+
+from .storage import create_storage
+
+
+# Days a character may go without updates before it is deleted, per status
+CHARACTER_RETENTION_DAYS = os.getenv("CHARACTER_RETENTION_DAYS", "failed=14,budget_exhausted=30,in_progress=30")
+
+# Days before untouched Entry/Scene session files and style examples are deleted (0 = keep)
+SESSION_RETENTION_DAYS = float(os.getenv("SESSION_RETENTION_DAYS", "30"))
+STYLE_EXAMPLE_RETENTION_DAYS = float(os.getenv("STYLE_EXAMPLE_RETENTION_DAYS", "30"))
+
+# Versions kept per checkpoint history (0 = keep all)
+HISTORY_MAX_VERSIONS = int(os.getenv("HISTORY_MAX_VERSIONS", "50"))
+
+# Seconds between passes in the server (0 disables the background job)
+MAINTENANCE_INTERVAL_SECONDS = float(os.getenv("MAINTENANCE_INTERVAL_SECONDS", "3600"))
+
+# Work per slice and pause between slices
+MAINTENANCE_SLICE_MS = float(os.getenv("MAINTENANCE_SLICE_MS", "50"))
+MAINTENANCE_PAUSE_MS = float(os.getenv("MAINTENANCE_PAUSE_MS", "200"))
+
+SESSION_DATA_DIR = "./backend/session_data"
+STYLE_EXAMPLES_DIR = "output/style_examples"
+
+STYLE_EXAMPLE_PATTERN = re.compile(r"style_\d{8}_\d{6}\.png")
+
+
+def parse_retention(spec: str) -> Dict[str, float]:
+    """
+    Parse "status=days,..." into {status: days}
+
+    Malformed parts are skipped with a warning; days <= 0 means keep forever.
+    """
+    retention = {}
+    for part in spec.split(","):
+        if not part.strip():
+            continue
+        status, _, days = part.partition("=")
+        try:
+            retention[status.strip()] = float(days)
+        except ValueError:
+            print(f"Warning: Ignoring invalid retention entry '{part}' (expected status=days)")
+    return {status: days for status, days in retention.items() if days > 0}
+
+
+def _format_bytes(size: int) -> str:
+    if size < 1024:
+        return f"{size} B"
+    value = float(size)
+    for unit in ("KB", "MB", "GB"):
+        value /= 1024
+        if value < 1024 or unit == "GB":
+            break
+    return f"{value:.1f} {unit}"
+
+
+def _empty_report() -> Dict[str, Any]:
+    return {
+        "characters_deleted": 0,
+        "images_deleted": 0,
+        "sessions_deleted": 0,
+        "style_examples_deleted": 0,
+        "histories_compacted": 0,
+        "bytes_reclaimed": 0,
+        "errors": 0,
+    }
+
+
+class MaintenanceJob:
+    """Incremental retention/GC pass over a storage backend and the session files"""
+
+    def __init__(
+        self,
+        storage,
+        retention: Optional[Dict[str, float]] = None,
+        session_dir: str = SESSION_DATA_DIR,
+        style_examples_dir: str = STYLE_EXAMPLES_DIR,
+        session_retention_days: float = SESSION_RETENTION_DAYS,
+        style_example_retention_days: float = STYLE_EXAMPLE_RETENTION_DAYS,
+        history_max_versions: int = HISTORY_MAX_VERSIONS,
+        is_character_active: Optional[Callable[[str], bool]] = None,
+        is_session_active: Optional[Callable[[str], bool]] = None,
+        dry_run: bool = False
+    ):
+        """
+        Args:
+            storage: CharacterStorage or SQLiteCharacterStorage instance
+            retention: {status: days} (parsed CHARACTER_RETENTION_DAYS if None)
+            session_dir: Directory of entry_*.json / scene_*.json files
+            style_examples_dir: Directory of generated style example images
+            session_retention_days: Age after which session files are deleted (0 = keep)
+            style_example_retention_days: Age after which style examples are deleted (0 = keep)
+            history_max_versions: Versions kept per checkpoint history (0 = keep all)
+            is_character_active: Returns True for characters with a running session
+            is_session_active: Returns True for session IDs loaded in the server
+            dry_run: Count what would be deleted without deleting anything (sizes of
+                characters and compactable history are not measured)
+        """
+        self.storage = storage
+        self.retention = retention if retention is not None else parse_retention(CHARACTER_RETENTION_DAYS)
+        self.session_dir = Path(session_dir)
+        self.style_examples_dir = Path(style_examples_dir)
+        self.session_retention_days = session_retention_days
+        self.style_example_retention_days = style_example_retention_days
+        self.history_max_versions = history_max_versions
+        self.is_character_active = is_character_active or (lambda character_id: False)
+        self.is_session_active = is_session_active or (lambda session_id: False)
+        self.dry_run = dry_run
+
+        self.passes = 0
+        self.bytes_reclaimed_total = 0
+        self.last_report: Optional[Dict[str, Any]] = None
+        self._pass: Optional[Iterator[None]] = None
+        self._report = _empty_report()
+        self._started = 0.0
+        self._swept_since: Optional[str] = None  # catalog updated_at of the last completed pass
+
+    # ========================================================================
+    # SCHEDULING
+    # ========================================================================
+
+    def run_slice(self, budget_seconds: float) -> bool:
+        """
+        Run work items until the time budget is used
+
+        Returns:
+            True if the pass finished (the next call starts a new one)
+        """
+        if self._pass is None:
+            self._pass = self._run_pass()
+            self._report = _empty_report()
+            self._report["started_at"] = datetime.utcnow().isoformat()
+            self._started = time.perf_counter()
+
+        deadline = time.perf_counter() + budget_seconds
+        for _ in self._pass:
+            if time.perf_counter() >= deadline:
+                return False
+
+        self._finish_pass()
+        return True
+
+    def run_pass(self) -> Dict[str, Any]:
+        """Run a complete pass without yielding (CLI)"""
+        while not self.run_slice(float("inf")):
+            pass
+        return self.last_report  # type: ignore
+
+    def reset(self) -> None:
+        """Abandon the pass in progress (the next slice starts a new one)"""
+        self._pass = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "passes": self.passes,
+            "running": self._pass is not None,
+            "bytes_reclaimed_total": self.bytes_reclaimed_total,
+            "last_pass": self.last_report,
+        }
+
+    def _finish_pass(self) -> None:
+        report = self._report
+        report["duration_seconds"] = round(time.perf_counter() - self._started, 2)
+        self._swept_since = report["started_at"]
+        self._pass = None
+        self.passes += 1
+        self.bytes_reclaimed_total += report["bytes_reclaimed"]
+        self.last_report = report
+
+        action = "would reclaim" if self.dry_run else "reclaimed"
+        print(
+            f"✓ Maintenance pass {action} {_format_bytes(report['bytes_reclaimed'])}: "
+            f"{report['characters_deleted']} characters, {report['images_deleted']} images, "
+            f"{report['sessions_deleted']} sessions, {report['style_examples_deleted']} style examples, "
+            f"{report['histories_compacted']} histories compacted ({report['duration_seconds']}s)"
+        )
+
+    def _run_pass(self) -> Iterator[None]:
+        """The pass itself; yields after every work item"""
+        for step in (self._expire_characters, self._sweep_characters, self._expire_sessions, self._expire_style_examples):
+            for unit in step():
+                try:
+                    unit()
+                except Exception as e:
+                    self._report["errors"] += 1
+                    print(f"Warning: Maintenance step failed: {e}")
+                yield
+
+    # ========================================================================
+    # CHARACTERS
+    # ========================================================================
+
+    def _expire_characters(self) -> Iterator[Callable[[], None]]:
+        """Characters past their status's retention period"""
+        for status, days in self.retention.items():
+            cutoff = (datetime.utcnow() - timedelta(days=days)).isoformat()
+            for entry in self.storage.list_catalog(status=status):
+                if entry["updated_at"] >= cutoff:
+                    continue  # Updated within the retention period
+                yield lambda character_id=entry["character_id"]: self._delete_character(character_id)
+
+    def _delete_character(self, character_id: str) -> None:
+        if self.is_character_active(character_id):
+            return
+        if self.dry_run:
+            freed = 0
+        else:
+            freed = self.storage.delete_character(character_id)
+        self._report["characters_deleted"] += 1
+        self._report["bytes_reclaimed"] += freed
+
+    def _sweep_characters(self) -> Iterator[Callable[[], None]]:
+        """Image and history cleanup for characters changed since the last pass"""
+        for entry in self.storage.list_catalog():
+            if self._swept_since is not None and entry["updated_at"] < self._swept_since:
+                break  # Newest first: everything after this was already swept
+            yield lambda character_id=entry["character_id"]: self._sweep_character(character_id)
+
+    def _sweep_character(self, character_id: str) -> None:
+        if self.is_character_active(character_id) or not self.storage.character_exists(character_id):
+            return
+        checkpoint_numbers = [entry["checkpoint_number"] for entry in self.storage.list_checkpoints(character_id)]
+
+        if self.history_max_versions > 0 and not self.dry_run:
+            for number in checkpoint_numbers:
+                freed = self.storage.compact_checkpoint_history(character_id, number, self.history_max_versions)
+                if freed:
+                    self._report["histories_compacted"] += 1
+                    self._report["bytes_reclaimed"] += freed
+
+        images_dir = self.storage.get_image_path(character_id, "portrait").parent
+        if not images_dir.exists():
+            return
+        images = [path for path in images_dir.iterdir() if path.is_file()]
+        if not images:
+            return
+
+        # Everything that can hold an image URL, including retained versions
+        references = [
+            self.storage.load_character_kb(character_id),
+            self.storage.load_final_profile(character_id),
+            self.storage.load_all_checkpoints(character_id),
+        ]
+        references.extend(self.storage.load_checkpoint_history(character_id, number) for number in checkpoint_numbers)
+        referenced = json.dumps(references)
+
+        for path in images:
+            if f"{character_id}/images/{path.name}" in referenced:
+                continue
+            size = path.stat().st_size
+            if not self.dry_run:
+                path.unlink()
+            self._report["images_deleted"] += 1
+            self._report["bytes_reclaimed"] += size
+
+    # ========================================================================
+    # SESSION FILES AND ASSETS
+    # ========================================================================
+
+    def _expire_files(self, directory: Path, pattern: str, days: float) -> Iterator[Path]:
+        """Files matching pattern not modified for days"""
+        if days <= 0 or not directory.exists():
+            return
+        cutoff = time.time() - days * 86400
+        for path in directory.glob(pattern):
+            try:
+                if path.stat().st_mtime < cutoff:
+                    yield path
+            except FileNotFoundError:
+                continue
+
+    def _delete_file(self, path: Path, counter: str) -> None:
+        try:
+            size = path.stat().st_size
+            if not self.dry_run:
+                path.unlink()
+        except FileNotFoundError:
+            return
+        self._report[counter] += 1
+        self._report["bytes_reclaimed"] += size
+
+    def _expire_sessions(self) -> Iterator[Callable[[], None]]:
+        for pattern in ("entry_*.json", "scene_*.json"):
+            for path in self._expire_files(self.session_dir, pattern, self.session_retention_days):
+                session_id = path.stem.split("_", 1)[1]
+                if self.is_session_active(session_id):
+                    continue
+                yield lambda path=path: self._delete_file(path, "sessions_deleted")
+
+    def _expire_style_examples(self) -> Iterator[Callable[[], None]]:
+        """Old style examples, unless a remaining Entry session links to them"""
+        expired = list(self._expire_files(self.style_examples_dir, "style_*.png", self.style_example_retention_days))
+        if not expired:
+            return
+
+        linked = set()
+        if self.session_dir.exists():
+            for path in self.session_dir.glob("entry_*.json"):
+                try:
+                    linked.update(STYLE_EXAMPLE_PATTERN.findall(path.read_text()))
+                except FileNotFoundError:
+                    continue
+
+        for path in expired:
+            if path.name in linked:
+                continue
+            yield lambda path=path: self._delete_file(path, "style_examples_deleted")
+
+
+async def run_maintenance_loop(
+    job: MaintenanceJob,
+    async_storage,
+    interval: float = MAINTENANCE_INTERVAL_SECONDS,
+    slice_ms: float = MAINTENANCE_SLICE_MS,
+    pause_ms: float = MAINTENANCE_PAUSE_MS
+) -> None:
+    """
+    Run maintenance passes forever, in short slices on the storage I/O pool
+
+    Args:
+        job: MaintenanceJob to run
+        async_storage: AsyncCharacterStorage whose pool runs the slices
+        interval: Seconds between the end of a pass and the next one
+        slice_ms: Work per slice
+        pause_ms: Pause between slices (lets queued storage calls through)
+    """
+    while True:
+        try:
+            while not await async_storage.run(job.run_slice, slice_ms / 1000):
+                await asyncio.sleep(pause_ms / 1000)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"Warning: Maintenance pass failed: {e}")
+            job.reset()
+        await asyncio.sleep(interval)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Apply retention, delete unreferenced files and compact history")
+    parser.add_argument("--dry-run", action="store_true", help="Report what would be reclaimed without deleting")
+    parser.add_argument("--session-dir", default=SESSION_DATA_DIR, help="Entry/Scene session directory")
+    parser.add_argument("--style-examples-dir", default=STYLE_EXAMPLES_DIR, help="Style example image directory")
+    args = parser.parse_args()
+
+    job = MaintenanceJob(
+        create_storage(),
+        session_dir=args.session_dir,
+        style_examples_dir=args.style_examples_dir,
+        dry_run=args.dry_run
+    )
+    report = job.run_pass()
+    if report["errors"]:
+        print(f"⚠️  {report['errors']} maintenance steps failed (see warnings above)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""
+Move characters from the flat directory layout into UUID-prefix shards
+
+Usage (from backend/):
+    python -m agents.Character_Identity.migrate_layout --source ./backend/character_data
+
+<base>/<id>/ becomes <base>/<id[:2]>/<id>/. Directories are renamed in
+place (no copying), and image URLs stored in the knowledge base, final
+profile and checkpoints (/character_data/<id>/images/...) are rewritten to
+the sharded path, with the checkpoint manifest updated to match. Catalog
+rows do not depend on the layout; the catalog is only built if the store
+has none yet. Safe to re-run: characters already in a shard are left
+alone. Run it with the API server stopped.
+"""
+
+import argparse
+import hashlib
+import json
+import os
+from datetime import datetime
+from pathlib import Path
+
+from .storage import (
+    CHECKPOINT_MANIFEST,
+    SHARD_PREFIX_LENGTH,
+    CharacterStorage,
+    atomic_write_json,
+    decode_json,
+    detect_format,
+    is_character_dir,
+    read_json_file
+)
+
+
+def _rewrite_image_urls(char_dir: Path, character_id: str) -> int:
+    """
+    Point stored image URLs at the sharded directory
+
+    Returns:
+        Number of files rewritten
+    """
+    old_prefix = f"/character_data/{character_id}/"
+    new_prefix = f"/character_data/{character_id[:SHARD_PREFIX_LENGTH]}/{character_id}/"
+
+    manifest_path = char_dir / "checkpoints" / CHECKPOINT_MANIFEST
+    manifest = read_json_file(manifest_path) if manifest_path.exists() else None
+
+    rewritten = 0
+    for path in char_dir.rglob("*.json"):
+        if path.name == CHECKPOINT_MANIFEST:
+            continue
+        raw = path.read_bytes()
+        text = json.dumps(decode_json(raw))
+        if old_prefix not in text:
+            continue
+
+        encoded = atomic_write_json(path, json.loads(text.replace(old_prefix, new_prefix)), detect_format(raw))
+        rewritten += 1
+
+        if manifest is not None and path.parent.name == "checkpoints":
+            for entry in manifest["checkpoints"].values():
+                if entry["file"] == path.name:
+                    entry.update(
+                        version=entry["version"] + 1,
+                        size=len(encoded),
+                        sha256=hashlib.sha256(encoded).hexdigest(),
+                        updated_at=datetime.utcnow().isoformat()
+                    )
+
+    if manifest is not None and rewritten:
+        atomic_write_json(manifest_path, manifest, detect_format(manifest_path.read_bytes()))
+    return rewritten
+
+
+def shard_store(source: str) -> dict:
+    """
+    Move every flat character directory into its shard
+
+    Args:
+        source: Base directory of the JSON storage
+
+    Returns:
+        Dict with moved and conflicting character IDs and the number of files rewritten
+    """
+    base_path = Path(source)
+    moved, conflicts, rewritten = [], [], 0
+
+    for entry in sorted(base_path.iterdir()):
+        if len(entry.name) <= SHARD_PREFIX_LENGTH or not is_character_dir(entry):
+            continue  # Files, shard directories, shared storylines and stray directories
+
+        character_id = entry.name
+        target = base_path / character_id[:SHARD_PREFIX_LENGTH] / character_id
+        if target.exists():
+            conflicts.append(character_id)
+            continue
+
+        target.parent.mkdir(exist_ok=True)
+        os.replace(entry, target)
+        rewritten += _rewrite_image_urls(target, character_id)
+        moved.append(character_id)
+
+    # Opening the store builds the catalog if it does not exist yet
+    CharacterStorage(source, coalesce_seconds=0, cache_size=0, layout="sharded")
+
+    return {"moved": moved, "conflicts": conflicts, "files_rewritten": rewritten}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Move character directories into UUID-prefix shards")
+    parser.add_argument("--source", default="./backend/character_data", help="JSON storage base directory")
+    args = parser.parse_args()
+
+    result = shard_store(args.source)
+    print(f"✓ Moved {len(result['moved'])} characters into shards ({result['files_rewritten']} files with image URLs rewritten)")
+    if result["conflicts"]:
+        print(f"⚠️  Skipped {len(result['conflicts'])} characters already present in a shard: {', '.join(result['conflicts'])}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""
+Migrate characters from the directory layout to the SQLite backend
+
+Usage (from backend/):
+    python -m agents.Character_Identity.migrate_storage \
+        --source ./backend/character_data --db ./backend/character_data.db
+
+Each character is imported in its own transaction, so the migration can be
+re-run safely; already-migrated characters are replaced. Images are left
+in place (the SQLite backend reads them from the same directory).
+"""
+
+import argparse
+
+from .storage import CharacterStorage
+from .sqlite_storage import CHARACTER_STORAGE_SQLITE_PATH, SQLiteCharacterStorage
+
+
+def migrate(source: str, db_path: str) -> dict:
+    """
+    Copy every character from a CharacterStorage directory into SQLite
+
+    Args:
+        source: Base directory of the JSON storage
+        db_path: SQLite database file to create or update
+
+    Returns:
+        Dict with migrated and skipped character IDs
+    """
+    json_storage = CharacterStorage(source, coalesce_seconds=0)
+    sqlite_storage = SQLiteCharacterStorage(db_path, images_path=source)
+
+    migrated, skipped = [], []
+    for character_id in json_storage.list_characters():
+        try:
+            metadata = json_storage.load_metadata(character_id)
+            kb = json_storage.load_character_kb(character_id)
+        except FileNotFoundError:
+            # Directory without metadata/KB (e.g. only images)
+            skipped.append(character_id)
+            continue
+
+        try:
+            input_data = json_storage.load_input(character_id)  # Storyline ref resolved
+        except FileNotFoundError:
+            input_data = kb["input_data"]
+
+        sqlite_storage.import_character(
+            character_id,
+            input_data,
+            metadata,
+            kb,
+            checkpoints=json_storage.load_all_checkpoints(character_id),
+            final_profile=json_storage.load_final_profile(character_id)
+        )
+        migrated.append(character_id)
+
+    return {"migrated": migrated, "skipped": skipped}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Migrate character data from JSON directories to SQLite")
+    parser.add_argument("--source", default="./backend/character_data", help="JSON storage base directory")
+    parser.add_argument("--db", default=CHARACTER_STORAGE_SQLITE_PATH, help="SQLite database path")
+    args = parser.parse_args()
+
+    result = migrate(args.source, args.db)
+    print(f"✓ Migrated {len(result['migrated'])} characters to {args.db}")
+    if result["skipped"]:
+        print(f"⚠️  Skipped {len(result['skipped'])} incomplete directories: {', '.join(result['skipped'])}")
+
+
+if __name__ == "__main__":
+    main()
@@ -10,8 +10,9 @@ Wave Structure:
 """
 
 import asyncio
+import copy
 from datetime import datetime
-from typing import Dict, Optional, Callable
+from typing import Dict, List, Optional, Callable, Tuple
 import os
 
 from .schemas import (
@@ -23,6 +24,11 @@ from .schemas import (
     CharacterOverview
 )
 from .storage import CharacterStorage
+from .async_storage import AsyncCharacterStorage
+from .dependencies import AGENT_CHECKPOINTS, compute_input_hash
+from .budget import BudgetExceededError, apply_budget_mode, compute_budget_status, should_skip_agent
+from providers.calls import is_retryable_error
+from providers.usage import AgentRunInfo, add_usage, empty_usage, estimate_cost_usd, total_tokens
 from .subagents import (
     personality_agent,
     backstory_motivation_agent,
@@ -32,6 +38,32 @@ from .subagents import (
     relationships_agent,
     image_generation_agent
 )
+from .subagents.storyline_digest import ensure_storyline_digest
+
+
+# Map agent name to agent function
+AGENT_FUNCTIONS = {
+    "personality": personality_agent,
+    "backstory_motivation": backstory_motivation_agent,
+    "voice_dialogue": voice_dialogue_agent,
+    "physical_description": physical_description_agent,
+    "story_arc": story_arc_agent,
+    "relationships": relationships_agent,
+    "image_generation": image_generation_agent,
+}
+
+# Per-agent retry budget inside a wave for transient provider errors
+# (retries after the first attempt, on top of the call-level retries)
+AGENT_MAX_RETRIES = int(os.getenv("AGENT_MAX_RETRIES", "2"))
+AGENT_RETRY_BASE_DELAY = float(os.getenv("AGENT_RETRY_BASE_DELAY", "2.0"))
+
+# Approval policies for checkpoint and wave gates:
+# - manual: wait for /approve and /approve_wave (default)
+# - auto: approve everything immediately (unattended batch runs)
+# - auto_unless_parse_fallback: auto-approve unless the agent fell back to placeholder data
+# - auto_after_timeout: wait for a human up to the timeout, then auto-approve
+APPROVAL_POLICIES = ["manual", "auto", "auto_unless_parse_fallback", "auto_after_timeout"]
+DEFAULT_APPROVAL_TIMEOUT_SECONDS = float(os.getenv("APPROVAL_TIMEOUT_SECONDS", "300"))
 
 
 def parse_importance_to_int(importance_str: str) -> int:
@@ -68,6 +100,70 @@ def parse_importance_to_int(importance_str: str) -> int:
     return 5
 
 
+def record_agent_usage(
+    metadata: Dict,
+    agent_name: str,
+    wave: int,
+    run_info: Optional[AgentRunInfo]
+) -> None:
+    """
+    Accumulate an agent run's measured usage into character metadata
+
+    Maintains totals per character, per agent and per wave under
+    metadata["usage"], along with an estimated cost in USD. Regenerations
+    add to the same counters. A structured-output repair call is recorded
+    as its own agent, "<agent>_repair", priced at the repair model's rate.
+
+    Args:
+        metadata: Character metadata dict (modified in place)
+        agent_name: Agent that produced the run
+        wave: Wave the agent belongs to
+        run_info: Measured run info returned by the sub-agent
+    """
+    if not run_info:
+        return
+
+    ledger = metadata.setdefault("usage", {
+        "total": empty_usage(),
+        "cost_usd": 0.0,
+        "agent_time_seconds": 0.0,
+        "api_calls": 0,
+        "by_agent": {},
+        "by_wave": {}
+    })
+    cost = estimate_cost_usd(run_info["model"], run_info["usage"])
+
+    add_usage(ledger["total"], run_info["usage"])
+    ledger["cost_usd"] = ledger.get("cost_usd", 0.0) + cost
+    ledger["agent_time_seconds"] += run_info["wall_time_seconds"]
+    ledger["api_calls"] += run_info["api_calls"]
+
+    agent_entry = ledger["by_agent"].setdefault(agent_name, {
+        "usage": empty_usage(),
+        "cost_usd": 0.0,
+        "agent_time_seconds": 0.0,
+        "api_calls": 0,
+        "runs": 0
+    })
+    add_usage(agent_entry["usage"], run_info["usage"])
+    agent_entry["cost_usd"] = agent_entry.get("cost_usd", 0.0) + cost
+    agent_entry["agent_time_seconds"] += run_info["wall_time_seconds"]
+    agent_entry["api_calls"] += run_info["api_calls"]
+    agent_entry["runs"] += 1
+
+    # JSON object keys are strings, so waves are keyed as "1", "2", "3"
+    wave_entry = ledger["by_wave"].setdefault(str(wave), {
+        "usage": empty_usage(),
+        "agent_time_seconds": 0.0,
+        "wall_time_seconds": 0.0
+    })
+    add_usage(wave_entry["usage"], run_info["usage"])
+    wave_entry["agent_time_seconds"] += run_info["wall_time_seconds"]
+
+    if run_info.get("repair"):
+        record_agent_usage(metadata, f"{agent_name}_repair", wave, run_info["repair"])
+
+
 class CharacterOrchestrator:
     """Orchestrates wave-based character development"""
 
@@ -77,17 +173,25 @@ class CharacterOrchestrator:
         anthropic_api_key: str,
         gemini_api_key: str,
         storage: CharacterStorage,
-        websocket_callback: Optional[Callable] = None
+        websocket_callback: Optional[Callable] = None,
+        async_storage: Optional[AsyncCharacterStorage] = None
     ):
         self.character_id = character_id
         self.anthropic_api_key = anthropic_api_key
         self.gemini_api_key = gemini_api_key
         self.storage = storage
+        # All I/O once the session is running goes through the thread pool
+        self.async_storage = async_storage or AsyncCharacterStorage(storage)
         self.websocket_callback = websocket_callback  # For real-time updates
 
         # Load character KB
         self.kb: CharacterKnowledgeBase = storage.load_character_kb(character_id)
 
+        # Approval policy chosen at character creation
+        policy = storage.load_metadata(character_id).get("approval_policy") or {}
+        self.approval_policy = policy.get("mode", "manual")
+        self.approval_timeout = policy.get("timeout_seconds") or DEFAULT_APPROVAL_TIMEOUT_SECONDS
+
         # Approval gates for wave-level human-in-the-loop control
         self.approval_events = {
             1: asyncio.Event(),  # Wave 1 approval gate
@@ -100,6 +204,24 @@ class CharacterOrchestrator:
         if self.websocket_callback:
             await self.websocket_callback(message)
 
+    async def _check_budget(self):
+        """Measure spend against the budgets and report it to the client"""
+        status = await self.async_storage.run(compute_budget_status, self.storage, self.character_id)
+        await self._send_update({"type": "budget_status", **status})
+        return status
+
+    async def _fail_on_exhausted_budget(self, status):
+        """Stop the session if the budget is exhausted"""
+        if status["level"] != "exhausted":
+            return
+
+        def mark_exhausted(metadata):
+            metadata["status"] = "budget_exhausted"
+
+        await self.async_storage.update_metadata(self.character_id, mark_exhausted)
+        await self.async_storage.flush(self.character_id)
+        raise BudgetExceededError(status)
+
     def approve_wave(self, wave_number: int):
         """
         Approve a wave and signal the orchestrator to continue to the next wave
@@ -120,10 +242,63 @@ class CharacterOrchestrator:
         wave: int,
         output: Dict,
         narrative: str,
-        tokens_used: int,
-        agent_time: float
+        run_info: Optional[AgentRunInfo]
+    ) -> Checkpoint:
+        """Create and save a checkpoint, then wait for its approval"""
+        checkpoint = self._build_checkpoint(checkpoint_number, agent_name, wave, output, narrative, run_info)
+        await self._save_checkpoint(checkpoint, run_info)
+
+        # WAIT for checkpoint approval (or apply the auto-approval policy)
+        await self._checkpoint_gate(checkpoint, run_info)
+
+        return checkpoint
+
+    async def _checkpoint_gate(self, checkpoint: Checkpoint, run_info: Optional[AgentRunInfo]):
+        """Block on a checkpoint according to the approval policy"""
+        checkpoint_number = checkpoint["checkpoint_number"]
+        parse_fallback = bool(run_info and run_info.get("parse_fallback"))
+
+        if self.approval_policy == "auto":
+            await self._auto_approve(checkpoint)
+        elif self.approval_policy == "auto_unless_parse_fallback" and not parse_fallback:
+            await self._auto_approve(checkpoint)
+        elif self.approval_policy == "auto_after_timeout":
+            approved = await self._wait_for_checkpoint_approval(checkpoint_number, timeout=self.approval_timeout)
+            if not approved:
+                await self._auto_approve(checkpoint)
+        else:
+            await self._wait_for_checkpoint_approval(checkpoint_number)
+
+    async def _auto_approve(self, checkpoint: Checkpoint):
+        """Approve a checkpoint on behalf of the policy, keeping an audit trail"""
+        checkpoint_number = checkpoint["checkpoint_number"]
+
+        checkpoint["status"] = "approved"
+        checkpoint["metadata"]["approved_by"] = f"policy:{self.approval_policy}"
+
+        def mark_completed(metadata):
+            metadata["completed_checkpoints"] = max(metadata.get("completed_checkpoints", 0), checkpoint_number)
+
+        await self.async_storage.save_checkpoint_with_metadata(self.character_id, checkpoint, mark_completed)
+
+        await self._send_update({
+            "type": "checkpoint_approved",
+            "checkpoint_number": checkpoint_number,
+            "agent": checkpoint["agent"],
+            "approved_by": checkpoint["metadata"]["approved_by"]
+        })
+
+    def _build_checkpoint(
+        self,
+        checkpoint_number: int,
+        agent_name: str,
+        wave: int,
+        output: Dict,
+        narrative: str,
+        run_info: Optional[AgentRunInfo]
     ) -> Checkpoint:
-        """Create and save a checkpoint"""
+        """Build a checkpoint awaiting approval from an agent result"""
+        usage = run_info["usage"] if run_info else empty_usage()
 
         checkpoint: Checkpoint = {
             "checkpoint_number": checkpoint_number,
@@ -136,283 +311,408 @@ class CharacterOrchestrator:
             "metadata": {
                 "wave": wave,
                 "timestamp": datetime.utcnow().isoformat(),
-                "tokens_used": tokens_used,
-                "agent_time_seconds": agent_time
+                "tokens_used": total_tokens(usage),
+                "agent_time_seconds": run_info["wall_time_seconds"] if run_info else 0.0,
+                "usage": usage,
+                "model": run_info["model"] if run_info else ""
             }
         }
+        if run_info and run_info.get("output_repair", "none") != "none":
+            checkpoint["metadata"]["output_repair"] = run_info["output_repair"]
 
-        # Save checkpoint
-        self.storage.save_checkpoint(self.character_id, checkpoint)
+        return checkpoint
+
+    async def _save_checkpoint(self, checkpoint: Checkpoint, run_info: Optional[AgentRunInfo]):
+        """Persist a checkpoint, record its usage and notify the client"""
+        checkpoint_number = checkpoint["checkpoint_number"]
+        agent_name = checkpoint["agent"]
+
+        # Save checkpoint together with metadata (progress + usage accounting)
+        def record_progress(metadata):
+            metadata["current_checkpoint"] = checkpoint_number
+            record_agent_usage(metadata, agent_name, checkpoint["metadata"]["wave"], run_info)
 
-        # Update metadata
-        metadata = self.storage.load_metadata(self.character_id)
-        metadata["current_checkpoint"] = checkpoint_number
-        self.storage.save_metadata(self.character_id, metadata)
+        await self.async_storage.save_checkpoint_with_metadata(self.character_id, checkpoint, record_progress)
 
         # Send WebSocket update
         await self._send_update({
             "type": "checkpoint_ready",
             "checkpoint_number": checkpoint_number,
             "agent": agent_name,
+            "usage": checkpoint["metadata"]["usage"],
             "message": f"{agent_name} analysis complete. Awaiting approval."
         })
 
-        # WAIT for checkpoint approval before continuing
-        await self._wait_for_checkpoint_approval(checkpoint_number)
+    async def _record_wave_time(self, wave: int, wave_time: float) -> Dict:
+        """Store a wave's wall-clock time and return its usage summary"""
+        def add_wave_time(metadata):
+            wave_entry = metadata.get("usage", {}).get("by_wave", {}).get(str(wave))
+            if wave_entry is not None:
+                wave_entry["wall_time_seconds"] += wave_time
 
-        return checkpoint
+        metadata = await self.async_storage.update_metadata(self.character_id, add_wave_time)
+        return metadata.get("usage", {}).get("by_wave", {}).get(str(wave)) or {}
 
-    async def _wait_for_checkpoint_approval(self, checkpoint_number: int):
-        """Wait for checkpoint to be approved before continuing"""
-        import asyncio
+    async def _wait_for_checkpoint_approval(
+        self,
+        checkpoint_number: int,
+        timeout: Optional[float] = None
+    ) -> bool:
+        """
+        Wait for checkpoint to be approved before continuing
+
+        Returns:
+            True if approved, False if the timeout elapsed first
+        """
+        loop = asyncio.get_event_loop()
+        deadline = loop.time() + timeout if timeout is not None else None
 
         while True:
-            metadata = self.storage.load_metadata(self.character_id)
+            metadata = await self.async_storage.load_metadata(self.character_id)
             if metadata.get("completed_checkpoints", 0) >= checkpoint_number:
                 # Checkpoint approved!
-                break
+                return True
+
+            if deadline is not None and loop.time() >= deadline:
+                return False
 
             # Check every 0.5 seconds
             await asyncio.sleep(0.5)
 
-    async def run_wave_1(self):
-        """Execute Wave 1: Foundation (Personality + Backstory)"""
+    async def _wave_gate(self, wave: int, message: str, checkpoints: List[int]):
+        """Pause after a wave according to the approval policy"""
+        if self.approval_policy in ("auto", "auto_unless_parse_fallback"):
+            # Checkpoint gates already covered anything needing a human
+            await self._send_update({
+                "type": "wave_approved",
+                "wave": wave,
+                "approved_by": f"policy:{self.approval_policy}",
+                "checkpoints": checkpoints
+            })
+            return
 
         await self._send_update({
-            "type": "wave_started",
-            "wave": 1,
-            "agents": ["personality", "backstory_motivation"]
+            "type": "awaiting_approval",
+            "wave": wave,
+            "message": message,
+            "checkpoints": checkpoints
         })
 
-        # Update KB
-        self.kb["current_wave"] = 1
-        self.storage.save_character_kb(self.kb)
+        if self.approval_policy == "auto_after_timeout":
+            try:
+                await asyncio.wait_for(self.approval_events[wave].wait(), timeout=self.approval_timeout)
+            except asyncio.TimeoutError:
+                await self._send_update({
+                    "type": "wave_approved",
+                    "wave": wave,
+                    "approved_by": f"policy:{self.approval_policy}",
+                    "checkpoints": checkpoints
+                })
+            return
 
-        # Run both agents in parallel
-        start_time = datetime.now()
+        await self.approval_events[wave].wait()  # PAUSE HERE until approved
 
-        personality_task = personality_agent(self.kb, self.anthropic_api_key)
-        backstory_task = backstory_motivation_agent(self.kb, self.anthropic_api_key)
+    def _agent_call(self, agent_name: str, kb: CharacterKnowledgeBase):
+        """Build the coroutine that runs one sub-agent against a KB"""
+        if agent_name == "image_generation":
+            return image_generation_agent(kb, self.gemini_api_key, self.async_storage)
+        return AGENT_FUNCTIONS[agent_name](kb, self.anthropic_api_key)
 
-        personality_result, backstory_result = await asyncio.gather(
-            personality_task,
-            backstory_task
-        )
+    async def _run_agent_with_retry(self, agent_name: str, kb: CharacterKnowledgeBase):
+        """
+        Run a sub-agent, retrying transient failures with exponential backoff
 
-        end_time = datetime.now()
-        wave_time = (end_time - start_time).total_seconds()
+        Only provider errors that stayed transient after the call-level
+        retries (timeouts, 429, 5xx, overloaded) are retried. Anything else
+        (auth errors, bad requests, bugs) fails the same way every time, so
+        it is raised at once.
 
-        # Unpack results
-        personality_output, personality_narrative = personality_result
-        backstory_output, backstory_narrative = backstory_result
+        Args:
+            agent_name: Agent to run
+            kb: KB snapshot the agent should read (same snapshot on every attempt)
 
-        # Update KB with outputs
-        self.kb["personality"] = personality_output
-        self.kb["backstory_motivation"] = backstory_output
-        self.kb["agent_statuses"]["personality"] = {"status": "completed", "wave": 1}
-        self.kb["agent_statuses"]["backstory_motivation"] = {"status": "completed", "wave": 1}
-        self.storage.save_character_kb(self.kb)
+        Returns:
+            Tuple of (structured_output, narrative, run_info)
 
-        # Create checkpoints
-        await self._create_checkpoint(
-            checkpoint_number=1,
-            agent_name="personality",
-            wave=1,
-            output=personality_output,
-            narrative=personality_narrative,
-            tokens_used=1500,  # Estimate
-            agent_time=wave_time / 2
-        )
+        Raises:
+            A non-transient exception immediately, or the last transient one
+            once AGENT_MAX_RETRIES retries are exhausted
+        """
+        attempt = 0
+        while True:
+            try:
+                return await self._agent_call(agent_name, kb)
+            except Exception as e:
+                attempt += 1
+                if not is_retryable_error(e) or attempt > AGENT_MAX_RETRIES:
+                    raise
+
+                delay = AGENT_RETRY_BASE_DELAY * (2 ** (attempt - 1))
+                print(f"Warning: {agent_name} failed (attempt {attempt}/{AGENT_MAX_RETRIES + 1}): {e}. Retrying in {delay:.1f}s")
+                await self._send_update({
+                    "type": "agent_retry",
+                    "agent": agent_name,
+                    "attempt": attempt,
+                    "max_retries": AGENT_MAX_RETRIES,
+                    "retry_in_seconds": delay,
+                    "error": str(e)
+                })
+                await asyncio.sleep(delay)
 
-        await self._create_checkpoint(
-            checkpoint_number=2,
-            agent_name="backstory_motivation",
-            wave=1,
-            output=backstory_output,
-            narrative=backstory_narrative,
-            tokens_used=1800,  # Estimate
-            agent_time=wave_time / 2
-        )
+    async def _run_and_commit_agent(
+        self,
+        agent_name: str,
+        wave: int,
+        kb: CharacterKnowledgeBase
+    ) -> Tuple[Optional[Tuple], Optional[str]]:
+        """
+        Run one agent of a wave and commit its result to the KB immediately
 
-        await self._send_update({
-            "type": "wave_complete",
-            "wave": 1,
-            "agents_completed": ["personality", "backstory_motivation"],
-            "next_wave": 2
-        })
+        A failure is recorded on the agent status without affecting the
+        other agents of the wave.
 
-    async def run_wave_2(self):
-        """Execute Wave 2: Expression (Voice + Physical + Story Arc)"""
+        Returns:
+            Tuple of (agent_result or None, error message or None)
+        """
+        input_hash = compute_input_hash(kb, agent_name)
+
+        self.kb["agent_statuses"][agent_name] = {"status": "in_progress", "wave": wave}
+        await self._send_update({"type": "agent_started", "agent": agent_name, "wave": wave})
+
+        try:
+            result = await self._run_agent_with_retry(agent_name, kb)
+        except Exception as e:
+            self.kb["agent_statuses"][agent_name] = {"status": "failed", "wave": wave}
+            await self.async_storage.save_character_kb(self.kb)
+            await self._send_update({
+                "type": "agent_failed",
+                "agent": agent_name,
+                "wave": wave,
+                "error": str(e)
+            })
+            return None, str(e)
+
+        output, _, _ = result
+        self.kb[agent_name] = output
+        self.kb["agent_statuses"][agent_name] = {"status": "completed", "wave": wave, "input_hash": input_hash}
+        if kb["mode"] != self.kb["mode"]:
+            # Budget downgrade: record the mode the output was actually produced in
+            self.kb["agent_statuses"][agent_name]["mode"] = kb["mode"]
+        await self.async_storage.save_character_kb(self.kb)
+        await self._send_update({"type": "agent_completed", "agent": agent_name, "wave": wave})
+
+        return result, None
+
+    async def _create_failed_checkpoint(
+        self,
+        agent_name: str,
+        wave: int,
+        error: str
+    ) -> Checkpoint:
+        """
+        Save a failed checkpoint and wait until it is retried and approved
+
+        The other agents of the wave keep their results; only this agent
+        needs to be re-run (see retry_agent).
+        """
+        checkpoint_number = AGENT_CHECKPOINTS[agent_name]
+        checkpoint: Checkpoint = {
+            "checkpoint_number": checkpoint_number,
+            "agent": agent_name,
+            "status": "failed",
+            "output": {
+                "narrative": "",
+                "structured": {}
+            },
+            "metadata": {
+                "wave": wave,
+                "timestamp": datetime.utcnow().isoformat(),
+                "tokens_used": 0,
+                "agent_time_seconds": 0.0,
+                "error": error
+            }
+        }
+
+        def record_progress(metadata):
+            metadata["current_checkpoint"] = checkpoint_number
+
+        await self.async_storage.save_checkpoint_with_metadata(self.character_id, checkpoint, record_progress)
 
         await self._send_update({
-            "type": "wave_started",
-            "wave": 2,
-            "agents": ["voice_dialogue", "physical_description", "story_arc"]
+            "type": "checkpoint_failed",
+            "checkpoint_number": checkpoint_number,
+            "agent": agent_name,
+            "error": error,
+            "message": f"{agent_name} failed after {AGENT_MAX_RETRIES + 1} attempts. Retry this checkpoint to continue."
         })
 
-        # Update KB
-        self.kb["current_wave"] = 2
-        self.storage.save_character_kb(self.kb)
+        if self.approval_policy == "auto":
+            # Nobody is watching an unattended run; fail it instead of blocking forever
+            raise RuntimeError(f"{agent_name} failed after {AGENT_MAX_RETRIES + 1} attempts: {error}")
 
-        # Run all three agents in parallel
-        start_time = datetime.now()
+        if self.approval_policy == "auto_after_timeout":
+            retried = await self._wait_for_checkpoint_approval(checkpoint_number, timeout=self.approval_timeout)
+            if not retried:
+                raise RuntimeError(f"{agent_name} failed and was not retried within {self.approval_timeout:.0f}s: {error}")
+        else:
+            await self._wait_for_checkpoint_approval(checkpoint_number)
 
-        voice_task = voice_dialogue_agent(self.kb, self.anthropic_api_key)
-        physical_task = physical_description_agent(self.kb, self.anthropic_api_key)
-        story_arc_task = story_arc_agent(self.kb, self.anthropic_api_key)
+        return checkpoint
 
-        voice_result, physical_result, story_arc_result = await asyncio.gather(
-            voice_task,
-            physical_task,
-            story_arc_task
-        )
+    async def retry_agent(self, agent_name: str) -> Checkpoint:
+        """
+        Re-run a single failed agent of the current session
 
-        end_time = datetime.now()
-        wave_time = (end_time - start_time).total_seconds()
+        Replaces the failed checkpoint with a fresh one awaiting approval.
+        The wave blocked on the failed checkpoint resumes once it is approved.
 
-        # Unpack results
-        voice_output, voice_narrative = voice_result
-        physical_output, physical_narrative = physical_result
-        story_arc_output, story_arc_narrative = story_arc_result
+        Args:
+            agent_name: Agent whose checkpoint failed
 
-        # Update KB
-        self.kb["voice_dialogue"] = voice_output
-        self.kb["physical_description"] = physical_output
-        self.kb["story_arc"] = story_arc_output
-        self.kb["agent_statuses"]["voice_dialogue"] = {"status": "completed", "wave": 2}
-        self.kb["agent_statuses"]["physical_description"] = {"status": "completed", "wave": 2}
-        self.kb["agent_statuses"]["story_arc"] = {"status": "completed", "wave": 2}
-        self.storage.save_character_kb(self.kb)
-
-        # Create checkpoints
-        await self._create_checkpoint(
-            checkpoint_number=3,
-            agent_name="voice_dialogue",
-            wave=2,
-            output=voice_output,
-            narrative=voice_narrative,
-            tokens_used=1600,
-            agent_time=wave_time / 3
-        )
+        Returns:
+            The new checkpoint
+        """
+        status = self.kb["agent_statuses"].get(agent_name, {})
+        if status.get("status") != "failed":
+            raise ValueError(f"Agent '{agent_name}' has not failed (status: {status.get('status', 'unknown')})")
 
-        await self._create_checkpoint(
-            checkpoint_number=4,
-            agent_name="physical_description",
-            wave=2,
-            output=physical_output,
-            narrative=physical_narrative,
-            tokens_used=1400,
-            agent_time=wave_time / 3
-        )
+        wave = status["wave"]
+        budget = await self._check_budget()
+        await self._fail_on_exhausted_budget(budget)
 
-        await self._create_checkpoint(
-            checkpoint_number=5,
-            agent_name="story_arc",
-            wave=2,
-            output=story_arc_output,
-            narrative=story_arc_narrative,
-            tokens_used=1700,
-            agent_time=wave_time / 3
-        )
+        retry_kb = copy.deepcopy(self.kb)
+        apply_budget_mode(retry_kb, budget)
+        result, error = await self._run_and_commit_agent(agent_name, wave, retry_kb)
+        if result is None:
+            raise RuntimeError(f"Retry of '{agent_name}' failed: {error}")
 
-        await self._send_update({
-            "type": "wave_complete",
-            "wave": 2,
-            "agents_completed": ["voice_dialogue", "physical_description", "story_arc"],
-            "next_wave": 3
-        })
+        output, narrative, run_info = result
+        checkpoint = self._build_checkpoint(AGENT_CHECKPOINTS[agent_name], agent_name, wave, output, narrative, run_info)
+        await self._save_checkpoint(checkpoint, run_info)
 
-    async def run_wave_3(self):
-        """Execute Wave 3: Social (Relationships + optional Image Generation)"""
+        return checkpoint
 
-        # Check if image generation is enabled
-        IMAGE_GENERATION_ENABLED = os.getenv("IMAGE_GENERATION_ENABLED", "false").lower() == "true"
+    async def _run_wave(self, wave: int, agent_names: List[str], next_wave):
+        """
+        Run the agents of a wave in parallel, isolating failures
 
-        agents_list = ["relationships"]
-        if IMAGE_GENERATION_ENABLED and self.gemini_api_key:
-            agents_list.append("image_generation")
+        Each agent's result is committed to the KB as soon as it completes,
+        so a failing agent never discards the results of its siblings.
+        Checkpoints are then created in order; failed agents produce a
+        failed checkpoint that can be retried on its own.
+
+        The budget is checked before the wave starts: near exhaustion the
+        wave runs in fast mode and optional agents are skipped.
+        """
+        budget = await self._check_budget()
+        await self._fail_on_exhausted_budget(budget)
+
+        skipped = [name for name in agent_names if should_skip_agent(name, budget)]
+        if skipped:
+            agent_names = [name for name in agent_names if name not in skipped]
+
+            def drop_skipped(metadata):
+                metadata["total_checkpoints"] -= len(skipped)
+
+            await self.async_storage.update_metadata(self.character_id, drop_skipped)
+            for name in skipped:
+                await self._send_update({
+                    "type": "agent_skipped",
+                    "agent": name,
+                    "wave": wave,
+                    "reason": "budget"
+                })
 
         await self._send_update({
             "type": "wave_started",
-            "wave": 3,
-            "agents": agents_list
+            "wave": wave,
+            "agents": agent_names
         })
 
         # Update KB
-        self.kb["current_wave"] = 3
-        self.storage.save_character_kb(self.kb)
+        self.kb["current_wave"] = wave
+        await self.async_storage.save_character_kb(self.kb)
+
+        # All agents (and their retries) read the KB as it was at wave start
+        wave_kb = copy.deepcopy(self.kb)
+        if apply_budget_mode(wave_kb, budget):
+            await self._send_update({
+                "type": "budget_downgrade",
+                "wave": wave,
+                "mode": wave_kb["mode"],
+                "fraction_used": budget["fraction_used"]
+            })
 
-        # Run agents
         start_time = datetime.now()
 
-        if IMAGE_GENERATION_ENABLED and self.gemini_api_key:
-            # Run both relationships and image generation
-            relationships_task = relationships_agent(self.kb, self.anthropic_api_key)
-            image_task = image_generation_agent(self.kb, self.gemini_api_key, self.storage)
-
-            relationships_result, image_result = await asyncio.gather(relationships_task, image_task)
-        else:
-            # Run only relationships
-            relationships_result = await relationships_agent(self.kb, self.anthropic_api_key)
-            image_result = None
+        results = await asyncio.gather(*[
+            self._run_and_commit_agent(name, wave, wave_kb)
+            for name in agent_names
+        ])
 
         end_time = datetime.now()
         wave_time = (end_time - start_time).total_seconds()
 
-        # Unpack results
-        relationships_output, relationships_narrative = relationships_result
-
-        # Update KB
-        self.kb["relationships"] = relationships_output
-        self.kb["agent_statuses"]["relationships"] = {"status": "completed", "wave": 3}
-
-        # Create checkpoint for relationships
-        await self._create_checkpoint(
-            checkpoint_number=6,
-            agent_name="relationships",
-            wave=3,
-            output=relationships_output,
-            narrative=relationships_narrative,
-            tokens_used=1800,
-            agent_time=wave_time
-        )
-
-        # If image generation was enabled, process results and create checkpoint
-        if image_result:
-            image_output, image_narrative = image_result
-            self.kb["image_generation"] = image_output
-            self.kb["agent_statuses"]["image_generation"] = {"status": "completed", "wave": 3}
-            self.storage.save_character_kb(self.kb)
-
-            await self._create_checkpoint(
-                checkpoint_number=7,
-                agent_name="image_generation",
-                wave=3,
-                output=image_output,
-                narrative=image_narrative,
-                tokens_used=5160,
-                agent_time=wave_time / 2
-            )
-        else:
-            # Save KB even if no image generation
-            self.storage.save_character_kb(self.kb)
-
-        agents_completed = ["relationships"]
-        if IMAGE_GENERATION_ENABLED and self.gemini_api_key and image_result:
-            agents_completed.append("image_generation")
+        # Create checkpoints in order
+        agents_completed = []
+        agents_failed = []
+        for name, (result, error) in zip(agent_names, results):
+            if result is None:
+                agents_failed.append(name)
+                await self._create_failed_checkpoint(name, wave, error)
+            else:
+                output, narrative, run_info = result
+                agents_completed.append(name)
+                await self._create_checkpoint(
+                    checkpoint_number=AGENT_CHECKPOINTS[name],
+                    agent_name=name,
+                    wave=wave,
+                    output=output,
+                    narrative=narrative,
+                    run_info=run_info
+                )
+
+        wave_usage = await self._record_wave_time(wave, wave_time)
+
+        # Wave boundary: make the KB and metadata durable
+        await self.async_storage.flush(self.character_id)
 
         await self._send_update({
             "type": "wave_complete",
-            "wave": 3,
+            "wave": wave,
             "agents_completed": agents_completed,
-            "next_wave": "final"
+            "agents_failed": agents_failed,
+            "agents_skipped": skipped,
+            "usage": wave_usage,
+            "next_wave": next_wave
         })
+        await self._check_budget()
+
+    async def run_wave_1(self):
+        """Execute Wave 1: Foundation (Personality + Backstory)"""
+        await self._run_wave(1, ["personality", "backstory_motivation"], next_wave=2)
+
+    async def run_wave_2(self):
+        """Execute Wave 2: Expression (Voice + Physical + Story Arc)"""
+        await self._run_wave(2, ["voice_dialogue", "physical_description", "story_arc"], next_wave=3)
+
+    async def run_wave_3(self):
+        """Execute Wave 3: Social (Relationships + optional Image Generation)"""
+
+        # Check if image generation is enabled
+        IMAGE_GENERATION_ENABLED = os.getenv("IMAGE_GENERATION_ENABLED", "false").lower() == "true"
+
+        agents_list = ["relationships"]
+        if IMAGE_GENERATION_ENABLED and self.gemini_api_key:
+            agents_list.append("image_generation")
+
+        await self._run_wave(3, agents_list, next_wave="final")
 
     async def create_final_profile(self) -> FinalCharacterProfile:
         """Consolidate all outputs into final character profile"""
 
         character = self.kb["input_data"]["characters"][0]
-        metadata = self.storage.load_metadata(self.character_id)
+        metadata = await self.async_storage.load_metadata(self.character_id)
 
         # Create overview
         importance_value = 5  # Default
@@ -449,6 +749,14 @@ class CharacterOrchestrator:
             if not self.kb.get(field):
                 raise ValueError(f"Cannot create final profile: {field} data missing. Character development incomplete.")
 
+        # Development time from session creation to consolidation
+        development_minutes = 0.0
+        if metadata.get("created_at"):
+            started_at = datetime.fromisoformat(metadata["created_at"])
+            development_minutes = round((datetime.utcnow() - started_at).total_seconds() / 60, 2)
+
+        usage_ledger = metadata.get("usage", {})
+
         # Create final profile
         final_profile: FinalCharacterProfile = {
             "character_id": self.character_id,
@@ -465,15 +773,17 @@ class CharacterOrchestrator:
             "relationships": self.kb["relationships"].get("relationships", []) if self.kb.get("relationships") else [],  # FIX: Handle both nested and flat structure
             "metadata": {
                 "mode": self.kb["mode"],
-                "development_time_minutes": 0,  # Calculate if needed
+                "development_time_minutes": development_minutes,
                 "total_checkpoints": metadata.get("total_checkpoints", 7),
                 "regenerations": metadata.get("regenerations", 0),
-                "total_tokens": 12000 if self.kb.get("image_generation") else 10000
+                "total_tokens": total_tokens(usage_ledger.get("total")),
+                "usage": usage_ledger.get("total", empty_usage()),
+                "agent_time_seconds": usage_ledger.get("agent_time_seconds", 0.0)
             }
         }
 
         # Save final profile
-        self.storage.save_final_profile(self.character_id, final_profile)
+        await self.async_storage.save_final_profile(self.character_id, final_profile)
 
         # Determine final checkpoint number (7 without images, 8 with images)
         final_checkpoint_number = 8 if self.kb.get("image_generation") else 7
@@ -485,8 +795,7 @@ class CharacterOrchestrator:
             wave=4,
             output=final_profile,  # type: ignore
             narrative="Character development complete. All aspects consolidated into comprehensive profile.",
-            tokens_used=0,
-            agent_time=0.0
+            run_info=None
         )
 
         await self._send_update({
@@ -499,35 +808,45 @@ class CharacterOrchestrator:
 
     async def run_all_waves(self):
         """Execute all waves sequentially with approval gates"""
+        # Shared storyline digest (generated once per storyline, reused by every character)
+        if not self.kb.get("storyline_digest"):
+            budget = await self._check_budget()
+            await self._fail_on_exhausted_budget(budget)
+            digest, run_info = await ensure_storyline_digest(
+                self.kb["input_data"]["storyline"], self.anthropic_api_key, self.async_storage
+            )
+            if run_info:
+                # Charged to the character that made the call, even if it failed (others reuse it for free)
+                await self.async_storage.update_metadata(
+                    self.character_id,
+                    lambda metadata: record_agent_usage(metadata, "storyline_digest", 1, run_info)
+                )
+            if digest:
+                self.kb["storyline_digest"] = digest
+
         # Wave 1: Foundation
         await self.run_wave_1()
-        await self._send_update({
-            "type": "awaiting_approval",
-            "wave": 1,
-            "message": "Wave 1 (Foundation) complete. Awaiting approval to continue to Wave 2.",
-            "checkpoints": [1, 2]
-        })
-        await self.approval_events[1].wait()  # PAUSE HERE until approved
+        await self._wave_gate(
+            1,
+            "Wave 1 (Foundation) complete. Awaiting approval to continue to Wave 2.",
+            [1, 2]
+        )
 
         # Wave 2: Expression
         await self.run_wave_2()
-        await self._send_update({
-            "type": "awaiting_approval",
-            "wave": 2,
-            "message": "Wave 2 (Expression) complete. Awaiting approval to continue to Wave 3.",
-            "checkpoints": [3, 4, 5]
-        })
-        await self.approval_events[2].wait()  # PAUSE HERE until approved
+        await self._wave_gate(
+            2,
+            "Wave 2 (Expression) complete. Awaiting approval to continue to Wave 3.",
+            [3, 4, 5]
+        )
 
         # Wave 3: Social
         await self.run_wave_3()
-        await self._send_update({
-            "type": "awaiting_approval",
-            "wave": 3,
-            "message": "Wave 3 (Social) complete. Awaiting approval to create final profile.",
-            "checkpoints": [6, 7]
-        })
-        await self.approval_events[3].wait()  # PAUSE HERE until approved
+        await self._wave_gate(
+            3,
+            "Wave 3 (Social) complete. Awaiting approval to create final profile.",
+            [6, 7]
+        )
 
         # Final profile creation
         final_profile = await self.create_final_profile()
@@ -11,6 +11,8 @@ try:
 except ImportError:
     from typing_extensions import NotRequired  # Python < 3.11
 
+from providers.usage import TokenUsage
+
 
 # ============================================================================
 # INPUT SCHEMAS (from Entry Agent)
@@ -47,6 +49,29 @@ class EntryAgentOutput(TypedDict):
     storyline: StorylineInput
 
 
+class StorylineDigest(TypedDict):
+    """Compact, character-focused summary of a storyline (generated once)"""
+    text: str
+    model: str
+    created_at: str
+    usage: TokenUsage
+
+
+class StorylineDigestFailure(TypedDict):
+    """Last failed digest attempt (retried only after a cooldown)"""
+    failed_at: str
+    error: str
+
+
+class StorylineRecord(TypedDict):
+    """Storyline stored once and referenced by ID from every character's input and KB"""
+    storyline_id: str  # SHA-256 of the storyline's canonical JSON
+    storyline: StorylineInput
+    created_at: str
+    digest: Optional[StorylineDigest]
+    digest_failure: NotRequired[StorylineDigestFailure]
+
+
 # ============================================================================
 # AGENT OUTPUT SCHEMAS
 # ============================================================================
@@ -78,11 +103,17 @@ class InternalConflict(TypedDict):
     description: str
 
 
+class MotivationGoals(TypedDict):
+    """What the character consciously wants vs what they truly need"""
+    surface: str
+    deep: str
+
+
 class BackstoryOutput(TypedDict):
     """Output from Backstory & Motivation sub-agent"""
     timeline: List[TimelineEvent]
     formative_experiences: List[FormativeExperience]  # FIX: Changed from List[str]
-    goals: Dict[str, str]  # {"surface": "...", "deep": "..."}
+    goals: MotivationGoals
     internal_conflicts: List[InternalConflict]  # FIX: Changed from List[str]
 
 
@@ -161,6 +192,11 @@ class CheckpointMetadata(TypedDict):
     timestamp: str
     tokens_used: int
     agent_time_seconds: float
+    usage: NotRequired[TokenUsage]  # Provider-reported token breakdown
+    model: NotRequired[str]
+    error: NotRequired[str]  # Set on failed checkpoints
+    approved_by: NotRequired[str]  # "policy:<mode>" when auto-approved
+    output_repair: NotRequired[str]  # "local" or "model" if malformed output was repaired, "failed" if placeholders were used
 
 
 class CheckpointOutput(TypedDict):
@@ -173,7 +209,7 @@ class Checkpoint(TypedDict):
     """Complete checkpoint data"""
     checkpoint_number: int
     agent: str
-    status: Literal["in_progress", "awaiting_approval", "approved", "rejected"]
+    status: Literal["in_progress", "awaiting_approval", "approved", "rejected", "failed"]
     output: CheckpointOutput
     metadata: CheckpointMetadata
 
@@ -221,8 +257,10 @@ class FinalCharacterProfile(TypedDict):
 
 class AgentStatus(TypedDict):
     """Status of a single agent"""
-    status: Literal["pending", "in_progress", "completed", "failed"]
+    status: Literal["pending", "in_progress", "completed", "failed", "stale"]
     wave: int
+    input_hash: NotRequired[str]  # Hash of consumed KB fields at last run
+    mode: NotRequired[str]  # Effective mode if the budget downgraded it
 
 
 class CharacterKnowledgeBase(TypedDict):
@@ -245,6 +283,29 @@ class CharacterKnowledgeBase(TypedDict):
     current_checkpoint: int
     agent_statuses: Dict[str, AgentStatus]
 
+    # Filled in on load from the storyline record (never stored in the KB)
+    storyline_digest: NotRequired[str]
+
+
+class BudgetLimits(TypedDict):
+    """Spend ceilings for a character or project (None = unlimited)"""
+    max_tokens: Optional[int]
+    max_cost_usd: Optional[float]
+
+
+class BudgetStatus(TypedDict):
+    """Spend against the character and project budgets"""
+    character_id: str
+    tokens_used: int
+    cost_usd: float
+    limits: BudgetLimits
+    project_id: Optional[str]
+    project_tokens_used: int
+    project_cost_usd: float
+    project_limits: BudgetLimits
+    fraction_used: float  # Highest fraction across all configured limits
+    level: Literal["ok", "downgrade", "skip_optional", "exhausted"]
+
 
 # ============================================================================
 # API REQUEST/RESPONSE SCHEMAS
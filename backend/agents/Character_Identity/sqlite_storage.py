@@ -0,0 +1,755 @@
+"""
+SQLite storage backend for Character Development System
+
+Stores the same records as CharacterStorage (input, metadata, knowledge
+base, checkpoints, final profile) in a single SQLite database in WAL mode,
+with indexed lookups by character, status and project. Images stay on disk
+under images_path so they can still be served as static files.
+
+Select with CHARACTER_STORAGE_BACKEND=sqlite (see storage.create_storage).
+
+Checkpoint versions (see history.py) live in checkpoint_history and are
+appended in the same transaction as the checkpoint they record.
+
+Storylines are stored once in the storylines table; character inputs and
+knowledge bases refer to them by ID (see storage.py).
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from .schemas import (
+    EntryAgentOutput,
+    Checkpoint,
+    FinalCharacterProfile,
+    CharacterKnowledgeBase,
+    StorylineDigest,
+    StorylineDigestFailure,
+    StorylineInput,
+    StorylineRecord
+)
+from .catalog import CATALOG_COLUMNS, ledger_spend
+from .history import compact_records, next_version, reconstruct, version_summary
+from .storage import (
+    input_with_storyline_ref,
+    kb_with_storyline_ref,
+    new_character_records,
+    new_storyline_record,
+    resolve_kb_storyline,
+    resolve_storyline_ref
+)
+
+
+CHARACTER_STORAGE_SQLITE_PATH = os.getenv("CHARACTER_STORAGE_SQLITE_PATH", "./backend/character_data.db")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS characters (
+    character_id   TEXT PRIMARY KEY,
+    project_id     TEXT,
+    status         TEXT NOT NULL,
+    created_at     TEXT NOT NULL,
+    updated_at     TEXT NOT NULL,
+    input          TEXT NOT NULL,
+    metadata       TEXT NOT NULL,
+    knowledge_base TEXT NOT NULL,
+    final_profile  TEXT,
+    tokens_used    INTEGER NOT NULL DEFAULT 0,
+    cost_usd       REAL NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_characters_project ON characters(project_id);
+CREATE INDEX IF NOT EXISTS idx_characters_status ON characters(status);
+CREATE INDEX IF NOT EXISTS idx_characters_updated ON characters(updated_at);
+
+CREATE TABLE IF NOT EXISTS checkpoints (
+    character_id      TEXT NOT NULL REFERENCES characters(character_id) ON DELETE CASCADE,
+    checkpoint_number INTEGER NOT NULL,
+    agent             TEXT NOT NULL,
+    status            TEXT NOT NULL,
+    updated_at        TEXT NOT NULL,
+    body              TEXT NOT NULL,
+    PRIMARY KEY (character_id, checkpoint_number)
+);
+CREATE INDEX IF NOT EXISTS idx_checkpoints_status ON checkpoints(status);
+
+CREATE TABLE IF NOT EXISTS checkpoint_history (
+    character_id      TEXT NOT NULL REFERENCES characters(character_id) ON DELETE CASCADE,
+    checkpoint_number INTEGER NOT NULL,
+    version           INTEGER NOT NULL,
+    kind              TEXT NOT NULL,
+    created_at        TEXT NOT NULL,
+    record            TEXT NOT NULL,
+    PRIMARY KEY (character_id, checkpoint_number, version)
+);
+
+CREATE TABLE IF NOT EXISTS storylines (
+    storyline_id TEXT PRIMARY KEY,
+    created_at   TEXT NOT NULL,
+    record       TEXT NOT NULL
+);
+"""
+
+
+def _dumps(data: Any) -> str:
+    return json.dumps(data, separators=(",", ":"))
+
+
+class SQLiteCharacterStorage:
+    """Manages SQLite storage for character development data"""
+
+    def __init__(
+        self,
+        db_path: str = CHARACTER_STORAGE_SQLITE_PATH,
+        images_path: str = "./backend/character_data"
+    ):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.base_path = Path(images_path)
+        self.base_path.mkdir(parents=True, exist_ok=True)
+
+        # sqlite3 connections must not be shared across threads
+        self._local = threading.local()
+
+        # executescript() manages its own transaction
+        self._connect().executescript(SCHEMA)
+        self._add_spend_columns()
+
+    def _add_spend_columns(self) -> None:
+        """Add and backfill the spend columns on databases created before them"""
+        existing = {row[1] for row in self._connect().execute("PRAGMA table_info(characters)")}
+        if "tokens_used" in existing:
+            return
+        with self._transaction() as conn:
+            conn.execute("ALTER TABLE characters ADD COLUMN tokens_used INTEGER NOT NULL DEFAULT 0")
+            conn.execute("ALTER TABLE characters ADD COLUMN cost_usd REAL NOT NULL DEFAULT 0")
+            rows = conn.execute("SELECT character_id, metadata FROM characters").fetchall()
+            for character_id, metadata in rows:
+                tokens_used, cost_usd = ledger_spend(json.loads(metadata))
+                conn.execute(
+                    "UPDATE characters SET tokens_used = ?, cost_usd = ? WHERE character_id = ?",
+                    (tokens_used, cost_usd, character_id)
+                )
+
+    def _connect(self) -> sqlite3.Connection:
+        """Get this thread's connection"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA foreign_keys=ON")
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def _transaction(self):
+        """Run statements in one write transaction"""
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    def _fetch_column(self, character_id: str, column: str) -> Optional[str]:
+        row = self._connect().execute(
+            f"SELECT {column} FROM characters WHERE character_id = ?",
+            (character_id,)
+        ).fetchone()
+        if row is None:
+            raise FileNotFoundError(f"Character {character_id} not found")
+        return row[0]
+
+    def _update_metadata(self, conn: sqlite3.Connection, character_id: str, metadata: Dict) -> None:
+        tokens_used, cost_usd = ledger_spend(metadata)
+        cursor = conn.execute(
+            """
+            UPDATE characters SET metadata = ?, status = ?, project_id = ?, updated_at = ?, tokens_used = ?, cost_usd = ?
+            WHERE character_id = ?
+            """,
+            (
+                _dumps(metadata),
+                metadata.get("status", "in_progress"),
+                metadata.get("project_id"),
+                datetime.utcnow().isoformat(),
+                tokens_used,
+                cost_usd,
+                character_id
+            )
+        )
+        if cursor.rowcount == 0:
+            raise FileNotFoundError(f"Character {character_id} metadata not found")
+
+    def _history_records(
+        self,
+        conn: sqlite3.Connection,
+        character_id: str,
+        checkpoint_number: int,
+        version: Optional[int] = None
+    ) -> List[Dict]:
+        """History records needed to rebuild a version: its last snapshot onwards"""
+        version = version if version is not None else 2 ** 62
+        rows = conn.execute(
+            """
+            SELECT record FROM checkpoint_history
+            WHERE character_id = ? AND checkpoint_number = ? AND version <= ? AND version >= (
+                SELECT COALESCE(MAX(version), 0) FROM checkpoint_history
+                WHERE character_id = ? AND checkpoint_number = ? AND version <= ? AND kind = 'snapshot'
+            )
+            ORDER BY version
+            """,
+            (character_id, checkpoint_number, version, character_id, checkpoint_number, version)
+        ).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def _append_history(self, conn: sqlite3.Connection, character_id: str, checkpoint: Checkpoint) -> None:
+        """Record the checkpoint as a new version if its content changed"""
+        number = checkpoint["checkpoint_number"]
+        records = self._history_records(conn, character_id, number)
+        head = (records[-1]["version"], reconstruct(records)) if records else None
+
+        pending = []
+        if head is None:
+            # Checkpoint saved before history existed: keep it as version 1
+            row = conn.execute(
+                "SELECT body FROM checkpoints WHERE character_id = ? AND checkpoint_number = ?",
+                (character_id, number)
+            ).fetchone()
+            if row is not None:
+                existing = json.loads(row[0])
+                pending.append(next_version(None, existing))
+                head = (1, existing)
+
+        record = next_version(head, checkpoint)
+        if record is not None:
+            pending.append(record)
+
+        conn.executemany(
+            """
+            INSERT INTO checkpoint_history (character_id, checkpoint_number, version, kind, created_at, record)
+            VALUES (?, ?, ?, ?, ?, ?)
+            """,
+            [
+                (
+                    character_id,
+                    number,
+                    entry["version"],
+                    "snapshot" if "snapshot" in entry else "diff",
+                    entry["timestamp"],
+                    _dumps(entry)
+                )
+                for entry in pending
+            ]
+        )
+
+    def _upsert_checkpoint(self, conn: sqlite3.Connection, character_id: str, checkpoint: Checkpoint) -> None:
+        self._append_history(conn, character_id, checkpoint)
+        conn.execute(
+            """
+            INSERT INTO checkpoints (character_id, checkpoint_number, agent, status, updated_at, body)
+            VALUES (?, ?, ?, ?, ?, ?)
+            ON CONFLICT (character_id, checkpoint_number) DO UPDATE SET
+                agent = excluded.agent,
+                status = excluded.status,
+                updated_at = excluded.updated_at,
+                body = excluded.body
+            """,
+            (
+                character_id,
+                checkpoint["checkpoint_number"],
+                checkpoint["agent"],
+                checkpoint["status"],
+                datetime.utcnow().isoformat(),
+                _dumps(checkpoint)
+            )
+        )
+
+    # ========================================================================
+    # CHARACTER CRUD OPERATIONS
+    # ========================================================================
+
+    def create_character(
+        self,
+        input_data: EntryAgentOutput,
+        mode: str = "balanced",
+        project_id: Optional[str] = None,
+        approval_policy: str = "manual",
+        approval_timeout_seconds: Optional[float] = None,
+        budget: Optional[Dict] = None
+    ) -> str:
+        """
+        Create a new character development session
+
+        Args:
+            input_data: Output from Entry Agent
+            mode: Development mode (fast/balanced/deep)
+            project_id: Optional project the character belongs to
+            approval_policy: Checkpoint approval policy (see orchestrator.APPROVAL_POLICIES)
+            approval_timeout_seconds: Wait before auto-approving under auto_after_timeout
+            budget: Character/project spend limits (see budget.make_budget)
+
+        Returns:
+            character_id: UUID of created character
+        """
+        character_id = str(uuid.uuid4())
+        metadata, kb = new_character_records(
+            character_id,
+            input_data,
+            mode,
+            project_id=project_id,
+            approval_policy=approval_policy,
+            approval_timeout_seconds=approval_timeout_seconds,
+            budget=budget
+        )
+        self.import_character(character_id, input_data, metadata, kb)
+        return character_id
+
+    def import_character(
+        self,
+        character_id: str,
+        input_data: EntryAgentOutput,
+        metadata: Dict,
+        kb: CharacterKnowledgeBase,
+        checkpoints: Optional[Dict[int, Checkpoint]] = None,
+        final_profile: Optional[FinalCharacterProfile] = None
+    ) -> None:
+        """
+        Insert (or replace) a complete character in one transaction
+
+        Used by create_character and by the directory-layout migration.
+        """
+        now = datetime.utcnow().isoformat()
+        input_data, storyline = input_with_storyline_ref(input_data)
+        kb, kb_storyline = kb_with_storyline_ref(kb)
+        with self._transaction() as conn:
+            for shared in (storyline, kb_storyline):
+                if shared is not None:
+                    self._insert_storyline(conn, shared)
+            conn.execute("DELETE FROM characters WHERE character_id = ?", (character_id,))
+            conn.execute(
+                """
+                INSERT INTO characters
+                    (character_id, project_id, status, created_at, updated_at, input, metadata, knowledge_base,
+                     final_profile, tokens_used, cost_usd)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                (
+                    character_id,
+                    metadata.get("project_id"),
+                    metadata.get("status", "in_progress"),
+                    metadata.get("created_at", now),
+                    now,
+                    _dumps(input_data),
+                    _dumps(metadata),
+                    _dumps(kb),
+                    _dumps(final_profile) if final_profile is not None else None,
+                    *ledger_spend(metadata)
+                )
+            )
+            for checkpoint in (checkpoints or {}).values():
+                self._upsert_checkpoint(conn, character_id, checkpoint)
+
+    def load_input(self, character_id: str) -> EntryAgentOutput:
+        """Load the Entry Agent output the character was created from"""
+        input_data = json.loads(self._fetch_column(character_id, "input"))
+        resolve_storyline_ref(input_data, self.load_storyline)
+        return input_data
+
+    def load_character_kb(self, character_id: str) -> CharacterKnowledgeBase:
+        """Load character knowledge base"""
+        kb = json.loads(self._fetch_column(character_id, "knowledge_base"))
+        return resolve_kb_storyline(kb, self.load_storyline)
+
+    def save_character_kb(self, kb: CharacterKnowledgeBase) -> None:
+        """Save character knowledge base"""
+        kb, storyline = kb_with_storyline_ref(kb)
+        with self._transaction() as conn:
+            if storyline is not None:
+                self._insert_storyline(conn, storyline)
+            cursor = conn.execute(
+                "UPDATE characters SET knowledge_base = ?, updated_at = ? WHERE character_id = ?",
+                (_dumps(kb), datetime.utcnow().isoformat(), kb["character_id"])
+            )
+            if cursor.rowcount == 0:
+                raise FileNotFoundError(f"Character {kb['character_id']} not found")
+
+    def load_metadata(self, character_id: str) -> Dict:
+        """Load character metadata"""
+        return json.loads(self._fetch_column(character_id, "metadata"))
+
+    def save_metadata(self, character_id: str, metadata: Dict) -> None:
+        """Save character metadata"""
+        with self._transaction() as conn:
+            self._update_metadata(conn, character_id, metadata)
+
+    def update_metadata(self, character_id: str, update: Callable[[Dict], Any]) -> Dict:
+        """Load, modify and save metadata in a single transaction"""
+        with self._transaction() as conn:
+            metadata = self.load_metadata(character_id)
+            update(metadata)
+            self._update_metadata(conn, character_id, metadata)
+        return metadata
+
+    # ========================================================================
+    # STORYLINES
+    # ========================================================================
+
+    def _insert_storyline(self, conn: sqlite3.Connection, storyline: StorylineInput) -> str:
+        record = new_storyline_record(storyline)
+        conn.execute(
+            "INSERT OR IGNORE INTO storylines (storyline_id, created_at, record) VALUES (?, ?, ?)",
+            (record["storyline_id"], record["created_at"], _dumps(record))
+        )
+        return record["storyline_id"]
+
+    def save_storyline(self, storyline: StorylineInput) -> str:
+        """
+        Store a storyline once (no-op if already stored)
+
+        Returns:
+            storyline_id: Content address of the storyline
+        """
+        with self._transaction() as conn:
+            return self._insert_storyline(conn, storyline)
+
+    def load_storyline(self, storyline_id: str) -> StorylineRecord:
+        """Load a storyline record (storyline and digest)"""
+        row = self._connect().execute(
+            "SELECT record FROM storylines WHERE storyline_id = ?",
+            (storyline_id,)
+        ).fetchone()
+        if row is None:
+            raise FileNotFoundError(f"Storyline {storyline_id} not found")
+        return json.loads(row[0])
+
+    def save_storyline_digest(self, storyline_id: str, digest: StorylineDigest) -> None:
+        """Attach a generated digest to a storyline record"""
+        with self._transaction() as conn:
+            record = self.load_storyline(storyline_id)
+            record["digest"] = digest
+            record.pop("digest_failure", None)
+            conn.execute("UPDATE storylines SET record = ? WHERE storyline_id = ?", (_dumps(record), storyline_id))
+
+    def save_storyline_digest_failure(self, storyline_id: str, failure: StorylineDigestFailure) -> None:
+        """Record a failed digest attempt on a storyline record"""
+        with self._transaction() as conn:
+            record = self.load_storyline(storyline_id)
+            record["digest_failure"] = failure
+            conn.execute("UPDATE storylines SET record = ? WHERE storyline_id = ?", (_dumps(record), storyline_id))
+
+    # ========================================================================
+    # CHECKPOINT OPERATIONS
+    # ========================================================================
+
+    def save_checkpoint(self, character_id: str, checkpoint: Checkpoint) -> None:
+        """Save a checkpoint"""
+        with self._transaction() as conn:
+            self._upsert_checkpoint(conn, character_id, checkpoint)
+
+    def save_checkpoint_with_metadata(
+        self,
+        character_id: str,
+        checkpoint: Checkpoint,
+        update: Callable[[Dict], Any]
+    ) -> Dict:
+        """Save a checkpoint and its metadata update in a single transaction"""
+        with self._transaction() as conn:
+            metadata = self.load_metadata(character_id)
+            update(metadata)
+            self._update_metadata(conn, character_id, metadata)
+            self._upsert_checkpoint(conn, character_id, checkpoint)
+        return metadata
+
+    def load_checkpoint(self, character_id: str, checkpoint_number: int) -> Optional[Checkpoint]:
+        """Load a specific checkpoint"""
+        row = self._connect().execute(
+            "SELECT body FROM checkpoints WHERE character_id = ? AND checkpoint_number = ?",
+            (character_id, checkpoint_number)
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def load_all_checkpoints(self, character_id: str) -> Dict[int, Checkpoint]:
+        """Load all checkpoints for a character"""
+        rows = self._connect().execute(
+            "SELECT checkpoint_number, body FROM checkpoints WHERE character_id = ? ORDER BY checkpoint_number",
+            (character_id,)
+        ).fetchall()
+        return {number: json.loads(body) for number, body in rows}
+
+    def list_checkpoints(self, character_id: str) -> List[Dict]:
+        """List checkpoint summaries without reading checkpoint bodies"""
+        rows = self._connect().execute(
+            """
+            SELECT checkpoint_number, agent, status, length(body), updated_at
+            FROM checkpoints WHERE character_id = ? ORDER BY checkpoint_number
+            """,
+            (character_id,)
+        ).fetchall()
+        return [
+            {"checkpoint_number": number, "agent": agent, "status": status, "size": size, "updated_at": updated_at}
+            for number, agent, status, size, updated_at in rows
+        ]
+
+    def list_checkpoint_versions(self, character_id: str, checkpoint_number: int) -> List[Dict]:
+        """List a checkpoint's versions, oldest first (no content)"""
+        rows = self._connect().execute(
+            """
+            SELECT record FROM checkpoint_history
+            WHERE character_id = ? AND checkpoint_number = ? ORDER BY version
+            """,
+            (character_id, checkpoint_number)
+        ).fetchall()
+        return [version_summary(json.loads(row[0])) for row in rows]
+
+    def load_checkpoint_version(
+        self,
+        character_id: str,
+        checkpoint_number: int,
+        version: int
+    ) -> Optional[Checkpoint]:
+        """Rebuild a checkpoint as it was at a given version (None if no such version)"""
+        records = self._history_records(self._connect(), character_id, checkpoint_number, version)
+        if not records or records[-1]["version"] != version:
+            return None
+        return reconstruct(records)
+
+    def load_checkpoint_history(self, character_id: str, checkpoint_number: int) -> List[Dict]:
+        """Raw history records of a checkpoint (see history.py), oldest first"""
+        rows = self._connect().execute(
+            """
+            SELECT record FROM checkpoint_history
+            WHERE character_id = ? AND checkpoint_number = ? ORDER BY version
+            """,
+            (character_id, checkpoint_number)
+        ).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def compact_checkpoint_history(self, character_id: str, checkpoint_number: int, keep: int) -> int:
+        """
+        Drop all but the newest keep versions of a checkpoint
+
+        Returns:
+            Bytes of history removed (the database file shrinks on VACUUM)
+        """
+        with self._transaction() as conn:
+            rows = conn.execute(
+                """
+                SELECT record FROM checkpoint_history
+                WHERE character_id = ? AND checkpoint_number = ? ORDER BY version
+                """,
+                (character_id, checkpoint_number)
+            ).fetchall()
+            records = [json.loads(row[0]) for row in rows]
+            compacted = compact_records(records, keep)
+            if compacted is records:
+                return 0
+
+            first = compacted[0]
+            conn.execute(
+                "DELETE FROM checkpoint_history WHERE character_id = ? AND checkpoint_number = ? AND version <= ?",
+                (character_id, checkpoint_number, first["version"])
+            )
+            conn.execute(
+                """
+                INSERT INTO checkpoint_history (character_id, checkpoint_number, version, kind, created_at, record)
+                VALUES (?, ?, ?, 'snapshot', ?, ?)
+                """,
+                (character_id, checkpoint_number, first["version"], first["timestamp"], _dumps(first))
+            )
+        return sum(len(row[0]) for row in rows) - sum(len(_dumps(record)) for record in compacted)
+
+    def replace_checkpoint_history(self, character_id: str, checkpoint_number: int, records: List[Dict]) -> None:
+        """Replace a checkpoint's history stream (archive import)"""
+        with self._transaction() as conn:
+            conn.execute(
+                "DELETE FROM checkpoint_history WHERE character_id = ? AND checkpoint_number = ?",
+                (character_id, checkpoint_number)
+            )
+            conn.executemany(
+                """
+                INSERT INTO checkpoint_history (character_id, checkpoint_number, version, kind, created_at, record)
+                VALUES (?, ?, ?, ?, ?, ?)
+                """,
+                [
+                    (
+                        character_id,
+                        checkpoint_number,
+                        record["version"],
+                        "snapshot" if "snapshot" in record else "diff",
+                        record["timestamp"],
+                        _dumps(record)
+                    )
+                    for record in records
+                ]
+            )
+
+    # ========================================================================
+    # IMAGE OPERATIONS
+    # ========================================================================
+
+    def save_image(self, character_id: str, image_type: str, image_data: bytes) -> str:
+        """
+        Save a generated image (on disk, next to the database)
+
+        Args:
+            character_id: Character UUID
+            image_type: Type of image (portrait, full_body, action, expression)
+            image_data: Raw image bytes
+
+        Returns:
+            Relative path to saved image
+        """
+        image_path = self.get_image_path(character_id, image_type)
+        image_path.parent.mkdir(parents=True, exist_ok=True)
+
+        with open(image_path, 'wb') as f:
+            f.write(image_data)
+
+        # Return relative path for API responses
+        return f"/character_data/{character_id}/images/{image_type}.png"
+
+    def get_image_path(self, character_id: str, image_type: str) -> Path:
+        """Get absolute path to an image"""
+        return self.base_path / character_id / "images" / f"{image_type}.png"
+
+    # ========================================================================
+    # FINAL OUTPUT
+    # ========================================================================
+
+    def save_final_profile(self, character_id: str, profile: FinalCharacterProfile) -> None:
+        """Save final character profile and mark the character completed"""
+        with self._transaction() as conn:
+            metadata = json.loads(self._fetch_column(character_id, "metadata"))
+            metadata["status"] = "completed"
+            metadata["completed_at"] = datetime.utcnow().isoformat()
+            self._update_metadata(conn, character_id, metadata)
+            conn.execute(
+                "UPDATE characters SET final_profile = ? WHERE character_id = ?",
+                (_dumps(profile), character_id)
+            )
+
+    def load_final_profile(self, character_id: str) -> Optional[FinalCharacterProfile]:
+        """Load final character profile"""
+        try:
+            profile = self._fetch_column(character_id, "final_profile")
+        except FileNotFoundError:
+            return None
+        return json.loads(profile) if profile else None
+
+    # ========================================================================
+    # UTILITY METHODS
+    # ========================================================================
+
+    def character_exists(self, character_id: str) -> bool:
+        """Check if character exists"""
+        row = self._connect().execute(
+            "SELECT 1 FROM characters WHERE character_id = ?",
+            (character_id,)
+        ).fetchone()
+        return row is not None
+
+    def delete_character(self, character_id: str) -> int:
+        """
+        Delete all character data (use with caution)
+
+        Returns:
+            Bytes of records and images removed (the database file shrinks on VACUUM)
+
+        Raises:
+            ValueError: If the ID would resolve outside the store
+        """
+        import shutil
+        images_dir = self.base_path / character_id
+        base = self.base_path.resolve()
+        if images_dir.resolve() == base or not images_dir.resolve().is_relative_to(base):
+            raise ValueError(f"Invalid character ID: {character_id!r}")
+        with self._transaction() as conn:
+            freed = sum(
+                conn.execute(sql, (character_id,)).fetchone()[0] or 0
+                for sql in (
+                    """
+                    SELECT length(input) + length(metadata) + length(knowledge_base) + COALESCE(length(final_profile), 0)
+                    FROM characters WHERE character_id = ?
+                    """,
+                    "SELECT SUM(length(body)) FROM checkpoints WHERE character_id = ?",
+                    "SELECT SUM(length(record)) FROM checkpoint_history WHERE character_id = ?",
+                )
+            )
+            conn.execute("DELETE FROM characters WHERE character_id = ?", (character_id,))
+        if images_dir.exists():
+            freed += sum(path.stat().st_size for path in images_dir.rglob("*") if path.is_file())
+            shutil.rmtree(images_dir)
+        return freed
+
+    @staticmethod
+    def _where(project_id: Optional[str], status: Optional[str]):
+        clauses, params = [], []
+        if project_id is not None:
+            clauses.append("project_id = ?")
+            params.append(project_id)
+        if status is not None:
+            clauses.append("status = ?")
+            params.append(status)
+        return (" WHERE " + " AND ".join(clauses) if clauses else ""), params
+
+    def list_characters(self, project_id: Optional[str] = None, status: Optional[str] = None) -> list[str]:
+        """List character IDs, optionally filtered by project and/or status (indexed)"""
+        where, params = self._where(project_id, status)
+        query = f"SELECT character_id FROM characters{where} ORDER BY created_at"
+        return [row[0] for row in self._connect().execute(query, params).fetchall()]
+
+    def project_spend(self, project_id: str, exclude_character_id: Optional[str] = None) -> Tuple[int, float]:
+        """Measured (tokens, cost_usd) of a project's characters (indexed lookup)"""
+        row = self._connect().execute(
+            """
+            SELECT COALESCE(SUM(tokens_used), 0), COALESCE(SUM(cost_usd), 0.0)
+            FROM characters WHERE project_id = ? AND character_id IS NOT ?
+            """,
+            (project_id, exclude_character_id)
+        ).fetchone()
+        return row[0], row[1]
+
+    def latest_character(self, project_id: Optional[str] = None, status: Optional[str] = None) -> Optional[str]:
+        """Most recently updated character matching the filters (indexed)"""
+        entries = self.list_catalog(project_id=project_id, status=status, limit=1)
+        return entries[0]["character_id"] if entries else None
+
+    def list_catalog(
+        self,
+        project_id: Optional[str] = None,
+        status: Optional[str] = None,
+        limit: Optional[int] = None
+    ) -> List[Dict]:
+        """Character summaries in the same shape as CharacterCatalog.entries()"""
+        where, params = self._where(project_id, status)
+        query = f"""
+            SELECT character_id, json_extract(input, '$.characters[0].name'), project_id, status,
+                   created_at, updated_at,
+                   json_extract(metadata, '$.completed_checkpoints'),
+                   json_extract(metadata, '$.total_checkpoints'),
+                   json_extract(metadata, '$.completed_at')
+            FROM characters{where} ORDER BY updated_at DESC
+        """
+        if limit is not None:
+            query += " LIMIT ?"
+            params.append(limit)
+        rows = self._connect().execute(query, params).fetchall()
+        return [dict(zip(CATALOG_COLUMNS, row)) for row in rows]
+
+    def flush(self, character_id: Optional[str] = None) -> None:
+        """Writes are committed immediately; nothing to flush"""
+
+    def invalidate_cache(self, character_id: Optional[str] = None) -> None:
+        """No in-process cache; reads are indexed queries"""
+
+    def cache_stats(self) -> Dict[str, Any]:
+        """Backend info for monitoring"""
+        return {"backend": "sqlite", "db_path": str(self.db_path)}
@@ -2,12 +2,57 @@
 Storage layer for Character Development System
 
 Handles JSON persistence of character data, checkpoints, and images.
+
+All JSON files are written atomically (temp file + rename), so a crash
+mid-write leaves the previous version intact. Knowledge base and metadata
+writes are coalesced: repeated saves of the same character within
+STORAGE_WRITE_COALESCE_MS are held in memory (reads see them immediately)
+and only the latest version is written. flush() is the durability barrier.
+
+Reads go through a bounded in-process LRU cache keyed by character and
+artifact. Entries are refreshed on every write and re-validated against the
+file's mtime/size, so edits made outside this process are picked up.
+
+STORAGE_FORMAT selects the on-disk encoding: pretty (indented JSON, the
+original layout), compact, gzip or zstd. Reads detect the encoding from the
+file itself, so formats can be mixed. In every format except pretty,
+checkpoints store {"$ref": "kb:<agent>"} / {"$ref": "final_profile"}
+instead of repeating output already held in the knowledge base or final
+profile; refs are resolved on read.
+
+Each character's checkpoints/manifest.json indexes its checkpoints (number,
+agent, status, version, file, size, sha256), so lookups and status listings
+never scan the directory or open checkpoint bodies.
+
+Character directories are sharded by UUID prefix (<base>/<id[:2]>/<id>/)
+so no directory grows past a few hundred entries, and catalog.db (see
+catalog.py) indexes every character for list/filter/latest queries.
+Stores written with the old flat layout (<base>/<id>/) keep working;
+migrate_layout.py moves them into shards.
+
+Every checkpoint save whose content changed appends an immutable version
+to history/<NN>.jsonl (diffs with periodic snapshots, see history.py), so
+any earlier output can be listed, fetched or rolled back to.
+
+Storylines are stored once under storylines/<storyline_id>.json, where the
+ID is a SHA-256 of the storyline. A character's input.json and KB hold
+{"$ref": "storyline:<id>"} instead of a copy, so a batch of characters
+sharing a storyline stores it a single time. Loads resolve the ref. KB
+loads also attach the storyline's digest, if one has been generated (see
+subagents/storyline_digest.py).
 """
 
+import atexit
+import gzip
+import hashlib
 import json
 import os
+import pickle
+import tempfile
+import threading
+from collections import OrderedDict
 from pathlib import Path
-from typing import Dict, Optional
+from typing import Any, Callable, Dict, List, Optional, Tuple
 from datetime import datetime
 import uuid
 
@@ -15,186 +60,1132 @@ from .schemas import (
     EntryAgentOutput,
     Checkpoint,
     FinalCharacterProfile,
-    CharacterKnowledgeBase
+    CharacterKnowledgeBase,
+    StorylineDigest,
+    StorylineDigestFailure,
+    StorylineInput,
+    StorylineRecord
 )
+from .dependencies import AGENT_CHECKPOINTS
+from .catalog import CharacterCatalog
+from .history import compact_records, next_version, reconstruct, version_summary
+
+try:
+    import zstandard
+    ZSTD_AVAILABLE = True
+except ImportError:
+    ZSTD_AVAILABLE = False
+
+
+# Window for coalescing KB/metadata writes (0 = write through)
+STORAGE_WRITE_COALESCE_SECONDS = float(os.getenv("STORAGE_WRITE_COALESCE_MS", "250")) / 1000
+
+# Max artifacts (KBs, metadata, checkpoints, profiles) kept in the read cache
+STORAGE_CACHE_SIZE = int(os.getenv("STORAGE_CACHE_SIZE", "512"))
+
+# "json" (directory per character) or "sqlite" (see sqlite_storage.py)
+CHARACTER_STORAGE_BACKEND = os.getenv("CHARACTER_STORAGE_BACKEND", "json")
+
+# On-disk encoding of JSON artifacts
+STORAGE_FORMATS = ["pretty", "compact", "gzip", "zstd"]
+STORAGE_FORMAT = os.getenv("STORAGE_FORMAT", "pretty")
+
+GZIP_MAGIC = b"\x1f\x8b"
+ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+
+# Marker replacing checkpoint output that duplicates the KB or final profile
+REF_KEY = "$ref"
+
+CHECKPOINT_MANIFEST = "manifest.json"
+MANIFEST_VERSION = 1
+
+# Directory layout: "sharded" (<base>/<id[:2]>/<id>) or "flat" (<base>/<id>)
+STORAGE_LAYOUTS = ["sharded", "flat"]
+STORAGE_LAYOUT = os.getenv("STORAGE_LAYOUT", "sharded")
+SHARD_PREFIX_LENGTH = 2
+
+CATALOG_FILE = "catalog.db"
+
+# Shared storyline records (see storyline_id())
+STORYLINES_DIR = "storylines"
+STORYLINE_REF_PREFIX = "storyline:"
+
+
+def encode_json(data: Any, storage_format: str = "pretty") -> bytes:
+    """
+    Serialize data in one of STORAGE_FORMATS
+
+    Args:
+        data: JSON-serializable data
+        storage_format: pretty, compact, gzip or zstd
+
+    Returns:
+        Encoded bytes
+    """
+    if storage_format == "pretty":
+        return json.dumps(data, indent=2).encode("utf-8")
+
+    raw = json.dumps(data, separators=(",", ":")).encode("utf-8")
+    if storage_format == "compact":
+        return raw
+    if storage_format == "gzip":
+        return gzip.compress(raw, compresslevel=6, mtime=0)
+    if storage_format == "zstd":
+        return zstandard.ZstdCompressor(level=6).compress(raw)
+    raise ValueError(f"Unknown storage format: {storage_format}. Valid formats: {STORAGE_FORMATS}")
+
+
+def decode_json(raw: bytes) -> Any:
+    """Parse bytes written by encode_json(), detecting compression from the magic bytes"""
+    if raw.startswith(GZIP_MAGIC):
+        raw = gzip.decompress(raw)
+    elif raw.startswith(ZSTD_MAGIC):
+        if not ZSTD_AVAILABLE:
+            raise RuntimeError("File is zstd-compressed but the zstandard package is not installed")
+        raw = zstandard.ZstdDecompressor().decompress(raw)
+    return json.loads(raw)
+
+
+def detect_format(raw: bytes) -> str:
+    """Storage format an encoded artifact was written in"""
+    if raw.startswith(GZIP_MAGIC):
+        return "gzip"
+    if raw.startswith(ZSTD_MAGIC):
+        return "zstd"
+    return "pretty" if raw.startswith(b"{\n") or raw.startswith(b"[\n") else "compact"
+
+
+def is_character_dir(path: Path) -> bool:
+    """Whether a directory holds a character (stray directories such as backups have no metadata.json)"""
+    return path.is_dir() and (path / "metadata.json").is_file()
+
+
+def read_json_file(path: Path) -> Any:
+    """Read a JSON artifact in any supported format"""
+    with open(path, 'rb') as f:
+        return decode_json(f.read())
+
+
+def _freeze(data: Any) -> bytes:
+    """Snapshot JSON data so later mutation by callers cannot leak in"""
+    return pickle.dumps(data, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def _thaw(blob: bytes) -> Any:
+    """Fresh, independently mutable copy of a snapshot (much cheaper than re-parsing JSON)"""
+    return pickle.loads(blob)
+
+
+def atomic_write_json(path: Path, data: Any, storage_format: str = "pretty") -> bytes:
+    """
+    Write JSON to a temp file in the same directory, fsync it and rename it into place
+
+    Args:
+        path: Destination file
+        data: JSON-serializable data
+        storage_format: Encoding (see encode_json)
+
+    Returns:
+        The bytes written
+    """
+    encoded = encode_json(data, storage_format)
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(encoded)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+    return encoded
+
+
+def new_character_records(
+    character_id: str,
+    input_data: EntryAgentOutput,
+    mode: str = "balanced",
+    project_id: Optional[str] = None,
+    approval_policy: str = "manual",
+    approval_timeout_seconds: Optional[float] = None,
+    budget: Optional[Dict] = None
+) -> Tuple[Dict, CharacterKnowledgeBase]:
+    """
+    Build the initial metadata and knowledge base for a new character
+
+    Shared by every storage backend so that all of them start characters
+    in the same state.
+
+    Returns:
+        Tuple of (metadata, knowledge_base)
+    """
+    # Initialize metadata
+    # Determine total checkpoints based on image generation setting
+    IMAGE_GENERATION_ENABLED = os.getenv("IMAGE_GENERATION_ENABLED", "false").lower() == "true"
+    total_checkpoints = 8 if IMAGE_GENERATION_ENABLED else 7
+
+    metadata = {
+        "character_id": character_id,
+        "created_at": datetime.utcnow().isoformat(),
+        "status": "in_progress",
+        "mode": mode,
+        "project_id": project_id,
+        "approval_policy": {
+            "mode": approval_policy,
+            "timeout_seconds": approval_timeout_seconds
+        },
+        "current_wave": 1,
+        "current_checkpoint": 0,
+        "completed_checkpoints": 0,
+        "total_checkpoints": total_checkpoints,
+        "regenerations": 0,
+        "budget": budget
+    }
+
+    # Initialize character knowledge base
+    kb: CharacterKnowledgeBase = {
+        "character_id": character_id,
+        "input_data": input_data,
+        "mode": mode,  # type: ignore
+        "personality": None,
+        "backstory_motivation": None,
+        "voice_dialogue": None,
+        "physical_description": None,
+        "story_arc": None,
+        "relationships": None,
+        "image_generation": None,
+        "current_wave": 1,
+        "current_checkpoint": 0,
+        "agent_statuses": {
+            "personality": {"status": "pending", "wave": 1},
+            "backstory_motivation": {"status": "pending", "wave": 1},
+            "voice_dialogue": {"status": "pending", "wave": 2},
+            "physical_description": {"status": "pending", "wave": 2},
+            "story_arc": {"status": "pending", "wave": 2},
+            "relationships": {"status": "pending", "wave": 3},
+            "image_generation": {"status": "pending", "wave": 3}
+        }
+    }
+
+    return metadata, kb
+
+
+# ============================================================================
+# STORYLINE REFERENCES (shared by every storage backend)
+# ============================================================================
+
+def storyline_id(storyline: StorylineInput) -> str:
+    """Content address of a storyline (identical storylines share one record)"""
+    payload = json.dumps(storyline, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def new_storyline_record(storyline: StorylineInput) -> StorylineRecord:
+    """Build the stored record for a storyline (no digest yet)"""
+    return {
+        "storyline_id": storyline_id(storyline),
+        "storyline": storyline,
+        "created_at": datetime.utcnow().isoformat(),
+        "digest": None
+    }
+
+
+def referenced_storyline_id(value: Any) -> Optional[str]:
+    """ID a {"$ref": "storyline:<id>"} points to, or None for an inline storyline"""
+    if isinstance(value, dict) and set(value) == {REF_KEY} and str(value[REF_KEY]).startswith(STORYLINE_REF_PREFIX):
+        return value[REF_KEY][len(STORYLINE_REF_PREFIX):]
+    return None
+
+
+def input_with_storyline_ref(input_data: EntryAgentOutput) -> Tuple[EntryAgentOutput, Optional[StorylineInput]]:
+    """
+    Copy of an Entry Agent input with its storyline replaced by a ref
+
+    Returns:
+        Tuple of (input to store, storyline to store or None if already a ref)
+    """
+    storyline = input_data.get("storyline")
+    if not isinstance(storyline, dict) or referenced_storyline_id(storyline) is not None:
+        return input_data, None
+    ref = {REF_KEY: STORYLINE_REF_PREFIX + storyline_id(storyline)}
+    return {**input_data, "storyline": ref}, storyline  # type: ignore
+
+
+def kb_with_storyline_ref(kb: CharacterKnowledgeBase) -> Tuple[CharacterKnowledgeBase, Optional[StorylineInput]]:
+    """Copy of a KB as stored: storyline as a ref, digest dropped"""
+    input_data, storyline = input_with_storyline_ref(kb["input_data"])
+    stored = {key: value for key, value in kb.items() if key != "storyline_digest"}
+    stored["input_data"] = input_data
+    return stored, storyline  # type: ignore
+
+
+def resolve_storyline_ref(
+    input_data: EntryAgentOutput,
+    load_storyline: Callable[[str], StorylineRecord]
+) -> Optional[StorylineRecord]:
+    """Inline the storyline an input refers to (in place); returns its record"""
+    ref_id = referenced_storyline_id(input_data.get("storyline"))
+    if ref_id is None:
+        return None
+    record = load_storyline(ref_id)
+    input_data["storyline"] = record["storyline"]
+    return record
+
+
+def resolve_kb_storyline(
+    kb: CharacterKnowledgeBase,
+    load_storyline: Callable[[str], StorylineRecord]
+) -> CharacterKnowledgeBase:
+    """Inline a KB's storyline and attach the storyline digest, if generated"""
+    record = resolve_storyline_ref(kb["input_data"], load_storyline)
+    if record is not None and record.get("digest"):
+        kb["storyline_digest"] = record["digest"]["text"]
+    return kb
 
 
 class CharacterStorage:
     """Manages file-based storage for character development data"""
 
-    def __init__(self, base_path: str = "./backend/character_data"):
+    def __init__(
+        self,
+        base_path: str = "./backend/character_data",
+        coalesce_seconds: float = STORAGE_WRITE_COALESCE_SECONDS,
+        cache_size: int = STORAGE_CACHE_SIZE,
+        storage_format: str = STORAGE_FORMAT,
+        layout: str = STORAGE_LAYOUT
+    ):
         self.base_path = Path(base_path)
         self.base_path.mkdir(parents=True, exist_ok=True)
 
-    def _get_character_dir(self, character_id: str) -> Path:
-        """Get directory path for a character"""
-        char_dir = self.base_path / character_id
-        char_dir.mkdir(parents=True, exist_ok=True)
+        if layout not in STORAGE_LAYOUTS:
+            raise ValueError(f"Unknown storage layout: {layout}. Valid layouts: {STORAGE_LAYOUTS}")
+        self.layout = layout
+        # Flat character directories left from before sharding are still read in place
+        self.has_flat_characters = layout == "flat" or any(
+            len(d.name) > SHARD_PREFIX_LENGTH and is_character_dir(d) for d in self.base_path.iterdir()
+        )
+
+        if storage_format not in STORAGE_FORMATS:
+            raise ValueError(f"Unknown storage format: {storage_format}. Valid formats: {STORAGE_FORMATS}")
+        if storage_format == "zstd" and not ZSTD_AVAILABLE:
+            print("Warning: zstandard not installed. Falling back to gzip storage format.")
+            storage_format = "gzip"
+        self.storage_format = storage_format
+        self.checkpoint_refs = storage_format != "pretty"
+
+        # Coalesced writes: path -> (character_id, artifact, snapshot), flushed per character
+        self.coalesce_seconds = coalesce_seconds
+        self._pending_writes: Dict[Path, Tuple[str, str, bytes]] = {}
+        self._flush_timers: Dict[str, threading.Timer] = {}
+        self._write_lock = threading.RLock()
+        atexit.register(self.flush)
+
+        # Read cache: (character_id, artifact) -> (path, mtime_ns, size, snapshot)
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[Tuple[str, str], Tuple[Path, int, int, bytes]]" = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+        # Index of all characters; built once for stores that predate it (or its spend columns)
+        self.catalog = CharacterCatalog(self.base_path / CATALOG_FILE)
+        if self.catalog.needs_rebuild or (
+            self.catalog.count() == 0 and any(True for _ in self._iter_character_dirs())
+        ):
+            self.rebuild_catalog()
+
+    def _get_character_dir(self, character_id: str, create: bool = False) -> Path:
+        """Get directory path for a character (created only on write paths)"""
+        flat_dir = self.base_path / character_id
+        if self.layout == "flat":
+            char_dir = flat_dir
+        else:
+            char_dir = self.base_path / character_id[:SHARD_PREFIX_LENGTH] / character_id
+            if self.has_flat_characters and not char_dir.exists() and flat_dir.exists():
+                char_dir = flat_dir
+        if create:
+            char_dir.mkdir(parents=True, exist_ok=True)
         return char_dir
 
-    def _get_checkpoints_dir(self, character_id: str) -> Path:
+    def _iter_character_dirs(self):
+        """Yield (character_id, directory) for every character on disk (both layouts)"""
+        for entry in self.base_path.iterdir():
+            if not entry.is_dir() or entry.name == STORYLINES_DIR:
+                continue
+            if len(entry.name) > SHARD_PREFIX_LENGTH:
+                if is_character_dir(entry):
+                    yield entry.name, entry
+                continue
+            for char_dir in entry.iterdir():
+                if is_character_dir(char_dir):
+                    yield char_dir.name, char_dir
+
+    def _get_checkpoints_dir(self, character_id: str, create: bool = False) -> Path:
         """Get checkpoints directory for a character"""
-        checkpoints_dir = self._get_character_dir(character_id) / "checkpoints"
-        checkpoints_dir.mkdir(parents=True, exist_ok=True)
+        checkpoints_dir = self._get_character_dir(character_id, create) / "checkpoints"
+        if create:
+            checkpoints_dir.mkdir(parents=True, exist_ok=True)
         return checkpoints_dir
 
-    def _get_images_dir(self, character_id: str) -> Path:
+    def _get_images_dir(self, character_id: str, create: bool = False) -> Path:
         """Get images directory for a character"""
-        images_dir = self._get_character_dir(character_id) / "images"
-        images_dir.mkdir(parents=True, exist_ok=True)
+        images_dir = self._get_character_dir(character_id, create) / "images"
+        if create:
+            images_dir.mkdir(parents=True, exist_ok=True)
         return images_dir
 
+    # ========================================================================
+    # READ CACHE
+    # ========================================================================
+
+    def _cache_put(self, character_id: str, artifact: str, path: Path, blob: bytes) -> None:
+        """Store a snapshot of a file just read or written"""
+        if self.cache_size <= 0:
+            return
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            return
+
+        with self._cache_lock:
+            key = (character_id, artifact)
+            self._cache[key] = (path, stat.st_mtime_ns, stat.st_size, blob)
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def _cache_get(self, character_id: str, artifact: str) -> Optional[Tuple[Path, bytes]]:
+        """Look up a snapshot, validating it against the file's mtime and size"""
+        key = (character_id, artifact)
+        with self._cache_lock:
+            entry = self._cache.get(key)
+        if entry is None:
+            return None
+
+        path, mtime_ns, size, blob = entry
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            stat = None
+
+        with self._cache_lock:
+            if stat is None or stat.st_mtime_ns != mtime_ns or stat.st_size != size:
+                # Changed or removed outside this process
+                self._cache.pop(key, None)
+                return None
+            if key in self._cache:
+                self._cache.move_to_end(key)
+        return path, blob
+
+    def _read_json(self, character_id: str, artifact: str, path: Path) -> Optional[Any]:
+        """
+        Read a JSON artifact: pending write, then cache, then disk
+
+        Returns:
+            A fresh copy of the data, or None if the file does not exist
+        """
+        pending = self._read_pending(path)
+        if pending is not None:
+            return pending
+
+        cached = self._cache_get(character_id, artifact)
+        if cached is not None and cached[0] == path:
+            self.cache_hits += 1
+            return _thaw(cached[1])
+
+        self.cache_misses += 1
+        try:
+            data = read_json_file(path)
+        except FileNotFoundError:
+            return None
+
+        self._cache_put(character_id, artifact, path, _freeze(data))
+        return data
+
+    def _write_json(self, character_id: str, artifact: str, path: Path, data: Any) -> bytes:
+        """Atomically write a JSON artifact and refresh its cache entry"""
+        encoded = atomic_write_json(path, data, self.storage_format)
+        self._cache_put(character_id, artifact, path, _freeze(data))
+        if artifact == "metadata":
+            self.catalog.record(character_id, data)
+        return encoded
+
+    def invalidate_cache(self, character_id: Optional[str] = None) -> None:
+        """
+        Drop cached artifacts
+
+        Args:
+            character_id: Only drop this character's entries (everything if None)
+        """
+        with self._cache_lock:
+            if character_id is None:
+                self._cache.clear()
+                return
+            for key in [k for k in self._cache if k[0] == character_id]:
+                del self._cache[key]
+
+    def cache_stats(self) -> Dict[str, Any]:
+        """Read cache counters for monitoring"""
+        lookups = self.cache_hits + self.cache_misses
+        return {
+            "entries": len(self._cache),
+            "capacity": self.cache_size,
+            "hits": self.cache_hits,
+            "misses": self.cache_misses,
+            "hit_rate": round(self.cache_hits / lookups, 4) if lookups else None,
+            "pending_writes": len(self._pending_writes)
+        }
+
+    # ========================================================================
+    # WRITE COALESCING
+    # ========================================================================
+
+    def _queue_write(self, character_id: str, artifact: str, path: Path, data: Any) -> None:
+        """Schedule a coalesced write; later writes to the same path replace it"""
+        if self.coalesce_seconds <= 0:
+            with self._write_lock:
+                self._write_json(character_id, artifact, path, data)
+            return
+
+        with self._write_lock:
+            # Snapshot now: callers keep mutating their KB/metadata dicts
+            self._pending_writes[path] = (character_id, artifact, _freeze(data))
+            if character_id not in self._flush_timers:
+                timer = threading.Timer(self.coalesce_seconds, self.flush, args=(character_id,))
+                timer.daemon = True
+                self._flush_timers[character_id] = timer
+                timer.start()
+
+    def _read_pending(self, path: Path) -> Optional[Any]:
+        """Return a copy of a not-yet-flushed write, if any"""
+        with self._write_lock:
+            pending = self._pending_writes.get(path)
+            return _thaw(pending[2]) if pending else None
+
+    def flush(self, character_id: Optional[str] = None) -> None:
+        """
+        Write pending KB/metadata saves to disk (durability barrier)
+
+        Args:
+            character_id: Only flush this character (all characters if None)
+        """
+        with self._write_lock:
+            paths = [
+                path for path, (cid, _, _) in self._pending_writes.items()
+                if character_id is None or cid == character_id
+            ]
+            for path in paths:
+                cid, artifact, blob = self._pending_writes.pop(path)
+                data = _thaw(blob)
+                atomic_write_json(path, data, self.storage_format)
+                self._cache_put(cid, artifact, path, blob)
+                if artifact == "metadata":
+                    self.catalog.record(cid, data)
+
+            timer_ids = [character_id] if character_id else list(self._flush_timers)
+            for cid in timer_ids:
+                timer = self._flush_timers.pop(cid, None)
+                if timer and timer is not threading.current_thread():
+                    timer.cancel()
+
+    def _discard_pending(self, character_id: str) -> None:
+        """Drop pending writes for a character (used on delete)"""
+        with self._write_lock:
+            for path in [p for p, (cid, _, _) in self._pending_writes.items() if cid == character_id]:
+                del self._pending_writes[path]
+            timer = self._flush_timers.pop(character_id, None)
+            if timer:
+                timer.cancel()
+
     # ========================================================================
     # CHARACTER CRUD OPERATIONS
     # ========================================================================
 
-    def create_character(self, input_data: EntryAgentOutput, mode: str = "balanced") -> str:
+    def create_character(
+        self,
+        input_data: EntryAgentOutput,
+        mode: str = "balanced",
+        project_id: Optional[str] = None,
+        approval_policy: str = "manual",
+        approval_timeout_seconds: Optional[float] = None,
+        budget: Optional[Dict] = None
+    ) -> str:
         """
         Create a new character development session
 
         Args:
             input_data: Output from Entry Agent
             mode: Development mode (fast/balanced/deep)
+            project_id: Optional project the character belongs to
+            approval_policy: Checkpoint approval policy (see orchestrator.APPROVAL_POLICIES)
+            approval_timeout_seconds: Wait before auto-approving under auto_after_timeout
+            budget: Character/project spend limits (see budget.make_budget)
 
         Returns:
             character_id: UUID of created character
         """
         character_id = str(uuid.uuid4())
-        char_dir = self._get_character_dir(character_id)
+        char_dir = self._get_character_dir(character_id, create=True)
 
-        # Save input data
+        # Save input data (storyline stored once, referenced by ID)
         input_path = char_dir / "input.json"
-        with open(input_path, 'w') as f:
-            json.dump(input_data, f, indent=2)
-
-        # Initialize metadata
-        # Determine total checkpoints based on image generation setting
-        IMAGE_GENERATION_ENABLED = os.getenv("IMAGE_GENERATION_ENABLED", "false").lower() == "true"
-        total_checkpoints = 8 if IMAGE_GENERATION_ENABLED else 7
-
-        metadata = {
-            "character_id": character_id,
-            "created_at": datetime.utcnow().isoformat(),
-            "status": "in_progress",
-            "mode": mode,
-            "current_wave": 1,
-            "current_checkpoint": 0,
-            "completed_checkpoints": 0,
-            "total_checkpoints": total_checkpoints,
-            "regenerations": 0
-        }
+        atomic_write_json(input_path, self._stored_input(input_data), self.storage_format)
 
-        metadata_path = char_dir / "metadata.json"
-        with open(metadata_path, 'w') as f:
-            json.dump(metadata, f, indent=2)
-
-        # Initialize character knowledge base
-        kb: CharacterKnowledgeBase = {
-            "character_id": character_id,
-            "input_data": input_data,
-            "mode": mode,  # type: ignore
-            "personality": None,
-            "backstory_motivation": None,
-            "voice_dialogue": None,
-            "physical_description": None,
-            "story_arc": None,
-            "relationships": None,
-            "image_generation": None,
-            "current_wave": 1,
-            "current_checkpoint": 0,
-            "agent_statuses": {
-                "personality": {"status": "pending", "wave": 1},
-                "backstory_motivation": {"status": "pending", "wave": 1},
-                "voice_dialogue": {"status": "pending", "wave": 2},
-                "physical_description": {"status": "pending", "wave": 2},
-                "story_arc": {"status": "pending", "wave": 2},
-                "relationships": {"status": "pending", "wave": 3},
-                "image_generation": {"status": "pending", "wave": 3}
-            }
-        }
+        metadata, kb = new_character_records(
+            character_id,
+            input_data,
+            mode,
+            project_id=project_id,
+            approval_policy=approval_policy,
+            approval_timeout_seconds=approval_timeout_seconds,
+            budget=budget
+        )
 
         kb_path = char_dir / "knowledge_base.json"
-        with open(kb_path, 'w') as f:
-            json.dump(kb, f, indent=2)
+        self._write_json(character_id, "kb", kb_path, self._stored_kb(kb))
+
+        metadata_path = char_dir / "metadata.json"
+        self._write_json(character_id, "metadata", metadata_path, metadata)
+        self.catalog.record(character_id, metadata, name=_character_name(input_data))
 
         return character_id
 
+    def import_character(
+        self,
+        character_id: str,
+        input_data: EntryAgentOutput,
+        metadata: Dict,
+        kb: CharacterKnowledgeBase,
+        checkpoints: Optional[Dict[int, Checkpoint]] = None,
+        final_profile: Optional[FinalCharacterProfile] = None
+    ) -> None:
+        """
+        Write (or replace) a complete character in this storage's format
+
+        Mirrors SQLiteCharacterStorage.import_character for migrations and
+        format conversion.
+        """
+        char_dir = self._get_character_dir(character_id, create=True)
+        atomic_write_json(char_dir / "input.json", self._stored_input(input_data), self.storage_format)
+        self._write_json(character_id, "metadata", char_dir / "metadata.json", metadata)
+        self.catalog.record(character_id, metadata, name=_character_name(input_data))
+        self._write_json(character_id, "kb", char_dir / "knowledge_base.json", self._stored_kb(kb))
+        if final_profile is not None:
+            self._write_json(character_id, "final", char_dir / "final_profile.json", final_profile)
+        for checkpoint in (checkpoints or {}).values():
+            self.save_checkpoint(character_id, checkpoint)
+
+    def load_input(self, character_id: str) -> EntryAgentOutput:
+        """Load the Entry Agent output the character was created from"""
+        try:
+            input_data = read_json_file(self._get_character_dir(character_id) / "input.json")
+        except FileNotFoundError:
+            raise FileNotFoundError(f"Character {character_id} not found")
+        resolve_storyline_ref(input_data, self.load_storyline)
+        return input_data
+
     def load_character_kb(self, character_id: str) -> CharacterKnowledgeBase:
         """Load character knowledge base"""
         char_dir = self._get_character_dir(character_id)
         kb_path = char_dir / "knowledge_base.json"
 
-        if not kb_path.exists():
+        kb = self._read_json(character_id, "kb", kb_path)
+        if kb is None:
             raise FileNotFoundError(f"Character {character_id} not found")
 
-        with open(kb_path, 'r') as f:
-            return json.load(f)
+        return resolve_kb_storyline(kb, self.load_storyline)
 
     def save_character_kb(self, kb: CharacterKnowledgeBase) -> None:
-        """Save character knowledge base"""
-        char_dir = self._get_character_dir(kb["character_id"])
+        """Save character knowledge base (coalesced, see flush())"""
+        char_dir = self._get_character_dir(kb["character_id"], create=True)
         kb_path = char_dir / "knowledge_base.json"
 
-        with open(kb_path, 'w') as f:
-            json.dump(kb, f, indent=2)
+        if self.checkpoint_refs:
+            previous = self._read_json(kb["character_id"], "kb", kb_path)
+            if previous is not None:
+                self._materialize_checkpoint_refs(kb["character_id"], previous, kb)
+
+        self._queue_write(kb["character_id"], "kb", kb_path, self._stored_kb(kb))
 
     def load_metadata(self, character_id: str) -> Dict:
         """Load character metadata"""
         char_dir = self._get_character_dir(character_id)
         metadata_path = char_dir / "metadata.json"
 
-        if not metadata_path.exists():
+        metadata = self._read_json(character_id, "metadata", metadata_path)
+        if metadata is None:
             raise FileNotFoundError(f"Character {character_id} metadata not found")
 
-        with open(metadata_path, 'r') as f:
-            return json.load(f)
+        return metadata
 
     def save_metadata(self, character_id: str, metadata: Dict) -> None:
-        """Save character metadata"""
-        char_dir = self._get_character_dir(character_id)
+        """Save character metadata (coalesced, see flush())"""
+        char_dir = self._get_character_dir(character_id, create=True)
         metadata_path = char_dir / "metadata.json"
 
-        with open(metadata_path, 'w') as f:
-            json.dump(metadata, f, indent=2)
+        self._queue_write(character_id, "metadata", metadata_path, metadata)
+
+    def update_metadata(self, character_id: str, update: Callable[[Dict], Any]) -> Dict:
+        """
+        Load, modify and save metadata atomically
+
+        Concurrent writers (the orchestrator on the I/O pool, approvals from
+        API handlers) would otherwise overwrite each other's changes.
+
+        Args:
+            character_id: Character UUID
+            update: Callable that mutates the metadata dict in place
+
+        Returns:
+            The updated metadata
+        """
+        with self._write_lock:
+            metadata = self.load_metadata(character_id)
+            update(metadata)
+            self.save_metadata(character_id, metadata)
+            return metadata
 
     # ========================================================================
     # CHECKPOINT OPERATIONS
     # ========================================================================
 
     def save_checkpoint(self, character_id: str, checkpoint: Checkpoint) -> None:
-        """Save a checkpoint"""
-        checkpoints_dir = self._get_checkpoints_dir(character_id)
+        """
+        Save a checkpoint and update the checkpoint manifest
+
+        Checkpoints are durability points: pending KB/metadata writes for the
+        character are flushed first, so the KB on disk is never older than
+        the checkpoints built from it.
+        """
+        checkpoints_dir = self._get_checkpoints_dir(character_id, create=True)
 
         # Filename: 01_personality.json, 02_backstory.json, etc.
         filename = f"{checkpoint['checkpoint_number']:02d}_{checkpoint['agent']}.json"
         checkpoint_path = checkpoints_dir / filename
 
-        with open(checkpoint_path, 'w') as f:
-            json.dump(checkpoint, f, indent=2)
+        with self._write_lock:
+            # History stores resolved content, so versions never depend on refs
+            self._append_history(character_id, checkpoint)
 
-    def load_checkpoint(self, character_id: str, checkpoint_number: int) -> Optional[Checkpoint]:
-        """Load a specific checkpoint"""
-        checkpoints_dir = self._get_checkpoints_dir(character_id)
+            if self.checkpoint_refs:
+                checkpoint = self._with_refs(character_id, checkpoint)
 
-        # Find file matching checkpoint number
-        for file_path in checkpoints_dir.glob(f"{checkpoint_number:02d}_*.json"):
-            with open(file_path, 'r') as f:
-                return json.load(f)
+            self.flush(character_id)
+            self._write_checkpoint_file(character_id, checkpoint_path, checkpoint)
 
-        return None
+    def save_checkpoint_with_metadata(
+        self,
+        character_id: str,
+        checkpoint: Checkpoint,
+        update: Callable[[Dict], Any]
+    ) -> Dict:
+        """
+        Save a checkpoint together with the metadata update it implies
+
+        Files cannot be updated transactionally; metadata is made durable
+        first so a crash never leaves a checkpoint newer than its metadata.
+
+        Args:
+            character_id: Character UUID
+            checkpoint: Checkpoint to save
+            update: Callable that mutates the metadata dict in place
+
+        Returns:
+            The updated metadata
+        """
+        with self._write_lock:
+            metadata = self.update_metadata(character_id, update)
+            self.save_checkpoint(character_id, checkpoint)
+            return metadata
+
+    def _load_checkpoint_raw(self, character_id: str, checkpoint_number: int) -> Optional[Tuple[Path, Checkpoint]]:
+        """Load a checkpoint as stored (refs unresolved) along with its file"""
+        artifact = f"checkpoint:{checkpoint_number}"
+
+        # Cached entries remember their file
+        cached = self._cache_get(character_id, artifact)
+        if cached is not None:
+            self.cache_hits += 1
+            return cached[0], _thaw(cached[1])
+
+        entry = self._load_manifest(character_id)["checkpoints"].get(str(checkpoint_number))
+        if entry is None:
+            return None
+
+        file_path = self._get_checkpoints_dir(character_id) / entry["file"]
+        checkpoint = self._read_json(character_id, artifact, file_path)
+        if checkpoint is None:
+            return None
+        return file_path, checkpoint
+
+    def load_checkpoint(self, character_id: str, checkpoint_number: int) -> Optional[Checkpoint]:
+        """Load a specific checkpoint"""
+        loaded = self._load_checkpoint_raw(character_id, checkpoint_number)
+        if loaded is None:
+            return None
+        return self._resolve_refs(character_id, loaded[1])
 
     def load_all_checkpoints(self, character_id: str) -> Dict[int, Checkpoint]:
         """Load all checkpoints for a character"""
-        checkpoints_dir = self._get_checkpoints_dir(character_id)
         checkpoints = {}
+        resolved: Dict[str, Any] = {}  # Ref targets loaded once for all checkpoints
 
-        for file_path in sorted(checkpoints_dir.glob("*.json")):
-            with open(file_path, 'r') as f:
-                checkpoint = json.load(f)
-                checkpoints[checkpoint["checkpoint_number"]] = checkpoint
+        for entry in self.list_checkpoints(character_id):
+            loaded = self._load_checkpoint_raw(character_id, entry["checkpoint_number"])
+            if loaded is not None:
+                checkpoints[entry["checkpoint_number"]] = self._resolve_refs(character_id, loaded[1], resolved)
 
         return checkpoints
 
+    def list_checkpoints(self, character_id: str) -> List[Dict]:
+        """
+        List checkpoint summaries from the manifest (no checkpoint bodies are read)
+
+        Returns:
+            Manifest entries (checkpoint_number, agent, status, version, file,
+            size, sha256, updated_at) ordered by checkpoint number
+        """
+        entries = self._load_manifest(character_id)["checkpoints"].values()
+        return sorted(entries, key=lambda entry: entry["checkpoint_number"])
+
+    # ========================================================================
+    # CHECKPOINT MANIFEST
+    # ========================================================================
+
+    def _manifest_path(self, character_id: str) -> Path:
+        return self._get_checkpoints_dir(character_id) / CHECKPOINT_MANIFEST
+
+    @staticmethod
+    def _manifest_entry(file_path: Path, checkpoint: Checkpoint, encoded: bytes, version: int) -> Dict:
+        return {
+            "checkpoint_number": checkpoint["checkpoint_number"],
+            "agent": checkpoint["agent"],
+            "status": checkpoint["status"],
+            "version": version,
+            "file": file_path.name,
+            "size": len(encoded),
+            "sha256": hashlib.sha256(encoded).hexdigest(),
+            "updated_at": datetime.utcnow().isoformat()
+        }
+
+    def _load_manifest(self, character_id: str) -> Dict:
+        """Load a character's checkpoint manifest, building it for legacy data"""
+        manifest = self._read_json(character_id, "manifest", self._manifest_path(character_id))
+        if manifest is None:
+            manifest = self._rebuild_manifest(character_id)
+        return manifest
+
+    def _rebuild_manifest(self, character_id: str) -> Dict:
+        """Index existing checkpoint files (data written before manifests existed)"""
+        manifest: Dict[str, Any] = {"version": MANIFEST_VERSION, "checkpoints": {}}
+        checkpoints_dir = self._get_checkpoints_dir(character_id)
+        if not checkpoints_dir.exists():
+            return manifest
+
+        # Oldest first, so the newest file wins if two share a number
+        files = sorted(checkpoints_dir.glob("[0-9][0-9]_*.json"), key=lambda p: p.stat().st_mtime_ns)
+        for file_path in files:
+            encoded = file_path.read_bytes()
+            checkpoint = decode_json(encoded)
+            manifest["checkpoints"][str(checkpoint["checkpoint_number"])] = self._manifest_entry(
+                file_path, checkpoint, encoded, version=1
+            )
+
+        if manifest["checkpoints"]:
+            self._write_json(character_id, "manifest", self._manifest_path(character_id), manifest)
+        return manifest
+
+    def _write_checkpoint_file(self, character_id: str, path: Path, checkpoint: Checkpoint) -> None:
+        """Write a checkpoint file and record it in the manifest"""
+        number = checkpoint["checkpoint_number"]
+        with self._write_lock:
+            manifest = self._load_manifest(character_id)
+            encoded = self._write_json(character_id, f"checkpoint:{number}", path, checkpoint)
+
+            previous = manifest["checkpoints"].get(str(number))
+            version = previous["version"] + 1 if previous else 1
+            manifest["checkpoints"][str(number)] = self._manifest_entry(path, checkpoint, encoded, version)
+            self._write_json(character_id, "manifest", self._manifest_path(character_id), manifest)
+
+    # ========================================================================
+    # VERSION HISTORY
+    # ========================================================================
+
+    def _history_path(self, character_id: str, checkpoint_number: int, create: bool = False) -> Path:
+        history_dir = self._get_character_dir(character_id, create) / "history"
+        if create:
+            history_dir.mkdir(exist_ok=True)
+        return history_dir / f"{checkpoint_number:02d}.jsonl"
+
+    def _load_history(self, character_id: str, checkpoint_number: int) -> List[Dict]:
+        """Read a checkpoint's history stream (one JSON record per line)"""
+        path = self._history_path(character_id, checkpoint_number)
+        if not path.exists():
+            return []
+
+        records = []
+        with open(path, "rb") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                try:
+                    records.append(json.loads(line))
+                except json.JSONDecodeError:
+                    # Torn append from a crash; later records are still valid
+                    print(f"Warning: Skipping corrupt history record in {path}")
+        return records
+
+    def _history_head(self, character_id: str, checkpoint_number: int) -> Optional[Tuple[int, Any]]:
+        """(version, document) of the latest version, or None if there is no history"""
+        artifact = f"history:{checkpoint_number}"
+        cached = self._cache_get(character_id, artifact)
+        if cached is not None:
+            self.cache_hits += 1
+            return tuple(_thaw(cached[1]))  # type: ignore
+
+        records = self._load_history(character_id, checkpoint_number)
+        if not records:
+            return None
+        head = (records[-1]["version"], reconstruct(records))
+        self._cache_put(
+            character_id, artifact, self._history_path(character_id, checkpoint_number), _freeze(list(head))
+        )
+        return head
+
+    def _append_history(self, character_id: str, checkpoint: Checkpoint) -> None:
+        """Append the checkpoint as a new version if its content changed"""
+        number = checkpoint["checkpoint_number"]
+        with self._write_lock:
+            head = self._history_head(character_id, number)
+
+            pending = []
+            if head is None:
+                # Checkpoint saved before history existed: keep it as version 1
+                existing = self.load_checkpoint(character_id, number)
+                if existing is not None:
+                    baseline = next_version(None, existing)
+                    pending.append(baseline)
+                    head = (baseline["version"], existing)
+
+            record = next_version(head, checkpoint)
+            if record is not None:
+                pending.append(record)
+                head = (record["version"], checkpoint)
+            if not pending:
+                return
+
+            path = self._history_path(character_id, number, create=True)
+            with open(path, "ab") as f:
+                for entry in pending:
+                    f.write(json.dumps(entry, separators=(",", ":")).encode("utf-8") + b"\n")
+                f.flush()
+                os.fsync(f.fileno())
+            self._cache_put(character_id, f"history:{number}", path, _freeze(list(head)))
+
+    def list_checkpoint_versions(self, character_id: str, checkpoint_number: int) -> List[Dict]:
+        """
+        List a checkpoint's versions, oldest first (no content)
+
+        Returns:
+            Dicts with version, timestamp, agent, status, kind and size
+        """
+        return [version_summary(record) for record in self._load_history(character_id, checkpoint_number)]
+
+    def load_checkpoint_version(
+        self,
+        character_id: str,
+        checkpoint_number: int,
+        version: int
+    ) -> Optional[Checkpoint]:
+        """Rebuild a checkpoint as it was at a given version (None if no such version)"""
+        return reconstruct(self._load_history(character_id, checkpoint_number), version)
+
+    def load_checkpoint_history(self, character_id: str, checkpoint_number: int) -> List[Dict]:
+        """Raw history records of a checkpoint (see history.py), oldest first"""
+        return self._load_history(character_id, checkpoint_number)
+
+    def compact_checkpoint_history(self, character_id: str, checkpoint_number: int, keep: int) -> int:
+        """
+        Drop all but the newest keep versions of a checkpoint
+
+        Returns:
+            Bytes reclaimed
+        """
+        with self._write_lock:
+            path = self._history_path(character_id, checkpoint_number)
+            records = self._load_history(character_id, checkpoint_number)
+            compacted = compact_records(records, keep)
+            if compacted is records:
+                return 0
+
+            old_size = path.stat().st_size
+            return old_size - self._write_history(path, compacted)
+
+    def replace_checkpoint_history(self, character_id: str, checkpoint_number: int, records: List[Dict]) -> None:
+        """Replace a checkpoint's history stream (archive import)"""
+        with self._write_lock:
+            self._write_history(self._history_path(character_id, checkpoint_number, create=True), records)
+
+    @staticmethod
+    def _write_history(path: Path, records: List[Dict]) -> int:
+        """Atomically rewrite a history stream; returns its new size"""
+        lines = b"".join(json.dumps(record, separators=(",", ":")).encode("utf-8") + b"\n" for record in records)
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(lines)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+        return len(lines)
+
+    # ========================================================================
+    # STORYLINES
+    # ========================================================================
+
+    def _storyline_path(self, storyline_id: str) -> Path:
+        return self.base_path / STORYLINES_DIR / f"{storyline_id}.json"
+
+    def save_storyline(self, storyline: StorylineInput) -> str:
+        """
+        Store a storyline once (no-op if already stored)
+
+        Returns:
+            storyline_id: Content address of the storyline
+        """
+        record = new_storyline_record(storyline)
+        path = self._storyline_path(record["storyline_id"])
+        if not path.exists():
+            path.parent.mkdir(parents=True, exist_ok=True)
+            self._write_json(record["storyline_id"], "storyline", path, record)
+        return record["storyline_id"]
+
+    def load_storyline(self, storyline_id: str) -> StorylineRecord:
+        """Load a storyline record (storyline and digest)"""
+        record = self._read_json(storyline_id, "storyline", self._storyline_path(storyline_id))
+        if record is None:
+            raise FileNotFoundError(f"Storyline {storyline_id} not found")
+        return record
+
+    def save_storyline_digest(self, storyline_id: str, digest: StorylineDigest) -> None:
+        """Attach a generated digest to a storyline record"""
+        record = self.load_storyline(storyline_id)
+        record["digest"] = digest
+        record.pop("digest_failure", None)
+        self._write_json(storyline_id, "storyline", self._storyline_path(storyline_id), record)
+
+    def save_storyline_digest_failure(self, storyline_id: str, failure: StorylineDigestFailure) -> None:
+        """Record a failed digest attempt on a storyline record"""
+        record = self.load_storyline(storyline_id)
+        record["digest_failure"] = failure
+        self._write_json(storyline_id, "storyline", self._storyline_path(storyline_id), record)
+
+    def _stored_input(self, input_data: EntryAgentOutput) -> EntryAgentOutput:
+        """Input as written to disk: storyline saved separately, referenced by ID"""
+        stored, storyline = input_with_storyline_ref(input_data)
+        if storyline is not None:
+            self.save_storyline(storyline)
+        return stored
+
+    def _stored_kb(self, kb: CharacterKnowledgeBase) -> CharacterKnowledgeBase:
+        """KB as written to disk: storyline referenced by ID, digest dropped"""
+        stored, storyline = kb_with_storyline_ref(kb)
+        if storyline is not None:
+            self.save_storyline(storyline)
+        return stored
+
+    # ========================================================================
+    # CHECKPOINT REFERENCES
+    # ========================================================================
+
+    def _with_refs(self, character_id: str, checkpoint: Checkpoint) -> Checkpoint:
+        """Replace structured output that duplicates the KB or final profile with a ref"""
+        structured = checkpoint["output"].get("structured")
+        if not structured:
+            return checkpoint
+
+        agent = checkpoint["agent"]
+        ref = None
+        try:
+            if agent == "final_consolidation":
+                if self.load_final_profile(character_id) == structured:
+                    ref = "final_profile"
+            elif agent in AGENT_CHECKPOINTS:
+                if self.load_character_kb(character_id).get(agent) == structured:
+                    ref = f"kb:{agent}"
+        except FileNotFoundError:
+            ref = None
+
+        if ref is None:
+            return checkpoint
+
+        return {
+            **checkpoint,
+            "output": {**checkpoint["output"], "structured": {REF_KEY: ref}}
+        }  # type: ignore
+
+    def _resolve_refs(
+        self,
+        character_id: str,
+        checkpoint: Checkpoint,
+        resolved: Optional[Dict[str, Any]] = None
+    ) -> Checkpoint:
+        """Inline the KB entry / final profile a checkpoint refers to"""
+        structured = checkpoint.get("output", {}).get("structured")
+        if not isinstance(structured, dict) or set(structured) != {REF_KEY}:
+            return checkpoint
+
+        ref = structured[REF_KEY]
+        resolved = resolved if resolved is not None else {}
+        if ref == "final_profile":
+            if "final_profile" not in resolved:
+                resolved["final_profile"] = self.load_final_profile(character_id)
+            value = resolved["final_profile"]
+        else:
+            if "kb" not in resolved:
+                resolved["kb"] = self.load_character_kb(character_id)
+            value = resolved["kb"].get(ref.split(":", 1)[1])
+
+        if value is None:
+            print(f"Warning: Unresolvable checkpoint ref {ref} for character {character_id}")
+            value = {}
+
+        checkpoint["output"]["structured"] = value
+        return checkpoint
+
+    def _materialize_checkpoint_refs(
+        self,
+        character_id: str,
+        previous: CharacterKnowledgeBase,
+        kb: CharacterKnowledgeBase
+    ) -> None:
+        """
+        Inline the old KB value into checkpoints whose ref target is about to change
+
+        Keeps a checkpoint's content stable even if the KB entry it pointed
+        to is replaced without the checkpoint being rewritten.
+        """
+        for agent, checkpoint_number in AGENT_CHECKPOINTS.items():
+            old_value = previous.get(agent)
+            if old_value is None or old_value == kb.get(agent):
+                continue
+
+            loaded = self._load_checkpoint_raw(character_id, checkpoint_number)
+            if loaded is None:
+                continue
+            path, checkpoint = loaded
+            if checkpoint["output"].get("structured") != {REF_KEY: f"kb:{agent}"}:
+                continue
+
+            checkpoint["output"]["structured"] = old_value
+            self._write_checkpoint_file(character_id, path, checkpoint)
+
     # ========================================================================
     # IMAGE OPERATIONS
     # ========================================================================
@@ -211,14 +1202,14 @@ class CharacterStorage:
         Returns:
             Relative path to saved image
         """
-        images_dir = self._get_images_dir(character_id)
+        images_dir = self._get_images_dir(character_id, create=True)
         image_path = images_dir / f"{image_type}.png"
 
         with open(image_path, 'wb') as f:
             f.write(image_data)
 
-        # Return relative path for API responses
-        return f"/character_data/{character_id}/images/{image_type}.png"
+        # Return relative path for API responses (served from the storage root)
+        return f"/character_data/{image_path.relative_to(self.base_path).as_posix()}"
 
     def get_image_path(self, character_id: str, image_type: str) -> Path:
         """Get absolute path to an image"""
@@ -231,28 +1222,24 @@ class CharacterStorage:
 
     def save_final_profile(self, character_id: str, profile: FinalCharacterProfile) -> None:
         """Save final character profile"""
-        char_dir = self._get_character_dir(character_id)
+        char_dir = self._get_character_dir(character_id, create=True)
         final_path = char_dir / "final_profile.json"
 
-        with open(final_path, 'w') as f:
-            json.dump(profile, f, indent=2)
+        self._write_json(character_id, "final", final_path, profile)
 
         # Update metadata
         metadata = self.load_metadata(character_id)
         metadata["status"] = "completed"
         metadata["completed_at"] = datetime.utcnow().isoformat()
         self.save_metadata(character_id, metadata)
+        self.flush(character_id)
 
     def load_final_profile(self, character_id: str) -> Optional[FinalCharacterProfile]:
         """Load final character profile"""
         char_dir = self._get_character_dir(character_id)
         final_path = char_dir / "final_profile.json"
 
-        if not final_path.exists():
-            return None
-
-        with open(final_path, 'r') as f:
-            return json.load(f)
+        return self._read_json(character_id, "final", final_path)
 
     # ========================================================================
     # UTILITY METHODS
@@ -262,13 +1249,97 @@ class CharacterStorage:
         """Check if character exists"""
         return self._get_character_dir(character_id).exists()
 
-    def delete_character(self, character_id: str) -> None:
-        """Delete all character data (use with caution)"""
+    def delete_character(self, character_id: str) -> int:
+        """
+        Delete all character data (use with caution)
+
+        Returns:
+            Bytes freed on disk
+
+        Raises:
+            ValueError: If the ID would resolve outside the store
+        """
         import shutil
         char_dir = self._get_character_dir(character_id)
+        base = self.base_path.resolve()
+        if char_dir.resolve() == base or not char_dir.resolve().is_relative_to(base):
+            raise ValueError(f"Invalid character ID: {character_id!r}")
+        self._discard_pending(character_id)
+        self.invalidate_cache(character_id)
+        freed = 0
         if char_dir.exists():
+            freed = sum(path.stat().st_size for path in char_dir.rglob("*") if path.is_file())
             shutil.rmtree(char_dir)
+        self.catalog.remove(character_id)
+        return freed
+
+    def list_characters(self, project_id: Optional[str] = None, status: Optional[str] = None) -> list[str]:
+        """List character IDs, optionally filtered by project and/or status (catalog lookup)"""
+        return self.catalog.character_ids(project_id=project_id, status=status)
+
+    def project_spend(self, project_id: str, exclude_character_id: Optional[str] = None) -> Tuple[int, float]:
+        """Measured (tokens, cost_usd) of a project's characters (catalog lookup)"""
+        return self.catalog.project_spend(project_id, exclude_character_id)
+
+    def latest_character(self, project_id: Optional[str] = None, status: Optional[str] = None) -> Optional[str]:
+        """Most recently updated character matching the filters (catalog lookup)"""
+        return self.catalog.latest(project_id=project_id, status=status)
+
+    def list_catalog(
+        self,
+        project_id: Optional[str] = None,
+        status: Optional[str] = None,
+        limit: Optional[int] = None
+    ) -> List[Dict]:
+        """Catalog rows (name, project, status, times, progress), most recently updated first"""
+        return self.catalog.entries(project_id=project_id, status=status, limit=limit)
+
+    def rebuild_catalog(self) -> int:
+        """
+        Rebuild the catalog from the character directories
+
+        Returns:
+            Number of characters indexed
+        """
+        self.flush()
+        self.catalog.clear()
+        indexed = 0
+        for character_id, char_dir in self._iter_character_dirs():
+            try:
+                metadata = read_json_file(char_dir / "metadata.json")
+            except FileNotFoundError:
+                continue  # Deleted since the directory was listed
+            try:
+                name = _character_name(read_json_file(char_dir / "input.json"))
+            except FileNotFoundError:
+                name = None
+            self.catalog.record(character_id, metadata, name=name)
+            indexed += 1
+        print(f"✓ Rebuilt character catalog for {self.base_path} ({indexed} characters)")
+        return indexed
+
+
+def _character_name(input_data: Dict) -> Optional[str]:
+    """Name of the character an Entry Agent input describes"""
+    characters = input_data.get("characters") or [{}]
+    return characters[0].get("name")
+
+
+def create_storage(backend: Optional[str] = None, **kwargs):
+    """
+    Create the configured storage backend
+
+    Args:
+        backend: "json" or "sqlite" (defaults to CHARACTER_STORAGE_BACKEND)
+        **kwargs: Backend constructor arguments
 
-    def list_characters(self) -> list[str]:
-        """List all character IDs"""
-        return [d.name for d in self.base_path.iterdir() if d.is_dir()]
+    Returns:
+        CharacterStorage or SQLiteCharacterStorage
+    """
+    backend = backend or CHARACTER_STORAGE_BACKEND
+    if backend == "json":
+        return CharacterStorage(**kwargs)
+    if backend == "sqlite":
+        from .sqlite_storage import SQLiteCharacterStorage
+        return SQLiteCharacterStorage(**kwargs)
+    raise ValueError(f"Unknown storage backend: {backend}. Valid backends: ['json', 'sqlite']")
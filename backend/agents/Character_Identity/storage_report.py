@@ -0,0 +1,104 @@
+"""
+Report on-disk size of character data under each storage format
+
+Usage (from backend/):
+    python -m agents.Character_Identity.storage_report --source ./backend/character_data
+    python -m agents.Character_Identity.storage_report --source ./backend/character_data --rewrite gzip
+
+Every character in the source directory is re-encoded into a temporary
+directory once per format (pretty, compact, gzip and, if installed, zstd),
+and the JSON bytes are compared. Images are excluded because no format
+changes them. --rewrite converts the source corpus in place afterwards.
+"""
+
+import argparse
+import tempfile
+from pathlib import Path
+from typing import Dict, List
+
+from .storage import STORAGE_FORMATS, ZSTD_AVAILABLE, CharacterStorage
+
+
+def _json_bytes(char_dir: Path) -> int:
+    """Total size of a character's JSON artifacts"""
+    return sum(p.stat().st_size for p in char_dir.rglob("*.json") if p.is_file())
+
+
+def _copy_character(source: CharacterStorage, target: CharacterStorage, character_id: str) -> None:
+    """Re-encode one character into another storage"""
+    target.import_character(
+        character_id,
+        source.load_input(character_id),
+        source.load_metadata(character_id),
+        source.load_character_kb(character_id),
+        checkpoints=source.load_all_checkpoints(character_id),
+        final_profile=source.load_final_profile(character_id)
+    )
+
+
+def measure(source_path: str) -> Dict[str, Dict[str, int]]:
+    """
+    Measure JSON bytes per character in every available format
+
+    Args:
+        source_path: Base directory of the JSON storage
+
+    Returns:
+        Dict of character_id → {"current": bytes, <format>: bytes, ...}
+    """
+    formats: List[str] = [f for f in STORAGE_FORMATS if f != "zstd" or ZSTD_AVAILABLE]
+    source = CharacterStorage(source_path, coalesce_seconds=0, cache_size=0)
+
+    sizes: Dict[str, Dict[str, int]] = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        targets = {
+            fmt: CharacterStorage(str(Path(tmp) / fmt), coalesce_seconds=0, cache_size=0, storage_format=fmt)
+            for fmt in formats
+        }
+        for character_id in source.list_characters():
+            try:
+                source.load_metadata(character_id)
+            except FileNotFoundError:
+                continue
+
+            sizes[character_id] = {"current": _json_bytes(source.base_path / character_id)}
+            for fmt, target in targets.items():
+                _copy_character(source, target, character_id)
+                sizes[character_id][fmt] = _json_bytes(target.base_path / character_id)
+
+    return sizes
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Report character storage size per format")
+    parser.add_argument("--source", default="./backend/character_data", help="JSON storage base directory")
+    parser.add_argument("--rewrite", choices=STORAGE_FORMATS, help="Convert the source corpus to this format in place")
+    args = parser.parse_args()
+
+    sizes = measure(args.source)
+    if not sizes:
+        print("No characters found")
+        return
+
+    formats = [f for f in next(iter(sizes.values())) if f != "current"]
+    print(f"{'character':<38} {'current':>10} " + " ".join(f"{fmt:>10}" for fmt in formats))
+    for character_id, row in sizes.items():
+        print(f"{character_id:<38} {row['current']:>10} " + " ".join(f"{row[fmt]:>10}" for fmt in formats))
+
+    totals = {key: sum(row[key] for row in sizes.values()) for key in ["current", *formats]}
+    print(f"{'TOTAL':<38} {totals['current']:>10} " + " ".join(f"{totals[fmt]:>10}" for fmt in formats))
+    for fmt in formats:
+        saved = totals["current"] - totals[fmt]
+        pct = 100 * saved / totals["current"] if totals["current"] else 0
+        print(f"  {fmt}: {saved} bytes saved ({pct:.1f}%), {saved // len(sizes)} bytes per character")
+
+    if args.rewrite:
+        source = CharacterStorage(args.source, coalesce_seconds=0, cache_size=0)
+        target = CharacterStorage(args.source, coalesce_seconds=0, cache_size=0, storage_format=args.rewrite)
+        for character_id in sizes:
+            _copy_character(source, target, character_id)
+        print(f"✓ Rewrote {len(sizes)} characters as {target.storage_format}")
+
+
+if __name__ == "__main__":
+    main()
@@ -8,17 +8,23 @@ Develops character's history and goals including:
 - Internal conflicts between competing desires
 """
 
-import json
+import time
 from typing import Tuple
-from anthropic import AsyncAnthropic  # FIX: Use AsyncAnthropic for async functions
+
+from providers.calls import call_anthropic
+from providers.clients import get_anthropic_client
+from providers.output_repair import repair_tool_output
+from providers.structured import forced_tool_choice
+from providers.usage import AgentRunInfo, usage_from_response
 
 from ..schemas import CharacterKnowledgeBase, BackstoryOutput, TimelineEvent
+from .context import OUTPUT_TOOLS, BACKSTORY_TOOL, cached_system_prompt
 
 
 async def backstory_motivation_agent(
     kb: CharacterKnowledgeBase,
     api_key: str
-) -> Tuple[BackstoryOutput, str]:
+) -> Tuple[BackstoryOutput, str, AgentRunInfo]:
     """
     Generate detailed backstory and motivation profile
 
@@ -27,38 +33,22 @@ async def backstory_motivation_agent(
         api_key: Anthropic API key
 
     Returns:
-        Tuple of (BackstoryOutput, narrative_description)
+        Tuple of (BackstoryOutput, narrative_description, run_info)
     """
-    client = AsyncAnthropic(api_key=api_key)  # FIX: Use AsyncAnthropic
+    started = time.perf_counter()
+    client = get_anthropic_client(api_key)  # Shared pooled client
     model = "claude-haiku-4-5-20251001"
 
     # Extract data
     character = kb["input_data"]["characters"][0]
-    storyline = kb["input_data"]["storyline"]
     mode = kb.get("mode", "balanced")
 
-    # Use personality data if available (Wave 1 agents run in parallel, might not be available)
-    personality_context = ""
-    if kb.get("personality"):
-        personality_context = f"""
-PERSONALITY INSIGHTS (from Personality Agent):
-- Core Traits: {", ".join(kb["personality"]["core_traits"])}
-- Fears: {", ".join(kb["personality"]["fears"])}
-- Secrets: {", ".join(kb["personality"]["secrets"])}
-
-Use these insights to inform backstory development."""
-
-    system_prompt = f"""You are a character development expert specializing in backstory and motivation for {storyline["tone"]} stories.
-
-Your task is to create a detailed backstory and motivation profile for this character.
+    # Agent-specific instructions (storyline, character and personality come from the cached prefix;
+    # Wave 1 agents run in parallel, so personality may not be available yet)
+    instructions = f"""You are a character development expert specializing in backstory and motivation for the story above.
 
-CHARACTER OVERVIEW:
-- Name: {character["name"]}
-- Basic Info: {character["personality"]}
-- Appearance: {character["appearance"]}
-- Role: {character["role"]}
-- Story Context: {storyline["overview"]}
-{personality_context}
+Your task is to create a detailed backstory and motivation profile for {character["name"]}.
+If personality insights are provided above, use them to inform backstory development.
 
 DEPTH MODE: {mode}
 {"Create essential timeline and motivations only." if mode == "fast" else ""}
@@ -96,70 +86,28 @@ IMPORTANT:
 - Connect backstory to personality traits
 - Create rich motivation beyond simple "good guy wants to save world"
 
-First, provide a rich NARRATIVE backstory (3-4 paragraphs covering their past, formative moments, and what drives them).
-Then, provide the STRUCTURED data in JSON format.
-
-Format:
-NARRATIVE:
-[Your narrative here]
-
-STRUCTURED:
-{{
-  "timeline": [
-    {{"age": 12, "event": "..."}},
-    {{"age": 18, "event": "..."}},
-    ...
-  ],
-  "formative_experiences": [
-    "Experience 1 and its impact...",
-    "Experience 2 and its impact...",
-    ...
-  ],
-  "goals": {{
-    "surface": "What they consciously pursue",
-    "deep": "What they truly need"
-  }},
-  "internal_conflicts": [
-    "Conflict 1",
-    "Conflict 2",
-    ...
-  ]
-}}"""
-
-    # Make API call (FIX: Add await for async client)
-    response = await client.messages.create(
+Write a rich NARRATIVE backstory (3-4 paragraphs covering their past, formative moments, and what drives them), then record it together with the structured data by calling the record_backstory tool."""
+
+    # Make API call (deadline, retry and hedging handled by call_anthropic)
+    response = await call_anthropic(
+        client,
+        "backstory_motivation",
         model=model,
         max_tokens=5000,
         temperature=0.7,
-        system=system_prompt,
+        system=cached_system_prompt(kb, "backstory_motivation", instructions),
+        tools=OUTPUT_TOOLS,  # Identical list in every agent keeps the cached prefix shared
+        tool_choice=forced_tool_choice(BACKSTORY_TOOL),
         messages=[{
             "role": "user",
             "content": f"Create a detailed backstory and motivation profile for {character['name']}. Provide both narrative and structured output."
         }]
     )
 
-    # Parse response
-    content = response.content[0].text
-
-    # Split narrative and structured
-    parts = content.split("STRUCTURED:")
-    if len(parts) == 2:
-        narrative = parts[0].replace("NARRATIVE:", "").strip()
-        structured_text = parts[1].strip()
-    else:
-        narrative = content[:content.find("{")].strip() if "{" in content else content
-        structured_text = content[content.find("{"):content.rfind("}")+1] if "{" in content else "{}"
-
-    # Parse JSON
-    try:
-        if "```json" in structured_text:
-            structured_text = structured_text.split("```json")[1].split("```")[0]
-        elif "```" in structured_text:
-            structured_text = structured_text.split("```")[1].split("```")[0]
-
-        structured_data = json.loads(structured_text)
-    except json.JSONDecodeError as e:
-        print(f"Warning: Failed to parse backstory JSON: {e}")
+    # Structured data arrives already parsed as the tool input (malformed output is repaired first)
+    narrative, structured_data, repair = await repair_tool_output(client, "backstory_motivation", response, BACKSTORY_TOOL)
+    parse_fallback = structured_data is None
+    if structured_data is None:
         structured_data = {
             "timeline": [{"age": 20, "event": "Significant event"}],
             "formative_experiences": ["Key experience"],
@@ -175,4 +123,15 @@ STRUCTURED:
         "internal_conflicts": structured_data.get("internal_conflicts", [])
     }
 
-    return backstory_output, narrative
+    # Measured usage and latency for this run
+    run_info: AgentRunInfo = {
+        "model": model,
+        "usage": usage_from_response(response),
+        "wall_time_seconds": time.perf_counter() - started,
+        "api_calls": 1,
+        "parse_fallback": parse_fallback,
+        "output_repair": repair["stage"],
+        "repair": repair["run_info"]
+    }
+
+    return backstory_output, narrative, run_info
@@ -0,0 +1,221 @@
+"""
+Shared, cacheable prompt context for the text sub-agents
+
+Every text sub-agent needs the same storyline, the same character and the
+same upstream outputs; only its instructions differ. System prompts are
+therefore built as a stable prefix followed by a small agent-specific
+suffix, with prompt-cache breakpoints inside the prefix:
+
+    [storyline or its digest]        ← breakpoint: shared by every character of a batch
+    [character]                      ← breakpoint: shared by all of one character's agents
+    [upstream outputs, AGENT_ORDER]  ← breakpoint on the last one
+    [agent instructions + depth mode]  (not cached)
+
+Tools precede the system prompt in the cached prefix, so every agent sends
+the same OUTPUT_TOOLS list and selects its own tool with tool_choice.
+
+Blocks are rendered deterministically (sorted keys, compact JSON) so the
+same input always produces byte-identical prefixes. Each upstream output is
+one block holding only the structured fields the dependent agent reads
+(UPSTREAM_FIELDS in dependencies.py), so narrative-heavy fields such as
+formative experiences or transformation beats are not re-sent to agents
+that ignore them.
+Prefixes shorter than the model's minimum cacheable length are simply sent
+uncached.
+
+Long storylines are replaced by their shared digest (see storyline_digest.py)
+when the knowledge base carries one.
+"""
+
+import json
+import os
+from typing import Any, Dict, List
+
+from providers.structured import output_tool
+
+from ..dependencies import consumed_upstream
+from ..schemas import (
+    BackstoryOutput,
+    CharacterInput,
+    CharacterKnowledgeBase,
+    PersonalityOutput,
+    PhysicalOutput,
+    RelationshipsOutput,
+    StoryArcOutput,
+    StorylineInput,
+    VoiceOutput,
+)
+
+
+PROMPT_CACHE_ENABLED = os.getenv("PROMPT_CACHE_ENABLED", "true").lower() == "true"
+# "5m" (default, cheaper writes) or "1h" (long batches with gaps between characters)
+PROMPT_CACHE_TTL = os.getenv("PROMPT_CACHE_TTL", "5m")
+
+# Section titles for upstream outputs in the shared prefix
+UPSTREAM_TITLES: Dict[str, str] = {
+    "personality": "PERSONALITY (from Personality Agent)",
+    "backstory_motivation": "BACKSTORY & MOTIVATION (from Backstory Agent)",
+    "voice_dialogue": "VOICE & DIALOGUE (from Voice Agent)",
+    "physical_description": "PHYSICAL PRESENCE (from Physical Description Agent)",
+    "story_arc": "STORY ARC (from Story Arc Agent)",
+    "relationships": "RELATIONSHIPS (from Relationships Agent)",
+}
+
+
+# Output tools: each agent's structured output arrives as its tool's input
+# (schemas generated from the output TypedDicts)
+PERSONALITY_TOOL = output_tool(
+    "record_personality",
+    "Record the character's personality profile",
+    PersonalityOutput,
+    narrative="Rich narrative description of the character's psychology (2-3 paragraphs)"
+)
+
+BACKSTORY_TOOL = output_tool(
+    "record_backstory",
+    "Record the character's backstory and motivation profile",
+    BackstoryOutput,
+    narrative="Rich narrative backstory (3-4 paragraphs covering the character's past, formative moments, and what drives them)"
+)
+
+VOICE_TOOL = output_tool(
+    "record_voice",
+    "Record the character's voice and dialogue profile",
+    VoiceOutput,
+    narrative="Rich narrative description of the character's voice (2-3 paragraphs explaining how they sound and why)"
+)
+
+PHYSICAL_TOOL = output_tool(
+    "record_physical_presence",
+    "Record the character's physical presence profile",
+    PhysicalOutput,
+    narrative="Rich narrative description of the character's physical presence (2-3 paragraphs explaining how they move and why)"
+)
+
+STORY_ARC_TOOL = output_tool(
+    "record_story_arc",
+    "Record the character's story arc",
+    StoryArcOutput,
+    narrative="Rich narrative description of the character's story arc (2-3 paragraphs explaining their transformation and role)"
+)
+
+RELATIONSHIPS_TOOL = output_tool(
+    "record_relationships",
+    "Record the character's relationships",
+    RelationshipsOutput,
+    narrative="Rich narrative description of the character's relationship patterns and key connections (2-3 paragraphs)"
+)
+
+# Sent unchanged by every text agent, which forces its own tool. Tools come
+# before the system prompt in the cache prefix, so a per-agent list would
+# keep agents from reusing each other's cache entries.
+OUTPUT_TOOLS: List[Dict[str, Any]] = [
+    PERSONALITY_TOOL,
+    BACKSTORY_TOOL,
+    VOICE_TOOL,
+    PHYSICAL_TOOL,
+    STORY_ARC_TOOL,
+    RELATIONSHIPS_TOOL,
+]
+
+
+def _cache_control() -> Dict[str, str]:
+    control = {"type": "ephemeral"}
+    if PROMPT_CACHE_TTL != "5m":
+        control["ttl"] = PROMPT_CACHE_TTL
+    return control
+
+
+def _render_json(value: Any) -> str:
+    return json.dumps(value, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+
+
+def storyline_context(storyline: StorylineInput) -> str:
+    """Storyline section of the shared prefix"""
+    lines = [
+        "STORYLINE:",
+        f"- Overview: {storyline['overview']}",
+        f"- Tone: {storyline['tone']}",
+    ]
+    scenes = storyline.get("scenes", [])
+    if scenes:
+        lines.append("- Scenes:")
+        for index, scene in enumerate(scenes, start=1):
+            if isinstance(scene, dict):
+                title = scene.get("title") or "Untitled"
+                lines.append(f"  {index}. {title}: {scene.get('description', '')}")
+                for key in ("setting", "mood"):
+                    if scene.get(key):
+                        lines.append(f"     {key.capitalize()}: {scene[key]}")
+                if scene.get("characters_involved"):
+                    lines.append(f"     Characters: {', '.join(scene['characters_involved'])}")
+            else:
+                lines.append(f"  {index}. {scene}")
+    return "\n".join(lines)
+
+
+def character_context(character: CharacterInput) -> str:
+    """Character section of the shared prefix"""
+    lines = [
+        "CHARACTER OVERVIEW:",
+        f"- Name: {character['name']}",
+        f"- Role: {character['role']}",
+    ]
+    if character.get("importance"):
+        lines.append(f"- Importance: {character['importance']}")
+    lines.append(f"- Basic Personality: {character['personality']}")
+    lines.append(f"- Appearance: {character['appearance']}")
+    return "\n".join(lines)
+
+
+def upstream_contexts(kb: CharacterKnowledgeBase, agent_name: str) -> List[str]:
+    """
+    Upstream output sections an agent reads, in execution order
+
+    Uses the same selection as compute_input_hash() (consumed_upstream():
+    declared dependencies present in the KB, reduced to their
+    UPSTREAM_FIELDS), so input hashes and stale-marking stay accurate.
+    """
+    return [
+        f"{UPSTREAM_TITLES[upstream]}:\n{_render_json(consumed)}"
+        for upstream, consumed in consumed_upstream(kb, agent_name).items()
+        if consumed is not None
+    ]
+
+
+def cached_system_prompt(
+    kb: CharacterKnowledgeBase,
+    agent_name: str,
+    instructions: str
+) -> List[Dict[str, Any]]:
+    """
+    Build an agent's system prompt as cacheable content blocks
+
+    Args:
+        kb: Character knowledge base
+        agent_name: Agent the prompt is for (selects upstream outputs)
+        instructions: Agent-specific task, depth mode and output format
+
+    Returns:
+        System content blocks for messages.create()
+    """
+    character = kb["input_data"]["characters"][0]
+    storyline = kb["input_data"]["storyline"]
+
+    prefix = [
+        [kb.get("storyline_digest") or storyline_context(storyline)],
+        [character_context(character)],
+    ]
+    upstream = upstream_contexts(kb, agent_name)
+    if upstream:
+        prefix.append(upstream)
+
+    blocks: List[Dict[str, Any]] = []
+    for group in prefix:
+        for text in group:
+            blocks.append({"type": "text", "text": text})
+        if PROMPT_CACHE_ENABLED:
+            blocks[-1]["cache_control"] = _cache_control()
+
+    blocks.append({"type": "text", "text": instructions})
+    return blocks
@@ -11,31 +11,37 @@ Generates character images using Google Gemini API including:
 import os
 import base64
 import json
+import time
 from typing import Tuple, List
-from google import genai
 from google.genai import types
 
+from providers.calls import call_gemini
+from providers.clients import get_gemini_client
+from providers.usage import AgentRunInfo, add_usage, empty_usage, usage_from_response
+
 from ..schemas import CharacterKnowledgeBase, ImageGenerationOutput, GeneratedImage
 
 
 async def image_generation_agent(
     kb: CharacterKnowledgeBase,
     api_key: str,
-    storage  # CharacterStorage instance
-) -> Tuple[ImageGenerationOutput, str]:
+    storage  # AsyncCharacterStorage instance
+) -> Tuple[ImageGenerationOutput, str, AgentRunInfo]:
     """
     Generate character images using Gemini API
 
     Args:
         kb: Character knowledge base (requires all previous outputs)
         api_key: Google Gemini API key
-        storage: CharacterStorage instance for saving images
+        storage: AsyncCharacterStorage instance for saving images (off the event loop)
 
     Returns:
-        Tuple of (ImageGenerationOutput, narrative_description)
+        Tuple of (ImageGenerationOutput, narrative_description, run_info)
     """
-    # Initialize Gemini client (NEW API)
-    client = genai.Client(api_key=api_key)
+    started = time.perf_counter()
+
+    # Shared Gemini client (connections reused across calls)
+    client = get_gemini_client(api_key)
 
     # Extract comprehensive character data
     character = kb["input_data"]["characters"][0]
@@ -147,13 +153,18 @@ Intimate, emotionally revealing."""
     # Generate images using Gemini (NEW API)
     generated_images: List[GeneratedImage] = []
     model_name = "gemini-2.5-flash-image"  # Updated model for image generation
+    usage = empty_usage()
+    api_calls = 0
 
     for image_type, prompt, aspect_ratio in image_prompts:
         try:
             print(f"Generating {image_type} image...")
 
-            # Generate image using Gemini NEW API
-            response = client.models.generate_content(
+            # Generate image using Gemini async API (deadline + retry via call_gemini)
+            api_calls += 1
+            response = await call_gemini(
+                client,
+                "image_generation",
                 model=model_name,
                 contents=prompt,
                 config=types.GenerateContentConfig(
@@ -161,6 +172,7 @@ Intimate, emotionally revealing."""
                     response_mime_type="image/png"
                 )
             )
+            add_usage(usage, usage_from_response(response))
 
             # Extract image data from response (NEW API structure)
             if response.candidates and len(response.candidates) > 0:
@@ -178,7 +190,7 @@ Intimate, emotionally revealing."""
                                 image_bytes = image_data
 
                             # Save image using storage
-                            image_path = storage.save_image(
+                            image_path = await storage.save_image(
                                 kb["character_id"],
                                 image_type,
                                 image_bytes
@@ -223,4 +235,12 @@ All images maintain visual consistency with {style_profile.lower()} aesthetic, s
         "style_profile": style_profile
     }
 
-    return image_output, narrative
+    # Measured usage and latency across all image calls
+    run_info: AgentRunInfo = {
+        "model": model_name,
+        "usage": usage,
+        "wall_time_seconds": time.perf_counter() - started,
+        "api_calls": api_calls
+    }
+
+    return image_output, narrative, run_info
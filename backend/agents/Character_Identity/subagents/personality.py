@@ -9,16 +9,23 @@ Analyzes and expands character's core psychological makeup including:
 """
 
 import os
+import time
 from typing import Dict, Tuple
-from anthropic import AsyncAnthropic  # FIX: Use AsyncAnthropic for async functions
+
+from providers.calls import call_anthropic
+from providers.clients import get_anthropic_client
+from providers.output_repair import repair_tool_output
+from providers.structured import forced_tool_choice
+from providers.usage import AgentRunInfo, usage_from_response
 
 from ..schemas import CharacterKnowledgeBase, PersonalityOutput
+from .context import OUTPUT_TOOLS, PERSONALITY_TOOL, cached_system_prompt
 
 
 async def personality_agent(
     kb: CharacterKnowledgeBase,
     api_key: str
-) -> Tuple[PersonalityOutput, str]:
+) -> Tuple[PersonalityOutput, str, AgentRunInfo]:
     """
     Generate detailed personality profile
 
@@ -27,29 +34,21 @@ async def personality_agent(
         api_key: Anthropic API key
 
     Returns:
-        Tuple of (PersonalityOutput, narrative_description)
+        Tuple of (PersonalityOutput, narrative_description, run_info)
     """
-    client = AsyncAnthropic(api_key=api_key)  # FIX: Use AsyncAnthropic
+    started = time.perf_counter()
+    client = get_anthropic_client(api_key)  # Shared pooled client
     model = "claude-haiku-4-5-20251001"  # Using Haiku for speed + cost efficiency
 
     # Extract character info from input
     character = kb["input_data"]["characters"][0]
-    storyline = kb["input_data"]["storyline"]
     mode = kb.get("mode", "balanced")
 
-    # Build system prompt
-    system_prompt = f"""You are a character psychology expert analyzing a character for a {storyline["tone"]} story.
+    # Agent-specific instructions (storyline and character come from the cached prefix)
+    instructions = f"""You are a character psychology expert analyzing {character["name"]} for the story above.
 
 Your task is to expand the character's personality into a comprehensive psychological profile.
 
-CHARACTER OVERVIEW:
-- Name: {character["name"]}
-- Basic Personality: {character["personality"]}
-- Appearance: {character["appearance"]}
-- Role: {character["role"]}
-- Story Context: {storyline["overview"]}
-- Tone: {storyline["tone"]}
-
 DEPTH MODE: {mode}
 {"Focus on essential psychological elements only." if mode == "fast" else ""}
 {"Provide comprehensive analysis with depth and nuance." if mode == "deep" else ""}
@@ -85,64 +84,32 @@ Generate a detailed personality analysis including:
 
 IMPORTANT:
 - Make it SPECIFIC to this character, not generic
-- Consider their backstory ({character.get("personality", "")})
+- Build on their basic personality from the character overview
 - Ensure psychological depth and complexity
 - Make traits interconnected and coherent
 
-First, provide a rich NARRATIVE description of their psychology (2-3 paragraphs).
-Then, provide the STRUCTURED data in JSON format.
-
-Format:
-NARRATIVE:
-[Your narrative here]
+Write a rich NARRATIVE description of their psychology (2-3 paragraphs), then record it together with the structured data by calling the record_personality tool."""
 
-STRUCTURED:
-{{
-  "core_traits": ["trait1", "trait2", ...],
-  "fears": ["fear1", "fear2", ...],
-  "secrets": ["secret1", "secret2", ...],
-  "emotional_baseline": "description",
-  "triggers": ["trigger1", "trigger2", ...]
-}}"""
-
-    # Make API call (FIX: Add await for async client)
-    response = await client.messages.create(
+    # Make API call (deadline, retry and hedging handled by call_anthropic)
+    response = await call_anthropic(
+        client,
+        "personality",
         model=model,
         max_tokens=4000,
         temperature=0.7,
-        system=system_prompt,
+        system=cached_system_prompt(kb, "personality", instructions),
+        tools=OUTPUT_TOOLS,  # Identical list in every agent keeps the cached prefix shared
+        tool_choice=forced_tool_choice(PERSONALITY_TOOL),
         messages=[{
             "role": "user",
             "content": f"Analyze {character['name']}'s personality in depth. Provide both narrative and structured output."
         }]
     )
 
-    # Parse response
-    content = response.content[0].text
-
-    # Split narrative and structured
-    parts = content.split("STRUCTURED:")
-    if len(parts) == 2:
-        narrative = parts[0].replace("NARRATIVE:", "").strip()
-        structured_text = parts[1].strip()
-    else:
-        # Fallback if format not followed
-        narrative = content[:content.find("{")].strip() if "{" in content else content
-        structured_text = content[content.find("{"):content.rfind("}")+1] if "{" in content else "{}"
-
-    # Parse JSON
-    import json
-    try:
-        # Extract JSON from markdown code blocks if present
-        if "```json" in structured_text:
-            structured_text = structured_text.split("```json")[1].split("```")[0]
-        elif "```" in structured_text:
-            structured_text = structured_text.split("```")[1].split("```")[0]
-
-        structured_data = json.loads(structured_text)
-    except json.JSONDecodeError as e:
-        # Fallback to basic structure
-        print(f"Warning: Failed to parse personality JSON: {e}")
+    # Structured data arrives already parsed as the tool input (malformed output is repaired first)
+    narrative, structured_data, repair = await repair_tool_output(client, "personality", response, PERSONALITY_TOOL)
+    parse_fallback = structured_data is None
+    if structured_data is None:
         structured_data = {
             "core_traits": ["complex", "conflicted"],
             "fears": ["unknown"],
@@ -160,4 +127,15 @@ STRUCTURED:
         "triggers": structured_data.get("triggers", [])
     }
 
-    return personality_output, narrative
+    # Measured usage and latency for this run
+    run_info: AgentRunInfo = {
+        "model": model,
+        "usage": usage_from_response(response),
+        "wall_time_seconds": time.perf_counter() - started,
+        "api_calls": 1,
+        "parse_fallback": parse_fallback,
+        "output_repair": repair["stage"],
+        "repair": repair["run_info"]
+    }
+
+    return personality_output, narrative, run_info
@@ -8,17 +8,23 @@ Develops character's embodied movement and physicality including:
 - Movement patterns and how they inhabit space
 """
 
-import json
+import time
 from typing import Tuple
-from anthropic import AsyncAnthropic  # FIX: Use AsyncAnthropic for async functions
+
+from providers.calls import call_anthropic
+from providers.clients import get_anthropic_client
+from providers.output_repair import repair_tool_output
+from providers.structured import forced_tool_choice
+from providers.usage import AgentRunInfo, usage_from_response
 
 from ..schemas import CharacterKnowledgeBase, PhysicalOutput
+from .context import OUTPUT_TOOLS, PHYSICAL_TOOL, cached_system_prompt
 
 
 async def physical_description_agent(
     kb: CharacterKnowledgeBase,
     api_key: str
-) -> Tuple[PhysicalOutput, str]:
+) -> Tuple[PhysicalOutput, str, AgentRunInfo]:
     """
     Generate detailed physical presence and movement profile
 
@@ -27,46 +33,22 @@ async def physical_description_agent(
         api_key: Anthropic API key
 
     Returns:
-        Tuple of (PhysicalOutput, narrative_description)
+        Tuple of (PhysicalOutput, narrative_description, run_info)
     """
-    client = AsyncAnthropic(api_key=api_key)  # FIX: Use AsyncAnthropic
+    started = time.perf_counter()
+    client = get_anthropic_client(api_key)  # Shared pooled client
     model = "claude-haiku-4-5-20251001"
 
     # Extract data
     character = kb["input_data"]["characters"][0]
-    storyline = kb["input_data"]["storyline"]
     mode = kb.get("mode", "balanced")
 
-    # Build context from previous outputs
-    personality_context = ""
-    if kb.get("personality"):
-        p = kb["personality"]
-        personality_context = f"""
-PERSONALITY:
-- Traits: {", ".join(p["core_traits"])}
-- Fears: {", ".join(p["fears"])}
-- Triggers: {", ".join(p["triggers"])}
-(These should influence body language and physical habits)"""
-
-    backstory_context = ""
-    if kb.get("backstory_motivation"):
-        b = kb["backstory_motivation"]
-        timeline_summary = ", ".join([f"{e.get('age', 'Unknown')}: {e.get('event', '')[:50]}" for e in b["timeline"][:3]])
-        backstory_context = f"""
-KEY BACKSTORY EVENTS:
-{timeline_summary}
-(Past experiences shape physical habits and posture)"""
-
-    system_prompt = f"""You are a physical movement and body language expert creating a character's unique physical presence for a {storyline["tone"]} story.
+    # Agent-specific instructions (storyline, character and Wave 1 outputs come from the cached prefix)
+    instructions = f"""You are a physical movement and body language expert creating {character["name"]}'s unique physical presence for the story above.
 
 Your task is to define HOW this character MOVES, their physical habits, and how they inhabit space.
-
-CHARACTER OVERVIEW:
-- Name: {character["name"]}
-- Basic Appearance: {character["appearance"]}
-- Role: {character["role"]}
-{personality_context}
-{backstory_context}
+Their personality (traits, fears, triggers) should influence body language and physical habits;
+past experiences from their backstory shape habits and posture.
 
 DEPTH MODE: {mode}
 
@@ -104,63 +86,28 @@ IMPORTANT:
 - Consider backstory impact (e.g., former soldier → military posture)
 - Avoid clichés - make it distinctive
 
-First, provide a rich NARRATIVE description of their physical presence (2-3 paragraphs explaining how they move and why).
-Then, provide the STRUCTURED data in JSON format.
-
-Format:
-NARRATIVE:
-[Your narrative here]
-
-STRUCTURED:
-{{
-  "mannerisms": [
-    "Specific mannerism 1",
-    "Specific mannerism 2",
-    ...
-  ],
-  "body_language": "Detailed description of posture and presence...",
-  "movement_style": "Description of how they move through space...",
-  "physical_quirks": [
-    "Quirk 1",
-    "Quirk 2",
-    ...
-  ]
-}}"""
-
-    # Make API call (FIX: Add await for async client)
-    response = await client.messages.create(
+Write a rich NARRATIVE description of their physical presence (2-3 paragraphs explaining how they move and why), then record it together with the structured data by calling the record_physical_presence tool."""
+
+    # Make API call (deadline, retry and hedging handled by call_anthropic)
+    response = await call_anthropic(
+        client,
+        "physical_description",
         model=model,
         max_tokens=4000,
         temperature=0.7,
-        system=system_prompt,
+        system=cached_system_prompt(kb, "physical_description", instructions),
+        tools=OUTPUT_TOOLS,  # Identical list in every agent keeps the cached prefix shared
+        tool_choice=forced_tool_choice(PHYSICAL_TOOL),
         messages=[{
             "role": "user",
             "content": f"Create a detailed physical presence profile for {character['name']}. Provide both narrative and structured output."
         }]
     )
 
-    # Parse response
-    content = response.content[0].text
-
-    # Split narrative and structured
-    parts = content.split("STRUCTURED:")
-    if len(parts) == 2:
-        narrative = parts[0].replace("NARRATIVE:", "").strip()
-        structured_text = parts[1].strip()
-    else:
-        narrative = content[:content.find("{")].strip() if "{" in content else content
-        structured_text = content[content.find("{"):content.rfind("}")+1] if "{" in content else "{}"
-
-    # Parse JSON
-    try:
-        if "```json" in structured_text:
-            structured_text = structured_text.split("```json")[1].split("```")[0]
-        elif "```" in structured_text:
-            structured_text = structured_text.split("```")[1].split("```")[0]
-
-        structured_data = json.loads(structured_text)
-    except json.JSONDecodeError as e:
-        print(f"Warning: Failed to parse physical JSON: {e}")
+    # Structured data arrives already parsed as the tool input (malformed output is repaired first)
+    narrative, structured_data, repair = await repair_tool_output(client, "physical_description", response, PHYSICAL_TOOL)
+    parse_fallback = structured_data is None
+    if structured_data is None:
         structured_data = {
             "mannerisms": ["Unknown mannerism"],
             "body_language": "Unknown",
@@ -176,4 +123,15 @@ STRUCTURED:
         "physical_quirks": structured_data.get("physical_quirks", [])
     }
 
-    return physical_output, narrative
+    # Measured usage and latency for this run
+    run_info: AgentRunInfo = {
+        "model": model,
+        "usage": usage_from_response(response),
+        "wall_time_seconds": time.perf_counter() - started,
+        "api_calls": 1,
+        "parse_fallback": parse_fallback,
+        "output_repair": repair["stage"],
+        "repair": repair["run_info"]
+    }
+
+    return physical_output, narrative, run_info
@@ -8,17 +8,23 @@ Develops character's interpersonal connections including:
 - How they behave differently with different people
 """
 
-import json
+import time
 from typing import Tuple, List
-from anthropic import AsyncAnthropic  # FIX: Use AsyncAnthropic for async functions
+
+from providers.calls import call_anthropic
+from providers.clients import get_anthropic_client
+from providers.output_repair import repair_tool_output
+from providers.structured import forced_tool_choice
+from providers.usage import AgentRunInfo, usage_from_response
 
 from ..schemas import CharacterKnowledgeBase, RelationshipsOutput, Relationship
+from .context import OUTPUT_TOOLS, RELATIONSHIPS_TOOL, cached_system_prompt
 
 
 async def relationships_agent(
     kb: CharacterKnowledgeBase,
     api_key: str
-) -> Tuple[RelationshipsOutput, str]:
+) -> Tuple[RelationshipsOutput, str, AgentRunInfo]:
     """
     Generate detailed relationship dynamics profile
 
@@ -27,61 +33,21 @@ async def relationships_agent(
         api_key: Anthropic API key
 
     Returns:
-        Tuple of (RelationshipsOutput, narrative_description)
+        Tuple of (RelationshipsOutput, narrative_description, run_info)
     """
-    client = AsyncAnthropic(api_key=api_key)  # FIX: Use AsyncAnthropic
+    started = time.perf_counter()
+    client = get_anthropic_client(api_key)  # Shared pooled client
     model = "claude-haiku-4-5-20251001"
 
     # Extract data
     character = kb["input_data"]["characters"][0]
-    storyline = kb["input_data"]["storyline"]
     mode = kb.get("mode", "balanced")
 
-    # Build comprehensive context from all previous outputs
-    context_blocks = []
-
-    if kb.get("personality"):
-        p = kb["personality"]
-        context_blocks.append(f"""PERSONALITY:
-- Traits: {", ".join(p["core_traits"])}
-- Fears: {", ".join(p["fears"])} (affects trust and relationships)
-- Triggers: {", ".join(p["triggers"])}""")
-
-    if kb.get("backstory_motivation"):
-        b = kb["backstory_motivation"]
-
-        # Handle both old (List[str]) and new (List[InternalConflict]) formats for internal_conflicts
-        if b["internal_conflicts"] and isinstance(b["internal_conflicts"][0], dict):
-            # New format: List[InternalConflict] with "conflict" and "description" keys
-            conflicts_str = ", ".join([ic["conflict"] for ic in b["internal_conflicts"]])
-        else:
-            # Old format: List[str]
-            conflicts_str = ", ".join(b["internal_conflicts"])
-
-        context_blocks.append(f"""BACKSTORY:
-- Key Events: {", ".join([e.get("event", "")[:60] for e in b["timeline"][:3]])}
-- Internal Conflicts: {conflicts_str}
-(Past shapes relationship patterns)""")
-
-    if kb.get("story_arc"):
-        sa = kb["story_arc"]
-        context_blocks.append(f"""STORY ARC:
-- Role: {sa["role"]}
-- Arc Type: {sa["arc_type"]}
-(Relationships should support this narrative arc)""")
-
-    full_context = "\n\n".join(context_blocks)
-
-    system_prompt = f"""You are a relationship dynamics expert creating a character's interpersonal connections for a {storyline["tone"]} story.
+    # Agent-specific instructions (storyline, character and upstream outputs come from the cached prefix)
+    instructions = f"""You are a relationship dynamics expert creating {character["name"]}'s interpersonal connections for the story above.
 
 Your task is to define this character's KEY RELATIONSHIPS and how they interact with others.
-
-CHARACTER OVERVIEW:
-- Name: {character["name"]}
-- Role: {character["role"]}
-- Story Context: {storyline["overview"]}
-
-{full_context}
+Their fears affect trust, their past shapes relationship patterns, and relationships should support their story arc.
 
 DEPTH MODE: {mode}
 
@@ -119,60 +85,28 @@ NOTE: Since other characters may not be fully developed yet, you can use placeho
 - "The Mentor (TBD - unnamed)" if their mentor hasn't been created
 - But still define the DYNAMIC and EVOLUTION based on this character's needs
 
-First, provide a rich NARRATIVE description of their relationship patterns and key connections (2-3 paragraphs).
-Then, provide the STRUCTURED data in JSON format.
-
-Format:
-NARRATIVE:
-[Your narrative here]
-
-STRUCTURED:
-{{
-  "relationships": [
-    {{
-      "character": "Name or TBD with description",
-      "type": "relationship_type",
-      "dynamic": "Detailed description of interaction...",
-      "evolution": "How relationship changes..."
-    }},
-    ...
-  ]
-}}"""
-
-    # Make API call (FIX: Add await for async client)
-    response = await client.messages.create(
+Write a rich NARRATIVE description of their relationship patterns and key connections (2-3 paragraphs), then record it together with the structured data by calling the record_relationships tool."""
+
+    # Make API call (deadline, retry and hedging handled by call_anthropic)
+    response = await call_anthropic(
+        client,
+        "relationships",
         model=model,
         max_tokens=4500,
         temperature=0.7,
-        system=system_prompt,
+        system=cached_system_prompt(kb, "relationships", instructions),
+        tools=OUTPUT_TOOLS,  # Identical list in every agent keeps the cached prefix shared
+        tool_choice=forced_tool_choice(RELATIONSHIPS_TOOL),
         messages=[{
             "role": "user",
             "content": f"Create a detailed relationships profile for {character['name']}. Provide both narrative and structured output."
         }]
     )
 
-    # Parse response
-    content = response.content[0].text
-
-    # Split narrative and structured
-    parts = content.split("STRUCTURED:")
-    if len(parts) == 2:
-        narrative = parts[0].replace("NARRATIVE:", "").strip()
-        structured_text = parts[1].strip()
-    else:
-        narrative = content[:content.find("{")].strip() if "{" in content else content
-        structured_text = content[content.find("{"):content.rfind("}")+1] if "{" in content else "{}"
-
-    # Parse JSON
-    try:
-        if "```json" in structured_text:
-            structured_text = structured_text.split("```json")[1].split("```")[0]
-        elif "```" in structured_text:
-            structured_text = structured_text.split("```")[1].split("```")[0]
-
-        structured_data = json.loads(structured_text)
-    except json.JSONDecodeError as e:
-        print(f"Warning: Failed to parse relationships JSON: {e}")
+    # Structured data arrives already parsed as the tool input (malformed output is repaired first)
+    narrative, structured_data, repair = await repair_tool_output(client, "relationships", response, RELATIONSHIPS_TOOL)
+    parse_fallback = structured_data is None
+    if structured_data is None:
         structured_data = {
             "relationships": [
                 {
@@ -189,4 +123,15 @@ STRUCTURED:
         "relationships": structured_data.get("relationships", [])
     }
 
-    return relationships_output, narrative
+    # Measured usage and latency for this run
+    run_info: AgentRunInfo = {
+        "model": model,
+        "usage": usage_from_response(response),
+        "wall_time_seconds": time.perf_counter() - started,
+        "api_calls": 1,
+        "parse_fallback": parse_fallback,
+        "output_repair": repair["stage"],
+        "repair": repair["run_info"]
+    }
+
+    return relationships_output, narrative, run_info
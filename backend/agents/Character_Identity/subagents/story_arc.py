@@ -8,17 +8,23 @@ Develops character's narrative function and transformation including:
 - How they fit into overall plot structure
 """
 
-import json
+import time
 from typing import Tuple
-from anthropic import AsyncAnthropic  # FIX: Use AsyncAnthropic for async functions
+
+from providers.calls import call_anthropic
+from providers.clients import get_anthropic_client
+from providers.output_repair import repair_tool_output
+from providers.structured import forced_tool_choice
+from providers.usage import AgentRunInfo, usage_from_response
 
 from ..schemas import CharacterKnowledgeBase, StoryArcOutput, TransformationBeat
+from .context import OUTPUT_TOOLS, STORY_ARC_TOOL, cached_system_prompt
 
 
 async def story_arc_agent(
     kb: CharacterKnowledgeBase,
     api_key: str
-) -> Tuple[StoryArcOutput, str]:
+) -> Tuple[StoryArcOutput, str, AgentRunInfo]:
     """
     Generate detailed story arc and narrative function profile
 
@@ -27,58 +33,21 @@ async def story_arc_agent(
         api_key: Anthropic API key
 
     Returns:
-        Tuple of (StoryArcOutput, narrative_description)
+        Tuple of (StoryArcOutput, narrative_description, run_info)
     """
-    client = AsyncAnthropic(api_key=api_key)  # FIX: Use AsyncAnthropic
+    started = time.perf_counter()
+    client = get_anthropic_client(api_key)  # Shared pooled client
     model = "claude-haiku-4-5-20251001"
 
     # Extract data
     character = kb["input_data"]["characters"][0]
-    storyline = kb["input_data"]["storyline"]
     mode = kb.get("mode", "balanced")
 
-    # Build rich context from all previous outputs
-    context_blocks = []
-
-    if kb.get("personality"):
-        p = kb["personality"]
-        context_blocks.append(f"""PERSONALITY:
-- Core Traits: {", ".join(p["core_traits"])}
-- Fears: {", ".join(p["fears"])}
-- Internal State: {p["emotional_baseline"]}""")
-
-    if kb.get("backstory_motivation"):
-        b = kb["backstory_motivation"]
-        # Handle internal_conflicts safely - can be list of strings or dicts
-        conflicts = b.get("internal_conflicts", [])
-        if conflicts and isinstance(conflicts[0], dict):
-            conflict_str = ", ".join([str(c) for c in conflicts])
-        else:
-            conflict_str = ", ".join(conflicts) if conflicts else "None specified"
-
-        context_blocks.append(f"""MOTIVATION:
-- Surface Goal: {b["goals"].get("surface", "Unknown")}
-- Deep Need: {b["goals"].get("deep", "Unknown")}
-- Internal Conflicts: {conflict_str}""")
-
-    full_context = "\n\n".join(context_blocks)
-
-    system_prompt = f"""You are a narrative structure expert designing a character's story arc for a {storyline["tone"]} story.
+    # Agent-specific instructions (storyline, character and Wave 1 outputs come from the cached prefix)
+    instructions = f"""You are a narrative structure expert designing {character["name"]}'s story arc for the story above.
 
 Your task is to define this character's NARRATIVE FUNCTION and TRANSFORMATION ARC throughout the story.
-
-CHARACTER OVERVIEW:
-- Name: {character["name"]}
-- Basic Role: {character["role"]}
-- Story Context: {storyline["overview"]}
-- Story Tone: {storyline["tone"]}
-- Scenes in Story: {", ".join([
-    scene.get('title', scene.get('description', 'Untitled')[:50] + '...' if len(scene.get('description', '')) > 50 else scene.get('description', 'Untitled'))
-    if isinstance(scene, dict) else scene
-    for scene in storyline.get("scenes", [])[:5]
-])}
-
-{full_context}
+Ground the arc in their personality, surface goal, deep need and internal conflicts, and place it in the story's scenes.
 
 DEPTH MODE: {mode}
 
@@ -111,59 +80,28 @@ IMPORTANT:
 - Ensure arc aligns with personality and motivation
 - Consider story tone when defining arc type
 
-First, provide a rich NARRATIVE description of their story arc (2-3 paragraphs explaining their transformation and role).
-Then, provide the STRUCTURED data in JSON format.
-
-Format:
-NARRATIVE:
-[Your narrative here]
-
-STRUCTURED:
-{{
-  "role": "Specific role classification",
-  "arc_type": "Specific arc type",
-  "transformation_beats": [
-    {{"act": 1, "beat": "Description..."}},
-    {{"act": 2, "beat": "Description..."}},
-    ...
-  ],
-  "scene_presence": ["Scene 1", "Scene 2", ...]
-}}"""
-
-    # Make API call (FIX: Add await for async client)
-    response = await client.messages.create(
+Write a rich NARRATIVE description of their story arc (2-3 paragraphs explaining their transformation and role), then record it together with the structured data by calling the record_story_arc tool."""
+
+    # Make API call (deadline, retry and hedging handled by call_anthropic)
+    response = await call_anthropic(
+        client,
+        "story_arc",
         model=model,
         max_tokens=4000,
         temperature=0.7,
-        system=system_prompt,
+        system=cached_system_prompt(kb, "story_arc", instructions),
+        tools=OUTPUT_TOOLS,  # Identical list in every agent keeps the cached prefix shared
+        tool_choice=forced_tool_choice(STORY_ARC_TOOL),
         messages=[{
             "role": "user",
             "content": f"Create a detailed story arc profile for {character['name']}. Provide both narrative and structured output."
         }]
     )
 
-    # Parse response
-    content = response.content[0].text
-
-    # Split narrative and structured
-    parts = content.split("STRUCTURED:")
-    if len(parts) == 2:
-        narrative = parts[0].replace("NARRATIVE:", "").strip()
-        structured_text = parts[1].strip()
-    else:
-        narrative = content[:content.find("{")].strip() if "{" in content else content
-        structured_text = content[content.find("{"):content.rfind("}")+1] if "{" in content else "{}"
-
-    # Parse JSON
-    try:
-        if "```json" in structured_text:
-            structured_text = structured_text.split("```json")[1].split("```")[0]
-        elif "```" in structured_text:
-            structured_text = structured_text.split("```")[1].split("```")[0]
-
-        structured_data = json.loads(structured_text)
-    except json.JSONDecodeError as e:
-        print(f"Warning: Failed to parse story arc JSON: {e}")
+    # Structured data arrives already parsed as the tool input (malformed output is repaired first)
+    narrative, structured_data, repair = await repair_tool_output(client, "story_arc", response, STORY_ARC_TOOL)
+    parse_fallback = structured_data is None
+    if structured_data is None:
         structured_data = {
             "role": "Unknown",
             "arc_type": "Unknown",
@@ -179,4 +117,15 @@ STRUCTURED:
         "scene_presence": structured_data.get("scene_presence", [])
     }
 
-    return story_arc_output, narrative
+    # Measured usage and latency for this run
+    run_info: AgentRunInfo = {
+        "model": model,
+        "usage": usage_from_response(response),
+        "wall_time_seconds": time.perf_counter() - started,
+        "api_calls": 1,
+        "parse_fallback": parse_fallback,
+        "output_repair": repair["stage"],
+        "repair": repair["run_info"]
+    }
+
+    return story_arc_output, narrative, run_info
@@ -0,0 +1,165 @@
+"""
+Storyline Digest (once per storyline, before Wave 1)
+
+Every text sub-agent's prompt opens with the storyline. For a long
+storyline (many scenes with full descriptions) that is the largest part of
+each prompt, and it is repeated for every agent of every character in a
+batch. This agent condenses the storyline once into a compact digest of what
+matters for character development. The digest is stored on the storyline
+record and replaces the full storyline in the prompts of every sub-agent of
+every character that shares it.
+
+Storylines shorter than STORYLINE_DIGEST_MIN_CHARS are used as they are.
+If the digest call fails, agents fall back to the full storyline, and the
+failure is recorded on the storyline record so that the other characters
+do not repeat the call for STORYLINE_DIGEST_FAILURE_COOLDOWN seconds. The
+character whose session makes the call is charged for it, failed or not
+(usage recorded as the "storyline_digest" agent); the others reuse the
+stored digest for free.
+"""
+
+import asyncio
+import os
+import time
+import weakref
+from datetime import datetime
+from typing import Any, Dict, Optional, Tuple
+
+from providers.calls import call_anthropic
+from providers.clients import get_anthropic_client
+from providers.usage import AgentRunInfo, TokenUsage, empty_usage, usage_from_response
+
+from ..schemas import StorylineDigest, StorylineInput
+from .context import storyline_context
+
+
+STORYLINE_DIGEST_ENABLED = os.getenv("STORYLINE_DIGEST_ENABLED", "true").lower() == "true"
+STORYLINE_DIGEST_MIN_CHARS = int(os.getenv("STORYLINE_DIGEST_MIN_CHARS", "2000"))
+STORYLINE_DIGEST_MODEL = "claude-haiku-4-5-20251001"
+# Seconds after a failed digest before another character tries again
+STORYLINE_DIGEST_FAILURE_COOLDOWN = float(os.getenv("STORYLINE_DIGEST_FAILURE_COOLDOWN", "300"))
+
+DIGEST_INSTRUCTIONS = """You condense storylines for a team of character development agents (personality, backstory, voice, physical presence, story arc, relationships).
+
+Rewrite the storyline you are given as a compact digest that keeps everything those agents need:
+- Premise, setting and central conflict (2-3 sentences)
+- Tone and genre
+- One line per scene: number, title, who is involved, and what the scene demands of or reveals about its characters
+- Recurring relationships, secrets and turning points that shape characters
+
+Drop staging, camera and visual detail that does not affect who the characters are. Keep character names exactly as written. Reply with the digest only, as plain text."""
+
+class StorylineDigestError(ValueError):
+    """Raised when the model's digest is unusable (carries the call's usage)"""
+
+    def __init__(self, message: str, usage: TokenUsage):
+        super().__init__(message)
+        self.usage = usage
+
+
+# Running loop → {storyline_id: lock}; characters of a batch start together
+_locks: "weakref.WeakKeyDictionary[Any, Dict[str, asyncio.Lock]]" = weakref.WeakKeyDictionary()
+
+
+async def generate_storyline_digest(storyline: StorylineInput, api_key: str) -> StorylineDigest:
+    """
+    Condense a storyline with one cheap model call
+
+    Args:
+        storyline: Full storyline
+        api_key: Anthropic API key
+
+    Returns:
+        StorylineDigest (text already titled for the prompt prefix)
+
+    Raises:
+        StorylineDigestError: If the digest is empty or not shorter than the storyline
+    """
+    client = get_anthropic_client(api_key)  # Shared pooled client
+    full_text = storyline_context(storyline)
+
+    response = await call_anthropic(
+        client,
+        "storyline_digest",
+        model=STORYLINE_DIGEST_MODEL,
+        max_tokens=1500,
+        temperature=0,  # Deterministic: eligible for the response cache
+        system=DIGEST_INSTRUCTIONS,
+        messages=[{"role": "user", "content": full_text}]
+    )
+
+    usage = usage_from_response(response)
+    text = "".join(getattr(block, "text", "") for block in response.content).strip()
+    if not text or len(text) >= len(full_text):
+        raise StorylineDigestError(f"Digest is {len(text)} characters for a {len(full_text)} character storyline", usage)
+
+    return {
+        "text": f"STORYLINE (digest):\n{text}",
+        "model": STORYLINE_DIGEST_MODEL,
+        "created_at": datetime.utcnow().isoformat(),
+        "usage": usage
+    }
+
+
+async def ensure_storyline_digest(
+    storyline: StorylineInput,
+    api_key: str,
+    async_storage
+) -> Tuple[Optional[str], Optional[AgentRunInfo]]:
+    """
+    Digest text for a storyline, generated and stored on first use
+
+    Concurrent callers for the same storyline wait for a single generation;
+    later callers read the stored digest. After a failure, callers use the
+    full storyline without retrying until the cooldown has passed.
+
+    Args:
+        storyline: Full storyline
+        api_key: Anthropic API key
+        async_storage: AsyncCharacterStorage holding the storyline record
+
+    Returns:
+        Tuple of (digest text or None to use the full storyline, run info of
+        the digest call if this caller made it, successful or failed)
+    """
+    if not STORYLINE_DIGEST_ENABLED or len(storyline_context(storyline)) < STORYLINE_DIGEST_MIN_CHARS:
+        return None, None
+
+    storage = async_storage.sync
+    storyline_id = await async_storage.run(storage.save_storyline, storyline)
+    lock = _locks.setdefault(asyncio.get_running_loop(), {}).setdefault(storyline_id, asyncio.Lock())
+
+    async with lock:
+        record = await async_storage.run(storage.load_storyline, storyline_id)
+        if record.get("digest"):
+            return record["digest"]["text"], None
+        failure = record.get("digest_failure")
+        if failure:
+            since = (datetime.utcnow() - datetime.fromisoformat(failure["failed_at"])).total_seconds()
+            if since < STORYLINE_DIGEST_FAILURE_COOLDOWN:
+                return None, None
+
+        started = time.perf_counter()
+        run_info: AgentRunInfo = {
+            "model": STORYLINE_DIGEST_MODEL,
+            "usage": empty_usage(),
+            "wall_time_seconds": 0.0,
+            "api_calls": 1
+        }
+        try:
+            digest = await generate_storyline_digest(storyline, api_key)
+        except Exception as e:
+            print(f"Warning: Storyline digest failed ({type(e).__name__}: {e}). Using the full storyline.")
+            await async_storage.run(storage.save_storyline_digest_failure, storyline_id, {
+                "failed_at": datetime.utcnow().isoformat(),
+                "error": f"{type(e).__name__}: {e}"
+            })
+            run_info["usage"] = getattr(e, "usage", None) or run_info["usage"]
+            run_info["wall_time_seconds"] = time.perf_counter() - started
+            return None, run_info
+
+        await async_storage.run(storage.save_storyline_digest, storyline_id, digest)
+        print(f"✓ Storyline digest: {len(storyline_context(storyline))} → {len(digest['text'])} characters")
+        run_info["usage"] = digest["usage"]
+        run_info["wall_time_seconds"] = time.perf_counter() - started
+        return digest["text"], run_info
@@ -8,17 +8,23 @@ Develops character's speech patterns and communication style including:
 - Sample dialogue in different emotional states
 """
 
-import json
+import time
 from typing import Tuple
-from anthropic import AsyncAnthropic  # FIX: Use AsyncAnthropic for async functions
+
+from providers.calls import call_anthropic
+from providers.clients import get_anthropic_client
+from providers.output_repair import repair_tool_output
+from providers.structured import forced_tool_choice
+from providers.usage import AgentRunInfo, usage_from_response
 
 from ..schemas import CharacterKnowledgeBase, VoiceOutput, SampleDialogue
+from .context import OUTPUT_TOOLS, VOICE_TOOL, cached_system_prompt
 
 
 async def voice_dialogue_agent(
     kb: CharacterKnowledgeBase,
     api_key: str
-) -> Tuple[VoiceOutput, str]:
+) -> Tuple[VoiceOutput, str, AgentRunInfo]:
     """
     Generate detailed voice and dialogue profile
 
@@ -27,44 +33,21 @@ async def voice_dialogue_agent(
         api_key: Anthropic API key
 
     Returns:
-        Tuple of (VoiceOutput, narrative_description)
+        Tuple of (VoiceOutput, narrative_description, run_info)
     """
-    client = AsyncAnthropic(api_key=api_key)  # FIX: Use AsyncAnthropic
+    started = time.perf_counter()
+    client = get_anthropic_client(api_key)  # Shared pooled client
     model = "claude-haiku-4-5-20251001"
 
     # Extract data
     character = kb["input_data"]["characters"][0]
-    storyline = kb["input_data"]["storyline"]
     mode = kb.get("mode", "balanced")
 
-    # Build context from Wave 1 outputs
-    personality_context = ""
-    if kb.get("personality"):
-        p = kb["personality"]
-        personality_context = f"""
-PERSONALITY:
-- Traits: {", ".join(p["core_traits"])}
-- Emotional Baseline: {p["emotional_baseline"]}
-- Fears: {", ".join(p["fears"])}"""
-
-    backstory_context = ""
-    if kb.get("backstory_motivation"):
-        b = kb["backstory_motivation"]
-        backstory_context = f"""
-BACKSTORY:
-- Background influences their speech patterns
-- Goals: {b["goals"].get("surface", "Unknown")} (surface), {b["goals"].get("deep", "Unknown")} (deep)"""
-
-    system_prompt = f"""You are a dialogue and voice expert creating a character's unique speech patterns for a {storyline["tone"]} story.
+    # Agent-specific instructions (storyline, character and Wave 1 outputs come from the cached prefix)
+    instructions = f"""You are a dialogue and voice expert creating {character["name"]}'s unique speech patterns for the story above.
 
 Your task is to define HOW this character speaks, including their vocabulary, patterns, and voice.
-
-CHARACTER OVERVIEW:
-- Name: {character["name"]}
-- Role: {character["role"]}
-- Story Tone: {storyline["tone"]}
-{personality_context}
-{backstory_context}
+Their background influences their speech patterns; their goals and personality shape what they say and how.
 
 DEPTH MODE: {mode}
 
@@ -103,60 +86,28 @@ IMPORTANT:
 - Consider backstory impact (e.g., street kid → slang)
 - Sample dialogue should SHOW their voice, not just describe it
 
-First, provide a rich NARRATIVE description of their voice (2-3 paragraphs explaining how they sound and why).
-Then, provide the STRUCTURED data in JSON format.
-
-Format:
-NARRATIVE:
-[Your narrative here]
-
-STRUCTURED:
-{{
-  "speech_pattern": "Detailed description...",
-  "verbal_tics": ["tic1", "tic2", ...],
-  "vocabulary": "Description of word choices...",
-  "sample_dialogue": {{
-    "confident": "Example line...",
-    "vulnerable": "Example line...",
-    "stressed": "Example line...",
-    "sarcastic": "Example line..."
-  }}
-}}"""
-
-    # Make API call (FIX: Add await for async client)
-    response = await client.messages.create(
+Write a rich NARRATIVE description of their voice (2-3 paragraphs explaining how they sound and why), then record it together with the structured data by calling the record_voice tool."""
+
+    # Make API call (deadline, retry and hedging handled by call_anthropic)
+    response = await call_anthropic(
+        client,
+        "voice_dialogue",
         model=model,
         max_tokens=4000,
         temperature=0.8,  # Higher temp for creative dialogue
-        system=system_prompt,
+        system=cached_system_prompt(kb, "voice_dialogue", instructions),
+        tools=OUTPUT_TOOLS,  # Identical list in every agent keeps the cached prefix shared
+        tool_choice=forced_tool_choice(VOICE_TOOL),
         messages=[{
             "role": "user",
             "content": f"Create a detailed voice and dialogue profile for {character['name']}. Provide both narrative and structured output."
         }]
     )
 
-    # Parse response
-    content = response.content[0].text
-
-    # Split narrative and structured
-    parts = content.split("STRUCTURED:")
-    if len(parts) == 2:
-        narrative = parts[0].replace("NARRATIVE:", "").strip()
-        structured_text = parts[1].strip()
-    else:
-        narrative = content[:content.find("{")].strip() if "{" in content else content
-        structured_text = content[content.find("{"):content.rfind("}")+1] if "{" in content else "{}"
-
-    # Parse JSON
-    try:
-        if "```json" in structured_text:
-            structured_text = structured_text.split("```json")[1].split("```")[0]
-        elif "```" in structured_text:
-            structured_text = structured_text.split("```")[1].split("```")[0]
-
-        structured_data = json.loads(structured_text)
-    except json.JSONDecodeError as e:
-        print(f"Warning: Failed to parse voice JSON: {e}")
+    # Structured data arrives already parsed as the tool input (malformed output is repaired first)
+    narrative, structured_data, repair = await repair_tool_output(client, "voice_dialogue", response, VOICE_TOOL)
+    parse_fallback = structured_data is None
+    if structured_data is None:
         structured_data = {
             "speech_pattern": "Unknown",
             "verbal_tics": ["..."],
@@ -177,4 +128,15 @@ STRUCTURED:
         "sample_dialogue": structured_data.get("sample_dialogue", {})  # type: ignore
     }
 
-    return voice_output, narrative
+    # Measured usage and latency for this run
+    run_info: AgentRunInfo = {
+        "model": model,
+        "usage": usage_from_response(response),
+        "wall_time_seconds": time.perf_counter() - started,
+        "api_calls": 1,
+        "parse_fallback": parse_fallback,
+        "output_repair": repair["stage"],
+        "repair": repair["run_info"]
+    }
+
+    return voice_output, narrative, run_info
@@ -5,8 +5,8 @@ Single LLM system that asks questions and outputs structured JSON when ready.
 
 from typing import List, Dict, Any
 import json
-from anthropic import AsyncAnthropic  # FIX: Use AsyncAnthropic for async functions
 from agent_types import AgentLevel
+from providers.clients import get_anthropic_client
 from .tools import TOOLS, execute_tool
 
 
@@ -16,7 +16,7 @@ class EntryAgent:
     def __init__(self, api_key: str, level: AgentLevel):
         self.api_key = api_key
         self.level = level
-        self.client = AsyncAnthropic(api_key=api_key)  # FIX: Use AsyncAnthropic for async functions
+        self.client = get_anthropic_client(api_key)  # Shared pooled client
         self.model = "claude-haiku-4-5-20251001"  # Using Haiku for speed + cost efficiency
 
     async def run(self, user_input: str, conversation_history: List[Dict[str, str]]) -> str:
@@ -10,6 +10,8 @@ from io import BytesIO
 from PIL import Image
 from datetime import datetime
 from dotenv import load_dotenv
+from providers.calls import call_gemini
+from providers.clients import get_gemini_client, is_live_mode, is_offline_mode
 load_dotenv()
 
 # Image generation feature flag (currently disabled but available)
@@ -130,7 +132,7 @@ async def generate_style_image(style_description: str, context: str = "") -> str
     try:
         # Check API key
         api_key = os.getenv("GEMINI_API_KEY")
-        if not api_key:
+        if not api_key and not is_offline_mode():
             return "Error: GEMINI_API_KEY not found in environment. Please set it in your .env file."
         # Build prompt for image generation
         prompt = f"Generate a visual style example image: {style_description}"
@@ -138,7 +140,17 @@ async def generate_style_image(style_description: str, context: str = "") -> str
             prompt += f". Context: {context}"
 
         # Generate image using NanoBanana (Gemini 2.5 Flash Image)
-        response = image_model.generate_content([prompt])
+        if not is_live_mode():
+            # Fake/cassette provider via the shared registry (same response shape),
+            # with the deadline, retry, cache and single-flight layers
+            response = await call_gemini(
+                get_gemini_client(api_key),
+                "style_image",
+                model="gemini-2.5-flash-image-preview",
+                contents=[prompt]
+            )
+        else:
+            response = image_model.generate_content([prompt])
 
         # Check response structure and extract image data
         if hasattr(response, 'candidates') and response.candidates:
@@ -8,8 +8,8 @@ Supports three personality modes:
 """
 
 from typing import List, Dict, Any, Optional
-from anthropic import AsyncAnthropic  # FIX: Use AsyncAnthropic for async functions
 from agent_types import AgentLevel
+from providers.clients import get_anthropic_client
 from .tools import TOOLS, execute_tool
 import sys
 import json
@@ -32,7 +32,7 @@ class SceneCreatorAgent:
         self.api_key = api_key
         self.level = level
         self.project_id = project_id
-        self.client = AsyncAnthropic(api_key=api_key)  # FIX: Use AsyncAnthropic
+        self.client = get_anthropic_client(api_key)  # Shared pooled client
         self.model = "claude-haiku-4-5-20251001"  # Using Haiku for speed + cost efficiency
 
         # Load current mode from project state
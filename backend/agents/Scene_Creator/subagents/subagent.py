@@ -8,7 +8,6 @@ import json
 import base64
 from io import BytesIO
 from typing import Dict, Any, List, Optional
-from anthropic import Anthropic
 
 try:
     from google import genai
@@ -20,20 +19,26 @@ except ImportError:
 import sys
 sys.path.append('../../..')
 from utils.state_manager import read_scene, get_global_continuity
+from providers.calls import call_anthropic, call_gemini
+from providers.clients import get_anthropic_client, get_gemini_client
 
 
-# Initialize clients
-anthropic_client = Anthropic(api_key=os.getenv("ANTHROPIC_API_KEY"))
 MODEL = "claude-sonnet-4-5-20250929"
 
-if NANO_BANANA_AVAILABLE:
+
+# Clients come from the shared registry (one pooled client per event loop)
+def _anthropic_client():
+    return get_anthropic_client(os.getenv("ANTHROPIC_API_KEY"))
+
+
+def _nano_banana_client():
+    if not NANO_BANANA_AVAILABLE:
+        return None
     try:
-        nano_banana_client = genai.Client(api_key=os.getenv("GEMINI_API_KEY"))
+        return get_gemini_client(os.getenv("GEMINI_API_KEY"))
     except Exception as e:
         print(f"Warning: Failed to initialize Nano Banana client: {e}")
-        nano_banana_client = None
-else:
-    nano_banana_client = None
+        return None
 
 
 # ============================================================================
@@ -105,7 +110,9 @@ Return as JSON:
   ]
 }}"""
 
-    response = anthropic_client.messages.create(
+    response = await call_anthropic(
+        _anthropic_client(),
+        "cinematography_designer",
         model=MODEL,
         max_tokens=4096,
         system=system_prompt,
@@ -175,7 +182,9 @@ Return as JSON:
   }}
 }}"""
 
-    response = anthropic_client.messages.create(
+    response = await call_anthropic(
+        _anthropic_client(),
+        "aesthetic_generator",
         model=MODEL,
         max_tokens=2048,
         system=system_prompt,
@@ -240,9 +249,12 @@ Return validation report as JSON:
   "recommendations": ["list of improvements"]
 }}"""
 
-    response = anthropic_client.messages.create(
+    response = await call_anthropic(
+        _anthropic_client(),
+        "scene_validator",
         model=MODEL,
         max_tokens=4096,
+        temperature=0,  # Deterministic: identical scenes share one call and cached response
         system=system_prompt,
         messages=[{"role": "user", "content": user_prompt}]
     )
@@ -270,7 +282,8 @@ async def reference_image_generator(
     Returns:
         JSON with image data (base64) and metadata
     """
-    if not NANO_BANANA_AVAILABLE or nano_banana_client is None:
+    nano_banana_client = _nano_banana_client()
+    if nano_banana_client is None:
         return json.dumps({
             "error": "Nano Banana (google-genai) not available",
             "message": "Install google-genai package to enable image generation"
@@ -288,7 +301,9 @@ async def reference_image_generator(
             full_prompt = prompt
 
         # Generate image
-        response = nano_banana_client.models.generate_content(
+        response = await call_gemini(
+            nano_banana_client,
+            "reference_image_generator",
             model="gemini-2.5-flash-image",
             contents=[full_prompt],
             config={
@@ -394,9 +409,12 @@ Return as JSON:
   "recommendations": ["timeline improvements"]
 }}"""
 
-    response = anthropic_client.messages.create(
+    response = await call_anthropic(
+        _anthropic_client(),
+        "timeline_validator",
         model=MODEL,
         max_tokens=2048,
+        temperature=0,  # Deterministic: identical scenes share one call and cached response
         system=system_prompt,
         messages=[{"role": "user", "content": user_prompt}]
     )
@@ -514,9 +532,12 @@ Return as JSON:
   "retakeReasons": ["if true, list reasons"]
 }}"""
 
-    response = anthropic_client.messages.create(
+    response = await call_anthropic(
+        _anthropic_client(),
+        "visual_continuity_checker",
         model=MODEL,
         max_tokens=4096,
+        temperature=0,  # Deterministic: identical scenes share one call and cached response
         system=system_prompt,
         messages=[{"role": "user", "content": user_prompt}]
     )
@@ -289,32 +289,30 @@ async def execute_tool(tool_name: str, **kwargs) -> str:
         return f"Error: Unknown tool '{tool_name}'"
 
 
+def _get_character_storage():
+    """The process-wide character storage (same instance as Character Development)"""
+    from agents.Character_Identity.async_storage import get_shared_storage
+
+    return get_shared_storage()
+
+
 async def get_character_data(character_id: str, data_type: str = "full") -> str:
     """Retrieve character data from Character Development system"""
-    from pathlib import Path
-
-    character_data_dir = Path(__file__).parent.parent.parent / "character_data"
+    storage = _get_character_storage()
 
     if character_id == "latest":
-        if not character_data_dir.exists():
-            return json.dumps({"error": "No characters found"})
-        char_dirs = [d for d in character_data_dir.iterdir() if d.is_dir()]
-        if not char_dirs:
+        # Catalog index lookup, no directory scan
+        character_id = await storage.latest_character()
+        if character_id is None:
             return json.dumps({"error": "No characters found"})
-        latest_dir = max(char_dirs, key=lambda d: d.stat().st_mtime)
-        character_id = latest_dir.name
 
-    char_dir = character_data_dir / character_id
-    if not char_dir.exists():
+    if not await storage.character_exists(character_id):
         return json.dumps({"error": f"Character {character_id} not found"})
 
-    final_profile_path = char_dir / "final_profile.json"
-    if not final_profile_path.exists():
+    profile = await storage.load_final_profile(character_id)
+    if profile is None:
         return json.dumps({"error": "Character profile not complete"})
 
-    with open(final_profile_path, 'r') as f:
-        profile = json.load(f)
-
     if data_type == "appearance":
         return json.dumps({
             "character_id": character_id,
@@ -11,8 +11,9 @@ import json
 import uuid
 from pathlib import Path
 from typing import Dict, Optional
-from fastapi import FastAPI, HTTPException, WebSocket, WebSocketDisconnect, BackgroundTasks
+from fastapi import FastAPI, HTTPException, WebSocket, WebSocketDisconnect, BackgroundTasks, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from pydantic import BaseModel
 from dotenv import load_dotenv
@@ -26,7 +27,20 @@ load_dotenv()
 # Import agent components
 from agents.Character_Identity.agent import CharacterIdentityAgent
 from agents.Character_Identity.schemas import EntryAgentOutput
+from agents.Character_Identity.budget import BudgetExceededError, make_budget
+from agents.Character_Identity.archive import ArchiveError, ArchiveStreamReader, export_archive, import_archive
+from agents.Character_Identity.maintenance import (
+    MAINTENANCE_INTERVAL_SECONDS,
+    MaintenanceJob,
+    run_maintenance_loop
+)
 from agent_types import AgentLevel
+from providers.calls import get_call_metrics
+from providers.cassette import get_cassette_metrics
+from providers.clients import close_clients, get_client_metrics, is_offline_mode
+from providers.output_repair import get_output_repair_metrics
+from providers.response_cache import get_response_cache_metrics
+from providers.single_flight import get_single_flight_metrics
 
 
 # ============================================================================
@@ -158,6 +172,14 @@ class StartCharacterRequest(BaseModel):
     characters: list
     storyline: dict
     mode: str = "balanced"
+    project_id: Optional[str] = None
+    approval_policy: str = "manual"  # manual, auto, auto_unless_parse_fallback, auto_after_timeout
+    approval_timeout_seconds: Optional[float] = None
+    # Spend limits (unset = environment default, which may be unlimited)
+    max_tokens: Optional[int] = None
+    max_cost_usd: Optional[float] = None
+    project_max_tokens: Optional[int] = None
+    project_max_cost_usd: Optional[float] = None
 
 
 class ApproveRequest(BaseModel):
@@ -167,12 +189,28 @@ class ApproveRequest(BaseModel):
 class FeedbackRequest(BaseModel):
     checkpoint: int
     feedback: str
+    cascade: bool = True
 
 
 class ApproveWaveRequest(BaseModel):
     wave: int
 
 
+class RetryRequest(BaseModel):
+    checkpoint: int
+
+
+class RollbackRequest(BaseModel):
+    version: int
+
+
+class BudgetRequest(BaseModel):
+    max_tokens: Optional[int] = None
+    max_cost_usd: Optional[float] = None
+    project_max_tokens: Optional[int] = None
+    project_max_cost_usd: Optional[float] = None
+
+
 # ============================================================================
 # FASTAPI APP
 # ============================================================================
@@ -212,13 +250,34 @@ if os.path.exists("./backend/character_data"):
 # Initialize agent
 anthropic_api_key = os.getenv("ANTHROPIC_API_KEY")
 if not anthropic_api_key:
-    raise ValueError("ANTHROPIC_API_KEY not found in environment")
+    if not is_offline_mode():
+        raise ValueError("ANTHROPIC_API_KEY not found in environment")
+    anthropic_api_key = "fake"  # PROVIDER_MODE=fake/replay: offline providers, no key needed
 
 character_agent = CharacterIdentityAgent(
     api_key=anthropic_api_key,
     level=AgentLevel.Character_Identity
 )
 
+# Retention/GC runs in short slices on the storage I/O pool (see maintenance.py)
+maintenance_job = MaintenanceJob(
+    character_agent.storage,
+    is_character_active=lambda character_id: character_id in character_agent.active_sessions,
+    is_session_active=lambda session_id: session_id in entry_sessions or session_id in scene_sessions
+)
+
+
+@app.on_event("startup")
+async def start_maintenance():
+    if MAINTENANCE_INTERVAL_SECONDS > 0:
+        asyncio.create_task(run_maintenance_loop(maintenance_job, character_agent.async_storage))
+
+
+@app.on_event("shutdown")
+async def shutdown_provider_clients():
+    await close_clients()
+
+
 # WebSocket connection manager
 class ConnectionManager:
     def __init__(self):
@@ -272,10 +331,21 @@ async def start_character(request: StartCharacterRequest, background_tasks: Back
         }
 
         # Create character
-        character_id = character_agent.start_character_development(
+        character_id = await character_agent.async_storage.run(
+            character_agent.start_character_development,
             entry_output,
-            mode=request.mode
+            mode=request.mode,
+            project_id=request.project_id,
+            approval_policy=request.approval_policy,
+            approval_timeout_seconds=request.approval_timeout_seconds,
+            budget=make_budget(
+                request.max_tokens,
+                request.max_cost_usd,
+                request.project_max_tokens,
+                request.project_max_cost_usd
+            )
         )
+        register_project_character(request.project_id, character_id)
 
         # Run development in background with error handling
         async def run_development():
@@ -295,10 +365,10 @@ async def start_character(request: StartCharacterRequest, background_tasks: Back
                 })
                 # Update character metadata to failed status
                 try:
-                    metadata = character_agent.storage.load_metadata(character_id)
-                    metadata["status"] = "failed"
-                    metadata["error"] = str(e)
-                    character_agent.storage.save_metadata(character_id, metadata)
+                    await character_agent.async_storage.update_metadata(
+                        character_id,
+                        lambda metadata: metadata.update(status="failed", error=str(e))
+                    )
                 except:
                     pass
 
@@ -360,6 +430,11 @@ async def start_batch_character_development(
                 characters_to_develop.append(char)
                 supporting_count += 1
 
+        # Store the shared storyline once; every character's input references it
+        storyline_id = await character_agent.async_storage.run(
+            character_agent.storage.save_storyline, request.storyline
+        )
+
         # Create development sessions for each selected character
         character_ids = []
         for char in characters_to_develop:
@@ -369,10 +444,21 @@ async def start_batch_character_development(
                 "storyline": request.storyline  # type: ignore
             }
 
-            character_id = character_agent.start_character_development(
+            character_id = await character_agent.async_storage.run(
+                character_agent.start_character_development,
                 entry_output,
-                mode=request.mode
+                mode=request.mode,
+                project_id=request.project_id,
+                approval_policy=request.approval_policy,
+                approval_timeout_seconds=request.approval_timeout_seconds,
+                budget=make_budget(
+                    request.max_tokens,
+                    request.max_cost_usd,
+                    request.project_max_tokens,
+                    request.project_max_cost_usd
+                )
             )
+            register_project_character(request.project_id, character_id)
 
             character_ids.append({
                 "character_id": character_id,
@@ -397,10 +483,10 @@ async def start_batch_character_development(
                         "message": f"Character development failed: {str(e)}"
                     })
                     try:
-                        metadata = character_agent.storage.load_metadata(cid)
-                        metadata["status"] = "failed"
-                        metadata["error"] = str(e)
-                        character_agent.storage.save_metadata(cid, metadata)
+                        await character_agent.async_storage.update_metadata(
+                            cid,
+                            lambda metadata: metadata.update(status="failed", error=str(e))
+                        )
                     except:
                         pass
 
@@ -408,6 +494,7 @@ async def start_batch_character_development(
 
         return {
             "characters": character_ids,
+            "storyline_id": storyline_id,
             "total_selected": len(character_ids),
             "total_submitted": len(request.characters),
             "status": "batch_started",
@@ -418,11 +505,22 @@ async def start_batch_character_development(
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.get("/api/storylines/{storyline_id}")
+async def get_storyline(storyline_id: str):
+    """Get a stored storyline and its shared digest (if one was generated)"""
+    try:
+        return await character_agent.async_storage.run(character_agent.storage.load_storyline, storyline_id)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Storyline not found")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @app.get("/api/character/{character_id}/status")
 async def get_status(character_id: str):
     """Get current status of character development"""
     try:
-        status = character_agent.get_character_status(character_id)
+        status = await character_agent.async_storage.run(character_agent.get_character_status, character_id)
         return status
     except FileNotFoundError:
         raise HTTPException(status_code=404, detail="Character not found")
@@ -430,11 +528,23 @@ async def get_status(character_id: str):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.get("/api/character/{character_id}/checkpoints")
+async def list_checkpoints(character_id: str):
+    """List checkpoint summaries without loading checkpoint bodies"""
+    try:
+        checkpoints = await character_agent.async_storage.run(character_agent.list_checkpoints, character_id)
+        return {"character_id": character_id, "checkpoints": checkpoints}
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Character not found")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @app.get("/api/character/{character_id}/checkpoint/{checkpoint_number}")
 async def get_checkpoint(character_id: str, checkpoint_number: int):
     """Get specific checkpoint data"""
     try:
-        checkpoint = character_agent.get_checkpoint(character_id, checkpoint_number)
+        checkpoint = await character_agent.async_storage.run(character_agent.get_checkpoint, character_id, checkpoint_number)
         if checkpoint is None:
             raise HTTPException(status_code=404, detail="Checkpoint not found")
         return checkpoint
@@ -444,11 +554,54 @@ async def get_checkpoint(character_id: str, checkpoint_number: int):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.get("/api/character/{character_id}/checkpoint/{checkpoint_number}/versions")
+async def list_checkpoint_versions(character_id: str, checkpoint_number: int):
+    """List a checkpoint's saved versions (oldest first)"""
+    try:
+        versions = await character_agent.async_storage.run(
+            character_agent.list_checkpoint_versions, character_id, checkpoint_number
+        )
+        return {"character_id": character_id, "checkpoint": checkpoint_number, "versions": versions}
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Character not found")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.get("/api/character/{character_id}/checkpoint/{checkpoint_number}/versions/{version}")
+async def get_checkpoint_version(character_id: str, checkpoint_number: int, version: int):
+    """Get a checkpoint as it was at a given version"""
+    try:
+        checkpoint = await character_agent.async_storage.run(
+            character_agent.get_checkpoint_version, character_id, checkpoint_number, version
+        )
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Character not found")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    if checkpoint is None:
+        raise HTTPException(status_code=404, detail="Checkpoint version not found")
+    return checkpoint
+
+
+@app.post("/api/character/{character_id}/checkpoint/{checkpoint_number}/rollback")
+async def rollback_checkpoint(character_id: str, checkpoint_number: int, request: RollbackRequest):
+    """Restore a checkpoint's output from an earlier version (no regeneration)"""
+    try:
+        return await character_agent.rollback_checkpoint(character_id, checkpoint_number, request.version)
+    except (FileNotFoundError, LookupError) as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @app.post("/api/character/{character_id}/approve")
 async def approve_checkpoint(character_id: str, request: ApproveRequest):
     """Approve a checkpoint and continue to next agent"""
     try:
-        character_agent.approve_checkpoint(character_id, request.checkpoint)
+        await character_agent.async_storage.run(character_agent.approve_checkpoint, character_id, request.checkpoint)
         return {
             "message": f"Checkpoint {request.checkpoint} approved. Proceeding to next agent.",
             "next_checkpoint": request.checkpoint + 1,
@@ -486,17 +639,40 @@ async def submit_feedback(character_id: str, request: FeedbackRequest):
         result = await character_agent.regenerate_agent(
             character_id,
             agent_name,
-            request.feedback
+            request.feedback,
+            cascade=request.cascade
         )
+        await manager.send_message(character_id, {"type": "budget_status", **result["budget"]})
 
         return {
             "message": result["message"],
             "status": "regenerated",
             "checkpoint": result["checkpoint"],
-            "agent": result["agent"]
+            "agent": result["agent"],
+            "recomputed": result["recomputed"],
+            "unchanged": result["unchanged"],
+            "stale": result["stale"],
+            "budget": result["budget"]
         }
     except FileNotFoundError:
         raise HTTPException(status_code=404, detail="Character not found")
+    except BudgetExceededError as e:
+        raise HTTPException(status_code=402, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.post("/api/character/{character_id}/retry")
+async def retry_checkpoint(character_id: str, request: RetryRequest):
+    """Re-run the agent behind a failed checkpoint"""
+    try:
+        return await character_agent.retry_checkpoint(character_id, request.checkpoint)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Character not found")
+    except BudgetExceededError as e:
+        raise HTTPException(status_code=402, detail=str(e))
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
@@ -527,11 +703,55 @@ async def approve_wave(character_id: str, request: ApproveWaveRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.get("/api/character/{character_id}/usage")
+async def get_usage(character_id: str):
+    """Get measured token usage and agent latency for a character"""
+    try:
+        return await character_agent.async_storage.run(character_agent.get_usage, character_id)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Character not found")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.get("/api/character/{character_id}/budget")
+async def get_budget(character_id: str):
+    """Get spend against the character and project budgets"""
+    try:
+        return await character_agent.async_storage.run(character_agent.get_budget, character_id)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Character not found")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.put("/api/character/{character_id}/budget")
+async def update_budget(character_id: str, request: BudgetRequest):
+    """Replace a character's budget limits (e.g. to allow more regenerations)"""
+    try:
+        status = await character_agent.async_storage.run(
+            character_agent.update_budget,
+            character_id,
+            make_budget(
+                request.max_tokens,
+                request.max_cost_usd,
+                request.project_max_tokens,
+                request.project_max_cost_usd
+            )
+        )
+        await manager.send_message(character_id, {"type": "budget_status", **status})
+        return status
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Character not found")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @app.get("/api/character/{character_id}/final")
 async def get_final_profile(character_id: str):
     """Get final character profile"""
     try:
-        profile = character_agent.get_final_profile(character_id)
+        profile = await character_agent.async_storage.run(character_agent.get_final_profile, character_id)
         if profile is None:
             raise HTTPException(status_code=404, detail="Final profile not yet complete")
         return profile
@@ -545,6 +765,69 @@ async def get_final_profile(character_id: str):
 # WEBSOCKET ENDPOINT
 # ============================================================================
 
+def _archive_response(character_ids, filename: str, project_id: Optional[str] = None) -> StreamingResponse:
+    """Stream an archive (the sync generator runs in the threadpool, off the event loop)"""
+    return StreamingResponse(
+        export_archive(character_agent.storage, character_ids, project_id=project_id),
+        media_type="application/gzip",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+
+@app.get("/api/character/{character_id}/export")
+async def export_character(character_id: str):
+    """Download a character (KB, checkpoints, history, images) as one .tar.gz"""
+    if not await character_agent.async_storage.character_exists(character_id):
+        raise HTTPException(status_code=404, detail="Character not found")
+    return _archive_response([character_id], f"character_{character_id}.tar.gz")
+
+
+@app.post("/api/character/import")
+async def import_characters(request: Request, overwrite: bool = False):
+    """
+    Import a character or project archive from the request body
+
+    The body is fed to the importer as it arrives; nothing is written
+    unless every file matches the archive's manifest hashes.
+    """
+    reader = ArchiveStreamReader()
+    # Own thread, not the storage I/O pool: the import waits on the upload for as long as it lasts
+    task = asyncio.create_task(
+        asyncio.to_thread(
+            import_archive, character_agent.storage, reader, overwrite, character_agent.active_sessions
+        )
+    )
+    try:
+        async for chunk in request.stream():
+            if task.done():
+                break  # Importer stopped early; its error is raised below
+            if chunk:
+                await asyncio.to_thread(reader.feed, chunk)
+    except BaseException:
+        # Client disconnected or the handler was cancelled: release the importer thread
+        reader.fail("Upload interrupted")
+        await asyncio.gather(task, return_exceptions=True)
+        raise
+    await asyncio.to_thread(reader.feed, b"")
+
+    try:
+        result = await task
+    except ArchiveError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except FileExistsError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+    for character_id in result["characters"]:
+        register_project_character(result["project_id"], character_id)
+    return {
+        "imported": result["characters"],
+        "project_id": result["project_id"],
+        "message": f"Imported {len(result['characters'])} characters"
+    }
+
+
 @app.websocket("/ws/character/{character_id}")
 async def websocket_endpoint(websocket: WebSocket, character_id: str):
     """
@@ -553,8 +836,16 @@ async def websocket_endpoint(websocket: WebSocket, character_id: str):
     Messages sent:
     - agent_started: When an agent begins
     - agent_progress: Progress updates
+    - agent_retry: When a failed agent is about to be retried
+    - agent_failed: When an agent exhausted its retries
     - checkpoint_ready: When checkpoint is ready for approval
+    - checkpoint_failed: When a checkpoint needs a manual retry
+    - checkpoint_approved: When the approval policy auto-approves a checkpoint
+    - wave_approved: When the approval policy skips a wave pause
     - wave_complete: When a wave finishes
+    - budget_status: Spend against the budgets (before and after each wave)
+    - budget_downgrade: When a wave runs in fast mode to save budget
+    - agent_skipped: When an optional agent is skipped to save budget
     - character_complete: When all development is done
     - error: If something goes wrong
     """
@@ -779,6 +1070,26 @@ async def get_project(project_id: str):
         raise HTTPException(status_code=404, detail="Project not found")
     return projects_store[project_id]
 
+@app.get("/api/projects/{project_id}/usage")
+async def get_project_usage(project_id: str):
+    """Get measured token usage aggregated over a project's characters"""
+    return await character_agent.async_storage.run(character_agent.get_project_usage, project_id)
+
+
+@app.get("/api/projects/{project_id}/export")
+async def export_project(project_id: str):
+    """Download every character of a project as one .tar.gz"""
+    character_ids = await character_agent.async_storage.list_characters(project_id=project_id)
+    if not character_ids:
+        raise HTTPException(status_code=404, detail="No characters found for project")
+    return _archive_response(character_ids, f"project_{project_id}.tar.gz", project_id=project_id)
+
+
+def register_project_character(project_id: Optional[str], character_id: str):
+    """Attach a character to an in-memory project record if one exists"""
+    if project_id and project_id in projects_store:
+        projects_store[project_id]["character_ids"].append(character_id)
+
 
 # ============================================================================
 # HEALTH CHECK
@@ -789,6 +1100,22 @@ async def health_check():
     return {"status": "healthy", "service": "weave-multi-agent-api"}
 
 
+@app.get("/api/metrics")
+async def get_metrics():
+    """Provider call metrics (retries, hedges, timeouts, latency percentiles), client pool usage, response cache, single-flight merges, cassette record/replay, storage cache counters and maintenance"""
+    return {
+        "model_calls": get_call_metrics(),
+        "provider_clients": get_client_metrics(),
+        "response_cache": get_response_cache_metrics(),
+        "single_flight": get_single_flight_metrics(),
+        "structured_output": get_output_repair_metrics(),
+        "cassette": get_cassette_metrics(),
+        "storage_cache": character_agent.storage.cache_stats(),
+        "storage_io_threads": character_agent.async_storage.max_workers,
+        "maintenance": maintenance_job.stats()
+    }
+
+
 if __name__ == "__main__":
     import uvicorn
     port = int(os.getenv("BACKEND_PORT", 8001))
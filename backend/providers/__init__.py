@@ -0,0 +1 @@
+"""Shared model provider layer (usage accounting, call handling)"""
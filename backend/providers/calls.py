@@ -0,0 +1,302 @@
+"""
+Resilient model call wrapper shared by all sub-agents
+
+Every Anthropic/Gemini request made by an agent goes through call_anthropic()
+or call_gemini(), which add:
+- A per-agent deadline (total time budget) and per-attempt timeout
+- Jittered exponential retry on retryable errors (429, 5xx, overloaded, timeouts)
+- Optional hedging: a duplicate request is fired when the first one runs past
+  the agent's observed p95 latency, and whichever finishes first wins
+
+Identical concurrent deterministic calls are merged into one
+(providers/single_flight.py) and eligible calls are served from the response cache
+(providers/response_cache.py) before any of that happens.
+
+Counters for retries, hedges and timeouts, plus input and prompt-cache token
+totals, are kept per agent and exposed via get_call_metrics().
+"""
+
+import asyncio
+import os
+import random
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from providers.response_cache import cached_call
+from providers.single_flight import single_flight
+from providers.usage import usage_from_response
+
+
+# ============================================================================
+# POLICY CONFIGURATION
+# ============================================================================
+
+# Defaults (override with environment variables)
+DEFAULT_DEADLINE_SECONDS = float(os.getenv("MODEL_CALL_DEADLINE", "180"))
+DEFAULT_ATTEMPT_TIMEOUT_SECONDS = float(os.getenv("MODEL_CALL_ATTEMPT_TIMEOUT", "90"))
+DEFAULT_MAX_RETRIES = int(os.getenv("MODEL_CALL_MAX_RETRIES", "3"))
+RETRY_BASE_DELAY_SECONDS = float(os.getenv("MODEL_CALL_RETRY_BASE_DELAY", "1.0"))
+RETRY_MAX_DELAY_SECONDS = float(os.getenv("MODEL_CALL_RETRY_MAX_DELAY", "20.0"))
+
+# Comma-separated agent names to hedge, or "all"
+HEDGE_AGENTS = {a.strip() for a in os.getenv("MODEL_CALL_HEDGE_AGENTS", "").split(",") if a.strip()}
+HEDGE_MIN_SAMPLES = int(os.getenv("MODEL_CALL_HEDGE_MIN_SAMPLES", "20"))
+
+# Per-agent overrides; anything missing falls back to the defaults above
+CALL_POLICIES: Dict[str, Dict[str, float]] = {
+    "personality": {"deadline": 150, "attempt_timeout": 75},
+    "backstory_motivation": {"deadline": 150, "attempt_timeout": 75},
+    "voice_dialogue": {"deadline": 150, "attempt_timeout": 75},
+    "physical_description": {"deadline": 150, "attempt_timeout": 75},
+    "story_arc": {"deadline": 150, "attempt_timeout": 75},
+    "relationships": {"deadline": 150, "attempt_timeout": 75},
+    "image_generation": {"deadline": 240, "attempt_timeout": 120, "max_retries": 2},
+}
+
+# HTTP status codes worth retrying (529 = Anthropic overloaded)
+RETRYABLE_STATUS_CODES = {408, 409, 429, 500, 502, 503, 504, 529}
+RETRYABLE_ERROR_NAMES = {"APIConnectionError", "APITimeoutError", "RateLimitError", "InternalServerError", "OverloadedError"}
+
+# Latency samples kept per agent for the p95 hedge threshold
+LATENCY_WINDOW = 200
+
+
+def get_call_policy(agent: str) -> Dict[str, Any]:
+    """Resolve the deadline/retry/hedge policy for an agent"""
+    overrides = CALL_POLICIES.get(agent, {})
+    return {
+        "deadline": overrides.get("deadline", DEFAULT_DEADLINE_SECONDS),
+        "attempt_timeout": overrides.get("attempt_timeout", DEFAULT_ATTEMPT_TIMEOUT_SECONDS),
+        "max_retries": int(overrides.get("max_retries", DEFAULT_MAX_RETRIES)),
+        "hedge": "all" in HEDGE_AGENTS or agent in HEDGE_AGENTS,
+    }
+
+
+def is_retryable_error(error: BaseException) -> bool:
+    """Check whether a provider error is transient"""
+    if isinstance(error, asyncio.TimeoutError):
+        return True
+
+    status = getattr(error, "status_code", None) or getattr(error, "code", None)
+    if isinstance(status, int) and status in RETRYABLE_STATUS_CODES:
+        return True
+
+    return type(error).__name__ in RETRYABLE_ERROR_NAMES
+
+
+# ============================================================================
+# METRICS
+# ============================================================================
+
+_metrics: Dict[str, Dict[str, int]] = {}
+_latencies: Dict[str, deque] = {}
+
+
+def _agent_metrics(agent: str) -> Dict[str, int]:
+    return _metrics.setdefault(agent, {
+        "calls": 0,
+        "attempts": 0,
+        "retries": 0,
+        "timeouts": 0,
+        "hedges_fired": 0,
+        "hedges_won": 0,
+        "failures": 0,
+        "input_tokens": 0,
+        "cache_read_input_tokens": 0,
+        "cache_creation_input_tokens": 0,
+    })
+
+
+def _record_usage(agent: str, response) -> None:
+    """Add a response's uncached, cache-read and cache-write input tokens to the agent's totals"""
+    metrics = _agent_metrics(agent)
+    usage = usage_from_response(response)
+    for key in ("input_tokens", "cache_read_input_tokens", "cache_creation_input_tokens"):
+        metrics[key] += usage[key]
+
+
+def _percentile(samples, fraction: float) -> Optional[float]:
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    index = min(int(round(fraction * (len(ordered) - 1))), len(ordered) - 1)
+    return ordered[index]
+
+
+def _hedge_threshold(agent: str) -> Optional[float]:
+    """p95 latency for an agent, once enough samples exist"""
+    samples = _latencies.get(agent)
+    if not samples or len(samples) < HEDGE_MIN_SAMPLES:
+        return None
+    return _percentile(samples, 0.95)
+
+
+def get_call_metrics() -> Dict[str, Dict[str, Any]]:
+    """
+    Snapshot of call counters and latency percentiles per agent
+
+    Returns:
+        Dict of agent name → counters plus p50/p95 latency in seconds and the
+        share of input tokens served from the prompt cache
+    """
+    snapshot = {}
+    for agent, counters in _metrics.items():
+        samples = _latencies.get(agent, [])
+        prompt_tokens = counters["input_tokens"] + counters["cache_read_input_tokens"] + counters["cache_creation_input_tokens"]
+        snapshot[agent] = {
+            **counters,
+            "latency_p50_seconds": _percentile(samples, 0.5),
+            "latency_p95_seconds": _percentile(samples, 0.95),
+            "cache_hit_ratio": counters["cache_read_input_tokens"] / prompt_tokens if prompt_tokens else None,
+        }
+    return snapshot
+
+
+def reset_call_metrics() -> None:
+    """Clear all counters and latency samples"""
+    _metrics.clear()
+    _latencies.clear()
+
+
+# ============================================================================
+# CALL EXECUTION
+# ============================================================================
+
+async def _hedged_attempt(agent: str, make_call: Callable[[], Awaitable], hedge: bool):
+    """
+    Run one attempt, firing a duplicate once the first exceeds p95
+
+    Returns the first successful result; raises only if every launched
+    request failed.
+    """
+    metrics = _agent_metrics(agent)
+    threshold = _hedge_threshold(agent) if hedge else None
+
+    primary = asyncio.ensure_future(make_call())
+    tasks = {primary}
+
+    try:
+        if threshold is None:
+            return await primary
+
+        done, _ = await asyncio.wait(tasks, timeout=threshold)
+        if not done:
+            metrics["hedges_fired"] += 1
+            hedged = asyncio.ensure_future(make_call())
+            tasks.add(hedged)
+
+        pending = set(tasks)
+        last_error: Optional[BaseException] = None
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    if task is not primary:
+                        metrics["hedges_won"] += 1
+                    return task.result()
+                last_error = task.exception()
+        raise last_error  # type: ignore[misc]
+    finally:
+        # Cancel the losing request (or everything, on timeout/cancellation)
+        for task in tasks:
+            if not task.done():
+                task.cancel()
+
+
+async def call_with_policy(agent: str, make_call: Callable[[], Awaitable]):
+    """
+    Execute a provider call under the agent's deadline, retry and hedge policy
+
+    Args:
+        agent: Agent name (selects the policy and metrics bucket)
+        make_call: Zero-argument callable returning a fresh request coroutine
+
+    Returns:
+        The provider response
+
+    Raises:
+        The last provider error once retries or the deadline are exhausted
+    """
+    policy = get_call_policy(agent)
+    metrics = _agent_metrics(agent)
+    metrics["calls"] += 1
+
+    started = time.monotonic()
+    attempt = 0
+
+    while True:
+        remaining = policy["deadline"] - (time.monotonic() - started)
+        attempt_timeout = min(policy["attempt_timeout"], remaining)
+        attempt += 1
+        metrics["attempts"] += 1
+        attempt_started = time.monotonic()
+
+        try:
+            response = await asyncio.wait_for(
+                _hedged_attempt(agent, make_call, policy["hedge"]),
+                timeout=max(attempt_timeout, 0.001)
+            )
+            _latencies.setdefault(agent, deque(maxlen=LATENCY_WINDOW)).append(time.monotonic() - attempt_started)
+            _record_usage(agent, response)
+            return response
+        except Exception as e:
+            if isinstance(e, asyncio.TimeoutError):
+                metrics["timeouts"] += 1
+
+            # Full jitter backoff, bounded by the remaining deadline
+            delay = random.uniform(0, min(RETRY_MAX_DELAY_SECONDS, RETRY_BASE_DELAY_SECONDS * (2 ** (attempt - 1))))
+            remaining = policy["deadline"] - (time.monotonic() - started)
+
+            if not is_retryable_error(e) or attempt > policy["max_retries"] or remaining <= delay:
+                metrics["failures"] += 1
+                raise
+
+            metrics["retries"] += 1
+            print(f"Warning: {agent} model call failed ({type(e).__name__}: {e}). Retry {attempt}/{policy['max_retries']} in {delay:.1f}s")
+            await asyncio.sleep(delay)
+
+
+async def call_anthropic(client, agent: str, **params):
+    """
+    client.messages.create() with deadline, retry and hedging
+
+    SDK-level retries are disabled so that this wrapper owns the retry budget.
+    Identical in-flight deterministic requests are merged, and eligible requests are served
+    from the response cache when enabled.
+
+    Args:
+        client: AsyncAnthropic client
+        agent: Agent name for policy and metrics
+        **params: Arguments for messages.create()
+
+    Returns:
+        anthropic Message
+    """
+    if hasattr(client, "with_options"):
+        client = client.with_options(max_retries=0)
+    return await single_flight("anthropic", agent, params, lambda: cached_call(
+        "anthropic", agent, params,
+        lambda: call_with_policy(agent, lambda: client.messages.create(**params))
+    ))
+
+
+async def call_gemini(client, agent: str, **params):
+    """
+    Async Gemini generate_content() with deadline, retry and hedging
+
+    Identical in-flight deterministic requests are merged, and eligible requests are served
+    from the response cache when enabled.
+
+    Args:
+        client: google-genai Client
+        agent: Agent name for policy and metrics
+        **params: Arguments for models.generate_content()
+
+    Returns:
+        GenerateContentResponse
+    """
+    return await single_flight("gemini", agent, params, lambda: cached_call(
+        "gemini", agent, params,
+        lambda: call_with_policy(agent, lambda: client.aio.models.generate_content(**params))
+    ))
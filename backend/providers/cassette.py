@@ -0,0 +1,432 @@
+"""
+Record/replay cassettes of real provider sessions
+
+PROVIDER_MODE=record wraps the live clients handed out by the client
+registry. Every provider request is appended to CASSETTE_PATH as one JSON
+line: Anthropic messages.create() and Gemini generate_content(), from the
+Entry, Character and Scene agents alike. Each line holds the request, the
+response or error, the token usage, and when the attempt started
+(seconds since recording began) and how long it took. Retries and hedges
+are recorded as separate attempts, so the cassette shows the real load.
+
+PROVIDER_MODE=replay serves responses from the cassette instead, with no
+API keys or network. Recorded usage is reported unchanged, so budgets and
+metrics match production. Recorded errors (429, 5xx) are raised again and
+go through the normal retry policy.
+
+Matching:
+- A request is looked up by the same SHA-256 the response cache uses.
+  Identical requests are served in recorded order, and the last one is
+  reused if the replay sends it more often.
+- Prompts that embed run-specific data (IDs, timestamps) fall back to the
+  next unserved entry with the same provider, model and tools. These
+  "loose" matches are counted separately.
+- A request with no match raises CassetteMissError, which is not retried.
+
+Timing: each response is delayed by its recorded latency times
+CASSETTE_SPEED (1 = recorded speed, 0.1 = ten times faster, 0 = no delay).
+CASSETTE_JITTER adds a random ±fraction to each delay.
+
+Cancelled attempts (timeouts, lost hedges) are recorded for load analysis
+but never replayed. Veo operations and file downloads are not recorded.
+In replay they are served by the fake provider (providers/fake.py).
+
+    python -m providers.cassette summary backend/cassettes/session.jsonl [other.jsonl ...]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from providers.response_cache import canonical_params, load_response, request_key
+from providers.usage import usage_from_response
+
+
+CASSETTE_PATH = os.getenv("CASSETTE_PATH", "./backend/cassettes/session.jsonl")
+CASSETTE_SPEED = float(os.getenv("CASSETTE_SPEED", "1.0"))  # Latency multiplier during replay
+CASSETTE_JITTER = float(os.getenv("CASSETTE_JITTER", "0"))  # e.g. 0.2 = ±20% per response
+CASSETTE_SEED = int(os.getenv("CASSETTE_SEED", "0"))
+
+# Bump when the line layout changes
+CASSETTE_FORMAT_VERSION = 1
+
+
+class CassetteMissError(Exception):
+    """Replayed request has no recorded counterpart"""
+
+
+class CassetteReplayError(Exception):
+    """Recorded provider error raised again during replay"""
+
+    def __init__(self, message: str, status_code: Optional[int]):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def _shape(provider: str, params: Dict[str, Any]) -> Tuple:
+    """Loose match key: provider, model, tool names and the forced tool"""
+    tools = tuple(sorted(tool.get("name", "") for tool in params.get("tools") or [] if isinstance(tool, dict)))
+    tool_choice = params.get("tool_choice")
+    forced = tool_choice.get("name") if isinstance(tool_choice, dict) else None
+    return provider, params.get("model"), tools, forced
+
+
+def _error_record(error: BaseException) -> Dict[str, Any]:
+    status = getattr(error, "status_code", None) or getattr(error, "code", None)
+    return {
+        "type": type(error).__name__,
+        "status_code": status if isinstance(status, int) else None,
+        "message": str(error)[:500],
+    }
+
+
+# ============================================================================
+# RECORDING
+# ============================================================================
+
+class CassetteRecorder:
+    """Appends every provider attempt to a cassette file"""
+
+    def __init__(self, path: str = CASSETTE_PATH):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._started = time.monotonic()
+        self._counters = {"recorded": 0, "errors": 0, "cancelled": 0}
+
+        with self._lock, open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps({
+                "cassette_format": CASSETTE_FORMAT_VERSION,
+                "session_started": datetime.now().isoformat()
+            }) + "\n")
+
+    def _write(self, record: Dict[str, Any]) -> None:
+        line = json.dumps(record) + "\n"
+        with self._lock, open(self.path, "a", encoding="utf-8") as f:
+            f.write(line)
+
+    def _record(self, provider: str, params: Dict[str, Any], started: float, response=None, error: BaseException = None, cancelled: bool = False) -> None:
+        record: Dict[str, Any] = {
+            "provider": provider,
+            "model": params.get("model"),
+            "key": request_key(provider, params),
+            "started_at": round(started - self._started, 4),
+            "latency": round(time.monotonic() - started, 4),
+        }
+        try:
+            record["request"] = canonical_params(params)
+        except (TypeError, ValueError):
+            record["request"] = {"model": params.get("model")}  # Not serializable; kept for the load profile only
+        if cancelled:
+            record["cancelled"] = True
+            self._counters["cancelled"] += 1
+        elif error is not None:
+            record["error"] = _error_record(error)
+            self._counters["errors"] += 1
+        else:
+            record["response"] = json.loads(response.model_dump_json())
+            record["usage"] = usage_from_response(response)
+        self._counters["recorded"] += 1
+        self._write(record)
+
+    async def call(self, provider: str, params: Dict[str, Any], make_call: Callable):
+        """Run an async provider call and record it"""
+        started = time.monotonic()
+        try:
+            response = await make_call()
+        except asyncio.CancelledError:
+            self._record(provider, params, started, cancelled=True)
+            raise
+        except Exception as e:
+            self._record(provider, params, started, error=e)
+            raise
+        self._record(provider, params, started, response=response)
+        return response
+
+    def call_sync(self, provider: str, params: Dict[str, Any], make_call: Callable):
+        """Run a blocking provider call and record it"""
+        started = time.monotonic()
+        try:
+            response = make_call()
+        except Exception as e:
+            self._record(provider, params, started, error=e)
+            raise
+        self._record(provider, params, started, response=response)
+        return response
+
+    def stats(self) -> Dict[str, Any]:
+        return {"mode": "record", "path": str(self.path), **self._counters}
+
+
+# ============================================================================
+# REPLAY
+# ============================================================================
+
+def read_cassette(path: str) -> List[Dict[str, Any]]:
+    """Recorded attempts of a cassette, in recording order (session headers dropped)"""
+    records = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                record = json.loads(line)
+                if "cassette_format" not in record:
+                    records.append(record)
+    return records
+
+
+class CassettePlayer:
+    """Serves recorded responses with recorded (scaled, jittered) latency"""
+
+    def __init__(self, path: str = CASSETTE_PATH, speed: float = CASSETTE_SPEED, jitter: float = CASSETTE_JITTER, seed: int = CASSETTE_SEED):
+        self.path = Path(path)
+        self.speed = speed
+        self.jitter = jitter
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._records = [r for r in read_cassette(path) if not r.get("cancelled")]
+        self._served = [False] * len(self._records)
+        self._by_key: Dict[str, deque] = {}
+        self._by_shape: Dict[Tuple, deque] = {}
+        self._last_by_key: Dict[str, int] = {}
+        self._counters = {"served_exact": 0, "served_loose": 0, "reused": 0, "misses": 0}
+
+        for index, record in enumerate(self._records):
+            self._by_key.setdefault(record["key"], deque()).append(index)
+            self._by_shape.setdefault(_shape(record["provider"], record["request"]), deque()).append(index)
+
+    def _next_unserved(self, queue: Optional[deque]) -> Optional[int]:
+        while queue:
+            index = queue.popleft()
+            if not self._served[index]:
+                return index
+        return None
+
+    def _match(self, provider: str, params: Dict[str, Any]) -> Tuple[Dict[str, Any], float]:
+        key = request_key(provider, params)
+        with self._lock:
+            index = self._next_unserved(self._by_key.get(key))
+            if index is not None:
+                self._counters["served_exact"] += 1
+            else:
+                index = self._next_unserved(self._by_shape.get(_shape(provider, params)))
+                if index is not None:
+                    self._counters["served_loose"] += 1
+                elif key in self._last_by_key:
+                    index = self._last_by_key[key]
+                    self._counters["reused"] += 1
+                else:
+                    self._counters["misses"] += 1
+                    raise CassetteMissError(f"No recorded {provider} response for model {params.get('model')} in {self.path}")
+
+            self._served[index] = True
+            self._last_by_key[key] = index
+            record = self._records[index]
+            factor = 1 + self._rng.uniform(-self.jitter, self.jitter) if self.jitter else 1
+        return record, max(record["latency"] * self.speed * factor, 0)
+
+    def _result(self, provider: str, record: Dict[str, Any]):
+        if "error" in record:
+            error = record["error"]
+            raise CassetteReplayError(f"{error['type']}: {error['message']}", error["status_code"])
+        return load_response(provider, record["response"])
+
+    async def call(self, provider: str, params: Dict[str, Any], make_call: Callable = None):
+        """Serve an async provider call from the cassette"""
+        record, delay = self._match(provider, params)
+        await asyncio.sleep(delay)
+        return self._result(provider, record)
+
+    def call_sync(self, provider: str, params: Dict[str, Any], make_call: Callable = None):
+        """Serve a blocking provider call from the cassette"""
+        record, delay = self._match(provider, params)
+        time.sleep(delay)
+        return self._result(provider, record)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "mode": "replay",
+                "path": str(self.path),
+                "speed": self.speed,
+                "jitter": self.jitter,
+                "recorded": len(self._records),
+                "remaining": self._served.count(False),
+                **self._counters,
+            }
+
+
+# ============================================================================
+# CLIENT WRAPPERS
+# ============================================================================
+
+class _CassetteMessages:
+    def __init__(self, session, messages):
+        self._session = session
+        self._messages = messages
+
+    async def create(self, **params):
+        return await self._session.call("anthropic", params, lambda: self._messages.create(**params))
+
+
+class CassetteAnthropic:
+    """AsyncAnthropic wrapper that records to or replays from a cassette"""
+
+    def __init__(self, session, client=None):
+        self._session = session
+        self._client = client
+        self.messages = _CassetteMessages(session, client.messages if client is not None else None)
+
+    def with_options(self, **options) -> "CassetteAnthropic":
+        if self._client is None:
+            return self
+        return CassetteAnthropic(self._session, self._client.with_options(**options))
+
+    async def close(self) -> None:
+        if self._client is not None:
+            await self._client.close()
+
+
+class _CassetteGeminiModels:
+    def __init__(self, session, models):
+        self._session = session
+        self._models = models
+
+    def generate_content(self, **params):
+        return self._session.call_sync("gemini", params, lambda: self._models.generate_content(**params))
+
+    def __getattr__(self, name):
+        return getattr(self._models, name)  # generate_videos etc. are not recorded
+
+
+class _CassetteAsyncGeminiModels(_CassetteGeminiModels):
+    async def generate_content(self, **params):
+        return await self._session.call("gemini", params, lambda: self._models.generate_content(**params))
+
+
+class CassetteGeminiClient:
+    """
+    google-genai Client wrapper that records to or replays from a cassette
+
+    Args:
+        session: CassetteRecorder or CassettePlayer
+        client: Client that serves everything else (live when recording, fake when replaying)
+    """
+
+    def __init__(self, session, client):
+        self._client = client
+        self.models = _CassetteGeminiModels(session, client.models)
+        self.aio = _CassetteAio(session, client.aio)
+
+    def __getattr__(self, name):
+        return getattr(self._client, name)
+
+
+class _CassetteAio:
+    def __init__(self, session, aio):
+        self._aio = aio
+        self.models = _CassetteAsyncGeminiModels(session, aio.models)
+
+    def __getattr__(self, name):
+        return getattr(self._aio, name)
+
+
+_session = None
+
+
+def get_cassette_session():
+    """Process-wide recorder or player for the current PROVIDER_MODE"""
+    global _session
+    if _session is None:
+        from providers.clients import PROVIDER_MODE
+        _session = CassettePlayer() if PROVIDER_MODE == "replay" else CassetteRecorder()
+    return _session
+
+
+def get_cassette_metrics() -> Dict[str, Any]:
+    """Cassette metrics for /api/metrics"""
+    if _session is None:
+        return {"mode": None}
+    return _session.stats()
+
+
+# ============================================================================
+# SUMMARY
+# ============================================================================
+
+def _percentile(samples: List[float], fraction: float) -> Optional[float]:
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    return ordered[min(int(round(fraction * (len(ordered) - 1))), len(ordered) - 1)]
+
+
+def summarize(path: str) -> Dict[str, Any]:
+    """
+    Load profile of a cassette
+
+    Returns:
+        Per provider/model: attempts, errors by status, cancelled attempts,
+        token totals and latency percentiles. Also the session span and
+        peak number of concurrent requests.
+    """
+    records = read_cassette(path)
+    models: Dict[str, Dict[str, Any]] = {}
+    events = []
+    for record in records:
+        entry = models.setdefault(f"{record['provider']}:{record['model']}", {
+            "attempts": 0, "errors": {}, "cancelled": 0,
+            "input_tokens": 0, "output_tokens": 0, "cache_read_input_tokens": 0, "latencies": []
+        })
+        entry["attempts"] += 1
+        if record.get("cancelled"):
+            entry["cancelled"] += 1
+        elif "error" in record:
+            status = str(record["error"]["status_code"] or record["error"]["type"])
+            entry["errors"][status] = entry["errors"].get(status, 0) + 1
+        else:
+            entry["latencies"].append(record["latency"])
+            for field in ("input_tokens", "output_tokens", "cache_read_input_tokens"):
+                entry[field] += record["usage"].get(field, 0)
+        events.append((record["started_at"], 1))
+        events.append((record["started_at"] + record["latency"], -1))
+
+    peak = current = 0
+    for _, change in sorted(events):
+        current += change
+        peak = max(peak, current)
+
+    for entry in models.values():
+        latencies = entry.pop("latencies")
+        entry["latency_p50_seconds"] = _percentile(latencies, 0.5)
+        entry["latency_p95_seconds"] = _percentile(latencies, 0.95)
+
+    return {
+        "path": path,
+        "attempts": len(records),
+        "span_seconds": round(max((t for t, _ in events), default=0), 2),
+        "peak_concurrency": peak,
+        "models": models,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect provider cassettes")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    summary_parser = subparsers.add_parser("summary", help="Load profile of one or more cassettes")
+    summary_parser.add_argument("paths", nargs="+")
+    args = parser.parse_args()
+
+    for path in args.paths:
+        print(json.dumps(summarize(path), indent=2))
+
+
+if __name__ == "__main__":
+    main()
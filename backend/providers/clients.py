@@ -0,0 +1,251 @@
+"""
+Process-wide provider client registry
+
+Sub-agents used to construct a fresh AsyncAnthropic / genai.Client on every
+call, paying DNS, TCP and TLS setup each time with no keep-alive reuse.
+get_anthropic_client() and get_gemini_client() return one shared client per
+API key, so every agent and pipeline run reuses warm pooled connections.
+
+Anthropic and Gemini clients get an httpx connection pool sized by
+PROVIDER_MAX_CONNECTIONS / PROVIDER_MAX_KEEPALIVE_CONNECTIONS with
+PROVIDER_KEEPALIVE_EXPIRY seconds of idle keep-alive, wrapped in a transport
+that counts requests and tracks in-flight concurrency. get_client_metrics()
+reports those counters plus the pool's open/idle connections. Gemini's pool
+is used by the async (client.aio) API that call_gemini() goes through, and
+needs a google-genai release whose HttpOptions accepts httpx_async_client;
+older releases keep the SDK's own pool (only clients_created is counted).
+
+httpx connections are bound to the event loop that opened them, so clients
+are cached per running loop (CLI tools that call asyncio.run() repeatedly
+get a fresh client per loop; the API server has one loop and one client).
+
+PROVIDER_MODE=fake swaps in the offline fakes from providers/fake.py (no
+API keys needed). PROVIDER_MODE=record wraps the live clients to save every
+call to a cassette, and PROVIDER_MODE=replay serves calls back from it
+(providers/cassette.py, no keys needed either). GEMINI_BASE_URL points Gemini clients at another
+endpoint, e.g. providers/fake_server.py (the Anthropic SDK reads
+ANTHROPIC_BASE_URL itself).
+"""
+
+import asyncio
+import os
+import weakref
+from typing import Any, Dict, Optional
+
+try:
+    import httpx
+    HTTPX_AVAILABLE = True
+except ImportError:
+    HTTPX_AVAILABLE = False
+
+
+# "live" (SDK clients), "fake" (offline fakes, see providers/fake.py),
+# "record" or "replay" (cassettes, see providers/cassette.py)
+PROVIDER_MODE = os.getenv("PROVIDER_MODE", "live").lower()
+GEMINI_BASE_URL = os.getenv("GEMINI_BASE_URL")
+
+# Connection pool limits per provider client
+PROVIDER_MAX_CONNECTIONS = int(os.getenv("PROVIDER_MAX_CONNECTIONS", "64"))
+PROVIDER_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("PROVIDER_MAX_KEEPALIVE_CONNECTIONS", "32"))
+PROVIDER_KEEPALIVE_EXPIRY = float(os.getenv("PROVIDER_KEEPALIVE_EXPIRY", "120"))
+
+
+# ============================================================================
+# POOL METRICS
+# ============================================================================
+
+_pool_metrics: Dict[str, Dict[str, int]] = {}
+_transports: Dict[str, "weakref.WeakSet"] = {}
+
+
+def _provider_metrics(provider: str) -> Dict[str, int]:
+    return _pool_metrics.setdefault(provider, {
+        "clients_created": 0,
+        "requests": 0,
+        "request_errors": 0,
+        "in_flight": 0,
+        "peak_in_flight": 0,
+    })
+
+
+if HTTPX_AVAILABLE:
+    class _CountingTransport(httpx.AsyncBaseTransport):
+        """Pooled httpx transport that records request counts and concurrency"""
+
+        def __init__(self, provider: str):
+            self.provider = provider
+            self._transport = httpx.AsyncHTTPTransport(
+                limits=httpx.Limits(
+                    max_connections=PROVIDER_MAX_CONNECTIONS,
+                    max_keepalive_connections=PROVIDER_MAX_KEEPALIVE_CONNECTIONS,
+                    keepalive_expiry=PROVIDER_KEEPALIVE_EXPIRY
+                )
+            )
+
+        async def handle_async_request(self, request):
+            metrics = _provider_metrics(self.provider)
+            metrics["requests"] += 1
+            metrics["in_flight"] += 1
+            metrics["peak_in_flight"] = max(metrics["peak_in_flight"], metrics["in_flight"])
+            try:
+                return await self._transport.handle_async_request(request)
+            except Exception:
+                metrics["request_errors"] += 1
+                raise
+            finally:
+                metrics["in_flight"] -= 1
+
+        async def aclose(self) -> None:
+            await self._transport.aclose()
+
+        def connection_counts(self) -> Dict[str, int]:
+            """Open and idle connections in the pool (0 if httpcore hides them)"""
+            pool = getattr(self._transport, "_pool", None)
+            connections = list(getattr(pool, "connections", []))
+            return {
+                "open": len(connections),
+                "idle": sum(1 for connection in connections if connection.is_idle()),
+            }
+
+
+def get_client_metrics() -> Dict[str, Dict[str, Any]]:
+    """
+    Snapshot of client pool usage per provider
+
+    Returns:
+        Dict of provider → request counters, peak concurrency and open/idle connections
+    """
+    snapshot = {}
+    for provider, counters in _pool_metrics.items():
+        connections = {"open": 0, "idle": 0}
+        for transport in list(_transports.get(provider, [])):
+            for key, value in transport.connection_counts().items():
+                connections[key] += value
+        snapshot[provider] = {**counters, "connections_open": connections["open"], "connections_idle": connections["idle"]}
+    return snapshot
+
+
+# ============================================================================
+# REGISTRY
+# ============================================================================
+
+# Running loop (None outside one) → {(provider, api_key): client}
+_clients: "weakref.WeakKeyDictionary[Any, Dict[tuple, Any]]" = weakref.WeakKeyDictionary()
+_loopless_clients: Dict[tuple, Any] = {}
+
+
+def _loop_clients() -> Dict[tuple, Any]:
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        return _loopless_clients
+    return _clients.setdefault(loop, {})
+
+
+def is_fake_mode() -> bool:
+    """Whether agents run against the offline fake providers"""
+    return PROVIDER_MODE == "fake"
+
+
+def is_offline_mode() -> bool:
+    """Whether provider calls are served locally (no API keys or network needed)"""
+    return PROVIDER_MODE in ("fake", "replay")
+
+
+def is_live_mode() -> bool:
+    """Whether agents use plain SDK clients (no fakes or cassettes)"""
+    return PROVIDER_MODE == "live"
+
+
+def get_anthropic_client(api_key: Optional[str]):
+    """
+    Shared AsyncAnthropic client for an API key
+
+    Args:
+        api_key: Anthropic API key
+
+    Returns:
+        AsyncAnthropic client with a tuned, instrumented connection pool
+        (FakeAnthropic in fake mode, CassetteAnthropic in record/replay mode)
+    """
+    clients = _loop_clients()
+    key = ("anthropic", api_key)
+    client = clients.get(key)
+    if client is None and is_fake_mode():
+        from providers.fake import FakeAnthropic
+        client = clients[key] = FakeAnthropic()
+    if client is None and PROVIDER_MODE == "replay":
+        from providers.cassette import CassetteAnthropic, get_cassette_session
+        client = clients[key] = CassetteAnthropic(get_cassette_session())
+    if client is None:
+        import anthropic
+
+        if HTTPX_AVAILABLE:
+            transport = _CountingTransport("anthropic")
+            _transports.setdefault("anthropic", weakref.WeakSet()).add(transport)
+            # Same defaults the SDK uses (timeouts, redirects), with our pool
+            http_client = anthropic.DefaultAsyncHttpxClient(transport=transport)
+            client = anthropic.AsyncAnthropic(api_key=api_key, http_client=http_client)
+        else:
+            client = anthropic.AsyncAnthropic(api_key=api_key)
+        _provider_metrics("anthropic")["clients_created"] += 1
+        if PROVIDER_MODE == "record":
+            from providers.cassette import CassetteAnthropic, get_cassette_session
+            client = CassetteAnthropic(get_cassette_session(), client)
+        clients[key] = client
+    return client
+
+
+def get_gemini_client(api_key: Optional[str]):
+    """
+    Shared google-genai Client for an API key
+
+    Async calls go through the same pooled, instrumented httpx transport as
+    Anthropic (when the SDK supports it); sharing the client is what lets
+    those connections be reused across calls.
+
+    Args:
+        api_key: Google Gemini API key
+
+    Returns:
+        google-genai Client with a tuned, instrumented async connection pool
+        (FakeGeminiClient in fake mode, CassetteGeminiClient in record/replay mode)
+    """
+    clients = _loop_clients()
+    key = ("gemini", api_key)
+    client = clients.get(key)
+    if client is None and is_fake_mode():
+        from providers.fake import FakeGeminiClient
+        client = clients[key] = FakeGeminiClient()
+    if client is None and PROVIDER_MODE == "replay":
+        from providers.cassette import CassetteGeminiClient, get_cassette_session
+        from providers.fake import FakeGeminiClient
+        client = clients[key] = CassetteGeminiClient(get_cassette_session(), FakeGeminiClient())
+    if client is None:
+        from google import genai
+        from google.genai import types
+
+        http_options: Dict[str, Any] = {"base_url": GEMINI_BASE_URL} if GEMINI_BASE_URL else {}
+        supported = getattr(getattr(types, "HttpOptions", None), "model_fields", {})
+        if HTTPX_AVAILABLE and "httpx_async_client" in supported:
+            transport = _CountingTransport("gemini")
+            _transports.setdefault("gemini", weakref.WeakSet()).add(transport)
+            # Same redirect default the SDK uses; timeouts are set per request
+            http_options["httpx_async_client"] = httpx.AsyncClient(transport=transport, follow_redirects=True)
+        client = genai.Client(api_key=api_key, http_options=http_options or None)
+        _provider_metrics("gemini")["clients_created"] += 1
+        if PROVIDER_MODE == "record":
+            from providers.cassette import CassetteGeminiClient, get_cassette_session
+            client = CassetteGeminiClient(get_cassette_session(), client)
+        clients[key] = client
+    return client
+
+
+async def close_clients() -> None:
+    """Close the current loop's clients (server shutdown)"""
+    clients = _loop_clients()
+    for client in clients.values():
+        close = getattr(client, "close", None)
+        if close is not None and asyncio.iscoroutinefunction(close):
+            await close()
+    clients.clear()
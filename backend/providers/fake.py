@@ -0,0 +1,584 @@
+"""
+Fake Anthropic and Gemini providers for offline, deterministic runs
+
+With PROVIDER_MODE=fake, get_anthropic_client() and get_gemini_client()
+return the in-process fakes below instead of SDK clients, so the Entry,
+Character and Scene agents run end to end with no API keys. The same
+responses are served over HTTP by providers/fake_server.py, for pointing
+real SDK clients at a local stand-in (ANTHROPIC_BASE_URL / GEMINI_BASE_URL).
+
+Responses:
+- Forced tool calls (tool_choice {"type": "tool"}) return a tool_use block
+  whose input is generated from the tool's input_schema, so structured
+  sub-agent output is always schema-valid
+- Tool loops (tools with auto tool_choice): the Nth user turn calls the Nth
+  tool, and a turn answering tool results ends with text, so loops like the
+  Entry agent's reach finalize_output
+- Gemini image requests return a small PNG; Veo returns a long-running
+  operation that completes after the profile's video latency
+- Usage is estimated from request/response size (about 4 characters per
+  token), and cache_control breakpoints are simulated (reads on repeated
+  prefixes, writes otherwise)
+
+Latency, 5xx/overloaded and 429 rates come from a named profile
+(FAKE_PROVIDER_PROFILE) with optional JSON overrides
+(FAKE_PROVIDER_OVERRIDES). Every random draw is seeded by
+FAKE_PROVIDER_SEED, the request content and how many times that request
+has been seen, so runs are reproducible regardless of task scheduling.
+"""
+
+import asyncio
+import base64
+import hashlib
+import json
+import math
+import os
+import random
+import struct
+import threading
+import time
+import zlib
+from types import SimpleNamespace
+from typing import Any, Dict, Optional, Tuple
+
+
+FAKE_PROVIDER_PROFILE = os.getenv("FAKE_PROVIDER_PROFILE", "instant")
+FAKE_PROVIDER_OVERRIDES = os.getenv("FAKE_PROVIDER_OVERRIDES", "")
+FAKE_PROVIDER_SEED = int(os.getenv("FAKE_PROVIDER_SEED", "0"))
+FAKE_PROVIDER_TIME_SCALE = float(os.getenv("FAKE_PROVIDER_TIME_SCALE", "1.0"))  # 0.1 = 10x faster
+
+# Latencies in seconds: time to first token is log-normal (median, p95),
+# generation adds output tokens / tokens_per_second
+LATENCY_PROFILES: Dict[str, Dict[str, float]] = {
+    "instant": {
+        "ttft_median": 0.0, "ttft_p95": 0.0, "tokens_per_second": 0,
+        "image_seconds": 0.0, "video_seconds": 0.0,
+        "error_rate": 0.0, "rate_limit_rate": 0.0,
+    },
+    "typical": {
+        "ttft_median": 0.6, "ttft_p95": 1.8, "tokens_per_second": 120,
+        "image_seconds": 6.0, "video_seconds": 45.0,
+        "error_rate": 0.0, "rate_limit_rate": 0.0,
+    },
+    "slow": {
+        "ttft_median": 2.0, "ttft_p95": 8.0, "tokens_per_second": 40,
+        "image_seconds": 15.0, "video_seconds": 120.0,
+        "error_rate": 0.01, "rate_limit_rate": 0.02,
+    },
+    "flaky": {
+        "ttft_median": 0.8, "ttft_p95": 4.0, "tokens_per_second": 100,
+        "image_seconds": 8.0, "video_seconds": 60.0,
+        "error_rate": 0.05, "rate_limit_rate": 0.10,
+    },
+}
+
+PROMPT_CACHE_TTL_SECONDS = 300
+CHARS_PER_TOKEN = 4
+
+
+def resolve_profile(name: Optional[str] = None, overrides: Optional[str] = None) -> Dict[str, float]:
+    """
+    Latency/error profile by name with JSON overrides applied
+
+    Raises:
+        ValueError: Unknown profile name
+    """
+    name = name or FAKE_PROVIDER_PROFILE
+    if name not in LATENCY_PROFILES:
+        raise ValueError(f"Unknown fake provider profile: {name}. Valid profiles: {list(LATENCY_PROFILES)}")
+    profile = dict(LATENCY_PROFILES[name])
+    overrides = FAKE_PROVIDER_OVERRIDES if overrides is None else overrides
+    if overrides:
+        profile.update(json.loads(overrides))
+    return profile
+
+
+# ============================================================================
+# ERRORS (names/status codes match what calls.is_retryable_error() expects)
+# ============================================================================
+
+class FakeProviderError(Exception):
+    """Injected provider failure"""
+    status_code = 500
+
+    def __init__(self, message: str):
+        super().__init__(message)
+        self.code = self.status_code
+
+
+class RateLimitError(FakeProviderError):
+    status_code = 429
+
+
+class InternalServerError(FakeProviderError):
+    status_code = 500
+
+
+class OverloadedError(FakeProviderError):
+    status_code = 529
+
+
+# ============================================================================
+# CONTENT GENERATION
+# ============================================================================
+
+def _digest(value: Any) -> str:
+    return hashlib.sha256(json.dumps(value, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+def _tokens(value: Any) -> int:
+    text = value if isinstance(value, str) else json.dumps(value, default=str)
+    return max(1, len(text) // CHARS_PER_TOKEN)
+
+
+def sample_from_schema(schema: Dict[str, Any], rng: random.Random, name: str = "value") -> Any:
+    """
+    Generate a value that satisfies a JSON schema
+
+    Args:
+        schema: JSON schema (as produced by providers.structured or hand-written tool schemas)
+        rng: Seeded random source
+        name: Property name, used to make strings readable
+
+    Returns:
+        A schema-valid value
+    """
+    if "enum" in schema:
+        return rng.choice(schema["enum"])
+    if "anyOf" in schema:
+        return sample_from_schema(schema["anyOf"][0], rng, name)
+
+    kind = schema.get("type", "string")
+    if isinstance(kind, list):
+        kind = next((k for k in kind if k != "null"), "string")
+
+    if kind == "object":
+        properties = schema.get("properties", {})
+        if not properties and isinstance(schema.get("additionalProperties"), dict):
+            return {f"{name}_key": sample_from_schema(schema["additionalProperties"], rng, name)}
+        return {key: sample_from_schema(sub, rng, key) for key, sub in properties.items()}
+    if kind == "array":
+        low = schema.get("minItems", 2)
+        high = max(low, schema.get("maxItems", 3))
+        item_name = name[:-1] if name.endswith("s") else name
+        return [sample_from_schema(schema.get("items", {}), rng, item_name) for _ in range(rng.randint(low, high))]
+    if kind == "integer":
+        return rng.randint(schema.get("minimum", 1), schema.get("maximum", 60))
+    if kind == "number":
+        return round(rng.uniform(schema.get("minimum", 0.0), schema.get("maximum", 1.0)), 2)
+    if kind == "boolean":
+        return rng.random() < 0.5
+    return f"Fake {name.replace('_', ' ')} #{rng.randint(1, 999)}"
+
+
+def fake_png(seed: str, size: int = 64) -> bytes:
+    """Solid-colour PNG (valid image bytes) with a colour derived from seed"""
+    red, green, blue = hashlib.sha256(seed.encode("utf-8")).digest()[:3]
+    row = b"\x00" + bytes([red, green, blue]) * size
+    raw = row * size
+
+    def chunk(kind: bytes, data: bytes) -> bytes:
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data) & 0xFFFFFFFF)
+
+    header = struct.pack(">IIBBBBB", size, size, 8, 2, 0, 0, 0)
+    return b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", header) + chunk(b"IDAT", zlib.compress(raw)) + chunk(b"IEND", b"")
+
+
+def fake_mp4(seed: str) -> bytes:
+    """Placeholder MP4 bytes (ftyp box plus padding)"""
+    return b"\x00\x00\x00\x18ftypmp42\x00\x00\x00\x00mp42isom" + hashlib.sha256(seed.encode("utf-8")).digest() * 32
+
+
+def _message_text(message: Dict[str, Any]) -> str:
+    content = message.get("content", "")
+    if isinstance(content, str):
+        return content
+    parts = []
+    for block in content:
+        block = block if isinstance(block, dict) else getattr(block, "__dict__", {})
+        if block.get("type") == "text":
+            parts.append(block.get("text", ""))
+    return " ".join(parts)
+
+
+def _is_tool_result_turn(message: Dict[str, Any]) -> bool:
+    content = message.get("content")
+    return isinstance(content, list) and any(
+        isinstance(block, dict) and block.get("type") == "tool_result" for block in content
+    )
+
+
+def _serializable(value: Any) -> Any:
+    """Request params as plain JSON (SDK content blocks become dicts)"""
+    if hasattr(value, "model_dump"):
+        return value.model_dump(mode="json", exclude_none=True)
+    if isinstance(value, dict):
+        return {key: _serializable(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_serializable(item) for item in value]
+    if isinstance(value, (bytes, bytearray)):
+        return {"sha256": hashlib.sha256(value).hexdigest()}
+    if isinstance(value, (str, int, float, bool)) or value is None:
+        return value
+    return getattr(value, "__dict__", str(value))
+
+
+# ============================================================================
+# CORE (shared by the in-process clients and the HTTP stand-in)
+# ============================================================================
+
+class FakeProviderCore:
+    """
+    Deterministic response, latency and failure generation
+
+    Thread-safe: the HTTP stand-in calls it from handler threads.
+    """
+
+    def __init__(
+        self,
+        profile: Optional[Dict[str, float]] = None,
+        seed: int = FAKE_PROVIDER_SEED,
+        time_scale: float = FAKE_PROVIDER_TIME_SCALE
+    ):
+        self.profile = profile or resolve_profile()
+        self.seed = seed
+        self.time_scale = time_scale
+        self._lock = threading.Lock()
+        self._seen: Dict[str, int] = {}
+        self._prompt_cache: Dict[str, float] = {}
+        self.stats = {"requests": 0, "errors_injected": 0, "rate_limits_injected": 0}
+
+    def _rng(self, digest: str, attempt: int, purpose: str) -> random.Random:
+        return random.Random(f"{self.seed}:{digest}:{attempt}:{purpose}")
+
+    def _attempt(self, digest: str) -> int:
+        with self._lock:
+            self._seen[digest] = self._seen.get(digest, 0) + 1
+            self.stats["requests"] += 1
+            return self._seen[digest]
+
+    def outcome(self, digest: str, attempt: int, output_tokens: int, base_seconds: float = 0.0) -> Tuple[float, Optional[FakeProviderError]]:
+        """
+        Latency and injected failure for one request
+
+        Returns:
+            Tuple of (seconds to wait, error to raise after waiting or None)
+        """
+        rng = self._rng(digest, attempt, "outcome")
+        profile = self.profile
+
+        ttft = 0.0
+        if profile["ttft_median"] > 0:
+            sigma = math.log(max(profile["ttft_p95"], profile["ttft_median"]) / profile["ttft_median"]) / 1.645
+            ttft = profile["ttft_median"] * math.exp(sigma * rng.gauss(0, 1))
+
+        roll = rng.random()
+        error: Optional[FakeProviderError] = None
+        if roll < profile["rate_limit_rate"]:
+            error = RateLimitError("Fake provider: rate limited")
+        elif roll < profile["rate_limit_rate"] + profile["error_rate"]:
+            error = rng.choice([InternalServerError, OverloadedError])("Fake provider: injected server error")
+
+        if error is not None:
+            with self._lock:
+                self.stats["rate_limits_injected" if isinstance(error, RateLimitError) else "errors_injected"] += 1
+            return ttft * self.time_scale, error
+
+        generation = output_tokens / profile["tokens_per_second"] if profile["tokens_per_second"] else 0.0
+        return (ttft + generation + base_seconds) * self.time_scale, None
+
+    # ------------------------------------------------------------------
+    # Anthropic Messages API
+    # ------------------------------------------------------------------
+
+    def _prompt_cache_usage(self, params: Dict[str, Any], input_tokens: int) -> Dict[str, int]:
+        """Split input tokens into uncached / cache read / cache write like the real API"""
+        system = params.get("system")
+        if not isinstance(system, list):
+            return {"input_tokens": input_tokens, "cache_read_input_tokens": 0, "cache_creation_input_tokens": 0}
+
+        tools = params.get("tools", [])
+        breakpoints = [
+            (index, _digest([tools, system[:index + 1]]), _tokens([tools, system[:index + 1]]))
+            for index, block in enumerate(system)
+            if isinstance(block, dict) and block.get("cache_control")
+        ]
+        now = time.time()
+        read = written = 0
+        with self._lock:
+            for _, digest, tokens in breakpoints:
+                if self._prompt_cache.get(digest, 0) > now:
+                    read = tokens
+            for _, digest, tokens in breakpoints:
+                self._prompt_cache[digest] = now + PROMPT_CACHE_TTL_SECONDS
+            if breakpoints:
+                written = max(breakpoints[-1][2] - read, 0)
+
+        return {
+            "input_tokens": max(input_tokens - read - written, 0),
+            "cache_read_input_tokens": read,
+            "cache_creation_input_tokens": written,
+        }
+
+    def anthropic_message(self, params: Dict[str, Any]) -> Tuple[Dict[str, Any], int, str]:
+        """
+        Messages API response for a request
+
+        Returns:
+            Tuple of (message JSON, attempt number, request digest)
+        """
+        params = _serializable(params)
+        digest = _digest({key: params.get(key) for key in ("model", "system", "messages", "tools", "tool_choice")})
+        attempt = self._attempt(digest)
+        rng = self._rng(digest, 0, "content")
+
+        messages = params.get("messages", [])
+        tools = params.get("tools") or []
+        tool_choice = params.get("tool_choice") or {}
+        last = messages[-1] if messages else {}
+
+        tool = None
+        if tool_choice.get("type") == "tool":
+            tool = next((t for t in tools if t["name"] == tool_choice["name"]), None)
+        elif tools and tool_choice.get("type") != "none" and not _is_tool_result_turn(last):
+            user_turns = sum(1 for m in messages if m.get("role") == "user" and not _is_tool_result_turn(m))
+            if tool_choice.get("type") == "any":
+                tool = tools[(user_turns - 1) % len(tools)]
+            elif user_turns <= len(tools):
+                tool = tools[user_turns - 1]
+
+        if tool is not None:
+            content = [{
+                "type": "tool_use",
+                "id": f"toolu_fake_{digest[:20]}",
+                "name": tool["name"],
+                "input": sample_from_schema(tool.get("input_schema", {"type": "object"}), rng, tool["name"]),
+            }]
+            stop_reason = "tool_use"
+        else:
+            prompt = _message_text(last)[:120]
+            content = [{"type": "text", "text": f"[fake {params.get('model', 'model')}] Response to: {prompt}"}]
+            stop_reason = "end_turn"
+
+        input_tokens = _tokens([params.get("system"), messages, tools])
+        usage = self._prompt_cache_usage(params, input_tokens)
+        usage["output_tokens"] = _tokens(content)
+
+        message = {
+            "id": f"msg_fake_{digest[:24]}",
+            "type": "message",
+            "role": "assistant",
+            "model": params.get("model", "fake"),
+            "content": content,
+            "stop_reason": stop_reason,
+            "stop_sequence": None,
+            "usage": usage,
+        }
+        return message, attempt, digest
+
+    # ------------------------------------------------------------------
+    # Gemini
+    # ------------------------------------------------------------------
+
+    def gemini_content(self, model: str, contents: Any, wants_image: bool) -> Tuple[Dict[str, Any], int, str, float]:
+        """
+        generate_content response (snake_case fields, raw image bytes)
+
+        Returns:
+            Tuple of (response dict, attempt number, request digest, extra seconds for image generation)
+        """
+        digest = _digest({"model": model, "contents": _serializable(contents), "image": wants_image})
+        attempt = self._attempt(digest)
+
+        if wants_image:
+            part = {"inline_data": {"mime_type": "image/png", "data": fake_png(digest)}}
+            output_tokens = 1290  # Gemini bills a fixed token count per image
+            extra = self.profile["image_seconds"]
+        else:
+            text = f"[fake {model}] Response to: {str(_serializable(contents))[:120]}"
+            part = {"text": text}
+            output_tokens = _tokens(text)
+            extra = 0.0
+
+        prompt_tokens = _tokens(_serializable(contents))
+        response = {
+            "candidates": [{"content": {"role": "model", "parts": [part]}, "finish_reason": "STOP"}],
+            "usage_metadata": {
+                "prompt_token_count": prompt_tokens,
+                "candidates_token_count": output_tokens,
+                "total_token_count": prompt_tokens + output_tokens,
+            },
+        }
+        return response, attempt, digest, extra
+
+
+# ============================================================================
+# IN-PROCESS CLIENTS
+# ============================================================================
+
+def _anthropic_message_object(message: Dict[str, Any]):
+    from anthropic.types import Message
+    return Message.model_validate(message)
+
+
+def _gemini_response_object(response: Dict[str, Any]):
+    from google.genai import types
+    return types.GenerateContentResponse.model_validate(response)
+
+
+def _wants_image(model: str, config: Any) -> bool:
+    modalities = config.get("response_modalities") if isinstance(config, dict) else getattr(config, "response_modalities", None)
+    return "image" in model or any(str(m).upper().endswith("IMAGE") for m in (modalities or []))
+
+
+class _FakeMessages:
+    def __init__(self, core: FakeProviderCore):
+        self._core = core
+
+    async def create(self, **params):
+        message, attempt, digest = self._core.anthropic_message(params)
+        delay, error = self._core.outcome(digest, attempt, message["usage"]["output_tokens"])
+        await asyncio.sleep(delay)
+        if error is not None:
+            raise error
+        return _anthropic_message_object(message)
+
+
+class FakeAnthropic:
+    """AsyncAnthropic stand-in (messages.create, with_options)"""
+
+    def __init__(self, core: Optional[FakeProviderCore] = None):
+        self.core = core or get_fake_core()
+        self.messages = _FakeMessages(self.core)
+
+    def with_options(self, **options) -> "FakeAnthropic":
+        return self
+
+    async def close(self) -> None:
+        return None
+
+
+class _FakeOperation(SimpleNamespace):
+    """Veo long-running operation"""
+
+
+class _FakeGeminiModels:
+    def __init__(self, core: FakeProviderCore, operations: Dict[str, Tuple[float, Any]]):
+        self._core = core
+        self._operations = operations
+
+    def _content(self, model: str, contents: Any, config: Any):
+        response, attempt, digest, extra = self._core.gemini_content(model, contents, _wants_image(model, config))
+        delay, error = self._core.outcome(digest, attempt, response["usage_metadata"]["candidates_token_count"], extra)
+        return response, delay, error
+
+    def generate_content(self, model: str, contents: Any = None, config: Any = None, **kwargs):
+        response, delay, error = self._content(model, contents, config)
+        time.sleep(delay)
+        if error is not None:
+            raise error
+        return _gemini_response_object(response)
+
+    def generate_videos(self, model: str, prompt: str = "", config: Any = None, **kwargs):
+        digest = _digest({"model": model, "prompt": prompt, "config": _serializable(config)})
+        attempt = self._core._attempt(digest)
+        delay, error = self._core.outcome(digest, attempt, 0)
+        if error is not None:
+            raise error
+        name = f"operations/fake-{digest[:16]}-{attempt}"
+        video = SimpleNamespace(video_bytes=fake_mp4(digest), data=fake_mp4(digest), mime_type="video/mp4", uri=None)
+        ready_at = time.time() + delay + self._core.profile["video_seconds"] * self._core.time_scale
+        self._operations[name] = (ready_at, SimpleNamespace(generated_videos=[SimpleNamespace(video=video)]))
+        return _FakeOperation(name=name, done=False, response=None, error=None)
+
+
+class _FakeAsyncGeminiModels:
+    def __init__(self, models: _FakeGeminiModels):
+        self._models = models
+
+    async def generate_content(self, model: str, contents: Any = None, config: Any = None, **kwargs):
+        response, delay, error = self._models._content(model, contents, config)
+        await asyncio.sleep(delay)
+        if error is not None:
+            raise error
+        return _gemini_response_object(response)
+
+    async def generate_videos(self, **kwargs):
+        return self._models.generate_videos(**kwargs)
+
+
+class _FakeOperations:
+    def __init__(self, operations: Dict[str, Tuple[float, Any]]):
+        self._operations = operations
+
+    def get(self, operation=None, **kwargs):
+        operation = operation or kwargs.get("name")
+        ready_at, response = self._operations[operation.name]
+        if time.time() < ready_at:
+            return _FakeOperation(name=operation.name, done=False, response=None, error=None)
+        return _FakeOperation(name=operation.name, done=True, response=response, result=response, error=None)
+
+
+class _FakeAsyncOperations:
+    def __init__(self, operations: _FakeOperations):
+        self._operations = operations
+
+    async def get(self, operation=None, **kwargs):
+        return self._operations.get(operation, **kwargs)
+
+
+class _FakeFiles:
+    def download(self, file=None, **kwargs) -> bytes:
+        return file.video_bytes
+
+
+class FakeGeminiClient:
+    """google-genai Client stand-in (models, operations, files and their .aio variants)"""
+
+    def __init__(self, core: Optional[FakeProviderCore] = None):
+        self.core = core or get_fake_core()
+        operations: Dict[str, Tuple[float, Any]] = {}
+        self.models = _FakeGeminiModels(self.core, operations)
+        self.operations = _FakeOperations(operations)
+        self.files = _FakeFiles()
+        self.aio = SimpleNamespace(
+            models=_FakeAsyncGeminiModels(self.models),
+            operations=_FakeAsyncOperations(self.operations)
+        )
+
+
+_core: Optional[FakeProviderCore] = None
+
+
+def get_fake_core() -> FakeProviderCore:
+    """Process-wide fake core (one profile, seed and prompt cache)"""
+    global _core
+    if _core is None:
+        _core = FakeProviderCore()
+    return _core
+
+
+# ============================================================================
+# REST ENCODING (for the HTTP stand-in)
+# ============================================================================
+
+def _camel(key: str) -> str:
+    head, *rest = key.split("_")
+    return head + "".join(word.capitalize() for word in rest)
+
+
+def gemini_rest_json(value: Any) -> Any:
+    """Convert a gemini_content() response to REST JSON (camelCase, base64 bytes)"""
+    if isinstance(value, dict):
+        return {_camel(key): gemini_rest_json(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [gemini_rest_json(item) for item in value]
+    if isinstance(value, (bytes, bytearray)):
+        return base64.b64encode(value).decode("ascii")
+    return value
+
+
+def gemini_rest_prompt(model: str, body: Dict[str, Any]) -> Tuple[Any, bool]:
+    """Extract (contents, wants_image) from a REST generateContent body"""
+    config = body.get("generationConfig", {})
+    return body.get("contents"), _wants_image(model, {"response_modalities": config.get("responseModalities")})
@@ -0,0 +1,131 @@
+"""
+Local HTTP stand-in for the Anthropic and Gemini APIs
+
+Serves the same deterministic responses, latencies and injected failures
+as the in-process fakes (providers/fake.py), for running real SDK clients
+against localhost:
+
+    python -m providers.fake_server --port 8790 --profile typical
+
+    ANTHROPIC_BASE_URL=http://127.0.0.1:8790 GEMINI_BASE_URL=http://127.0.0.1:8790 ...
+
+Endpoints:
+- POST /v1/messages                                (Anthropic Messages API)
+- POST /v1beta/models/<model>:generateContent      (Gemini text and image)
+- GET  /stats                                      (requests and injected failures)
+
+Injected failures are returned as the providers' HTTP errors (429, 500,
+529) so SDK and retry handling see realistic responses. Veo long-running
+operations are only available in-process.
+"""
+
+import argparse
+import json
+import re
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict
+
+from providers.fake import FakeProviderCore, gemini_rest_json, gemini_rest_prompt, resolve_profile
+
+
+GEMINI_PATH = re.compile(r"^/v1(?:beta)?/models/(?P<model>[^:/]+):generateContent$")
+
+ANTHROPIC_ERROR_TYPES = {429: "rate_limit_error", 500: "api_error", 529: "overloaded_error"}
+
+
+def make_handler(core: FakeProviderCore):
+    """Request handler class bound to a fake core"""
+
+    class FakeProviderHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # Keep-alive, like the real APIs
+
+        def _send_json(self, status: int, payload: Dict[str, Any], headers: Dict[str, str] = None) -> None:
+            body = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            for key, value in (headers or {}).items():
+                self.send_header(key, value)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _read_json(self) -> Dict[str, Any]:
+            length = int(self.headers.get("Content-Length", 0))
+            return json.loads(self.rfile.read(length) or b"{}")
+
+        def do_GET(self):
+            if self.path == "/stats":
+                self._send_json(200, {"profile": core.profile, **core.stats})
+            else:
+                self._send_json(404, {"error": {"message": f"Unknown path {self.path}"}})
+
+        def do_POST(self):
+            body = self._read_json()
+
+            if self.path.split("?")[0] == "/v1/messages":
+                message, attempt, digest = core.anthropic_message(body)
+                delay, error = core.outcome(digest, attempt, message["usage"]["output_tokens"])
+                time.sleep(delay)
+                if error is not None:
+                    self._send_json(error.status_code, {
+                        "type": "error",
+                        "error": {"type": ANTHROPIC_ERROR_TYPES.get(error.status_code, "api_error"), "message": str(error)}
+                    }, {"retry-after": "1"} if error.status_code == 429 else None)
+                    return
+                self._send_json(200, message)
+                return
+
+            match = GEMINI_PATH.match(self.path.split("?")[0])
+            if match:
+                contents, wants_image = gemini_rest_prompt(match.group("model"), body)
+                response, attempt, digest, extra = core.gemini_content(match.group("model"), contents, wants_image)
+                delay, error = core.outcome(digest, attempt, response["usage_metadata"]["candidates_token_count"], extra)
+                time.sleep(delay)
+                if error is not None:
+                    status = "RESOURCE_EXHAUSTED" if error.status_code == 429 else "UNAVAILABLE"
+                    self._send_json(error.status_code, {"error": {"code": error.status_code, "message": str(error), "status": status}})
+                    return
+                self._send_json(200, gemini_rest_json(response))
+                return
+
+            self._send_json(404, {"error": {"message": f"Unknown path {self.path}"}})
+
+        def log_message(self, format, *args):
+            pass  # Per-request logging would dominate benchmark output
+
+    return FakeProviderHandler
+
+
+def serve(host: str, port: int, core: FakeProviderCore) -> ThreadingHTTPServer:
+    """Create the stand-in server (call serve_forever() to run it)"""
+    return ThreadingHTTPServer((host, port), make_handler(core))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local fake Anthropic/Gemini API server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8790)
+    parser.add_argument("--profile", default=None, help="Latency profile (instant, typical, slow, flaky)")
+    parser.add_argument("--overrides", default=None, help='JSON profile overrides, e.g. \'{"rate_limit_rate": 0.2}\'')
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--time-scale", type=float, default=None, help="Multiply all latencies (0.1 = 10x faster)")
+    args = parser.parse_args()
+
+    core_kwargs: Dict[str, Any] = {"profile": resolve_profile(args.profile, args.overrides)}
+    if args.seed is not None:
+        core_kwargs["seed"] = args.seed
+    if args.time_scale is not None:
+        core_kwargs["time_scale"] = args.time_scale
+    core = FakeProviderCore(**core_kwargs)
+
+    server = serve(args.host, args.port, core)
+    print(f"✓ Fake provider API listening on http://{args.host}:{args.port} (profile: {args.profile or 'default'})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,301 @@
+"""
+Repair of malformed structured output before falling back to placeholders
+
+A text sub-agent's structured data normally arrives as the input of its
+forced output tool call (providers/structured.py). Sometimes it does not:
+output is cut off at max_tokens, the model answers in text instead of
+calling the tool, or a list is passed as a JSON string. Placeholder data
+then gets rejected at review, and the regeneration re-sends the agent's
+whole prompt.
+
+repair_tool_output() tries two cheap stages first:
+
+1. Local: lenient JSON recovery (code fences, surrounding prose, trailing
+   commas, unclosed strings and brackets), applied to text replies and to
+   string values where the schema expects a list or object. No model call.
+2. Model: one small deterministic call containing only the broken fragment
+   and the tool's schema, forced to call the tool.
+
+Only when both fail does the agent use placeholders (flagged
+parse_fallback, which sends the checkpoint to review and regeneration).
+Per-agent outcomes and repair rates are reported under structured_output
+in /api/metrics.
+"""
+
+import json
+import os
+import re
+from typing import Any, Dict, List, Optional, Tuple, TypedDict
+
+from providers.calls import call_anthropic
+from providers.structured import forced_tool_choice, tool_output
+from providers.usage import AgentRunInfo, usage_from_response
+
+
+STRUCTURED_REPAIR_ENABLED = os.getenv("STRUCTURED_REPAIR_ENABLED", "true").lower() == "true"
+# Set to false to keep repair local (no extra model calls)
+STRUCTURED_REPAIR_MODEL_CALLS = os.getenv("STRUCTURED_REPAIR_MODEL_CALLS", "true").lower() == "true"
+STRUCTURED_REPAIR_MODEL = os.getenv("STRUCTURED_REPAIR_MODEL", "claude-haiku-4-5-20251001")
+STRUCTURED_REPAIR_MAX_TOKENS = int(os.getenv("STRUCTURED_REPAIR_MAX_TOKENS", "4000"))
+STRUCTURED_REPAIR_MAX_FRAGMENT_CHARS = int(os.getenv("STRUCTURED_REPAIR_MAX_FRAGMENT_CHARS", "16000"))
+
+REPAIR_INSTRUCTIONS = """You repair malformed structured output. The user message is a fragment of output that should have matched the schema of the tool you are given, but is truncated, mis-formatted or incomplete.
+
+Record it by calling the tool:
+- Keep every value present in the fragment, word for word
+- Convert values to the types the schema requires (e.g. a comma-separated string into a list)
+- Complete a truncated value or fill a missing required field briefly and consistently with the rest of the fragment"""
+
+# Separators outside strings tried as cut points when closing truncated JSON
+TRUNCATION_CUTS_TRIED = 3
+
+_FENCE = re.compile(r"```(?:json)?\s*(.*?)(?:```|$)", re.DOTALL)
+_TRAILING_COMMA = re.compile(r",\s*([}\]])")
+_JSON_TYPES = {"array": list, "object": dict, "string": str}
+
+
+class OutputRepair(TypedDict):
+    """How an agent's structured output was obtained"""
+    stage: str  # "none" (valid as returned), "local", "model" or "failed"
+    run_info: Optional[AgentRunInfo]  # The repair model call, if one was made (priced at its own model)
+
+
+# ============================================================================
+# LENIENT JSON
+# ============================================================================
+
+def _close_truncated(text: str) -> List[str]:
+    """Candidate completions of JSON cut off mid-value, most complete first"""
+    stack: List[str] = []
+    cuts: List[Tuple[int, str]] = []
+    in_string = escape = False
+    for index, char in enumerate(text):
+        if in_string:
+            if escape:
+                escape = False
+            elif char == "\\":
+                escape = True
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char in "{[":
+            stack.append("}" if char == "{" else "]")
+        elif char in "}]":
+            if stack:
+                stack.pop()
+        elif char == ",":
+            cuts.append((index, "".join(reversed(stack))))
+
+    candidates = [text + ('"' if in_string else "") + "".join(reversed(stack))]
+    candidates += [text[:index] + closers for index, closers in reversed(cuts[-TRUNCATION_CUTS_TRIED:])]
+    return candidates
+
+
+def lenient_json(text: str) -> Optional[Any]:
+    """
+    Parse the first JSON object or array in model text, leniently
+
+    Tolerates code fences, prose before or after the JSON, trailing commas
+    and output truncated mid-value (the last complete values are kept).
+
+    Args:
+        text: Model output
+
+    Returns:
+        Parsed value, or None if nothing could be recovered
+    """
+    fence = _FENCE.search(text)
+    if fence:
+        text = fence.group(1)
+    starts = [index for index in (text.find("{"), text.find("[")) if index >= 0]
+    if not starts:
+        return None
+    text = _TRAILING_COMMA.sub(r"\1", text[min(starts):].strip())
+
+    decoder = json.JSONDecoder()
+    for candidate in [text] + _close_truncated(text):
+        try:
+            return decoder.raw_decode(_TRAILING_COMMA.sub(r"\1", candidate))[0]
+        except ValueError:
+            continue
+    return None
+
+
+def _problems(data: Dict[str, Any], schema: Dict[str, Any]) -> List[str]:
+    """Required keys that are missing or have the wrong JSON type"""
+    properties = schema.get("properties", {})
+    problems = []
+    for key in schema.get("required", []):
+        if key == "narrative":
+            continue
+        expected = _JSON_TYPES.get(properties.get(key, {}).get("type"))
+        if key not in data or (expected is not None and not isinstance(data[key], expected)):
+            problems.append(key)
+    return problems
+
+
+def _coerce(data: Dict[str, Any], schema: Dict[str, Any]) -> Dict[str, Any]:
+    """Unwrap a single wrapper key and parse lists/objects passed as JSON strings"""
+    properties = schema.get("properties", {})
+    if len(data) == 1:
+        (inner,) = data.values()
+        if isinstance(inner, dict) and not set(data) & set(properties):
+            data = dict(inner)  # e.g. {"record_personality": {...}}
+
+    for key, value in list(data.items()):
+        expected = _JSON_TYPES.get(properties.get(key, {}).get("type"))
+        if expected in (list, dict) and isinstance(value, str):
+            parsed = lenient_json(value)
+            if isinstance(parsed, expected):
+                data[key] = parsed
+    return data
+
+
+def _tool_input(response, tool: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Raw input of the output tool call, or None if the tool was not called"""
+    for block in response.content:
+        if getattr(block, "type", None) == "tool_use" and block.name == tool["name"]:
+            return dict(block.input) if isinstance(block.input, dict) else {}
+    return None
+
+
+def _response_text(response) -> str:
+    return "".join(getattr(block, "text", "") for block in response.content).strip()
+
+
+# ============================================================================
+# METRICS
+# ============================================================================
+
+_metrics: Dict[str, Dict[str, int]] = {}
+
+
+def _record(agent: str, stage: str) -> None:
+    counts = _metrics.setdefault(agent, {"outputs": 0, "valid": 0, "repaired_local": 0, "repaired_model": 0, "failed": 0})
+    counts["outputs"] += 1
+    counts[{"none": "valid", "local": "repaired_local", "model": "repaired_model"}.get(stage, "failed")] += 1
+
+
+def _with_rate(counts: Dict[str, int]) -> Dict[str, Any]:
+    repaired = counts["repaired_local"] + counts["repaired_model"]
+    broken = repaired + counts["failed"]
+    return {**counts, "repair_rate": repaired / broken if broken else None}
+
+
+def get_output_repair_metrics() -> Dict[str, Any]:
+    """Structured output outcomes and repair rates (overall and per agent) for /api/metrics"""
+    totals = {"outputs": 0, "valid": 0, "repaired_local": 0, "repaired_model": 0, "failed": 0}
+    for counts in _metrics.values():
+        for key in totals:
+            totals[key] += counts[key]
+    return {
+        "enabled": STRUCTURED_REPAIR_ENABLED,
+        "model_calls": STRUCTURED_REPAIR_MODEL_CALLS,
+        **_with_rate(totals),
+        "by_agent": {agent: _with_rate(counts) for agent, counts in _metrics.items()},
+    }
+
+
+# ============================================================================
+# REPAIR
+# ============================================================================
+
+async def _model_repair(client, agent: str, fragment: str, tool: Dict[str, Any]) -> Tuple[Optional[Dict[str, Any]], Any]:
+    """One small forced-tool call with only the fragment and the schema"""
+    schema = dict(tool["input_schema"])
+    schema["properties"] = {key: value for key, value in schema["properties"].items() if key != "narrative"}
+    schema["required"] = [key for key in schema["required"] if key != "narrative"]
+    repair_tool = {**tool, "input_schema": schema}
+
+    response = await call_anthropic(
+        client,
+        f"{agent}_repair",
+        model=STRUCTURED_REPAIR_MODEL,
+        max_tokens=STRUCTURED_REPAIR_MAX_TOKENS,
+        temperature=0,  # Deterministic: eligible for the response cache
+        system=REPAIR_INSTRUCTIONS,
+        tools=[repair_tool],
+        tool_choice=forced_tool_choice(repair_tool),
+        messages=[{"role": "user", "content": fragment[:STRUCTURED_REPAIR_MAX_FRAGMENT_CHARS]}]
+    )
+
+    data = _tool_input(response, repair_tool)
+    if data is None:
+        data = lenient_json(_response_text(response))
+    if isinstance(data, dict):
+        data = _coerce(data, schema)
+        if not _problems(data, schema):
+            return data, response
+    return None, response
+
+
+async def repair_tool_output(
+    client,
+    agent: str,
+    response,
+    tool: Dict[str, Any]
+) -> Tuple[str, Optional[Dict[str, Any]], OutputRepair]:
+    """
+    Extract an output tool's input, repairing malformed output cheaply
+
+    Args:
+        client: Anthropic client (used only for the model repair stage)
+        agent: Agent name (metrics, and "<agent>_repair" for the repair call)
+        response: anthropic Message from a call with forced_tool_choice(tool)
+        tool: The output tool
+
+    Returns:
+        Tuple of (narrative, structured data without the narrative or None
+        if repair failed, repair outcome with the repair call's run info)
+    """
+    repair: OutputRepair = {"stage": "none", "run_info": None}
+    schema = tool["input_schema"]
+
+    narrative, data = tool_output(response, tool)
+    if data is not None and not _problems(data, schema):
+        _record(agent, "none")
+        return narrative, data, repair
+    if not STRUCTURED_REPAIR_ENABLED:
+        # Invalid data is not passed through: the agent falls back to placeholders
+        repair["stage"] = "failed"
+        _record(agent, "failed")
+        return narrative, None, repair
+
+    # Stage 1: local lenient recovery
+    raw = _tool_input(response, tool)
+    text = _response_text(response)
+    candidate = raw if raw else lenient_json(text)
+    # Partial data including the narrative: enough to rebuild the rest from
+    fragment = json.dumps(candidate, ensure_ascii=False) if isinstance(candidate, dict) and candidate else text
+    if isinstance(candidate, dict):
+        candidate = _coerce(candidate, schema)
+        narrative = candidate.pop("narrative", "") or narrative
+        if not _problems(candidate, schema):
+            print(f"✓ Repaired {agent} output locally")
+            repair["stage"] = "local"
+            _record(agent, "local")
+            return narrative, candidate, repair
+
+    # Stage 2: tiny model call with only the broken fragment and the schema
+    if STRUCTURED_REPAIR_MODEL_CALLS and fragment:
+        try:
+            data, repair_response = await _model_repair(client, agent, fragment, tool)
+            repair["run_info"] = {
+                "model": STRUCTURED_REPAIR_MODEL,
+                "usage": usage_from_response(repair_response),
+                "wall_time_seconds": 0.0,  # Already part of the agent's run time
+                "api_calls": 1
+            }
+            if data is not None:
+                print(f"✓ Repaired {agent} output with {STRUCTURED_REPAIR_MODEL}")
+                repair["stage"] = "model"
+                _record(agent, "model")
+                return narrative, data, repair
+        except Exception as e:
+            print(f"Warning: {agent} output repair call failed ({type(e).__name__}: {e})")
+
+    print(f"Warning: Could not repair {agent} output; using placeholder data")
+    repair["stage"] = "failed"
+    _record(agent, "failed")
+    return narrative, None, repair
@@ -0,0 +1,344 @@
+"""
+Content-addressed on-disk cache for model responses
+
+Re-running a character with identical inputs (crash recovery, tests,
+benchmarks, the same storyline in another project) sends byte-identical
+requests. With the cache enabled, call_anthropic() and call_gemini() look
+the request up by a SHA-256 of the provider, model, system prompt,
+messages/contents, tools and sampling parameters, and only call the
+provider on a miss.
+
+What gets cached (RESPONSE_CACHE_ENABLED=true):
+- Deterministic requests (temperature 0) from every agent
+- Sampled requests only from agents listed in RESPONSE_CACHE_AGENTS
+  ("all" for every agent), since caching them pins one sample
+
+Entries live in RESPONSE_CACHE_DIR as <key[:2]>/<key>.json. The cache is
+bounded by RESPONSE_CACHE_MAX_BYTES with least-recently-used eviction and
+entries expire after RESPONSE_CACHE_TTL_SECONDS. Responses cut off at
+max_tokens are never stored. A hit reports zero token usage, since nothing
+was billed. Inside fresh_responses() lookups are skipped (results are still
+stored), so an explicit regeneration gets a new sample.
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+
+RESPONSE_CACHE_ENABLED = os.getenv("RESPONSE_CACHE_ENABLED", "false").lower() == "true"
+RESPONSE_CACHE_DIR = os.getenv("RESPONSE_CACHE_DIR", "./backend/response_cache")
+RESPONSE_CACHE_MAX_BYTES = int(os.getenv("RESPONSE_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
+RESPONSE_CACHE_TTL_SECONDS = float(os.getenv("RESPONSE_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))  # 0 = never expire
+
+# Comma-separated agents whose sampled (temperature > 0) calls are cached, or "all"
+RESPONSE_CACHE_AGENTS = {a.strip() for a in os.getenv("RESPONSE_CACHE_AGENTS", "").split(",") if a.strip()}
+
+# Bump when the key or entry layout changes
+CACHE_FORMAT_VERSION = 1
+
+# Set inside fresh_responses() (context-local, so concurrent runs are unaffected)
+_skip_lookup: ContextVar[bool] = ContextVar("response_cache_skip_lookup", default=False)
+
+
+# ============================================================================
+# KEYS
+# ============================================================================
+
+def _canonical(value: Any) -> Any:
+    """json.dumps default hook: SDK models by content, bytes by digest"""
+    if hasattr(value, "model_dump"):
+        return value.model_dump(mode="json", exclude_none=True)
+    if isinstance(value, (bytes, bytearray)):
+        return {"sha256": hashlib.sha256(value).hexdigest()}
+    raise TypeError(f"{type(value).__name__} has no stable cache representation")
+
+
+def canonical_params(params: Dict[str, Any]) -> Dict[str, Any]:
+    """JSON-safe copy of SDK call arguments, as hashed by request_key()"""
+    return json.loads(json.dumps(params, default=_canonical))
+
+
+def request_key(provider: str, params: Dict[str, Any]) -> Optional[str]:
+    """
+    Content address of a request
+
+    Args:
+        provider: "anthropic" or "gemini"
+        params: Keyword arguments of the SDK call
+
+    Returns:
+        Hex SHA-256 key, or None if a parameter cannot be hashed stably
+    """
+    try:
+        payload = json.dumps(
+            {"version": CACHE_FORMAT_VERSION, "provider": provider, "params": params},
+            sort_keys=True,
+            separators=(",", ":"),
+            default=_canonical
+        )
+    except (TypeError, ValueError):
+        return None
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _temperature(params: Dict[str, Any]) -> Optional[float]:
+    if "temperature" in params:
+        return params["temperature"]
+    config = params.get("config")
+    if isinstance(config, dict):
+        return config.get("temperature")
+    return getattr(config, "temperature", None)
+
+
+def is_deterministic(params: Dict[str, Any]) -> bool:
+    """Whether a request asks for no sampling (temperature 0; providers sample by default)"""
+    return _temperature(params) == 0
+
+
+def should_cache(agent: str, params: Dict[str, Any]) -> bool:
+    """Whether a call is eligible: deterministic, or from an opted-in agent"""
+    if not RESPONSE_CACHE_ENABLED:
+        return False
+    if is_deterministic(params):
+        return True
+    return "all" in RESPONSE_CACHE_AGENTS or agent in RESPONSE_CACHE_AGENTS
+
+
+# ============================================================================
+# SERIALIZATION
+# ============================================================================
+
+def load_response(provider: str, body: Dict[str, Any]):
+    """Rebuild an SDK response object from its JSON dump"""
+    if provider == "anthropic":
+        from anthropic.types import Message
+        return Message.model_validate_json(json.dumps(body))
+    from google.genai import types
+    return types.GenerateContentResponse.model_validate_json(json.dumps(body))
+
+
+def clear_usage(response) -> None:
+    """Zero the token counts of a replayed response (nothing was billed)"""
+    usage = getattr(response, "usage", None)
+    if usage is not None:
+        for field in ("input_tokens", "output_tokens", "cache_creation_input_tokens", "cache_read_input_tokens"):
+            if getattr(usage, field, None) is not None:
+                setattr(usage, field, 0)
+    if getattr(response, "usage_metadata", None) is not None:
+        response.usage_metadata = None
+
+
+# ============================================================================
+# CACHE
+# ============================================================================
+
+class ResponseCache:
+    """
+    Size-bounded LRU of provider responses on disk
+
+    The index (key → size, in recency order) is rebuilt from file mtimes at
+    startup; a hit touches the file so recency survives restarts. Methods
+    block on file I/O and are called through asyncio.to_thread().
+    """
+
+    def __init__(
+        self,
+        directory: str = RESPONSE_CACHE_DIR,
+        max_bytes: int = RESPONSE_CACHE_MAX_BYTES,
+        ttl_seconds: float = RESPONSE_CACHE_TTL_SECONDS
+    ):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._index: "OrderedDict[str, int]" = OrderedDict()
+        self._bytes = 0
+        self._counters = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0, "expired": 0, "uncacheable": 0}
+        self._by_agent: Dict[str, Dict[str, int]] = {}
+
+        if self.directory.exists():
+            entries = []
+            for path in self.directory.glob("*/*.json"):
+                stat = path.stat()
+                entries.append((stat.st_mtime, path.stem, stat.st_size))
+            for _, key, size in sorted(entries):
+                self._index[key] = size
+                self._bytes += size
+
+    def _path(self, key: str) -> Path:
+        return self.directory / key[:2] / f"{key}.json"
+
+    def _count(self, agent: str, outcome: str) -> None:
+        self._counters[outcome] += 1
+        if outcome in ("hits", "misses"):
+            entry = self._by_agent.setdefault(agent, {"hits": 0, "misses": 0})
+            entry[outcome] += 1
+
+    def note_uncacheable(self) -> None:
+        """Count a request or response that could not be cached"""
+        with self._lock:
+            self._counters["uncacheable"] += 1
+
+    def _drop(self, key: str) -> None:
+        self._bytes -= self._index.pop(key, 0)
+        self._path(key).unlink(missing_ok=True)
+
+    def get(self, key: str, provider: str, agent: str):
+        """
+        Look up a response
+
+        Returns:
+            The replayed response (usage zeroed), or None on a miss
+        """
+        with self._lock:
+            if key not in self._index:
+                self._count(agent, "misses")
+                return None
+
+            path = self._path(key)
+            try:
+                entry = json.loads(path.read_text(encoding="utf-8"))
+            except (OSError, ValueError):
+                self._drop(key)
+                self._count(agent, "misses")
+                return None
+
+            if self.ttl_seconds and time.time() - entry["created_at"] > self.ttl_seconds:
+                self._drop(key)
+                self._counters["expired"] += 1
+                self._count(agent, "misses")
+                return None
+
+            os.utime(path)
+            self._index.move_to_end(key)
+            self._count(agent, "hits")
+
+        response = load_response(provider, entry["response"])
+        clear_usage(response)
+        return response
+
+    def put(self, key: str, provider: str, agent: str, response) -> bool:
+        """
+        Store a response (skipped if truncated or not serializable)
+
+        Returns:
+            True if stored
+        """
+        if getattr(response, "stop_reason", None) == "max_tokens":
+            return False
+        try:
+            body = json.loads(response.model_dump_json())
+        except (AttributeError, TypeError, ValueError):
+            self.note_uncacheable()
+            return False
+
+        encoded = json.dumps({
+            "provider": provider,
+            "agent": agent,
+            "created_at": time.time(),
+            "response": body
+        }).encode("utf-8")
+
+        with self._lock:
+            path = self._path(key)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = path.with_suffix(".tmp")
+            tmp_path.write_bytes(encoded)
+            os.replace(tmp_path, path)
+
+            self._bytes += len(encoded) - self._index.pop(key, 0)
+            self._index[key] = len(encoded)
+            self._counters["stores"] += 1
+
+            while self._bytes > self.max_bytes and len(self._index) > 1:
+                oldest = next(iter(self._index))
+                self._drop(oldest)
+                self._counters["evictions"] += 1
+        return True
+
+    def stats(self) -> Dict[str, Any]:
+        """Counters, hit rate and size (overall and per agent)"""
+        with self._lock:
+            lookups = self._counters["hits"] + self._counters["misses"]
+            return {
+                **self._counters,
+                "hit_rate": self._counters["hits"] / lookups if lookups else None,
+                "entries": len(self._index),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "by_agent": {agent: dict(counts) for agent, counts in self._by_agent.items()},
+            }
+
+
+_cache: Optional[ResponseCache] = None
+
+
+def get_response_cache() -> ResponseCache:
+    """Process-wide cache (created on first use)"""
+    global _cache
+    if _cache is None:
+        _cache = ResponseCache()
+    return _cache
+
+
+def get_response_cache_metrics() -> Dict[str, Any]:
+    """Cache metrics for /api/metrics"""
+    if not RESPONSE_CACHE_ENABLED:
+        return {"enabled": False}
+    return {"enabled": True, **get_response_cache().stats()}
+
+
+def lookups_skipped() -> bool:
+    """Whether the current context is inside fresh_responses()"""
+    return _skip_lookup.get()
+
+
+@contextmanager
+def fresh_responses():
+    """Skip cache lookups (still storing results) for calls made inside the block"""
+    token = _skip_lookup.set(True)
+    try:
+        yield
+    finally:
+        _skip_lookup.reset(token)
+
+
+async def cached_call(provider: str, agent: str, params: Dict[str, Any], make_call: Callable[[], Awaitable]):
+    """
+    Serve a provider call from the cache, calling through on a miss
+
+    Args:
+        provider: "anthropic" or "gemini"
+        agent: Agent name (eligibility and per-agent metrics)
+        params: Keyword arguments of the SDK call (hashed into the key)
+        make_call: Zero-argument callable performing the real call
+
+    Returns:
+        The provider response
+    """
+    if not should_cache(agent, params):
+        return await make_call()
+
+    cache = get_response_cache()
+    key = request_key(provider, params)
+    if key is None:
+        cache.note_uncacheable()
+        return await make_call()
+
+    if not lookups_skipped():
+        cached = await asyncio.to_thread(cache.get, key, provider, agent)
+        if cached is not None:
+            return cached
+
+    response = await make_call()
+    await asyncio.to_thread(cache.put, key, provider, agent, response)
+    return response
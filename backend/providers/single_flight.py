@@ -0,0 +1,146 @@
+"""
+In-flight deduplication (single-flight) of identical model calls
+
+Batch starts, retried HTTP requests and double-submitted feedback can put
+byte-identical requests in flight at the same moment, and different Scene
+Creator sessions call the same tools with the same scene JSON. With
+single-flight, call_anthropic() and call_gemini() key each request by the
+response cache's SHA-256. The first caller (the leader) runs the call.
+Concurrent callers with the same key attach to it and receive a copy of its
+response or its error. Nothing is remembered after the call completes;
+that is the response cache's job.
+
+Followers' copies report zero token usage (the call was billed once, to
+the leader), so budgets are not double-counted.
+
+Scope: only deterministic requests (temperature 0) are merged. Sampled
+requests are independent samples and are merged only for agents listed in
+SINGLE_FLIGHT_SAMPLED_AGENTS ("all" for every agent). Regenerations
+(inside fresh_responses()) are never merged, and neither are agents listed
+in SINGLE_FLIGHT_EXCLUDE_AGENTS. The Scene Creator validators and
+continuity checker run at temperature 0 so their shared scene checks merge.
+
+The shared call is cancelled only when every caller waiting on it has been
+cancelled.
+"""
+
+import asyncio
+import os
+import weakref
+from typing import Any, Awaitable, Callable, Dict
+
+from providers.response_cache import clear_usage, is_deterministic, lookups_skipped, request_key
+
+
+SINGLE_FLIGHT_ENABLED = os.getenv("SINGLE_FLIGHT_ENABLED", "true").lower() == "true"
+
+# Comma-separated agents whose sampled (temperature > 0) calls may be merged, or "all"
+SINGLE_FLIGHT_SAMPLED_AGENTS = {a.strip() for a in os.getenv("SINGLE_FLIGHT_SAMPLED_AGENTS", "").split(",") if a.strip()}
+
+# Comma-separated agents whose calls are never merged
+SINGLE_FLIGHT_EXCLUDE_AGENTS = {a.strip() for a in os.getenv("SINGLE_FLIGHT_EXCLUDE_AGENTS", "").split(",") if a.strip()}
+
+
+def should_coalesce(agent: str, params: Dict[str, Any]) -> bool:
+    """Whether a call may attach to an identical in-flight call"""
+    if not SINGLE_FLIGHT_ENABLED or agent in SINGLE_FLIGHT_EXCLUDE_AGENTS:
+        return False
+    if lookups_skipped():
+        return False  # A regeneration is meant to be a new sample
+    if is_deterministic(params):
+        return True
+    return "all" in SINGLE_FLIGHT_SAMPLED_AGENTS or agent in SINGLE_FLIGHT_SAMPLED_AGENTS
+
+
+# ============================================================================
+# METRICS
+# ============================================================================
+
+_metrics: Dict[str, Dict[str, int]] = {}
+
+
+def _agent_metrics(agent: str) -> Dict[str, int]:
+    return _metrics.setdefault(agent, {"leaders": 0, "coalesced": 0})
+
+
+def get_single_flight_metrics() -> Dict[str, Any]:
+    """Leader and coalesced call counts (overall and per agent) for /api/metrics"""
+    leaders = sum(m["leaders"] for m in _metrics.values())
+    coalesced = sum(m["coalesced"] for m in _metrics.values())
+    return {
+        "enabled": SINGLE_FLIGHT_ENABLED,
+        "sampled_agents": sorted(SINGLE_FLIGHT_SAMPLED_AGENTS),
+        "leaders": leaders,
+        "coalesced": coalesced,
+        "coalesced_ratio": coalesced / (leaders + coalesced) if leaders + coalesced else None,
+        "in_flight": sum(len(flights) for flights in _flights.values()),
+        "by_agent": {agent: dict(counts) for agent, counts in _metrics.items()},
+    }
+
+
+# ============================================================================
+# CALLS
+# ============================================================================
+
+class _Flight:
+    """A shared in-flight call and the number of callers waiting on it"""
+
+    def __init__(self, task: asyncio.Future):
+        self.task = task
+        self.waiters = 0
+
+
+# Running loop → {request key: flight} (futures belong to one loop)
+_flights: "weakref.WeakKeyDictionary[Any, Dict[str, _Flight]]" = weakref.WeakKeyDictionary()
+
+
+def _follower_copy(response):
+    """Copy of the leader's response with usage zeroed"""
+    copy = response.model_copy(deep=True) if hasattr(response, "model_copy") else response
+    if copy is not response:
+        clear_usage(copy)
+    return copy
+
+
+async def _wait(flight: _Flight):
+    flight.waiters += 1
+    try:
+        return await asyncio.shield(flight.task)
+    except asyncio.CancelledError:
+        if flight.waiters == 1 and not flight.task.done():
+            flight.task.cancel()  # Last caller gave up
+        raise
+    finally:
+        flight.waiters -= 1
+
+
+async def single_flight(provider: str, agent: str, params: Dict[str, Any], make_call: Callable[[], Awaitable]):
+    """
+    Run a provider call, attaching to an identical call already in flight
+
+    Args:
+        provider: "anthropic" or "gemini"
+        agent: Agent name (scope and per-agent metrics)
+        params: Keyword arguments of the SDK call (hashed into the key)
+        make_call: Zero-argument callable performing the call
+
+    Returns:
+        The provider response (a usage-free copy for followers)
+    """
+    if not should_coalesce(agent, params):
+        return await make_call()
+
+    key = request_key(provider, params)
+    if key is None:
+        return await make_call()
+
+    flights = _flights.setdefault(asyncio.get_running_loop(), {})
+    flight = flights.get(key)
+    if flight is not None:
+        _agent_metrics(agent)["coalesced"] += 1
+        return _follower_copy(await _wait(flight))
+
+    _agent_metrics(agent)["leaders"] += 1
+    flight = flights[key] = _Flight(asyncio.ensure_future(make_call()))
+    flight.task.add_done_callback(lambda _: flights.pop(key, None) if flights.get(key) is flight else None)
+    return await _wait(flight)
@@ -0,0 +1,137 @@
+"""
+Structured output through forced tool calls
+
+Instead of asking the model for a NARRATIVE:/STRUCTURED: text format and
+parsing JSON out of it, an agent declares one "output tool" whose input
+schema is generated from its TypedDict and forces the model to call it.
+The structured data then arrives already parsed in the tool_use block.
+
+    tool = output_tool("record_personality", "Record the profile", PersonalityOutput,
+                       narrative="2-3 paragraph narrative")
+    response = await call_anthropic(client, agent, tools=[tool],
+                                    tool_choice=forced_tool_choice(tool), ...)
+    narrative, data = tool_output(response, tool)
+"""
+
+import typing
+from typing import Any, Dict, Optional, Tuple, Union, get_args, get_origin, get_type_hints
+
+try:
+    from typing import is_typeddict  # Python 3.10+
+except ImportError:
+    from typing_extensions import is_typeddict  # Python < 3.10
+
+
+_PRIMITIVE_SCHEMAS = {
+    str: {"type": "string"},
+    int: {"type": "integer"},
+    float: {"type": "number"},
+    bool: {"type": "boolean"},
+}
+
+
+def type_schema(annotation: Any) -> Dict[str, Any]:
+    """
+    JSON schema for a type annotation
+
+    Supports primitives, List, Dict[str, X], Optional/Union, Literal, Any
+    and nested TypedDicts.
+    """
+    if annotation in _PRIMITIVE_SCHEMAS:
+        return dict(_PRIMITIVE_SCHEMAS[annotation])
+    if annotation is Any:
+        return {}
+    if is_typeddict(annotation):
+        return typeddict_schema(annotation)
+
+    origin = get_origin(annotation)
+    args = get_args(annotation)
+    if origin in (list, typing.List):
+        return {"type": "array", "items": type_schema(args[0]) if args else {}}
+    if origin in (dict, typing.Dict):
+        return {"type": "object", "additionalProperties": type_schema(args[1]) if args else {}}
+    if origin is typing.Literal:
+        return {"enum": list(args)}
+    if origin is Union:
+        options = [arg for arg in args if arg is not type(None)]
+        if len(options) == 1:
+            return type_schema(options[0])
+        return {"anyOf": [type_schema(option) for option in options]}
+
+    raise TypeError(f"No JSON schema mapping for {annotation!r}")
+
+
+def typeddict_schema(cls: type) -> Dict[str, Any]:
+    """
+    JSON schema for a TypedDict (docstring becomes the description)
+
+    Args:
+        cls: TypedDict class
+
+    Returns:
+        Object schema with every key and the TypedDict's required keys
+    """
+    hints = get_type_hints(cls)
+    schema: Dict[str, Any] = {
+        "type": "object",
+        "properties": {key: type_schema(annotation) for key, annotation in hints.items()},
+        "required": [key for key in hints if key in cls.__required_keys__],
+    }
+    if cls.__doc__:
+        schema["description"] = cls.__doc__.strip()
+    return schema
+
+
+def output_tool(name: str, description: str, output_type: type, narrative: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Tool definition whose input is an agent's structured output
+
+    Args:
+        name: Tool name
+        description: What calling the tool records
+        output_type: TypedDict the input must match
+        narrative: If given, adds a leading required "narrative" string
+            property with this description (prose written before the data)
+
+    Returns:
+        Tool definition for messages.create(tools=...)
+    """
+    schema = typeddict_schema(output_type)
+    schema.pop("description", None)
+    if narrative is not None:
+        schema["properties"] = {"narrative": {"type": "string", "description": narrative}, **schema["properties"]}
+        schema["required"] = ["narrative"] + schema["required"]
+    return {"name": name, "description": description, "input_schema": schema}
+
+
+def forced_tool_choice(tool: Dict[str, Any]) -> Dict[str, str]:
+    """tool_choice that makes the model call this tool"""
+    return {"type": "tool", "name": tool["name"]}
+
+
+def tool_output(response, tool: Dict[str, Any]) -> Tuple[str, Optional[Dict[str, Any]]]:
+    """
+    Extract an output tool's input from a response
+
+    Args:
+        response: anthropic Message from a call with forced_tool_choice(tool)
+        tool: The output tool
+
+    Returns:
+        Tuple of (narrative, structured data without the narrative). The data
+        is None if the tool was not called or required keys are missing
+        (e.g. output cut off at max_tokens).
+    """
+    for block in response.content:
+        if getattr(block, "type", None) == "tool_use" and block.name == tool["name"]:
+            data = dict(block.input) if isinstance(block.input, dict) else {}
+            narrative = data.pop("narrative", "")
+            missing = [key for key in tool["input_schema"]["required"] if key != "narrative" and key not in data]
+            if missing:
+                print(f"Warning: {tool['name']} output is missing {', '.join(missing)} (stop reason: {getattr(response, 'stop_reason', None)})")
+                return narrative, None
+            return narrative, data
+
+    print(f"Warning: Model did not call {tool['name']} (stop reason: {getattr(response, 'stop_reason', None)})")
+    text = "".join(getattr(block, "text", "") for block in response.content)
+    return text.strip(), None
@@ -0,0 +1,135 @@
+"""
+Token usage accounting for model provider responses
+
+Normalizes Anthropic and Gemini usage metadata into a single TokenUsage
+shape so that agents can report real counts instead of estimates.
+"""
+
+import os
+from typing import Dict, TypedDict, Iterable, Optional
+try:
+    from typing import NotRequired  # Python 3.11+
+except ImportError:
+    from typing_extensions import NotRequired  # Python < 3.11
+
+
+# USD per million tokens: (input, output, cache write, cache read)
+MODEL_PRICES: Dict[str, tuple] = {
+    "claude-haiku-4-5-20251001": (1.00, 5.00, 1.25, 0.10),
+    "claude-sonnet-4-5-20250929": (3.00, 15.00, 3.75, 0.30),
+    "gemini-2.5-flash-image": (0.30, 30.00, 0.30, 0.03),
+}
+
+# Used for models missing from MODEL_PRICES
+DEFAULT_MODEL_PRICE = tuple(
+    float(p) for p in os.getenv("DEFAULT_MODEL_PRICE_PER_MTOK", "3.0,15.0,3.75,0.3").split(",")
+)
+
+
+class TokenUsage(TypedDict):
+    """Token counts reported by the provider for one or more calls"""
+    input_tokens: int
+    output_tokens: int
+    cache_creation_input_tokens: int
+    cache_read_input_tokens: int
+
+
+class AgentRunInfo(TypedDict):
+    """Measured cost and outcome of a single sub-agent run"""
+    model: str
+    usage: TokenUsage
+    wall_time_seconds: float
+    api_calls: int
+    parse_fallback: NotRequired[bool]  # True if placeholder data replaced unparseable output
+    output_repair: NotRequired[str]  # "none", "local", "model" or "failed" (providers/output_repair.py)
+    repair: NotRequired[Optional["AgentRunInfo"]]  # Repair model call, recorded as "<agent>_repair"
+
+
+def empty_usage() -> TokenUsage:
+    """Create a zeroed usage record"""
+    return {
+        "input_tokens": 0,
+        "output_tokens": 0,
+        "cache_creation_input_tokens": 0,
+        "cache_read_input_tokens": 0,
+    }
+
+
+def usage_from_response(response) -> TokenUsage:
+    """
+    Extract token usage from an Anthropic or Gemini response
+
+    Args:
+        response: anthropic Message or google-genai GenerateContentResponse
+
+    Returns:
+        TokenUsage (zeros for fields the provider did not report)
+    """
+    usage = empty_usage()
+
+    # Anthropic: response.usage
+    anthropic_usage = getattr(response, "usage", None)
+    if anthropic_usage is not None:
+        usage["input_tokens"] = getattr(anthropic_usage, "input_tokens", 0) or 0
+        usage["output_tokens"] = getattr(anthropic_usage, "output_tokens", 0) or 0
+        usage["cache_creation_input_tokens"] = getattr(anthropic_usage, "cache_creation_input_tokens", 0) or 0
+        usage["cache_read_input_tokens"] = getattr(anthropic_usage, "cache_read_input_tokens", 0) or 0
+        return usage
+
+    # Gemini: response.usage_metadata
+    gemini_usage = getattr(response, "usage_metadata", None)
+    if gemini_usage is not None:
+        cached = getattr(gemini_usage, "cached_content_token_count", 0) or 0
+        prompt = getattr(gemini_usage, "prompt_token_count", 0) or 0
+        usage["input_tokens"] = max(prompt - cached, 0)
+        usage["output_tokens"] = getattr(gemini_usage, "candidates_token_count", 0) or 0
+        usage["cache_read_input_tokens"] = cached
+
+    return usage
+
+
+def add_usage(total: TokenUsage, usage: Optional[TokenUsage]) -> TokenUsage:
+    """Add usage into a running total (in place) and return the total"""
+    if usage:
+        for key in total:
+            total[key] += usage.get(key, 0)  # type: ignore
+    return total
+
+
+def sum_usage(usages: Iterable[Optional[TokenUsage]]) -> TokenUsage:
+    """Sum several usage records"""
+    total = empty_usage()
+    for usage in usages:
+        add_usage(total, usage)
+    return total
+
+
+def total_tokens(usage: Optional[TokenUsage]) -> int:
+    """Total billed tokens (input, output and cache reads/writes)"""
+    if not usage:
+        return 0
+    return sum(usage.values())
+
+
+def estimate_cost_usd(model: str, usage: Optional[TokenUsage]) -> float:
+    """
+    Estimate the USD cost of a usage record at list prices
+
+    Args:
+        model: Model identifier reported in AgentRunInfo
+        usage: Token usage for that model
+
+    Returns:
+        Cost in USD (0.0 when usage is missing)
+    """
+    if not usage:
+        return 0.0
+
+    input_price, output_price, cache_write_price, cache_read_price = MODEL_PRICES.get(model, DEFAULT_MODEL_PRICE)
+    cost = (
+        usage.get("input_tokens", 0) * input_price
+        + usage.get("output_tokens", 0) * output_price
+        + usage.get("cache_creation_input_tokens", 0) * cache_write_price
+        + usage.get("cache_read_input_tokens", 0) * cache_read_price
+    )
+    return cost / 1_000_000
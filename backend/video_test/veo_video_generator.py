@@ -20,6 +20,8 @@ from io import BytesIO
 from typing import List, Optional, Dict, Any
 from datetime import datetime
 
+from providers.clients import get_gemini_client
+
 try:
     from google import genai
     from google.genai import types
@@ -44,7 +46,7 @@ except ImportError:
 veo_client = None
 if VEO_AVAILABLE:
     try:
-        veo_client = genai.Client(api_key=os.getenv("GEMINI_API_KEY"))
+        veo_client = get_gemini_client(os.getenv("GEMINI_API_KEY"))  # Fake client when PROVIDER_MODE=fake
     except Exception as e:
         print(f"Warning: Failed to initialize Veo client: {e}")
         veo_client = None